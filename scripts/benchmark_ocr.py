@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+OCR吞吐基准测试
+对比逐页 pytesseract.image_to_string（每页启动一次 tesseract 进程）
+与常驻引擎池（src/utils/ocr_engine_pool.py）的页/秒。
+逐页基线是单线程的，因此引擎池先以 1 个工作线程运行（只体现引擎常驻），
+再以 --workers 个工作线程运行（体现并行），两部分加速分别报告。
+
+用法:
+    python scripts/benchmark_ocr.py                     # 合成 20 页扫描样张
+    python scripts/benchmark_ocr.py --pdf scan.pdf      # 使用本地扫描版PDF
+    python scripts/benchmark_ocr.py --images ./pages    # 使用目录下的页面图片
+"""
+
+import os
+import sys
+import time
+import argparse
+from typing import List, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.ocr_engine_pool import OCREnginePool, DEFAULT_LANG
+
+SAMPLE_LINES = [
+    "第一条 合同双方应遵守本协议的全部条款。",
+    "Article 2. The supplier shall deliver the goods within 30 days.",
+    "第三条 付款方式：验收合格后十五个工作日内支付。",
+    "Invoice No. 2024-0815  Amount: 12,500.00 CNY",
+]
+
+
+def synth_pages(count: int, size=(1654, 2339)) -> List[Image.Image]:
+    """合成近似 200dpi A4 扫描件的页面"""
+    try:
+        font = ImageFont.truetype("NotoSansCJK-Regular.ttc", 36)
+    except OSError:
+        font = ImageFont.load_default()
+    pages = []
+    for n in range(count):
+        page = Image.new("L", size, color=255)
+        draw = ImageDraw.Draw(page)
+        y = 120
+        while y < size[1] - 160:
+            draw.text((120, y), f"{SAMPLE_LINES[(y // 60 + n) % len(SAMPLE_LINES)]}  ({n + 1})", fill=0, font=font)
+            y += 60
+        pages.append(page.convert("RGB"))
+    return pages
+
+
+def load_pages(args) -> List[Image.Image]:
+    if args.pdf:
+        from src.utils.streaming_ocr import iter_pdf_pages
+        pages = [Image.fromarray(img) for _, img in iter_pdf_pages(args.pdf, dpi=args.dpi)]
+        return pages[:args.pages] if args.pages else pages
+    if args.images:
+        names = sorted(n for n in os.listdir(args.images)
+                       if n.lower().endswith(('.png', '.jpg', '.jpeg', '.tif', '.tiff')))
+        pages = [Image.open(os.path.join(args.images, n)).convert("RGB") for n in names]
+        return pages[:args.pages] if args.pages else pages
+    return synth_pages(args.pages or 20)
+
+
+def bench_per_page(pages, lang) -> float:
+    import pytesseract
+    start = time.time()
+    for page in pages:
+        pytesseract.image_to_string(page, lang=lang)
+    return len(pages) / (time.time() - start)
+
+
+def bench_pool(pages, lang, workers, batch_size) -> Tuple[float, int]:
+    """返回 (页/秒, 实际工作线程数)"""
+    pool = OCREnginePool(workers=workers, lang=lang, batch_size=batch_size)
+    try:
+        # 预热：引擎初始化不计入吞吐
+        pool.recognize(pages[:1])
+        start = time.time()
+        pool.recognize(pages)
+        return len(pages) / (time.time() - start), pool.workers
+    finally:
+        print(f"   后端: {pool.backend}, 工作线程: {pool.workers}, 批大小: {pool.batch_size}")
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR吞吐基准测试")
+    parser.add_argument("--pdf", help="扫描版PDF路径")
+    parser.add_argument("--images", help="页面图片目录")
+    parser.add_argument("--pages", type=int, default=0, help="最多测试的页数（合成样张默认20页）")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--lang", default=DEFAULT_LANG)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    print(f"📄 测试页数: {len(pages)}")
+
+    print("⏱️  逐页 pytesseract ...")
+    baseline = bench_per_page(pages, args.lang)
+    print(f"   {baseline:.2f} 页/秒")
+
+    print("⏱️  常驻引擎池（1 个工作线程）...")
+    resident, _ = bench_pool(pages, args.lang, 1, args.batch_size)
+    print(f"   {resident:.2f} 页/秒")
+
+    print("⏱️  常驻引擎池 ...")
+    pooled, workers = bench_pool(pages, args.lang, args.workers, args.batch_size)
+    print(f"   {pooled:.2f} 页/秒")
+
+    print(f"🚀 引擎常驻（同为单线程）: {resident / baseline:.2f}x")
+    print(f"🚀 并行（{workers} 个工作线程 vs 1 个）: {pooled / resident:.2f}x")
+    print(f"🚀 总加速比: {pooled / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+并发查询向量化压测
+模拟多个用户同时提问，对比每个请求单独前向（原方式）
+与查询向量化服务（src/utils/query_embedding.py：记忆化 + 微批合并）的延迟分布和 CPU 时间。
+
+用法:
+    python scripts/benchmark_query_embedding.py                          # 合成编码器，16 个并发用户
+    python scripts/benchmark_query_embedding.py --users 32 --max-wait-ms 5
+    python scripts/benchmark_query_embedding.py --model BAAI/bge-small-zh-v1.5   # 本地 HuggingFace 模型
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import hashlib
+import threading
+from typing import Callable, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.query_embedding import QueryEmbeddingService, query_batch_fn
+
+QUESTIONS = [
+    "如何配置OCR", "OCR识别率低怎么办", "知识库如何增量更新", "支持哪些文件格式",
+    "如何切换嵌入模型", "检索结果不准确怎么调参", "怎样开启重排序", "如何导出聊天记录",
+    "API 怎么调用", "多知识库联合查询", "爬取网页后如何入库", "GPU 加速如何开启",
+]
+
+
+class SyntheticEncoder:
+    """近似小型编码器的计算量：固定开销 + 随批大小次线性增长的矩阵运算"""
+
+    def __init__(self, dim: int = 512, hidden: int = 1024, layers: int = 4, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.weights = [rng.standard_normal((hidden, hidden)).astype(np.float32) / np.sqrt(hidden)
+                        for _ in range(layers)]
+        self.proj = rng.standard_normal((hidden, dim)).astype(np.float32) / np.sqrt(hidden)
+        self.hidden = hidden
+        self.forward_passes = 0
+        self._lock = threading.Lock()
+
+    def _features(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(self.hidden).astype(np.float32)
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.forward_passes += 1
+        x = np.stack([self._features(t) for t in texts])
+        # 每个序列 32 个 token
+        x = np.repeat(x[:, None, :], 32, axis=1)
+        for w in self.weights:
+            x = np.tanh(x @ w)
+        vectors = x.mean(axis=1) @ self.proj
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.tolist()
+
+
+def make_workload(users: int, per_user: int, repeat_ratio: float, seed: int = 42) -> List[List[str]]:
+    """每个用户的提问序列：一部分是常见问题（重复），其余是带编号的新问题"""
+    rng = random.Random(seed)
+    workload = []
+    for u in range(users):
+        queries = []
+        for i in range(per_user):
+            if rng.random() < repeat_ratio:
+                queries.append(rng.choice(QUESTIONS))
+            else:
+                queries.append(f"{rng.choice(QUESTIONS)}（用户{u}第{i}问）")
+        workload.append(queries)
+    return workload
+
+
+def run_load(embed_one: Callable[[str], List[float]], workload: List[List[str]]):
+    latencies: List[float] = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(workload))
+
+    def user(queries):
+        barrier.wait()
+        for q in queries:
+            start = time.perf_counter()
+            embed_one(q)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=user, args=(q,)) for q in workload]
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    ms = np.array(latencies) * 1000
+    return {
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+        "qps": len(latencies) / wall,
+        "cpu_s": cpu,
+    }
+
+
+def load_model(args):
+    if not args.model:
+        encoder = SyntheticEncoder()
+        return encoder.encode, encoder
+    from src.utils.model_manager import load_embedding_model
+    embed = load_embedding_model("HuggingFace", args.model, use_cache=False)
+    if embed is None:
+        raise SystemExit(f"无法加载模型: {args.model}")
+    return query_batch_fn(embed), None
+
+
+def report(name, result, forward_passes=None):
+    extra = f", 前向 {forward_passes} 次" if forward_passes is not None else ""
+    print(f"   {name}: p50 {result['p50']:.1f} ms, p95 {result['p95']:.1f} ms, p99 {result['p99']:.1f} ms, "
+          f"{result['qps']:.1f} 查询/秒, CPU {result['cpu_s']:.2f} s{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发查询向量化压测")
+    parser.add_argument("--model", help="本地 HuggingFace 嵌入模型（默认使用合成编码器）")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=20, help="每个用户的提问数")
+    parser.add_argument("--repeat-ratio", type=float, default=0.3, help="常见问题（重复提问）的比例")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=3.0)
+    args = parser.parse_args()
+
+    batch_fn, encoder = load_model(args)
+    workload = make_workload(args.users, args.queries, args.repeat_ratio)
+    print(f"👥 {args.users} 个并发用户 × {args.queries} 问，重复提问比例 {args.repeat_ratio:.0%}")
+
+    batch_fn(["预热"])
+    print("⏱️  每个请求单独前向 ...")
+    before = encoder.forward_passes if encoder else None
+    direct = run_load(lambda q: batch_fn([q])[0], workload)
+    report("单独前向", direct, encoder.forward_passes - before if encoder else None)
+
+    print("⏱️  查询向量化服务 ...")
+    service = QueryEmbeddingService(batch_fn, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    before = encoder.forward_passes if encoder else None
+    served = run_load(service.embed, workload)
+    report("合批+记忆化", served, encoder.forward_passes - before if encoder else None)
+    stats = service.get_stats()
+    print(f"   记忆命中 {stats['memo_hit_rate']:.0%}, 同查询合并 {stats['coalesced']} 次, "
+          f"平均批大小 {stats['avg_batch']:.1f}, 平均凑批等待 {stats['avg_wait_ms']:.1f} ms")
+    service.close()
+
+    print(f"🚀 p95 延迟: {direct['p95']:.1f} → {served['p95']:.1f} ms, "
+          f"CPU: {direct['cpu_s']:.2f} → {served['cpu_s']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
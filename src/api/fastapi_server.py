@@ -6,16 +6,23 @@ v2.0: 新增增量更新、多模态支持
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import uvicorn
 import os
+import json
+import time
+import asyncio
 import tempfile
 from datetime import datetime
 
 from src.app_logging import LogManager
 from src.utils.enhanced_cache import smart_cache_manager
+from src.utils.query_result_store import get_query_result_store
 from src.kb.kb_manager import KBManager
+from src.config.manifest_manager import ManifestManager
+from src.query.kb_registry import KBBusyError, get_kb_registry
 from src.processors.multimodal_processor import MultimodalProcessor
 
 logger = LogManager()
@@ -50,6 +57,7 @@ class IncrementalUpdateResponse(BaseModel):
     changes: Dict[str, List[str]]
     processed_files: List[str]
     skipped_files: List[str]
+    failed_files: List[str] = []
 
 class MultimodalQueryRequest(BaseModel):
     query: str
@@ -78,8 +86,15 @@ app.add_middleware(
 
 # 初始化管理器
 kb_manager = KBManager()
+kb_registry = get_kb_registry(kb_manager.base_path)
 multimodal_processor = MultimodalProcessor()
 
+# 查询缓存：按知识库内容版本失效，语义层用各知识库自身的嵌入模型向量化查询；
+# 磁盘二级缓存在同一节点的工作进程间共享，启动时预热热门查询
+smart_cache_manager.cache.configure(kb_base_path=kb_manager.base_path, embed_fn=kb_registry.embed_query,
+                                    store=get_query_result_store())
+smart_cache_manager.cache.warm_up()
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -90,49 +105,144 @@ async def health_check():
     """健康检查"""
     return {"status": "healthy", "timestamp": "2025-12-10"}
 
+def _query_cache_kwargs(request: QueryRequest) -> Dict[str, Any]:
+    return {"top_k": request.top_k}
+
+async def _cache_get(request: QueryRequest) -> Optional[Dict[str, Any]]:
+    """查询缓存（语义层需要向量化查询，在线程池执行）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        kb_registry.executor,
+        lambda: smart_cache_manager.cache.get(request.query, request.kb_name, **_query_cache_kwargs(request))
+    )
+
+async def _cache_set(request: QueryRequest, result: Dict[str, Any]):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        kb_registry.executor,
+        lambda: smart_cache_manager.cache.set(request.query, request.kb_name, result, **_query_cache_kwargs(request))
+    )
+
+async def _retrieve(request: QueryRequest) -> List[Dict[str, Any]]:
+    """在知识库并发限额内检索（线程池执行，不阻塞事件循环）"""
+    if not kb_manager.exists(request.kb_name):
+        raise HTTPException(status_code=404, detail=f"知识库 '{request.kb_name}' 不存在")
+    try:
+        return await kb_registry.run_limited(
+            request.kb_name, kb_registry.retrieve, request.kb_name, request.query, request.top_k
+        )
+    except KBBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @app.post("/query", response_model=QueryResponse)
 async def query_knowledge_base(request: QueryRequest):
     """查询知识库"""
     try:
-        # 这里集成实际的查询逻辑
-        # 暂时返回模拟数据
+        if request.use_cache:
+            cached = await _cache_get(request)
+            if cached:
+                return QueryResponse(**{**cached, "cached": True})
+        
+        start_time = time.time()
+        sources = await _retrieve(request)
+        retrieve_time = time.time() - start_time
+        
+        loop = asyncio.get_running_loop()
+        answer = await loop.run_in_executor(
+            kb_registry.llm_executor, kb_registry.answer, request.query, sources
+        )
         
         result = {
-            "answer": f"针对查询'{request.query}'的回答",
-            "sources": [
-                {
-                    "file_name": "example.pdf",
-                    "score": 0.95,
-                    "text": "相关文档片段..."
-                }
-            ],
+            "answer": answer,
+            "sources": sources,
             "metadata": {
                 "kb_name": request.kb_name,
-                "query_time": "0.5s",
+                "query_time": f"{time.time() - start_time:.2f}s",
+                "retrieve_time": f"{retrieve_time:.2f}s",
                 "top_k": request.top_k
             },
             "cached": False
         }
         
+        if request.use_cache:
+            await _cache_set(request, result)
+        smart_cache_manager.analyze_query_patterns(request.query)
+        
         return QueryResponse(**result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"API查询失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/stream")
+async def query_knowledge_base_stream(request: QueryRequest):
+    """查询知识库（SSE 流式返回：sources → token... → done）"""
+    cached = None
+    if request.use_cache:
+        cached = await _cache_get(request)
+    
+    start_time = time.time()
+    sources = cached["sources"] if cached else await _retrieve(request)
+    
+    async def event_stream():
+        yield _sse("sources", sources)
+        if cached:
+            yield _sse("token", {"text": cached["answer"]})
+            yield _sse("done", {**cached["metadata"], "cached": True})
+            return
+        
+        tokens = []
+        try:
+            async for token in kb_registry.astream_answer(request.query, sources):
+                tokens.append(token)
+                yield _sse("token", {"text": token})
+        except Exception as e:
+            logger.error(f"API流式生成失败: {e}")
+            yield _sse("error", {"detail": str(e)})
+            return
+        
+        metadata = {
+            "kb_name": request.kb_name,
+            "query_time": f"{time.time() - start_time:.2f}s",
+            "top_k": request.top_k
+        }
+        if request.use_cache:
+            await _cache_set(request, {
+                "answer": "".join(tokens),
+                "sources": sources,
+                "metadata": metadata,
+                "cached": False
+            })
+        yield _sse("done", {**metadata, "cached": False})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/knowledge-bases", response_model=List[KnowledgeBaseInfo])
 async def list_knowledge_bases():
     """列出所有知识库"""
     try:
-        # 模拟知识库列表
-        kbs = [
-            {
-                "name": "示例知识库",
-                "document_count": 10,
-                "created_at": "2025-12-10",
-                "size_mb": 25.6
-            }
-        ]
+        kbs = []
+        for kb_name in kb_manager.list_all():
+            stats = kb_manager.get_stats(kb_name) or {}
+            manifest = ManifestManager.load(os.path.join(kb_manager.base_path, kb_name))
+            created_at = stats.get('created_time') if stats.get('created_at') else stats.get('modified_time', '')
+            kbs.append({
+                "name": kb_name,
+                "document_count": manifest.get('file_count', len(manifest.get('files', []))),
+                "created_at": created_at,
+                "size_mb": round(stats.get('size', 0) / (1024 * 1024), 2)
+            })
         
         return [KnowledgeBaseInfo(**kb) for kb in kbs]
         
@@ -140,6 +250,11 @@ async def list_knowledge_bases():
         logger.error(f"获取知识库列表失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/registry/stats")
+async def get_registry_stats():
+    """获取常驻索引注册表统计"""
+    return kb_registry.get_stats()
+
 @app.get("/cache/stats")
 async def get_cache_stats():
     """获取缓存统计"""
@@ -181,25 +296,26 @@ async def incremental_update(request: IncrementalUpdateRequest):
             files_to_process = changes['new'] + changes['modified']
             skipped_files = changes['unchanged']
         
-        # ⚠️ MOCK IMPLEMENTATION: This is a placeholder. Real processing logic needs to be connected to KBManager.
-        logger.warning("Executing MOCK incremental update - no actual files are processed", stage="API")
-        for file_path in files_to_process:
-            try:
-                processed_files.append(file_path)
-            except Exception as e:
-                logger.log_error(f"处理文件失败: {file_path}", str(e))
-                continue
-        
-        if processed_files:
-            kb_manager.mark_files_processed(request.kb_name, processed_files)
+        failed_files = []
+        if files_to_process:
+            loop = asyncio.get_running_loop()
+            processed_files, failed_files = await loop.run_in_executor(
+                kb_registry.executor, kb_registry.update_files, request.kb_name, files_to_process
+            )
+            for file_path in failed_files:
+                logger.log_error(f"处理文件失败: {file_path}", "文件读取失败或内容为空")
+        # update_files 已登记文件哈希并升级知识库版本（查询缓存随之失效）
         
         return IncrementalUpdateResponse(
             status="success",
             changes=changes,
             processed_files=processed_files,
-            skipped_files=skipped_files
+            skipped_files=skipped_files,
+            failed_files=failed_files
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.log_error("增量更新失败", str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,147 @@
+"""异步日志写入器 - 内存缓冲 + 后台线程批量写盘
+
+日志调用方只把行追加到有界缓冲区（deque 的 append/popleft 在 CPython 中是原子的，
+无需加锁），由专用线程按固定间隔或积压达到阈值时批量写入，并按间隔 fsync。
+缓冲区满时丢弃新日志并计数，保证业务线程永不因写日志阻塞。
+"""
+
+import os
+import time
+import atexit
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, IO, Optional
+
+
+class AsyncLogWriter:
+    """后台批量日志写入器"""
+
+    def __init__(self, capacity: int = 50000, flush_interval: float = 0.5,
+                 fsync_interval: float = 5.0, batch_size: int = 1000, max_open_files: int = 8):
+        self.capacity = capacity              # 缓冲区上限（条）
+        self.flush_interval = flush_interval  # 写盘间隔（秒）
+        self.fsync_interval = fsync_interval  # fsync 间隔（秒），0 表示每次写盘都 fsync
+        self.batch_size = batch_size          # 积压达到该条数时提前唤醒写线程
+        self.max_open_files = max_open_files  # 同时保持打开的日志文件数（按最近使用淘汰）
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+        self._buffer = deque()
+        self._files: "OrderedDict[str, IO]" = OrderedDict()
+        self._write_lock = threading.Lock()  # 只在写线程与显式 flush 之间互斥
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._last_fsync = time.time()
+
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, path: str, line: str) -> bool:
+        """提交一行日志（不阻塞），缓冲区已满时丢弃并返回 False"""
+        if self._closed or len(self._buffer) >= self.capacity:
+            self.dropped += 1
+            return False
+        self._buffer.append((path, line))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+
+    def _drain(self, force_fsync: bool = False):
+        """取出缓冲区中的全部日志，按文件合并为一次写入"""
+        with self._write_lock:
+            grouped: Dict[str, list] = {}
+            while True:
+                try:
+                    path, line = self._buffer.popleft()
+                except IndexError:
+                    break
+                grouped.setdefault(path, []).append(line)
+
+            for path, lines in grouped.items():
+                try:
+                    f = self._get_file(path)
+                    f.write("".join(lines))
+                    f.flush()
+                    self.written += len(lines)
+                except Exception:
+                    self.dropped += len(lines)
+            if grouped:
+                self.batches += 1
+
+            now = time.time()
+            if force_fsync or now - self._last_fsync >= self.fsync_interval:
+                for f in self._files.values():
+                    try:
+                        os.fsync(f.fileno())
+                    except Exception:
+                        pass
+                self._last_fsync = now
+
+    def _get_file(self, path: str) -> IO:
+        f = self._files.get(path)
+        if f is not None:
+            self._files.move_to_end(path)
+            return f
+        # 多个日志文件交替写入时保留最近使用的句柄，只关闭最久未用的
+        while len(self._files) >= self.max_open_files:
+            _, old = self._files.popitem(last=False)
+            try:
+                os.fsync(old.fileno())
+                old.close()
+            except Exception:
+                pass
+        f = self._files[path] = open(path, 'a', encoding='utf-8')
+        return f
+
+    def _close_files(self):
+        for f in self._files.values():
+            try:
+                f.close()
+            except Exception:
+                pass
+        self._files.clear()
+
+    def flush(self):
+        """立即写盘并 fsync（关闭前或需要读取日志文件时调用）"""
+        self._drain(force_fsync=True)
+
+    def close(self):
+        """停止写线程并写出剩余日志"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self._drain(force_fsync=True)
+        with self._write_lock:
+            self._close_files()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+
+_writer: Optional[AsyncLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> AsyncLogWriter:
+    """获取进程级共享的日志写入器"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AsyncLogWriter()
+        return _writer
@@ -7,6 +7,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 from contextlib import contextmanager
 
+from .async_log_writer import get_log_writer
+
 
 # 全局单例
 _global_logger_instance = None
@@ -49,6 +51,7 @@ class LogManager:
             os.makedirs(log_dir)
         
         self.log_file = os.path.join(log_dir, f"log_{datetime.now().strftime('%Y%m%d')}.jsonl")
+        self._writer = get_log_writer()  # 文件写入交给后台线程批量完成
         self._cleanup_old_logs()
     
     def _cleanup_old_logs(self, days: int = 30):
@@ -98,10 +101,9 @@ class LogManager:
             "details": details or {}
         }
         
-        # 写入文件
+        # 写入文件（进入缓冲区，由后台线程批量写盘）
         try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._writer.submit(self.log_file, json.dumps(entry, ensure_ascii=False) + '\n')
         except Exception:
             pass
         
@@ -330,6 +332,14 @@ class LogManager:
     def get_log_file(self) -> str:
         """获取当前日志文件路径"""
         return self.log_file
+    
+    def flush(self):
+        """把缓冲中的日志立即写盘（读取日志文件前或退出前调用）"""
+        self._writer.flush()
+    
+    def get_writer_stats(self) -> Dict[str, int]:
+        """日志写入统计：待写入、已写入、因缓冲区满丢弃的条数"""
+        return self._writer.get_stats()
 
 
 # 全局单例
@@ -97,6 +97,7 @@ notes_manager = NotesManager()
 from src.utils.enhanced_ocr_optimizer import enhanced_ocr_optimizer
 from src.ui.progress_monitor import progress_monitor
 from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings, StorageContext, load_index_from_storage
+from src.kb.npy_vector_store import load_storage_context
 from llama_index.core.memory import ChatMemoryBuffer
 
 def enhanced_web_search(final_prompt, logger):
@@ -308,6 +309,7 @@ from src.processors.document_parser import _parse_single_doc, _parse_batch_docs
 
 # 引入资源保护
 from src.utils.adaptive_throttling import get_resource_guard
+from src.utils.metrics_sampler import get_metrics_sampler
 import psutil as psutil_main
 
 # 初始化资源保护
@@ -1118,10 +1120,21 @@ with st.sidebar:
                 # 不需要手动保存按钮了，失焦自动保存
         else:
             # 管理模式 - 使用一行化布局 (1x2 紧凑布局)
-            manage_title_col1, manage_title_col2 = st.columns([4, 1])
+            manage_title_col1, manage_title_col2, manage_title_col3 = st.columns([3, 1, 1])
             with manage_title_col1:
                 st.markdown("📤 **添加文档**")
             with manage_title_col2:
+                if st.button("🔁", help="增量同步 (只处理源目录中新增/修改/删除的文件)", use_container_width=True):
+                    from src.processors.index_builder import guess_source_dir
+                    source_dir = guess_source_dir(os.path.join(output_base, current_kb_name))
+                    if source_dir:
+                        st.session_state.uploaded_path = source_dir
+                        st.session_state.trigger_delta = True
+                        st.session_state.trigger_btn_start = True
+                        st.rerun()
+                    else:
+                        st.warning("未找到该库的源目录，无法增量同步")
+            with manage_title_col3:
                 if st.button("🔄", help="重建索引 (覆盖该库)", use_container_width=True):
                     # 触发重建逻辑
                     st.session_state.uploaded_path = os.path.join("vector_db_storage", current_kb_name)
@@ -1136,6 +1149,10 @@ with st.sidebar:
             if st.session_state.get('trigger_rebuild'):
                 action_mode = "NEW"
                 st.session_state.trigger_rebuild = False # 消费掉标记
+            # 增量同步：与源目录比对，只处理变化的文件
+            elif st.session_state.get('trigger_delta'):
+                action_mode = "DELTA"
+                st.session_state.trigger_delta = False
             
             # 初始化 btn_start
             if st.session_state.get('trigger_btn_start'):
@@ -1662,7 +1679,7 @@ with st.sidebar:
 
             st.write("")
 
-            btn_label = "🚀 立即创建" if is_create_mode else ("➕ 执行追加" if action_mode=="APPEND" else "🔄 执行覆盖")
+            btn_label = "🚀 立即创建" if is_create_mode else {"APPEND": "➕ 执行追加", "DELTA": "🔁 增量同步"}.get(action_mode, "🔄 执行覆盖")
             btn_start = st.button(btn_label, type="primary", use_container_width=True, key="main_sidebar_start_btn")
             
             # 自动收起侧边栏
@@ -2153,15 +2170,15 @@ def jump_to_knowledge_base(kb_name: str, output_base: str):
 
 
 def process_knowledge_base_logic(kb_name, action_mode="NEW", use_ocr=False, extract_metadata=False, generate_summary=False, force_reindex=False):
-    """处理知识库逻辑 (Stage 4.2 - 使用 IndexBuilder)"""
+    """处理知识库逻辑 (Stage 4.2 - 使用 IndexBuilder)；action_mode: NEW 重建 / APPEND 追加 / DELTA 与源目录增量同步"""
     global logger
     
     persist_dir = os.path.join(output_base, kb_name)
     start_time = time.time()
     
     # 资源保护检查
-    cpu = psutil_main.cpu_percent(interval=0.1)
-    mem = psutil_main.virtual_memory().percent
+    sample = get_metrics_sampler().latest()
+    cpu, mem = sample.cpu_percent, sample.memory_percent
     result = resource_guard.check_resources(cpu, mem, 0)
     throttle_info = result.get('throttle', {})
     if throttle_info.get('action') == 'reject':
@@ -2275,6 +2292,12 @@ def process_knowledge_base_logic(kb_name, action_mode="NEW", use_ocr=False, extr
     logger.separator("处理完成")
     logger.success(f"✅ 知识库 '{kb_name}' 处理完成")
     logger.info(f"📊 统计: {result.file_count} 个文件, {result.doc_count} 个文档片段")
+    if result.delta:
+        logger.info(f"🔁 增量同步: 新增 {result.delta['new']}, 修改 {result.delta['modified']}, "
+                    f"删除 {result.delta['removed']}, 未变 {result.delta['unchanged']} 个文件")
+    if result.duplicates:
+        logger.warning(f"♻️ {len(result.duplicates)} 个文件与库内已有内容近似重复，未入库: "
+                       + ", ".join(f"{name} ≈ {owner}" for name, owner in result.duplicates.items()))
     logger.info(f"⏱️  耗时: {duration:.1f} 秒")
     
     logger.log("SUCCESS", f"知识库处理完成: {kb_name}, 文档数: {result.doc_count}", stage="知识库处理")
@@ -2956,7 +2979,7 @@ if btn_start:
             )
             # st.session_state.current_nav 等跳转逻辑已移至 process_knowledge_base_logic 内部的 jump_to_knowledge_base
             
-            if action_mode == "NEW" or action_mode == "APPEND":
+            if action_mode in ("NEW", "APPEND", "DELTA"):
                 st.session_state.messages = []
                 st.session_state.suggestions_history = []
                 hist_path = os.path.join(HISTORY_DIR, f"{final_kb_name}.json")
@@ -2994,8 +3017,9 @@ elif active_kb_name:
         if selected_files:
             with st.status(f"正在批量删除 {len(selected_files)} 个文件...", expanded=True) as status:
                 try:
-                    from llama_index.core import StorageContext, load_index_from_storage
-                    ctx = StorageContext.from_defaults(persist_dir=db_path)
+                    from llama_index.core import load_index_from_storage
+                    from src.kb.npy_vector_store import load_storage_context
+                    ctx = load_storage_context(db_path)
                     idx = load_index_from_storage(ctx)
                     
                     for fname in selected_files:
@@ -3206,8 +3230,9 @@ elif active_kb_name:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                from llama_index.core import StorageContext, load_index_from_storage as load_idx
-                storage_context = StorageContext.from_defaults(persist_dir=db_path)
+                from llama_index.core import load_index_from_storage as load_idx
+                from src.kb.npy_vector_store import load_storage_context
+                storage_context = load_storage_context(db_path)
                 idx = load_idx(storage_context)
                 retriever = idx.as_retriever(similarity_top_k=3)
                 
@@ -3577,9 +3602,10 @@ elif active_kb_name:
                                     with st.spinner("生成中..."):
                                         try:
                                             # 直接从索引获取文档内容
-                                            from llama_index.core import StorageContext, load_index_from_storage
+                                            from llama_index.core import load_index_from_storage
+                                            from src.kb.npy_vector_store import load_storage_context
                                             
-                                            storage_context = StorageContext.from_defaults(persist_dir=db_path)
+                                            storage_context = load_storage_context(db_path)
                                             index = load_index_from_storage(storage_context)
                                             retriever = index.as_retriever(similarity_top_k=3)
                                             
@@ -3659,7 +3685,7 @@ elif active_kb_name:
                                 if st.button("🗑️", key=f"del_{i}", help="删除文件"):
                                     with st.status(f"删除中...", expanded=True) as status:
                                         try:
-                                            ctx = StorageContext.from_defaults(persist_dir=db_path)
+                                            ctx = load_storage_context(db_path)
                                             idx = load_index_from_storage(ctx)
                                             for did in f.get('doc_ids', []):
                                                 idx.delete_ref_doc(did, delete_from_docstore=True)
@@ -4754,8 +4780,7 @@ if not st.session_state.get('is_processing', False) and st.session_state.questio
             logger.start_operation("多知识库查询", f"知识库: {', '.join(selected_kbs)}")
             
             # 导入多知识库查询引擎
-            from src.query.multi_kb_query_engine import query_single_kb_worker
-            from concurrent.futures import ProcessPoolExecutor, as_completed
+            from src.query.multi_kb_query_engine import MultiKBQueryEngine
             
             # 执行多知识库查询
             start_time = time.time()
@@ -4777,57 +4802,17 @@ if not st.session_state.get('is_processing', False) and st.session_state.questio
                     except Exception as e:
                         logger.error(f"多库研究模式异常: {e}")
             
-            results = {}
-            max_workers = min(mp.cpu_count(), len(selected_kbs), 3)
-            
-            try:
-                with ProcessPoolExecutor(max_workers=max_workers) as executor:
-                    future_to_kb = {
-                        executor.submit(query_single_kb_worker, kb_name, final_prompt, 3): kb_name 
-                        for kb_name in selected_kbs
-                    }
-                    
-                    for future in as_completed(future_to_kb, timeout=60):
-                        kb_name = future_to_kb[future]
-                        try:
-                            result = future.result(timeout=30)
-                            results[kb_name] = result
-                        except Exception as e:
-                            results[kb_name] = {
-                                "kb_name": kb_name,
-                                "success": False,
-                                "error": f"查询失败: {str(e)}",
-                                "results": []
-                            }
-            except Exception as e:
-                logger.error(f"多进程查询失败: {e}")
-                # 回退到单线程
-                for kb_name in selected_kbs:
-                    try:
-                        result = query_single_kb_worker(kb_name, final_prompt, 3)
-                        results[kb_name] = result
-                    except Exception as kb_error:
-                        results[kb_name] = {
-                            "kb_name": kb_name,
-                            "success": False,
-                            "error": f"查询失败: {str(kb_error)}",
-                            "results": []
-                        }
+            # 常驻进程池检索（模型和索引常驻），按分数合并后只生成一次答案
+            multi_engine = MultiKBQueryEngine(output_base)
+            multi_kb_results = multi_engine.query_multiple_kbs(selected_kbs, final_prompt, top_k_per_kb=3)
+            results = multi_kb_results.get("results", {})
             
             # 生成整合答案
             successful_results = [r for r in results.values() if r["success"]]
             total_time = time.time() - start_time
             
             if successful_results:
-                # 构建整合答案
-                integrated_answer = f"**基于 {len(successful_results)} 个知识库的查询结果：**\n\n"
-                
-                for i, result in enumerate(successful_results, 1):
-                    kb_name = result["kb_name"]
-                    answer = result.get("answer", "无答案")
-                    integrated_answer += f"#### 📚 知识库 {i}: {kb_name}\n{answer}\n\n"
-                
-                integrated_answer += f"---\n**查询统计**: {len(successful_results)}/{len(selected_kbs)} 个知识库响应成功，耗时 {total_time:.2f} 秒"
+                integrated_answer = multi_engine.generate_integrated_answer(multi_kb_results)
                 
                 # 显示结果
                 with st.chat_message("assistant", avatar="🤖"):
@@ -8,6 +8,7 @@ import threading
 from typing import Dict, Any
 from src.utils.gpu_optimizer import gpu_optimizer
 from src.utils.enhanced_cache import enhanced_cache
+from src.utils.query_result_store import get_query_result_store
 from src.processors.multimodal_processor import multimodal_processor
 from src.app_logging import LogManager
 
@@ -71,6 +72,10 @@ class OptimizationManager:
         # 设置缓存预热
         enhanced_cache.max_size = 2000  # 增加缓存容量
         enhanced_cache.ttl = 7200  # 2小时TTL
+        
+        # 接入磁盘二级缓存，重启后从热门查询预热
+        enhanced_cache.configure(store=get_query_result_store())
+        enhanced_cache.warm_up()
     
     def _initialize_multimodal_support(self):
         """初始化多模态支持"""
@@ -134,7 +139,7 @@ class OptimizationManager:
         """清理资源"""
         logger.info("🧹 清理优化资源...")
         gpu_optimizer.cleanup()
-        enhanced_cache.clear()
+        enhanced_cache.clear(persistent=False)
 
 # 全局优化管理器
 optimization_manager = OptimizationManager()
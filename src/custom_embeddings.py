@@ -57,7 +57,11 @@ class CustomHuggingFaceEmbedding(BaseEmbedding):
     
     def _get_query_embedding(self, query: str) -> List[float]:
         """获取查询嵌入"""
-        return self._get_text_embedding(query)
+        return self._get_query_embeddings([query])[0]
+    
+    def _get_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """批量获取查询嵌入（查询向量化服务合批后一次前向）"""
+        return self._get_text_embeddings(queries)
     
     def _get_text_embedding(self, text: str) -> List[float]:
         """获取文本嵌入"""
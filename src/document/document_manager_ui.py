@@ -199,7 +199,8 @@ class DocumentManagerUI:
     def delete_file(self, file_info: dict, kb_name: str, doc_manager):
         """删除文件"""
         try:
-            from llama_index.core import StorageContext, load_index_from_storage
+            from llama_index.core import load_index_from_storage
+            from src.kb.npy_vector_store import load_storage_context
             from src.utils.app_utils import remove_file_from_manifest
             
             output_base = os.path.join(os.getcwd(), "vector_db_storage")
@@ -207,7 +208,7 @@ class DocumentManagerUI:
             
             with st.status("删除中...", expanded=True) as status:
                 # 从索引中删除
-                ctx = StorageContext.from_defaults(persist_dir=db_path)
+                ctx = load_storage_context(db_path)
                 idx = load_index_from_storage(ctx)
                 
                 for doc_id in file_info.get('doc_ids', []):
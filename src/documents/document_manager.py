@@ -12,6 +12,7 @@ from llama_index.core import StorageContext, load_index_from_storage
 from src.app_logging import LogManager
 from src.config import ManifestManager
 from src.metadata_manager import MetadataManager
+from src.kb.npy_vector_store import load_storage_context
 
 logger = LogManager()
 
@@ -537,7 +538,7 @@ class DocumentManager:
         """删除文件"""
         with st.status(f"正在删除 {f['name']}...", expanded=True) as status:
             try:
-                ctx = StorageContext.from_defaults(persist_dir=self.db_path)
+                ctx = load_storage_context(self.db_path)
                 idx = load_index_from_storage(ctx)
                 for did in f.get('doc_ids', []):
                     idx.delete_ref_doc(did, delete_from_docstore=True)
@@ -57,7 +57,7 @@ class FileProcessResult:
         return report
 
 
-from typing import List, Tuple
+from typing import Iterator, List, Optional, Tuple
 from pathlib import Path
 import os
 import multiprocessing as mp
@@ -65,32 +65,6 @@ import multiprocessing as mp
 # 支持的文件格式
 SUPPORTED_FORMATS = {'.pdf', '.txt', '.docx', '.md', '.xlsx', '.xls', '.csv', '.json'}
 
-# OCR多进程函数（必须在模块级别）
-def _ocr_page(args):
-    """OCR单页处理（用于多进程）"""
-    import pytesseract
-    import os
-    
-    idx, img = args
-    try:
-        # 设置OCR配置，提升识别速度和准确率
-        config = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz一二三四五六七八九十百千万亿零壹贰叁肆伍陆柒捌玖拾佰仟萬億'
-        
-        # 多语言识别
-        text = pytesseract.image_to_string(img, lang='chi_sim+eng', config=config)
-        
-        # 清理文本
-        if text:
-            text = text.strip()
-            # 移除过短的行（可能是噪声）
-            lines = [line.strip() for line in text.split('\n') if len(line.strip()) > 2]
-            text = '\n'.join(lines)
-        
-        return idx, text if text else ""
-    except Exception as e:
-        print(f"   ⚠️  第{idx}页OCR失败: {str(e)[:30]}")
-        return idx, ""
-
 # 将文件加载函数移到模块级别（用于多进程）
 def _load_single_file(file_info, use_ocr=True):
     """单个文件加载函数（优化：直接读取文件内容，避免 SimpleDirectoryReader 开销）"""
@@ -244,44 +218,29 @@ def _load_single_file(file_info, use_ocr=True):
                     return "此PDF为扫描版，已跳过OCR处理。如需OCR识别，请在前台勾选'启用OCR识别'"
                 
                 try:
-                    from pdf2image import convert_from_path
                     from src.utils.enhanced_ocr_optimizer import enhanced_ocr_optimizer
                     
-                    print(f"   🔍 检测到扫描版PDF，启用增强OCR处理...")
-                    
-                    # 转换PDF为图片
-                    images = convert_from_path(file_path, dpi=200)
+                    print(f"   🔍 检测到扫描版PDF，启用流式OCR处理...")
                     
-                    # 使用增强OCR优化器处理
-                    ocr_results = enhanced_ocr_optimizer.process_pdf_pages(file_path, images)
+                    # 按页光栅化、按页识别；每页识别完成即生成一个带页码的文档，
+                    # 整本PDF不会同时以图片形式驻留内存
+                    page_docs = []
+                    pages_count = 0
+                    for page_no, text in enhanced_ocr_optimizer.process_pdf_streaming(file_path, dpi=200):
+                        pages_count += 1
+                        if text.strip():
+                            metadata = base_metadata.copy()
+                            metadata.update({'page_number': page_no, 'page_label': f"第{page_no}页"})
+                            page_docs.append(Document(text=text, metadata=metadata, id_=str(uuid.uuid4())))
                     
-                    # 合并OCR结果
-                    full_text = '\n\n'.join([
-                        f"=== 第 {i+1} 页 ===\n{text}" 
-                        for i, text in enumerate(ocr_results) if text.strip()
-                    ])
-                    
-                    if full_text.strip():
-                        print(f"   ✅ OCR处理完成: {len(images)} 页，提取 {len(full_text)} 字符")
-                        # OCR直接返回文本，上层逻辑会处理，但这里我们需要确保返回的元数据一致性
-                        # 原逻辑直接返回文本字符串，调用方 _process_batch 似乎能处理？
-                        # 检查 _process_batch -> 它是直接返回 _load_single_file 的结果。
-                        # 原逻辑: return full_text (这看起来是个Bug，因为其他路径返回tuple)
-                        # 等等，原代码: return full_text 确实存在。这会导致 _process_batch 拿到字符串而不是tuple。
-                        # 让我们修正这个潜在Bug，返回标准tuple格式
-                        # 实际上原代码中:
-                        # return f"__BATCH_OCR__{task_id}", fname, 'pending_ocr', len(images), 'batch_ocr'
-                        # 是正确返回。但 full_text 的返回似乎不对。
-                        # 修正为：返回单文档列表
-                        return [Document(text=full_text, metadata=base_metadata)], file_name, 'success', (size, 1), 'ocr'
+                    if page_docs:
+                        chars = sum(len(d.text) for d in page_docs)
+                        print(f"   ✅ OCR处理完成: {pages_count} 页，提取 {chars} 字符")
+                        return page_docs, file_name, 'success', (size, len(page_docs)), 'ocr'
                     else:
                         print(f"   ⚠️  OCR未提取到文本内容")
                         return None, file_name, 'failed', "此PDF为扫描版，OCR处理未能提取到文本内容。", 'ocr'
                     
-                    # 原代码中还有 batch_ocr 逻辑，但这里被上面的 return 覆盖了？
-                    # 看来原代码逻辑是：如果能立即处理完就返回文本，否则扔进队列。
-                    # 为了简化，我这里假设 enhanced_ocr_optimizer 是同步的（根据原代码看似如此）
-                    
                 except Exception as e:
                     return None, file_name, 'failed', f"OCR准备失败: {str(e)[:50]}", 'ocr'
         
@@ -335,25 +294,10 @@ def _process_batch(args):
     return batch_results
 
 
-def scan_directory_safe(input_dir: str, use_ocr: bool = True) -> Tuple[List, 'FileProcessResult']:
-    """
-    安全扫描目录，返回成功加载的文档和处理结果（多线程并行）
-    
-    Args:
-        input_dir: 输入目录路径
-        use_ocr: 是否启用OCR识别
-    
-    Returns:
-        (documents, result) - 文档列表和处理结果
-    """
-    from llama_index.core import SimpleDirectoryReader
+def _collect_files(input_dir: str) -> List[Tuple[str, str, str]]:
+    """多线程扫描目录，返回 (路径, 文件名, 扩展名) 列表"""
     from concurrent.futures import ThreadPoolExecutor, as_completed
     
-    result = FileProcessResult()
-    all_docs = []
-    
-    # 第一步：并行扫描所有文件（优化：多线程加速）
-    print(f"📁 [第 2 步] 并行扫描目录: {input_dir}")
     file_list = []
     
     # 获取所有子目录
@@ -365,33 +309,183 @@ def scan_directory_safe(input_dir: str, use_ocr: bool = True) -> Tuple[List, 'Fi
         pass
     
     # 并行扫描函数
-    def scan_dir(directory):
+    def scan_dir(directory, recursive=True):
         local_files = []
         try:
-            for root, _, filenames in os.walk(directory):
+            for root, dirs, filenames in os.walk(directory):
                 for f in filenames:
                     if not f.startswith('.'):
                         fp = os.path.join(root, f)
                         ext = Path(f).suffix.lower()
                         local_files.append((fp, f, ext))
+                if not recursive:
+                    break
         except Exception as e:
             print(f"   扫描失败 {directory}: {e}")
         return local_files
     
     # 多线程并行扫描（安全配置：32 线程）
     if len(subdirs) > 1:
-        from concurrent.futures import ThreadPoolExecutor, as_completed
         scan_workers = min(32, len(subdirs))  # 32 线程
         print(f"⚡ [第 2 步] 安全模式：{scan_workers} 线程并行扫描 {len(subdirs)} 个目录")
         
         with ThreadPoolExecutor(max_workers=scan_workers) as executor:
-            futures = [executor.submit(scan_dir, d) for d in subdirs]
+            # 根目录只扫描本层，子目录由各自线程递归扫描，避免重复登记
+            futures = [executor.submit(scan_dir, d, d != input_dir) for d in subdirs]
             for future in as_completed(futures):
                 file_list.extend(future.result())
     else:
         # 单目录直接扫描
         file_list = scan_dir(input_dir)
     
+    return file_list
+
+
+def _record_file_result(file_result, result: 'FileProcessResult'):
+    """登记单个文件的处理结果，成功时返回文档列表，否则返回 None"""
+    if len(file_result) == 5:
+        docs, fname, status, info, read_mode = file_result
+    elif len(file_result) == 4:
+        docs, fname, status, info = file_result
+    else:
+        print(f"⚠️ 异常返回值: {file_result}")
+        return None
+    
+    if status == 'success' and docs:
+        size, doc_count = info
+        result.add_success(fname, size, doc_count)
+        return docs
+    elif status == 'skipped':
+        result.add_skipped(fname, info)
+    else:
+        result.add_failed(fname, info)
+    return None
+
+
+def _record_batch_failure(batch_files, error: Exception, result: 'FileProcessResult'):
+    """整批读取失败：批内文件全部登记为失败（构建时不登记其哈希，下次增量构建重试），并写入日志"""
+    from src.app_logging import LogManager
+    
+    reason = f"批次处理失败: {error}"
+    LogManager().error(f"❌ [流式读取] {reason}", stage="文件读取",
+                       details={"files": [fname for _, fname, _ in batch_files]})
+    for _, fname, _ in batch_files:
+        result.add_failed(fname, reason)
+
+
+def iter_document_batches(input_dir: str, use_ocr: bool = True,
+                          result: 'FileProcessResult' = None,
+                          batch_size: int = 10, max_pending: int = None,
+                          max_workers: int = None,
+                          files: Optional[List[Tuple[str, str, str]]] = None) -> Iterator[List]:
+    """
+    流式读取目录，按批产出文档（有界内存）
+    
+    与 scan_directory_safe 不同，本函数不会把整个目录的文档收集到一个列表里：
+    读取进程池中同时在途的批次数被限制为 max_pending，消费方（切分/向量化）
+    处理慢时读取方会自动等待，从而形成背压，峰值内存只与批次大小有关。
+    
+    Args:
+        input_dir: 输入目录路径
+        use_ocr: 是否启用OCR识别
+        result: 处理结果追踪对象（可选，由调用方持有以便读取统计）
+        batch_size: 每个读取任务包含的文件数
+        max_pending: 最大在途批次数，默认 2 × 进程数
+        max_workers: 读取进程数，默认 min(CPU核心数, 12)
+        files: 只读取这些文件 [(路径, 文件名, 扩展名)]（增量构建），默认扫描整个目录
+    
+    Yields:
+        每个文件批次成功读取的文档列表（读取失败的文件登记在 result.failed 中）
+    """
+    from collections import deque
+    
+    if result is None:
+        result = FileProcessResult()
+    
+    if files is None:
+        file_list = _collect_files(input_dir)
+        print(f"✅ [流式读取] 扫描完成: 发现 {len(file_list)} 个文件")
+    else:
+        file_list = list(files)
+        print(f"✅ [流式读取] 增量模式: 读取 {len(file_list)} 个变化文件")
+    
+    if max_workers is None:
+        max_workers = min(mp.cpu_count(), 12)
+    if max_pending is None:
+        max_pending = max(2, max_workers * 2)
+    
+    batches = ((file_list[i:i + batch_size], use_ocr) for i in range(0, len(file_list), batch_size))
+    
+    if max_workers <= 1 or len(file_list) <= batch_size:
+        # 文件少时串行读取，避免进程池启动开销
+        for batch in batches:
+            docs = []
+            try:
+                for file_result in _process_batch(batch):
+                    batch_docs = _record_file_result(file_result, result)
+                    if batch_docs:
+                        docs.extend(batch_docs)
+            except Exception as e:
+                _record_batch_failure(batch[0], e, result)
+            if docs:
+                yield docs
+        return
+    
+    print(f"🚀 [流式读取] {max_workers} 进程 | 批量大小: {batch_size} | 最大在途批次: {max_pending}")
+    
+    with mp.Pool(processes=max_workers) as pool:
+        pending = deque()
+        
+        def submit_next():
+            batch = next(batches, None)
+            if batch is None:
+                return False
+            pending.append((batch[0], pool.apply_async(_process_batch, (batch,))))
+            return True
+        
+        # 预先填满窗口
+        while len(pending) < max_pending and submit_next():
+            pass
+        
+        while pending:
+            # 按提交顺序取结果；窗口满时读取进程最多领先消费方 max_pending 个批次
+            batch_files, async_result = pending.popleft()
+            docs = []
+            try:
+                for file_result in async_result.get():
+                    batch_docs = _record_file_result(file_result, result)
+                    if batch_docs:
+                        docs.extend(batch_docs)
+            except Exception as e:
+                _record_batch_failure(batch_files, e, result)
+            
+            submit_next()
+            
+            if docs:
+                yield docs
+
+
+def scan_directory_safe(input_dir: str, use_ocr: bool = True) -> Tuple[List, 'FileProcessResult']:
+    """
+    安全扫描目录，返回成功加载的文档和处理结果（多线程并行）
+    
+    Args:
+        input_dir: 输入目录路径
+        use_ocr: 是否启用OCR识别
+    
+    Returns:
+        (documents, result) - 文档列表和处理结果
+    """
+    from llama_index.core import SimpleDirectoryReader
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    result = FileProcessResult()
+    all_docs = []
+    
+    # 第一步：并行扫描所有文件（优化：多线程加速）
+    print(f"📁 [第 2 步] 并行扫描目录: {input_dir}")
+    file_list = _collect_files(input_dir)
+    
     print(f"✅ [第 2 步] 扫描完成: 发现 {len(file_list)} 个文件")
     
     # 第二步：多线程并行处理（动态调度，保持资源 < 80%）
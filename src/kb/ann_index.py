@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+近似最近邻（ANN）索引
+为二进制向量存储（NpyVectorStore）提供亚线性检索，持久化在 <persist_dir>/ann_index/：
+
+- ivf:  倒排文件（k-means 粗聚类 + 只扫描最近的 nprobe 个簇），纯 NumPy，无额外依赖
+- hnsw: 分层可导航小世界图（需安装 hnswlib）
+
+构建时用库内向量作查询，对比精确检索得到 recall@k，并按目标召回率自动选取
+nprobe / ef_search。向量数低于 min_rows 的知识库不建 ANN，继续使用精确检索。
+"""
+
+import os
+import json
+import time
+import shutil
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+    HAS_HNSWLIB = True
+except ImportError:
+    HAS_HNSWLIB = False
+
+ANN_DIRNAME = "ann_index"
+DEFAULT_MIN_ROWS = 50000
+_BLOCK_ROWS = 65536
+
+
+def _unit(vecs: np.ndarray, norms: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.asarray(norms, dtype=np.float32)
+    return vecs / np.where(norms > 0, norms, 1.0)[:, None]
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class IVFIndex:
+    """倒排文件索引：行号按所属簇连续存放，检索时只扫描 nprobe 个簇"""
+
+    method = "ivf"
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, nprobe: int = 8):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix, norms, nlist: Optional[int] = None, train_size: int = 100000,
+              seed: int = 42) -> "IVFIndex":
+        count = len(matrix)
+        nlist = nlist or max(16, int(4 * np.sqrt(count)))
+        nlist = min(nlist, count)
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(count, size=min(train_size, count), replace=False))
+        train = _unit(matrix[sample], norms[sample])
+        centroids = cls._kmeans(train, nlist, seed)
+
+        # 分块把所有行分配到最近的簇
+        assign = np.empty(count, dtype=np.int32)
+        for start in range(0, count, _BLOCK_ROWS):
+            block = _unit(matrix[start:start + _BLOCK_ROWS], norms[start:start + _BLOCK_ROWS])
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind='stable').astype(np.int64)
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+        return cls(centroids, order, offsets)
+
+    @staticmethod
+    def _kmeans(train: np.ndarray, nlist: int, seed: int) -> np.ndarray:
+        try:
+            from sklearn.cluster import MiniBatchKMeans
+            km = MiniBatchKMeans(n_clusters=nlist, random_state=seed, batch_size=4096, n_init=1)
+            centroids = km.fit(train).cluster_centers_.astype(np.float32)
+        except ImportError:
+            rng = np.random.default_rng(seed)
+            centroids = train[rng.choice(len(train), size=nlist, replace=False)].copy()
+            for _ in range(10):
+                assign = np.argmax(train @ centroids.T, axis=1)
+                for c in range(nlist):
+                    members = train[assign == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+        # 球面 k-means：质心归一化后用内积即余弦
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        return centroids / np.where(norms > 0, norms, 1.0)
+
+    def search(self, query_unit: np.ndarray, k: int, matrix, norms) -> Tuple[np.ndarray, np.ndarray]:
+        probes = _top_k(self.centroids @ query_unit, self.nprobe)
+        rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes])
+        if not len(rows):
+            return rows, np.zeros(0, dtype=np.float32)
+        rows.sort()  # 顺序读取内存映射
+        row_norms = np.asarray(norms[rows], dtype=np.float32)
+        scores = (np.asarray(matrix[rows], dtype=np.float32) @ query_unit) / np.where(row_norms > 0, row_norms, 1.0)
+        top = _top_k(scores, k)
+        return rows[top], scores[top]
+
+    def set_params(self, nprobe: Optional[int] = None, **kwargs):
+        if nprobe:
+            self.nprobe = max(1, min(int(nprobe), self.nlist))
+
+    def tuning_grid(self, k: int):
+        nprobe = 1
+        while nprobe < self.nlist:
+            yield {"nprobe": nprobe}
+            nprobe *= 2
+        yield {"nprobe": self.nlist}
+
+    def params(self) -> Dict[str, Any]:
+        return {"nlist": self.nlist, "nprobe": self.nprobe}
+
+    def save(self, ann_dir: str):
+        np.save(os.path.join(ann_dir, "centroids.npy"), self.centroids)
+        np.save(os.path.join(ann_dir, "order.npy"), self.order)
+        np.save(os.path.join(ann_dir, "offsets.npy"), self.offsets)
+
+    @classmethod
+    def load(cls, ann_dir: str, meta: Dict[str, Any]) -> "IVFIndex":
+        return cls(
+            np.load(os.path.join(ann_dir, "centroids.npy")),
+            np.load(os.path.join(ann_dir, "order.npy"), mmap_mode='r'),
+            np.load(os.path.join(ann_dir, "offsets.npy")),
+            nprobe=meta.get("nprobe", 8),
+        )
+
+
+class HNSWIndex:
+    """HNSW 图索引（hnswlib，内积空间 + 单位向量 = 余弦）"""
+
+    method = "hnsw"
+
+    def __init__(self, index, ef_search: int = 64, m: int = 16, ef_construction: int = 200):
+        self.index = index
+        self.ef_search = ef_search
+        self.m = m
+        self.ef_construction = ef_construction
+        self.index.set_ef(ef_search)
+
+    @classmethod
+    def build(cls, matrix, norms, m: int = 16, ef_construction: int = 200, **kwargs) -> "HNSWIndex":
+        if not HAS_HNSWLIB:
+            raise ImportError("构建 HNSW 索引需要安装 hnswlib: pip install hnswlib")
+        count, dim = matrix.shape
+        index = hnswlib.Index(space='ip', dim=dim)
+        index.init_index(max_elements=count, ef_construction=ef_construction, M=m)
+        for start in range(0, count, _BLOCK_ROWS):
+            block = _unit(matrix[start:start + _BLOCK_ROWS], norms[start:start + _BLOCK_ROWS])
+            index.add_items(block, np.arange(start, start + len(block)))
+        return cls(index, m=m, ef_construction=ef_construction)
+
+    def search(self, query_unit: np.ndarray, k: int, matrix, norms) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, self.index.get_current_count())
+        if self.ef_search < k:
+            self.index.set_ef(k)
+        labels, distances = self.index.knn_query(query_unit[None, :], k=k)
+        if self.ef_search < k:
+            self.index.set_ef(self.ef_search)
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+    def set_params(self, ef_search: Optional[int] = None, **kwargs):
+        if ef_search:
+            self.ef_search = int(ef_search)
+            self.index.set_ef(self.ef_search)
+
+    def tuning_grid(self, k: int):
+        ef = max(k, 16)
+        while ef <= 1024:
+            yield {"ef_search": ef}
+            ef *= 2
+
+    def params(self) -> Dict[str, Any]:
+        return {"m": self.m, "ef_construction": self.ef_construction, "ef_search": self.ef_search}
+
+    def save(self, ann_dir: str):
+        self.index.save_index(os.path.join(ann_dir, "hnsw.bin"))
+
+    @classmethod
+    def load(cls, ann_dir: str, meta: Dict[str, Any]) -> "HNSWIndex":
+        if not HAS_HNSWLIB:
+            raise ImportError("加载 HNSW 索引需要安装 hnswlib")
+        index = hnswlib.Index(space='ip', dim=meta["dim"])
+        index.load_index(os.path.join(ann_dir, "hnsw.bin"), max_elements=meta["count"])
+        return cls(index, ef_search=meta.get("ef_search", 64), m=meta.get("m", 16),
+                   ef_construction=meta.get("ef_construction", 200))
+
+
+_BACKENDS = {"ivf": IVFIndex, "hnsw": HNSWIndex}
+
+
+class ANNIndex:
+    """已加载的 ANN 索引及其覆盖范围（前 count 行、对应向量存储的 generation）"""
+
+    def __init__(self, backend, count: int, generation: int, meta: Dict[str, Any]):
+        self.backend = backend
+        self.count = count
+        self.generation = generation
+        self.meta = meta
+
+    def search(self, query_unit: np.ndarray, k: int, matrix, norms):
+        return self.backend.search(query_unit, k, matrix, norms)
+
+    def set_params(self, **params):
+        self.backend.set_params(**params)
+
+
+def load_ann_index(persist_dir: str) -> Optional[ANNIndex]:
+    """加载 ANN 索引，不存在或依赖缺失时返回 None（调用方回退精确检索）"""
+    ann_dir = os.path.join(persist_dir, ANN_DIRNAME)
+    meta_file = os.path.join(ann_dir, "meta.json")
+    if not os.path.exists(meta_file):
+        return None
+    try:
+        with open(meta_file, 'r') as f:
+            meta = json.load(f)
+        backend = _BACKENDS[meta["method"]].load(ann_dir, meta)
+        return ANNIndex(backend, meta["count"], meta.get("generation", 0), meta)
+    except Exception:
+        return None
+
+
+def _recall_at_k(backend, matrix, norms, k: int, queries: np.ndarray) -> Tuple[float, float, float]:
+    """返回 (recall@k, ANN 平均耗时 ms, 精确检索平均耗时 ms)
+
+    查询取自库内向量，评估时排除查询自身（留一法），避免高估召回率。
+    """
+    count = len(matrix)
+    hits = 0
+    ann_time = exact_time = 0.0
+    for row in queries:
+        q = _unit(matrix[row:row + 1], norms[row:row + 1])[0]
+
+        start = time.perf_counter()
+        scores = np.empty(count, dtype=np.float32)
+        for b in range(0, count, _BLOCK_ROWS):
+            block = np.asarray(matrix[b:b + _BLOCK_ROWS], dtype=np.float32)
+            scores[b:b + len(block)] = block @ q
+        scores /= np.where(np.asarray(norms, dtype=np.float32) > 0, norms, 1.0)
+        exact = set(_top_k(scores, k + 1).tolist()) - {int(row)}
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows, _ = backend.search(q, k + 1, matrix, norms)
+        ann_time += time.perf_counter() - start
+        hits += len(exact & (set(rows.tolist()) - {int(row)}))
+    n = max(len(queries), 1)
+    return hits / (n * k), ann_time / n * 1000, exact_time / n * 1000
+
+
+def build_ann_index(persist_dir: str, method: str = "ivf", min_rows: int = DEFAULT_MIN_ROWS,
+                    target_recall: float = 0.95, recall_k: int = 10, sample_queries: int = 100,
+                    **params) -> Dict[str, Any]:
+    """为知识库的二进制向量存储构建 ANN 索引，返回构建报告
+
+    Args:
+        method: ivf / hnsw
+        min_rows: 向量数低于该值时不建索引（精确检索更快且无召回损失）
+        target_recall: 自动调参的目标 recall@k
+        recall_k: 召回率评估的 k
+        sample_queries: 评估使用的查询数（从库内向量抽样）
+        **params: 后端参数，ivf: nlist/nprobe/train_size；hnsw: m/ef_construction/ef_search
+    """
+    from src.kb.npy_vector_store import NpyVectorStore
+
+    ann_dir = os.path.join(persist_dir, ANN_DIRNAME)
+    if method not in _BACKENDS:
+        raise ValueError(f"不支持的 ANN 方法: {method}")
+    if not NpyVectorStore.exists(persist_dir):
+        return {"status": "skipped", "reason": "知识库未使用二进制向量存储"}
+
+    store = NpyVectorStore.from_persist_dir(persist_dir)
+    matrix, norms = store._matrix, store._norms
+    count = len(matrix)
+    if count < min_rows:
+        # 小知识库：删除可能过期的旧索引，使用精确检索
+        shutil.rmtree(ann_dir, ignore_errors=True)
+        return {"status": "skipped", "rows": count,
+                "reason": f"向量数 {count} < {min_rows}，使用精确检索"}
+
+    build_start = time.time()
+    tune_params = {k: params.pop(k) for k in ("nprobe", "ef_search") if k in params}
+    backend = _BACKENDS[method].build(matrix, norms, **params)
+    build_seconds = time.time() - build_start
+
+    rng = np.random.default_rng(0)
+    queries = rng.choice(count, size=min(sample_queries, count), replace=False)
+    k = min(recall_k, count)
+
+    if tune_params:
+        backend.set_params(**tune_params)
+        recall, ann_ms, exact_ms = _recall_at_k(backend, matrix, norms, k, queries)
+    else:
+        # 从最快的参数开始，取第一个达到目标召回率的设置
+        for candidate in backend.tuning_grid(k):
+            backend.set_params(**candidate)
+            recall, ann_ms, exact_ms = _recall_at_k(backend, matrix, norms, k, queries)
+            if recall >= target_recall:
+                break
+
+    tmp_dir = ann_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    backend.save(tmp_dir)
+    meta = {
+        "method": method,
+        "count": count,
+        "dim": int(matrix.shape[1]),
+        "generation": store._generation,
+        **backend.params(),
+        "recall_k": k,
+        "recall": round(recall, 4),
+        "ann_ms": round(ann_ms, 3),
+        "exact_ms": round(exact_ms, 3),
+        "build_seconds": round(build_seconds, 2),
+        "built_at": time.time(),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(ann_dir, ignore_errors=True)
+    os.replace(tmp_dir, ann_dir)
+    return {"status": "built", **meta}
@@ -0,0 +1,452 @@
+"""
+持久化 BM25 倒排索引
+构建时写入知识库目录，挂载时内存映射加载，无需重新分词全部节点
+
+目录结构 (<persist_dir>/bm25_index/):
+    meta.json           全局统计 (文档数、总长度、段列表)
+    deleted.json        已删除节点ID (墓碑)
+    seg_00001/          不可变索引段 (每次构建/追加写入新段)
+        terms.json      词表 (词 -> 词ID 按列表顺序)
+        doc_ids.json    段内文档序号 -> 节点ID
+        doc_lens.npy    文档长度 (int32)
+        offsets.npy     倒排表偏移 (int64, 词数+1)
+        postings.npy    倒排文档序号 (int32)
+        tfs.npy         词频 (uint16)
+"""
+
+import os
+import re
+import json
+import math
+import shutil
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import jieba
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+BM25_DIR_NAME = "bm25_index"
+FORMAT_VERSION = 1
+
+# 中英文常见停用词（仅过滤高频虚词，保留专业术语）
+_STOPWORDS = {
+    '的', '了', '和', '是', '在', '就', '都', '而', '及', '与', '着', '或', '一个', '没有',
+    '我们', '你们', '他们', '这', '那', '之', '也', '为', '对', '把', '被', '从', '吗', '呢', '吧',
+    'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'is', 'are', 'was',
+    'were', 'be', 'by', 'with', 'as', 'at', 'it', 'this', 'that', 'from',
+}
+_WORD_RE = re.compile(r'\w', re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """jieba 搜索引擎模式分词（小写、去停用词和标点）"""
+    if not text:
+        return []
+    tokens = []
+    for tok in jieba.lcut_for_search(text.lower()):
+        tok = tok.strip()
+        if not tok or tok in _STOPWORDS or not _WORD_RE.search(tok):
+            continue
+        tokens.append(tok)
+    return tokens
+
+
+class _Segment:
+    """只读索引段（内存映射）"""
+
+    def __init__(self, seg_dir: str):
+        self.name = os.path.basename(seg_dir)
+        with open(os.path.join(seg_dir, "terms.json"), 'r', encoding='utf-8') as f:
+            self.vocab = {t: i for i, t in enumerate(json.load(f))}
+        with open(os.path.join(seg_dir, "doc_ids.json"), 'r', encoding='utf-8') as f:
+            self.doc_ids = json.load(f)
+        self.doc_lens = np.load(os.path.join(seg_dir, "doc_lens.npy"), mmap_mode='r')
+        self.offsets = np.load(os.path.join(seg_dir, "offsets.npy"), mmap_mode='r')
+        self.postings = np.load(os.path.join(seg_dir, "postings.npy"), mmap_mode='r')
+        self.tfs = np.load(os.path.join(seg_dir, "tfs.npy"), mmap_mode='r')
+        self.live = np.ones(len(self.doc_ids), dtype=bool)
+
+    def df(self, term: str) -> int:
+        tid = self.vocab.get(term)
+        if tid is None:
+            return 0
+        return int(self.offsets[tid + 1] - self.offsets[tid])
+
+    def term_postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        tid = self.vocab.get(term)
+        if tid is None:
+            return None
+        start, end = int(self.offsets[tid]), int(self.offsets[tid + 1])
+        return self.postings[start:end], self.tfs[start:end]
+
+
+class BM25Index:
+    """
+    分段式 BM25 倒排索引
+
+    - 构建：add_nodes() 分词后缓存在内存，累计 segment_size 个文档写出一个段
+    - 追加：APPEND 模式只写新段，已有段不重写
+    - 删除：delete() 记录墓碑，检索时跳过，compact() 时物理清除
+    - 加载：段文件以 mmap 方式打开，检索只读取命中词的倒排表
+    """
+
+    def __init__(self, persist_dir: str, k1: float = 1.5, b: float = 0.75,
+                 segment_size: int = 50000, max_segments: int = 8):
+        self.persist_dir = persist_dir
+        self.index_dir = os.path.join(persist_dir, BM25_DIR_NAME)
+        self.k1 = k1
+        self.b = b
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+
+        self.segments: List[_Segment] = []
+        self.deleted = set()
+        self.num_docs = 0
+        self.total_len = 0
+        self._next_seg = 1
+        self._locations = None  # 节点ID -> (段, 段内序号)，按需构建
+        self._queued_deletes = set()  # 已登记、尚未作用到磁盘段的删除（commit 或检索前统一生效）
+
+        # 待写出的内存段
+        self._pending_postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._pending_ids: List[str] = []
+        self._pending_pos: Dict[str, int] = {}
+        self._pending_lens: List[int] = []
+
+        self._load()
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        """知识库目录下是否已有 BM25 索引"""
+        return os.path.exists(os.path.join(persist_dir, BM25_DIR_NAME, "meta.json"))
+
+    # ---------- 加载 / 保存 ----------
+
+    def _load(self):
+        meta_file = os.path.join(self.index_dir, "meta.json")
+        if not os.path.exists(meta_file):
+            return
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.k1 = meta.get('k1', self.k1)
+        self.b = meta.get('b', self.b)
+        self.num_docs = meta.get('num_docs', 0)
+        self.total_len = meta.get('total_len', 0)
+        self._next_seg = meta.get('next_segment', 1)
+        for name in meta.get('segments', []):
+            self.segments.append(_Segment(os.path.join(self.index_dir, name)))
+
+        deleted_file = os.path.join(self.index_dir, "deleted.json")
+        if os.path.exists(deleted_file):
+            with open(deleted_file, 'r', encoding='utf-8') as f:
+                self.deleted = set(json.load(f))
+        if self.deleted:
+            self._mark_dead(self.deleted)
+
+    def _write_meta(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        meta = {
+            'version': FORMAT_VERSION,
+            'k1': self.k1,
+            'b': self.b,
+            'num_docs': self.num_docs,
+            'total_len': self.total_len,
+            'next_segment': self._next_seg,
+            'segments': [seg.name for seg in self.segments],
+        }
+        self._atomic_json(os.path.join(self.index_dir, "deleted.json"), sorted(self.deleted))
+        self._atomic_json(os.path.join(self.index_dir, "meta.json"), meta)
+
+    @staticmethod
+    def _atomic_json(path: str, data):
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    # ---------- 写入 ----------
+
+    def contains(self, doc_id: str) -> bool:
+        """节点是否已登记（未删除）"""
+        if doc_id in self.deleted or doc_id in self._queued_deletes:
+            return False
+        return doc_id in self._pending_pos or doc_id in self._get_locations()
+
+    def _get_locations(self) -> Dict[str, Tuple[int, int]]:
+        if self._locations is None:
+            self._locations = {}
+            for si, seg in enumerate(self.segments):
+                for di, doc_id in enumerate(seg.doc_ids):
+                    self._locations[doc_id] = (si, di)
+        return self._locations
+
+    def add_nodes(self, nodes: Iterable) -> int:
+        """登记节点（分词后写入内存段），返回新增数量"""
+        added = 0
+        for node in nodes:
+            text = node.get_content() if hasattr(node, 'get_content') else str(node)
+            self.add_text(node.node_id, text)
+            added += 1
+        return added
+
+    def add_text(self, doc_id: str, text: str):
+        """登记单个文本"""
+        tokens = tokenize(text)
+        local_idx = len(self._pending_ids)
+        self._pending_ids.append(doc_id)
+        self._pending_pos[doc_id] = local_idx
+        self._pending_lens.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self._pending_postings.setdefault(term, []).append((local_idx, tf))
+
+        self.num_docs += 1
+        self.total_len += len(tokens)
+
+        if len(self._pending_ids) >= self.segment_size:
+            self._flush_pending()
+
+    def delete(self, doc_ids: Iterable[str]):
+        """删除节点（登记墓碑）
+
+        只在内存中登记，不写出内存段也不构建位置表；一次构建中的多次删除在
+        commit（或下一次检索）时一并作用到各段并随元数据落盘。
+        """
+        for doc_id in doc_ids:
+            if doc_id in self.deleted:
+                continue
+            pos = self._pending_pos.get(doc_id)
+            if pos is not None:
+                # 尚在内存段中：直接扣除，写出内存段时标记为已删除
+                self.num_docs -= 1
+                self.total_len -= self._pending_lens[pos]
+                self.deleted.add(doc_id)
+            else:
+                self._queued_deletes.add(doc_id)
+
+    def _apply_deletes(self):
+        """把登记的删除作用到磁盘段（每批删除只扫描一次）"""
+        if not self._queued_deletes:
+            return
+        for si, di in self._mark_dead(self._queued_deletes):
+            self.num_docs -= 1
+            self.total_len -= int(self.segments[si].doc_lens[di])
+            self.deleted.add(self.segments[si].doc_ids[di])
+        self._queued_deletes = set()
+
+    def _mark_dead(self, doc_ids) -> List[Tuple[int, int]]:
+        """把各段中属于 doc_ids 的存活行标记为已删除，返回这些行的 (段, 段内序号)"""
+        if self._locations is not None:
+            rows = [self._locations[d] for d in doc_ids if d in self._locations]
+        else:
+            # 位置表未构建时逐段扫描节点ID，不为删除单独建表
+            rows = [(si, di) for si, seg in enumerate(self.segments)
+                    for di, doc_id in enumerate(seg.doc_ids) if doc_id in doc_ids]
+        rows = [(si, di) for si, di in rows if self.segments[si].live[di]]
+        for si, di in rows:
+            self.segments[si].live[di] = False
+        return rows
+
+    def _flush_pending(self):
+        """将内存段写出为磁盘段"""
+        if not self._pending_ids:
+            return
+        seg_name = f"seg_{self._next_seg:05d}"
+        self._next_seg += 1
+        self._write_segment(
+            os.path.join(self.index_dir, seg_name),
+            self._pending_postings, self._pending_ids, self._pending_lens
+        )
+        seg = _Segment(os.path.join(self.index_dir, seg_name))
+        self.segments.append(seg)
+        # 写出前已被删除的行
+        for doc_id, di in self._pending_pos.items():
+            if doc_id in self.deleted:
+                seg.live[di] = False
+        if self._locations is not None:
+            si = len(self.segments) - 1
+            for di, doc_id in enumerate(self._pending_ids):
+                self._locations[doc_id] = (si, di)
+        self._pending_postings = {}
+        self._pending_ids = []
+        self._pending_pos = {}
+        self._pending_lens = []
+
+    @staticmethod
+    def _write_segment(seg_dir: str, postings: Dict[str, List[Tuple[int, int]]],
+                       doc_ids: List[str], doc_lens: List[int]):
+        os.makedirs(seg_dir, exist_ok=True)
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        total = 0
+        for i, term in enumerate(terms):
+            total += len(postings[term])
+            offsets[i + 1] = total
+        post_docs = np.empty(total, dtype=np.int32)
+        post_tfs = np.empty(total, dtype=np.uint16)
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            start = offsets[i]
+            post_docs[start:start + len(entries)] = [e[0] for e in entries]
+            post_tfs[start:start + len(entries)] = [min(e[1], 65535) for e in entries]
+
+        with open(os.path.join(seg_dir, "terms.json"), 'w', encoding='utf-8') as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(seg_dir, "doc_ids.json"), 'w', encoding='utf-8') as f:
+            json.dump(doc_ids, f, ensure_ascii=False)
+        np.save(os.path.join(seg_dir, "doc_lens.npy"), np.asarray(doc_lens, dtype=np.int32))
+        np.save(os.path.join(seg_dir, "offsets.npy"), offsets)
+        np.save(os.path.join(seg_dir, "postings.npy"), post_docs)
+        np.save(os.path.join(seg_dir, "tfs.npy"), post_tfs)
+
+    def commit(self):
+        """应用登记的删除、写出内存段并保存元数据；段数过多时自动合并"""
+        self._apply_deletes()
+        self._flush_pending()
+        if len(self.segments) > self.max_segments:
+            self.compact()
+        else:
+            self._write_meta()
+
+    def compact(self):
+        """合并所有段并物理清除已删除节点"""
+        self._apply_deletes()
+        self._flush_pending()
+        if not self.segments:
+            self._write_meta()
+            return
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_ids: List[str] = []
+        doc_lens: List[int] = []
+        for seg in self.segments:
+            # 段内序号 -> 合并后序号（已删除为 -1）
+            remap = np.full(len(seg.doc_ids), -1, dtype=np.int64)
+            live_idx = np.nonzero(seg.live)[0]
+            remap[live_idx] = np.arange(len(doc_ids), len(doc_ids) + len(live_idx))
+            doc_ids.extend(seg.doc_ids[i] for i in live_idx)
+            doc_lens.extend(int(seg.doc_lens[i]) for i in live_idx)
+            for term, tid in seg.vocab.items():
+                start, end = int(seg.offsets[tid]), int(seg.offsets[tid + 1])
+                new_docs = remap[seg.postings[start:end]]
+                keep = new_docs >= 0
+                if not keep.any():
+                    continue
+                postings.setdefault(term, []).extend(
+                    zip(new_docs[keep].tolist(), seg.tfs[start:end][keep].tolist())
+                )
+
+        old_names = [seg.name for seg in self.segments]
+        seg_name = f"seg_{self._next_seg:05d}"
+        self._next_seg += 1
+        self._write_segment(os.path.join(self.index_dir, seg_name), postings, doc_ids, doc_lens)
+
+        self.segments = [_Segment(os.path.join(self.index_dir, seg_name))]
+        self.deleted = set()
+        self._locations = None
+        self.num_docs = len(doc_ids)
+        self.total_len = int(sum(doc_lens))
+        self._write_meta()
+
+        for name in old_names:
+            shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+
+    # ---------- 检索 ----------
+
+    def _allowed_masks(self, allowed: Iterable[str]) -> List[np.ndarray]:
+        """把允许的节点ID转换为各段的布尔掩码"""
+        masks = [np.zeros(len(seg.doc_ids), dtype=bool) for seg in self.segments]
+        locations = self._get_locations()
+        for doc_id in allowed:
+            loc = locations.get(doc_id)
+            if loc is not None:
+                masks[loc[0]][loc[1]] = True
+        return masks
+
+    def search(self, query: str, top_k: int = 5,
+               allowed: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """BM25 检索，返回 [(节点ID, 分数)]，按分数降序
+
+        Args:
+            allowed: 只在这些节点中检索（元数据过滤结果），在取 top_k 之前生效
+        """
+        self._apply_deletes()
+        terms = Counter(tokenize(query))
+        if not terms or self.num_docs <= 0:
+            return []
+        masks = self._allowed_masks(allowed) if allowed is not None else None
+
+        avgdl = self.total_len / self.num_docs if self.num_docs else 1.0
+        idf = {}
+        for term in terms:
+            df = sum(seg.df(term) for seg in self.segments)
+            if df:
+                idf[term] = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+        if not idf:
+            return []
+
+        hits: List[Tuple[str, float]] = []
+        for si, seg in enumerate(self.segments):
+            if masks is not None and not masks[si].any():
+                continue
+            scores = None
+            for term, weight in idf.items():
+                entry = seg.term_postings(term)
+                if entry is None:
+                    continue
+                docs, tfs = entry
+                tf = tfs.astype(np.float32)
+                dl = seg.doc_lens[docs].astype(np.float32)
+                denom = tf + self.k1 * (1 - self.b + self.b * dl / avgdl)
+                if scores is None:
+                    scores = np.zeros(len(seg.doc_ids), dtype=np.float32)
+                # 同一词在段内的倒排文档序号唯一，可直接累加
+                scores[docs] += weight * terms[term] * tf * (self.k1 + 1) / denom
+            if scores is None:
+                continue
+            scores[~seg.live] = 0
+            if masks is not None:
+                scores[~masks[si]] = 0
+            candidates = np.nonzero(scores > 0)[0]
+            if len(candidates) > top_k:
+                part = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+                candidates = candidates[part]
+            hits.extend((seg.doc_ids[i], float(scores[i])) for i in candidates)
+
+        hits.sort(key=lambda x: x[1], reverse=True)
+        return hits[:top_k]
+
+    def get_stats(self) -> Dict:
+        """获取索引统计"""
+        self._apply_deletes()
+        return {
+            'num_docs': self.num_docs,
+            'segments': len(self.segments),
+            'deleted': len(self.deleted),
+            'avg_doc_len': round(self.total_len / self.num_docs, 1) if self.num_docs else 0,
+        }
+
+
+class PersistentBM25Retriever(BaseRetriever):
+    """基于持久化 BM25 索引的检索器：只按命中ID从 docstore 取回 top_k 节点"""
+
+    def __init__(self, bm25_index: BM25Index, docstore, similarity_top_k: int = 5,
+                 callback_manager=None):
+        self._bm25_index = bm25_index
+        self._docstore = docstore
+        self._similarity_top_k = similarity_top_k
+        super().__init__(callback_manager=callback_manager)
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, docstore, similarity_top_k: int = 5):
+        return cls(BM25Index(persist_dir), docstore, similarity_top_k=similarity_top_k)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        results = []
+        for node_id, score in self._bm25_index.search(query_bundle.query_str, self._similarity_top_k):
+            node = self._docstore.get_node(node_id, raise_error=False)
+            if node is not None:
+                results.append(NodeWithScore(node=node, score=score))
+        return results
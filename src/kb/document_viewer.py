@@ -204,10 +204,11 @@ class DocumentViewer:
             分块列表
         """
         try:
-            from llama_index.core import StorageContext, load_index_from_storage
+            from llama_index.core import load_index_from_storage
+            from src.kb.npy_vector_store import load_storage_context
             
             kb_path = os.path.join(self.vector_db_path, kb_name)
-            storage_context = StorageContext.from_defaults(persist_dir=kb_path)
+            storage_context = load_storage_context(kb_path)
             index = load_index_from_storage(storage_context)
             
             # 获取所有节点
@@ -0,0 +1,193 @@
+"""
+原生混合检索 - 向量与 BM25 两路并行，NumPy 倒数排名融合
+替代 QueryFusionRetriever(use_async=False)：
+  - 两路同时执行（BM25 在线程池，向量在调用线程），总延迟约等于较慢的一路
+  - 元数据过滤在打分前生效：过滤结果作为两路共同的候选集，向量路只对候选行打分，BM25 路在取 top_k 前屏蔽
+  - 融合只处理扁平的 节点ID/分数 数组，最后只为 top_k 个结果从 docstore 取节点
+  - 记录每一路的耗时，last_timings 为最近一次，get_stats() 为累计平均；每次查询写一条调试日志，
+    进程内所有检索器的累计平均由 get_hybrid_retrieval_stats() 提供给监控面板
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import MetadataFilters, VectorStoreQuery
+from llama_index.core.vector_stores.utils import build_metadata_filter_fn
+
+from src.app_logging import LogManager
+from src.kb.bm25_index import BM25Index
+
+logger = LogManager()
+
+RRF_K = 60
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """进程内共享的检索线程池（BM25 路）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-bm25")
+        return _executor
+
+
+def _new_totals() -> Dict[str, float]:
+    return {"queries": 0, "vector_ms": 0.0, "bm25_ms": 0.0, "fusion_ms": 0.0, "total_ms": 0.0}
+
+
+def _averages(totals: Dict[str, float]) -> Dict[str, Any]:
+    totals = dict(totals)
+    queries = totals.pop("queries")
+    stats = {f"avg_{name}": (value / queries if queries else 0.0) for name, value in totals.items()}
+    stats["queries"] = queries
+    return stats
+
+
+# 进程内所有检索器的累计耗时（检索器随查询引擎创建，单个实例的统计不足以反映整体）
+_process_totals = _new_totals()
+_process_totals_lock = threading.Lock()
+
+
+def get_hybrid_retrieval_stats() -> Dict[str, Any]:
+    """进程内混合检索各路平均耗时（毫秒），监控面板使用"""
+    with _process_totals_lock:
+        return _averages(_process_totals)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], weights: Optional[Sequence[float]] = None,
+                           k: int = RRF_K, top_k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """倒数排名融合：score(d) = Σ w_i / (k + rank_i(d))，rank 从 1 开始
+
+    Returns:
+        (节点ID数组, 融合分数数组)，按分数降序
+    """
+    weights = weights or [1.0] * len(rankings)
+    lengths = [len(r) for r in rankings]
+    if not sum(lengths):
+        return np.array([], dtype=str), np.array([], dtype=np.float64)
+    all_ids = np.concatenate([np.asarray(r, dtype=str) for r in rankings if len(r)])
+    contrib = np.concatenate([w / (k + np.arange(1, n + 1, dtype=np.float64))
+                              for w, n in zip(weights, lengths) if n])
+    unique_ids, inverse = np.unique(all_ids, return_inverse=True)
+    fused = np.bincount(inverse, weights=contrib, minlength=len(unique_ids))
+    # 同分时按节点ID排序，结果稳定
+    order = np.lexsort((unique_ids, -fused))
+    if top_k is not None:
+        order = order[:top_k]
+    return unique_ids[order], fused[order]
+
+
+class HybridRetriever(BaseRetriever):
+    """向量 + BM25 并行检索，RRF 融合"""
+
+    def __init__(self, index, bm25_index: Optional[BM25Index], similarity_top_k: int = 5,
+                 candidate_top_k: Optional[int] = None, filters: Optional[MetadataFilters] = None,
+                 weights: Tuple[float, float] = (1.0, 1.0), rrf_k: int = RRF_K, callback_manager=None):
+        """
+        Args:
+            index: VectorStoreIndex
+            bm25_index: 持久化 BM25 索引，None 时只走向量路
+            similarity_top_k: 融合后返回的节点数
+            candidate_top_k: 每一路召回的候选数（默认 similarity_top_k * 2）
+            filters: 元数据过滤条件
+            weights: (向量, BM25) 的融合权重
+            rrf_k: RRF 平滑常数
+        """
+        self._index = index
+        self._vector_store = index.vector_store
+        self._docstore = index.docstore
+        self._embed_model = index._embed_model
+        self._bm25 = bm25_index
+        self._top_k = similarity_top_k
+        self._candidate_k = candidate_top_k or similarity_top_k * 2
+        self._filters = filters
+        self._weights = weights
+        self._rrf_k = rrf_k
+        self._stats_lock = threading.Lock()
+        self._totals = _new_totals()
+        self.last_timings: Dict[str, float] = {}
+        super().__init__(callback_manager=callback_manager)
+
+    # ---------- 过滤 ----------
+
+    def _allowed_ids(self) -> Optional[List[str]]:
+        """满足过滤条件的节点ID；无过滤时为 None"""
+        if self._filters is None:
+            return None
+        if hasattr(self._vector_store, "filter_node_ids"):
+            return self._vector_store.filter_node_ids(self._filters)
+        # 旧知识库（JSON 向量存储）：按 docstore 元数据过滤
+        filter_fn = build_metadata_filter_fn(lambda nid: self._docstore.docs[nid].metadata, self._filters)
+        return [nid for nid in self._docstore.docs if filter_fn(nid)]
+
+    # ---------- 两路检索 ----------
+
+    def _vector_leg(self, query_bundle: QueryBundle, allowed: Optional[List[str]]) -> Tuple[List[str], float]:
+        start = time.perf_counter()
+        embedding = query_bundle.embedding
+        if embedding is None:
+            embedding = self._embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+        # 过滤结果以候选ID传入，向量存储只对这些行打分，不再重复计算过滤条件
+        result = self._vector_store.query(VectorStoreQuery(
+            query_embedding=embedding, similarity_top_k=self._candidate_k, node_ids=allowed
+        ))
+        return list(result.ids or []), (time.perf_counter() - start) * 1000
+
+    def _bm25_leg(self, query_str: str, allowed: Optional[List[str]]) -> Tuple[List[str], float]:
+        start = time.perf_counter()
+        hits = self._bm25.search(query_str, self._candidate_k, allowed=allowed)
+        return [node_id for node_id, _ in hits], (time.perf_counter() - start) * 1000
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        start = time.perf_counter()
+        allowed = self._allowed_ids()
+        if allowed is not None and not allowed:
+            return []
+
+        bm25_future = None
+        if self._bm25 is not None:
+            bm25_future = _get_executor().submit(self._bm25_leg, query_bundle.query_str, allowed)
+        vector_ids, vector_ms = self._vector_leg(query_bundle, allowed)
+        bm25_ids, bm25_ms = bm25_future.result() if bm25_future is not None else ([], 0.0)
+
+        fusion_start = time.perf_counter()
+        ids, scores = reciprocal_rank_fusion([vector_ids, bm25_ids], self._weights, self._rrf_k,
+                                             top_k=self._top_k)
+        results = []
+        for node_id, score in zip(ids, scores):
+            node = self._docstore.get_node(str(node_id), raise_error=False)
+            if node is not None:
+                results.append(NodeWithScore(node=node, score=float(score)))
+        end = time.perf_counter()
+
+        timings = {
+            "vector_ms": vector_ms,
+            "bm25_ms": bm25_ms,
+            "fusion_ms": (end - fusion_start) * 1000,
+            "total_ms": (end - start) * 1000,
+        }
+        self.last_timings = timings
+        for lock, totals in ((self._stats_lock, self._totals), (_process_totals_lock, _process_totals)):
+            with lock:
+                totals["queries"] += 1
+                for name, value in timings.items():
+                    totals[name] += value
+        logger.debug(
+            f"混合检索 {len(results)} 条: 向量 {vector_ms:.1f}ms, BM25 {bm25_ms:.1f}ms, "
+            f"融合 {timings['fusion_ms']:.1f}ms, 总计 {timings['total_ms']:.1f}ms",
+            "检索"
+        )
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各路平均耗时（毫秒）"""
+        with self._stats_lock:
+            return _averages(self._totals)
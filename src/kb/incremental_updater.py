@@ -1,11 +1,18 @@
-"""增量更新管理器 - 支持文档增量添加，无需重建整个知识库"""
+"""增量更新管理器 - 支持文档增量添加，无需重建整个知识库
+
+变化检测先比较 (size, mtime_ns, inode) 快照，快照一致的文件不读内容；
+只有快照不一致的可疑文件才并行计算哈希（xxhash 优先）。
+"""
 
 import os
 import json
-import hashlib
 from typing import List, Dict, Optional, Set
 from pathlib import Path
 
+from src.utils.file_fingerprint import (
+    HASH_ALGO, ChangeReport, hash_algo_of, hash_file, hash_files, stat_fingerprint, stat_matches
+)
+
 
 class IncrementalUpdater:
     """增量更新管理器"""
@@ -13,14 +20,19 @@ class IncrementalUpdater:
     def __init__(self, kb_path: str):
         self.kb_path = kb_path
         self.metadata_file = os.path.join(kb_path, "incremental_metadata.json")
+        # 路径 -> {"hash", "size", "mtime_ns", "inode"}
         self.file_hashes = self._load_metadata()
+        self._last_records: Dict[str, Dict] = {}  # get_changed_files 得到的当前指纹，标记时复用
+        self.last_report: Optional[ChangeReport] = None
     
-    def _load_metadata(self) -> Dict[str, str]:
+    def _load_metadata(self) -> Dict[str, Dict]:
         """加载文件哈希元数据"""
         if os.path.exists(self.metadata_file):
             try:
                 with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    data = json.load(f)
+                # 旧版只记录 MD5 字符串，没有快照，首次检测时按哈希比对
+                return {path: rec if isinstance(rec, dict) else {"hash": rec} for path, rec in data.items()}
             except:
                 return {}
         return {}
@@ -29,18 +41,11 @@ class IncrementalUpdater:
         """保存文件哈希元数据"""
         os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
         with open(self.metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(self.file_hashes, f, ensure_ascii=False, indent=2)
+            json.dump(self.file_hashes, f, ensure_ascii=False)
     
     def _calculate_file_hash(self, file_path: str) -> str:
         """计算文件哈希值"""
-        hash_md5 = hashlib.md5()
-        try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
-        except:
-            return ""
+        return hash_file(file_path)
     
     def get_changed_files(self, file_paths: List[str]) -> Dict[str, List[str]]:
         """检测文件变化
@@ -53,34 +58,89 @@ class IncrementalUpdater:
             }
         """
         result = {'new': [], 'modified': [], 'unchanged': []}
+        report = ChangeReport()
+        fingerprints = {}
+        jobs = []  # 需要读内容的文件: (路径, 算法)
         
         for file_path in file_paths:
-            if not os.path.exists(file_path):
+            fingerprint = stat_fingerprint(file_path)
+            if fingerprint is None:
                 continue
-                
-            current_hash = self._calculate_file_hash(file_path)
-            stored_hash = self.file_hashes.get(file_path)
-            
-            if stored_hash is None:
+            report.files += 1
+            fingerprints[file_path] = fingerprint
+            record = self.file_hashes.get(file_path)
+            if record is not None and stat_matches(record, fingerprint):
+                report.stat_hits += 1
+                report.bytes_avoided += fingerprint['size']
+                result['unchanged'].append(file_path)
+            else:
+                # 与已记录的哈希比对时沿用其算法（兼容旧版 MD5 记录）
+                algo = hash_algo_of(record['hash']) if record and record.get('hash') else HASH_ALGO
+                jobs.append((file_path, algo))
+        
+        hashes = hash_files(jobs)
+        snapshot_updated = False
+        for file_path, current_hash in hashes.items():
+            if not current_hash:
+                continue  # 读取失败，本次不参与比对
+            fingerprint = fingerprints[file_path]
+            report.hashed += 1
+            report.bytes_hashed += fingerprint['size']
+            current = {"hash": current_hash, **fingerprint}
+            record = self.file_hashes.get(file_path)
+            if record is None:
+                self._last_records[file_path] = current
                 result['new'].append(file_path)
-            elif stored_hash != current_hash:
+            elif record.get('hash') != current_hash:
+                self._last_records[file_path] = current
                 result['modified'].append(file_path)
             else:
+                # 内容未变（如只 touch 过）：刷新快照，下次无需再读
+                self.file_hashes[file_path] = current
+                snapshot_updated = True
                 result['unchanged'].append(file_path)
         
+        if snapshot_updated:
+            self._save_metadata()
+        self.last_report = report.finish()
         return result
     
-    def mark_files_processed(self, file_paths: List[str]):
-        """标记文件已处理"""
+    def mark_files_processed(self, file_paths: List[str], known_hashes: Optional[Dict[str, str]] = None):
+        """标记文件已处理
+        
+        Args:
+            known_hashes: 本次构建中已算出的哈希（路径 -> 哈希，如元数据提取时写入清单的值），
+                          算法与当前一致时直接复用，不再读文件
+        """
+        known = {p: h for p, h in (known_hashes or {}).items() if h and hash_algo_of(h) == HASH_ALGO}
+        missing = [p for p in file_paths if p not in self._last_records and p not in known]
+        fresh = hash_files([(p, HASH_ALGO) for p in missing])
+        fresh.update(known)
         for file_path in file_paths:
-            if os.path.exists(file_path):
-                self.file_hashes[file_path] = self._calculate_file_hash(file_path)
+            record = self._last_records.pop(file_path, None)
+            if record is None:
+                fingerprint = stat_fingerprint(file_path)
+                # 读取失败（哈希为空）不登记，下次构建重新检测
+                if fingerprint is None or not fresh.get(file_path):
+                    continue
+                record = {"hash": fresh[file_path], **fingerprint}
+            self.file_hashes[file_path] = record
         self._save_metadata()
     
+    def seed_hashes(self, hashes: Dict[str, str]):
+        """补登尚无记录的文件哈希（如清单中元数据提取时算出的哈希），不覆盖已有记录"""
+        for file_path, file_hash in hashes.items():
+            if file_hash and file_path not in self.file_hashes:
+                self.file_hashes[file_path] = {"hash": file_hash}
+    
     def remove_file_record(self, file_path: str):
         """移除文件记录"""
-        if file_path in self.file_hashes:
-            del self.file_hashes[file_path]
+        self.remove_file_records([file_path])
+    
+    def remove_file_records(self, file_paths: List[str]):
+        """批量移除文件记录"""
+        removed = [p for p in file_paths if self.file_hashes.pop(p, None) is not None]
+        if removed:
             self._save_metadata()
     
     def get_stats(self) -> Dict[str, int]:
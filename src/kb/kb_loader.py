@@ -16,6 +16,7 @@ from llama_index.core.vector_stores import MetadataFilters, ExactMatchFilter
 from src.app_logging import LogManager
 from src.config import ManifestManager
 from src.utils.model_manager import load_embedding_model
+from src.kb.npy_vector_store import load_storage_context
 
 logger = LogManager()
 
@@ -116,7 +117,7 @@ class KnowledgeBaseLoader:
             
             stage1_start = time.time()
             storage_context = self._load_with_progress(
-                lambda: StorageContext.from_defaults(persist_dir=db_path),
+                lambda: load_storage_context(db_path),
                 progress_bar, 5, 39, "[1/3] 加载向量数据"
             )
             stage1_time = time.time() - stage1_start
@@ -179,7 +180,7 @@ class KnowledgeBaseLoader:
                 else:
                     raise ValueError(f"无法加载嵌入模型: {kb_embed_model}")
                 
-                storage_context = StorageContext.from_defaults(persist_dir=db_path)
+                storage_context = load_storage_context(db_path)
                 index = load_index_from_storage(storage_context)
                 
                 # 使用通用创建方法（支持过滤）
@@ -249,29 +250,41 @@ class KnowledgeBaseLoader:
         # BM25 混合检索配置
         if st.session_state.get('enable_bm25', False):
             try:
-                from llama_index.retrievers.bm25 import BM25Retriever
-                from llama_index.core.retrievers import QueryFusionRetriever
-                
-                status.write("   🔍 构建 BM25 混合检索...")
-                nodes = index.docstore.docs.values()
-                
-                bm25_retriever = BM25Retriever.from_defaults(
-                    nodes=list(nodes),
-                    similarity_top_k=5
-                )
+                from src.kb.bm25_index import BM25Index
+
+                if BM25Index.exists(db_path):
+                    # 持久化倒排索引：mmap 加载，向量与 BM25 两路并行检索，过滤条件两路共用
+                    from src.kb.hybrid_retriever import HybridRetriever
+
+                    status.write("   🔍 加载 BM25 倒排索引...")
+                    retriever = HybridRetriever(
+                        index, BM25Index(db_path), similarity_top_k=5, filters=filters
+                    )
+                else:
+                    # 旧知识库无持久化索引，回退为内存构建
+                    from llama_index.retrievers.bm25 import BM25Retriever
+                    from llama_index.core.retrievers import QueryFusionRetriever
+
+                    status.write("   🔍 构建 BM25 混合检索...")
+                    nodes = index.docstore.docs.values()
+                    
+                    bm25_retriever = BM25Retriever.from_defaults(
+                        nodes=list(nodes),
+                        similarity_top_k=5
+                    )
                 
-                vector_retriever = index.as_retriever(
-                    similarity_top_k=5,
-                    filters=filters
-                )
+                    vector_retriever = index.as_retriever(
+                        similarity_top_k=5,
+                        filters=filters
+                    )
                 
-                retriever = QueryFusionRetriever(
-                    retrievers=[vector_retriever, bm25_retriever],
-                    similarity_top_k=5,
-                    num_queries=1,
-                    mode="reciprocal_rerank",
-                    use_async=False,
-                )
+                    retriever = QueryFusionRetriever(
+                        retrievers=[vector_retriever, bm25_retriever],
+                        similarity_top_k=5,
+                        num_queries=1,
+                        mode="reciprocal_rerank",
+                        use_async=False,
+                    )
                 
                 status.write("   ✅ BM25 混合检索构建成功")
             except Exception as e:
@@ -280,12 +293,13 @@ class KnowledgeBaseLoader:
         # Re-ranking 配置
         if st.session_state.get('enable_rerank', False):
             try:
-                from llama_index.core.postprocessor import SentenceTransformerRerank
+                from src.query.reranker import SharedRerank
                 
                 rerank_model = st.session_state.get('rerank_model', 'BAAI/bge-reranker-base')
                 status.write(f"   🎯 加载 Re-ranking 模型: {rerank_model}...")
                 
-                reranker = SentenceTransformerRerank(
+                # 进程内共享的常驻模型：再次挂载或其他会话直接复用，打分跨请求合批并缓存
+                reranker = SharedRerank.for_deployment(
                     top_n=3,
                     model=rerank_model,
                     keep_retrieval_score=True,
@@ -26,12 +26,12 @@ class KBProcessor:
         start_time = time.time()
         
         # 资源保护检查
-        import psutil
         from src.utils.adaptive_throttling import get_resource_guard
+        from src.utils.metrics_sampler import get_metrics_sampler
         
         resource_guard = get_resource_guard()
-        cpu = psutil.cpu_percent(interval=0.1)
-        mem = psutil.virtual_memory().percent
+        sample = get_metrics_sampler().latest()
+        cpu, mem = sample.cpu_percent, sample.memory_percent
         result = resource_guard.check_resources(cpu, mem, 0)
         throttle_info = result.get('throttle', {})
         
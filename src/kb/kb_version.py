@@ -0,0 +1,55 @@
+"""
+知识库内容版本 - 每次构建/追加/增量写入后递增
+版本号保存在知识库目录的 .kb_version 中，取纳秒时间戳并保证单调递增；
+删除后重建的知识库也不会与旧版本号相同。查询缓存等按版本号精确失效。
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, Tuple
+
+VERSION_FILE = ".kb_version"
+
+_lock = threading.Lock()
+_memo: Dict[str, Tuple[Tuple[int, int], int]] = {}  # 文件路径 -> ((mtime_ns, inode), 版本号)
+
+
+def _version_path(persist_dir: str) -> str:
+    return os.path.join(persist_dir, VERSION_FILE)
+
+
+def get_kb_version(persist_dir: str) -> int:
+    """读取知识库内容版本（未构建过返回 0），文件未变时不重复读取"""
+    path = _version_path(persist_dir)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+    # 写入走 os.replace，inode 随之变化，同一时间片内的多次写入也能区分
+    stamp = (stat.st_mtime_ns, stat.st_ino)
+    memo = _memo.get(path)
+    if memo and memo[0] == stamp:
+        return memo[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            version = int(json.load(f).get('version', 0))
+    except Exception:
+        return 0
+    _memo[path] = (stamp, version)
+    return version
+
+
+def bump_kb_version(persist_dir: str) -> int:
+    """知识库内容变化后调用，返回新版本号"""
+    path = _version_path(persist_dir)
+    with _lock:
+        version = max(time.time_ns(), get_kb_version(persist_dir) + 1)
+        os.makedirs(persist_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'updated_at': time.time()}, f)
+        os.replace(tmp_path, path)
+        _memo.pop(path, None)
+    return version
@@ -0,0 +1,616 @@
+#!/usr/bin/env python3
+"""
+二进制向量存储
+替代 SimpleVectorStore 的 JSON 持久化，向量以连续的 float32/float16 矩阵存放：
+
+    <persist_dir>/default__vector_store/
+        meta.json        格式、维度、行数、墓碑
+        vectors.bin      行主序向量矩阵（内存映射，零拷贝加载）
+        norms.bin        每行的 L2 范数（float32），查询时免重算
+        ids.json         偏移表：第 i 行对应的 node_id / ref_doc_id
+        metadata.jsonl   第 i 行节点的元数据（仅在使用元数据过滤时加载）
+
+追加写入只在文件末尾追加新行；删除记为墓碑，墓碑占比过高时持久化会压缩重写。
+相似度检索为分块的 NumPy 矩阵乘法（余弦相似度）。
+"""
+
+import os
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import build_metadata_filter_fn, node_to_metadata_dict
+
+STORE_DIRNAME = "default__vector_store"
+JSON_STORE_FNAME = "default__vector_store.json"
+IMAGE_STORE_FNAME = "image__vector_store.json"
+FORMAT_VERSION = 1
+
+# 分块计算相似度，float16 矩阵转 float32 时内存占用有上界
+_BLOCK_ROWS = 65536
+# 墓碑占比超过该值时持久化压缩重写
+_COMPACT_RATIO = 0.2
+
+
+def _atomic_json(path: str, data):
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class NpyVectorStore(BasePydanticVectorStore):
+    """内存映射的二进制向量存储"""
+
+    stores_text: bool = False
+    dtype: str = "float32"
+
+    _store_dir: Optional[str] = PrivateAttr(default=None)
+    _dim: int = PrivateAttr(default=0)
+    _count: int = PrivateAttr(default=0)
+    _matrix: Any = PrivateAttr(default=None)
+    _norms: Any = PrivateAttr(default=None)
+    _alive: Any = PrivateAttr(default=None)
+    _node_ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[str] = PrivateAttr(default_factory=list)
+    _id_to_row: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _ref_rows: Optional[Dict[str, List[int]]] = PrivateAttr(default=None)  # ref_doc_id -> 行，首次删除时构建
+    _pending_vecs: List[Any] = PrivateAttr(default_factory=list)
+    _pending_meta: List[str] = PrivateAttr(default_factory=list)
+    _metadata: Optional[List[Dict[str, Any]]] = PrivateAttr(default=None)
+    _dirty: bool = PrivateAttr(default=False)
+    _needs_rewrite: bool = PrivateAttr(default=False)
+    _generation: int = PrivateAttr(default=0)
+    _ann: Any = PrivateAttr(default=None)
+    _ann_checked: bool = PrivateAttr(default=False)
+    _filter_cache: Any = PrivateAttr(default=None)
+
+    def __init__(self, dtype: str = "float32", store_dir: Optional[str] = None, **kwargs: Any):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"不支持的向量精度: {dtype}")
+        super().__init__(dtype=dtype, **kwargs)
+        self._alive = np.zeros(0, dtype=bool)
+        self._store_dir = store_dir
+        if store_dir and os.path.exists(os.path.join(store_dir, "meta.json")):
+            self._load(store_dir)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NpyVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    # ---------- 加载 ----------
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        """知识库是否已使用二进制向量存储"""
+        return os.path.exists(os.path.join(persist_dir, STORE_DIRNAME, "meta.json"))
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, dtype: Optional[str] = None) -> "NpyVectorStore":
+        store_dir = os.path.join(persist_dir, STORE_DIRNAME)
+        if dtype is None:
+            dtype = "float32"
+            meta_file = os.path.join(store_dir, "meta.json")
+            if os.path.exists(meta_file):
+                with open(meta_file, 'r') as f:
+                    dtype = json.load(f).get('dtype', dtype)
+        return cls(dtype=dtype, store_dir=store_dir)
+
+    def _load(self, store_dir: str):
+        with open(os.path.join(store_dir, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        with open(os.path.join(store_dir, "ids.json"), 'r', encoding='utf-8') as f:
+            ids = json.load(f)
+
+        self._dim = meta['dim']
+        self._count = meta['count']
+        self._generation = meta.get('generation', 0)
+        self._node_ids = ids['node_ids'][:self._count]
+        self._ref_doc_ids = ids['ref_doc_ids'][:self._count]
+        self._map_files(store_dir)
+
+        self._alive = np.ones(self._count, dtype=bool)
+        deleted = meta.get('deleted', [])
+        if deleted:
+            self._alive[np.asarray(deleted, dtype=np.int64)] = False
+        self._id_to_row = {nid: i for i, nid in enumerate(self._node_ids) if self._alive[i]}
+        self._ref_rows = None
+
+    def _map_files(self, store_dir: str):
+        if self._count and self._dim:
+            self._matrix = np.memmap(os.path.join(store_dir, "vectors.bin"), dtype=self.dtype,
+                                     mode='r', shape=(self._count, self._dim))
+            self._norms = np.memmap(os.path.join(store_dir, "norms.bin"), dtype=np.float32,
+                                    mode='r', shape=(self._count,))
+        else:
+            self._matrix = np.zeros((0, self._dim), dtype=self.dtype)
+            self._norms = np.zeros(0, dtype=np.float32)
+
+    # ---------- 写入 ----------
+
+    @property
+    def _total(self) -> int:
+        return len(self._node_ids)
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        vecs = np.asarray([node.get_embedding() for node in nodes], dtype=np.float32)
+        if self._dim == 0:
+            self._dim = vecs.shape[1]
+            self._matrix = np.zeros((0, self._dim), dtype=self.dtype)
+        elif vecs.shape[1] != self._dim:
+            raise ValueError(f"向量维度不一致: {vecs.shape[1]} != {self._dim}")
+
+        # 同一节点重复写入时旧行作废
+        replaced = [self._id_to_row[n.node_id] for n in nodes if n.node_id in self._id_to_row]
+        if replaced:
+            self._kill_rows(replaced)
+
+        start = self._total
+        alive = np.ones(len(nodes), dtype=bool)
+        self._alive = np.concatenate([self._alive, alive])
+        self._pending_vecs.append(vecs)
+        for offset, node in enumerate(nodes):
+            self._node_ids.append(node.node_id)
+            self._ref_doc_ids.append(node.ref_doc_id or "None")
+            self._id_to_row[node.node_id] = start + offset
+            if self._ref_rows is not None:
+                self._ref_rows.setdefault(node.ref_doc_id or "None", []).append(start + offset)
+            metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+            metadata.pop("_node_content", None)
+            self._pending_meta.append(json.dumps(metadata, ensure_ascii=False))
+            if self._metadata is not None:
+                self._metadata.append(metadata)
+        self._dirty = True
+        return [node.node_id for node in nodes]
+
+    def _kill_rows(self, rows: List[int]):
+        for row in rows:
+            if self._alive[row]:
+                self._alive[row] = False
+                self._id_to_row.pop(self._node_ids[row], None)
+        self._dirty = True
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        # 一次构建中逐个删除大量文档时，不再每次扫描全部行
+        if self._ref_rows is None:
+            self._ref_rows = {}
+            for i, ref in enumerate(self._ref_doc_ids):
+                self._ref_rows.setdefault(ref, []).append(i)
+        self._kill_rows(self._ref_rows.pop(ref_doc_id, []))
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None,
+                     filters: Optional[MetadataFilters] = None, **delete_kwargs: Any) -> None:
+        if node_ids is not None:
+            rows = [self._id_to_row[nid] for nid in node_ids if nid in self._id_to_row]
+        else:
+            rows = list(np.flatnonzero(self._alive))
+        if filters is not None:
+            mask = self._filter_mask(filters)
+            rows = [r for r in rows if mask[r]]
+        self._kill_rows(rows)
+
+    def clear(self) -> None:
+        self._dim = 0
+        self._count = 0
+        self._matrix = np.zeros((0, 0), dtype=self.dtype)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._node_ids, self._ref_doc_ids = [], []
+        self._id_to_row = {}
+        self._ref_rows = None
+        self._pending_vecs, self._pending_meta = [], []
+        self._metadata = []
+        self._dirty = True
+        self._needs_rewrite = True
+
+    def get(self, text_id: str) -> List[float]:
+        return self._row_vector(self._id_to_row[text_id]).tolist()
+
+    def _row_vector(self, row: int) -> np.ndarray:
+        if row < self._count:
+            return np.asarray(self._matrix[row], dtype=np.float32)
+        row -= self._count
+        for block in self._pending_vecs:
+            if row < len(block):
+                return block[row]
+            row -= len(block)
+        raise IndexError(row)
+
+    # ---------- 检索 ----------
+
+    def _load_metadata(self) -> List[Dict[str, Any]]:
+        if self._metadata is None:
+            metadata = []
+            if self._store_dir and self._count:
+                with open(os.path.join(self._store_dir, "metadata.jsonl"), 'r', encoding='utf-8') as f:
+                    for _, line in zip(range(self._count), f):
+                        metadata.append(json.loads(line))
+            metadata.extend(json.loads(m) for m in self._pending_meta)
+            self._metadata = metadata
+        return self._metadata
+
+    def _filter_mask(self, filters: MetadataFilters) -> np.ndarray:
+        metadata = self._load_metadata()
+        # 过滤函数按行号取元数据，免去 node_id -> 行号的查找
+        filter_fn = build_metadata_filter_fn(lambda row: metadata[row], filters)
+        return np.fromiter((filter_fn(row) for row in range(self._total)), dtype=bool, count=self._total)
+
+    def filter_node_ids(self, filters: MetadataFilters) -> List[str]:
+        """满足元数据过滤条件的存活节点ID（混合检索在各路打分前先过滤）；数据未变时复用上次结果"""
+        key = (filters.model_dump_json(), self._total, self._generation, int(self._alive.sum()))
+        if self._filter_cache is not None and self._filter_cache[0] == key:
+            return self._filter_cache[1]
+        rows = np.flatnonzero(self._alive & self._filter_mask(filters))
+        node_ids = [self._node_ids[int(r)] for r in rows]
+        self._filter_cache = (key, node_ids)
+        return node_ids
+
+    def _scores(self, query: np.ndarray, first_row: int = 0) -> np.ndarray:
+        """first_row 及之后所有行（含未持久化的新行）与查询向量的余弦相似度"""
+        q_norm = float(np.linalg.norm(query)) or 1.0
+        parts = []
+        for start in range(first_row, self._count, _BLOCK_ROWS):
+            block = self._matrix[start:start + _BLOCK_ROWS]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            parts.append(block @ query)
+        norms = [np.asarray(self._norms[first_row:self._count], dtype=np.float32)]
+        for vecs in self._pending_vecs:
+            parts.append(vecs @ query)
+            norms.append(np.linalg.norm(vecs, axis=1).astype(np.float32))
+        if not parts:
+            return np.zeros(0, dtype=np.float32)
+        dots = np.concatenate(parts)
+        norms = np.concatenate(norms)
+        return np.where(norms > 0, dots / (norms * q_norm), 0.0)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        candidates = self._alive.copy()
+        if query.node_ids is not None:
+            allowed = np.zeros(self._total, dtype=bool)
+            rows = [self._id_to_row[nid] for nid in query.node_ids if nid in self._id_to_row]
+            allowed[rows] = True
+            candidates &= allowed
+        if query.filters is not None:
+            candidates &= self._filter_mask(query.filters)
+
+        if not candidates.any() or query.query_embedding is None:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+
+        query_vec = np.asarray(query.query_embedding, dtype=np.float32)
+        top_k = query.similarity_top_k or 1
+
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            return self._query_fallback(query, query_vec, np.flatnonzero(candidates), **kwargs)
+
+        if query.node_ids is None and query.filters is None:
+            result = self._query_ann(query_vec, top_k)
+            if result is not None:
+                return result
+
+        scores = self._scores(query_vec)
+        scores = np.where(candidates, scores, -np.inf)
+        k = min(top_k, int(candidates.sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return VectorStoreQueryResult(
+            similarities=[float(scores[i]) for i in top],
+            ids=[self._node_ids[i] for i in top],
+        )
+
+    # ---------- ANN ----------
+
+    def get_ann_index(self):
+        """加载与当前数据一致的 ANN 索引（压缩重写后行号改变，旧索引失效）"""
+        if not self._ann_checked:
+            self._ann_checked = True
+            if self._store_dir:
+                from src.kb.ann_index import load_ann_index
+                self._ann = load_ann_index(os.path.dirname(self._store_dir))
+        ann = self._ann
+        if ann is None or ann.generation != self._generation or ann.count > self._count:
+            return None
+        return ann
+
+    def set_ann_params(self, **params):
+        """调整 ANN 检索参数（ivf: nprobe；hnsw: ef_search），在召回率与延迟间权衡"""
+        ann = self.get_ann_index()
+        if ann is not None:
+            ann.set_params(**params)
+
+    def _query_ann(self, query_vec: np.ndarray, top_k: int) -> Optional[VectorStoreQueryResult]:
+        """ANN 检索已建索引的行，索引之后追加的行精确检索，合并取 top_k"""
+        ann = self.get_ann_index()
+        if ann is None:
+            return None
+
+        q_norm = float(np.linalg.norm(query_vec)) or 1.0
+        query_unit = query_vec / q_norm
+        dead = ann.count - int(self._alive[:ann.count].sum())
+        rows, scores = ann.search(query_unit, top_k + dead if dead < top_k * 4 else top_k * 4,
+                                  self._matrix, self._norms)
+        keep = self._alive[rows]
+        rows, scores = rows[keep], scores[keep]
+
+        tail = self._scores(query_vec, first_row=ann.count)
+        if len(tail):
+            tail = np.where(self._alive[ann.count:], tail, -np.inf)
+            tail_top = np.argsort(-tail)[:top_k]
+            tail_top = tail_top[np.isfinite(tail[tail_top])]
+            rows = np.concatenate([rows, tail_top + ann.count])
+            scores = np.concatenate([scores, tail[tail_top]])
+
+        if len(rows) < min(top_k, int(self._alive.sum())):
+            # 墓碑过多导致候选不足，回退精确检索
+            return None
+        order = np.argsort(-scores)[:top_k]
+        return VectorStoreQueryResult(
+            similarities=[float(scores[i]) for i in order],
+            ids=[self._node_ids[int(rows[i])] for i in order],
+        )
+
+    def _query_fallback(self, query: VectorStoreQuery, query_vec: np.ndarray,
+                        rows: np.ndarray, **kwargs: Any) -> VectorStoreQueryResult:
+        """MMR / 学习器模式：取出候选向量后沿用 llama_index 的实现"""
+        from llama_index.core.indices.query.embedding_utils import (
+            get_top_k_embeddings_learner,
+            get_top_k_mmr_embeddings,
+        )
+
+        embeddings = [self._row_vector(int(r)).tolist() for r in rows]
+        node_ids = [self._node_ids[int(r)] for r in rows]
+        if query.mode == VectorStoreQueryMode.MMR:
+            sims, ids = get_top_k_mmr_embeddings(
+                query_vec.tolist(), embeddings, similarity_top_k=query.similarity_top_k,
+                embedding_ids=node_ids, mmr_threshold=kwargs.get("mmr_threshold"),
+            )
+        else:
+            sims, ids = get_top_k_embeddings_learner(
+                query_vec.tolist(), embeddings, similarity_top_k=query.similarity_top_k,
+                embedding_ids=node_ids, query_mode=query.mode,
+            )
+        return VectorStoreQueryResult(similarities=sims, ids=ids)
+
+    # ---------- 持久化 ----------
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """写入 <persist_dir>/default__vector_store/（persist_path 为 StorageContext 给出的 JSON 路径）"""
+        store_dir = os.path.splitext(persist_path)[0]
+        if store_dir != self._store_dir:
+            # 写到新位置：整体重写
+            self._needs_rewrite = True
+        elif not self._dirty:
+            return
+        os.makedirs(store_dir, exist_ok=True)
+
+        dead = self._total - int(self._alive.sum())
+        if self._needs_rewrite or (self._total and dead / self._total > _COMPACT_RATIO):
+            self._rewrite(store_dir)
+        else:
+            self._append(store_dir)
+
+        self._store_dir = store_dir
+        self._pending_vecs, self._pending_meta = [], []
+        self._dirty = False
+        self._needs_rewrite = False
+        self._map_files(store_dir)
+
+    def _append(self, store_dir: str):
+        """只追加新行，已有数据不重写"""
+        row_bytes = self._dim * np.dtype(self.dtype).itemsize
+        for fname, size in (("vectors.bin", self._count * row_bytes), ("norms.bin", self._count * 4)):
+            path = os.path.join(store_dir, fname)
+            # 截掉上次中断留下的半截数据
+            with open(path, 'ab') as f:
+                f.truncate(size)
+
+        metadata_lines = self._count
+        with open(os.path.join(store_dir, "vectors.bin"), 'ab') as fv, \
+                open(os.path.join(store_dir, "norms.bin"), 'ab') as fn:
+            for vecs in self._pending_vecs:
+                fv.write(vecs.astype(self.dtype).tobytes())
+                fn.write(np.linalg.norm(vecs, axis=1).astype(np.float32).tobytes())
+        self._truncate_lines(os.path.join(store_dir, "metadata.jsonl"), metadata_lines)
+        with open(os.path.join(store_dir, "metadata.jsonl"), 'a', encoding='utf-8') as f:
+            for line in self._pending_meta:
+                f.write(line + "\n")
+
+        self._count = self._total
+        self._write_tables(store_dir, deleted=np.flatnonzero(~self._alive).tolist())
+
+    @staticmethod
+    def _truncate_lines(path: str, keep: int):
+        if not os.path.exists(path):
+            open(path, 'w').close()
+            return
+        with open(path, 'rb+') as f:
+            for _ in range(keep):
+                if not f.readline():
+                    break
+            f.truncate()
+
+    def _rewrite(self, store_dir: str):
+        """只保留存活行，整体重写（压缩）"""
+        rows = np.flatnonzero(self._alive)
+        tmp_vec = os.path.join(store_dir, "vectors.bin.tmp")
+        tmp_norm = os.path.join(store_dir, "norms.bin.tmp")
+        tmp_meta = os.path.join(store_dir, "metadata.jsonl.tmp")
+
+        old_meta = None
+        if self._metadata is None and self._store_dir and self._count:
+            old_meta = open(os.path.join(self._store_dir, "metadata.jsonl"), 'r', encoding='utf-8')
+        try:
+            alive_rows = set(rows.tolist())
+            persisted_rows = rows[rows < self._count]  # 未持久化的行在 _pending_vecs 中
+            with open(tmp_vec, 'wb') as fv, open(tmp_norm, 'wb') as fn, \
+                    open(tmp_meta, 'w', encoding='utf-8') as fm:
+                for start in range(0, self._count, _BLOCK_ROWS):
+                    block_rows = persisted_rows[(persisted_rows >= start) & (persisted_rows < start + _BLOCK_ROWS)]
+                    if len(block_rows):
+                        fv.write(np.asarray(self._matrix[block_rows], dtype=self.dtype).tobytes())
+                        fn.write(np.asarray(self._norms[block_rows], dtype=np.float32).tobytes())
+                offset = self._count
+                for vecs in self._pending_vecs:
+                    keep = self._alive[offset:offset + len(vecs)]
+                    fv.write(vecs[keep].astype(self.dtype).tobytes())
+                    fn.write(np.linalg.norm(vecs[keep], axis=1).astype(np.float32).tobytes())
+                    offset += len(vecs)
+
+                for i in range(self._total):
+                    if self._metadata is not None:
+                        line = json.dumps(self._metadata[i], ensure_ascii=False)
+                    elif i < self._count:
+                        line = old_meta.readline().rstrip("\n")
+                    else:
+                        line = self._pending_meta[i - self._count]
+                    if i in alive_rows:
+                        fm.write(line + "\n")
+        finally:
+            if old_meta is not None:
+                old_meta.close()
+
+        os.replace(tmp_vec, os.path.join(store_dir, "vectors.bin"))
+        os.replace(tmp_norm, os.path.join(store_dir, "norms.bin"))
+        os.replace(tmp_meta, os.path.join(store_dir, "metadata.jsonl"))
+
+        self._node_ids = [self._node_ids[i] for i in rows]
+        self._ref_doc_ids = [self._ref_doc_ids[i] for i in rows]
+        if self._metadata is not None:
+            self._metadata = [self._metadata[i] for i in rows]
+        self._alive = np.ones(len(rows), dtype=bool)
+        self._id_to_row = {nid: i for i, nid in enumerate(self._node_ids)}
+        self._ref_rows = None
+        self._count = len(rows)
+        self._generation += 1
+        self._write_tables(store_dir, deleted=[])
+
+    def _write_tables(self, store_dir: str, deleted: List[int]):
+        # 偏移表先于 meta.json 落盘；meta.json 中的行数是数据有效范围的唯一依据
+        _atomic_json(os.path.join(store_dir, "ids.json"),
+                     {"node_ids": self._node_ids, "ref_doc_ids": self._ref_doc_ids})
+        _atomic_json(os.path.join(store_dir, "meta.json"), {
+            "format_version": FORMAT_VERSION,
+            "dtype": self.dtype,
+            "dim": self._dim,
+            "count": self._count,
+            "generation": self._generation,
+            "deleted": deleted,
+        })
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "dtype": self.dtype,
+            "dim": self._dim,
+            "rows": self._total,
+            "alive": int(self._alive.sum()),
+            "pending": self._total - self._count,
+            "ann": self._ann.meta if self.get_ann_index() is not None else None,
+        }
+
+
+def new_storage_context(dtype: str = "float32"):
+    """新建知识库使用的存储上下文（二进制向量存储）"""
+    from llama_index.core import StorageContext
+    return StorageContext.from_defaults(vector_store=NpyVectorStore(dtype=dtype))
+
+
+def load_storage_context(persist_dir: str):
+    """加载知识库存储上下文：优先使用二进制向量存储，旧知识库回退到 JSON"""
+    from llama_index.core import StorageContext
+
+    if not NpyVectorStore.exists(persist_dir):
+        return StorageContext.from_defaults(persist_dir=persist_dir)
+
+    from llama_index.core.vector_stores.simple import SimpleVectorStore
+
+    vector_stores = {"default": NpyVectorStore.from_persist_dir(persist_dir)}
+    if os.path.exists(os.path.join(persist_dir, IMAGE_STORE_FNAME)):
+        vector_stores["image"] = SimpleVectorStore.from_persist_dir(persist_dir, namespace="image")
+    return StorageContext.from_defaults(persist_dir=persist_dir, vector_stores=vector_stores)
+
+
+def migrate_kb(persist_dir: str, dtype: str = "float32", keep_json: bool = False) -> Dict[str, Any]:
+    """把 JSON 向量存储转换为二进制格式"""
+    json_path = os.path.join(persist_dir, JSON_STORE_FNAME)
+    if NpyVectorStore.exists(persist_dir):
+        return {"kb": persist_dir, "status": "skipped", "reason": "已是二进制格式"}
+    if not os.path.exists(json_path):
+        return {"kb": persist_dir, "status": "skipped", "reason": "没有向量存储"}
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    embedding_dict = data.get('embedding_dict', {})
+    ref_ids = data.get('text_id_to_ref_doc_id', {})
+    metadata_dict = data.get('metadata_dict') or {}
+
+    store = NpyVectorStore(dtype=dtype)
+    node_ids = list(embedding_dict)
+    if node_ids:
+        vecs = np.asarray([embedding_dict[nid] for nid in node_ids], dtype=np.float32)
+        store._dim = vecs.shape[1]
+        store._matrix = np.zeros((0, store._dim), dtype=dtype)
+        store._pending_vecs = [vecs]
+        store._node_ids = node_ids
+        store._ref_doc_ids = [ref_ids.get(nid, "None") for nid in node_ids]
+        store._id_to_row = {nid: i for i, nid in enumerate(node_ids)}
+        store._pending_meta = [json.dumps(metadata_dict.get(nid, {}), ensure_ascii=False) for nid in node_ids]
+        store._alive = np.ones(len(node_ids), dtype=bool)
+    store._dirty = True
+    store.persist(json_path)
+
+    json_size = os.path.getsize(json_path)
+    store_dir = os.path.join(persist_dir, STORE_DIRNAME)
+    binary_size = sum(os.path.getsize(os.path.join(store_dir, f)) for f in os.listdir(store_dir))
+    if not keep_json:
+        os.remove(json_path)
+    return {
+        "kb": persist_dir,
+        "status": "migrated",
+        "vectors": len(node_ids),
+        "json_mb": round(json_size / 1024 / 1024, 2),
+        "binary_mb": round(binary_size / 1024 / 1024, 2),
+    }
+
+
+def migrate_all(base_path: str = "vector_db_storage", dtype: str = "float32",
+                keep_json: bool = False) -> List[Dict[str, Any]]:
+    """迁移目录下所有知识库"""
+    results = []
+    if not os.path.isdir(base_path):
+        return results
+    for name in sorted(os.listdir(base_path)):
+        kb_path = os.path.join(base_path, name)
+        if os.path.isdir(kb_path):
+            try:
+                results.append(migrate_kb(kb_path, dtype=dtype, keep_json=keep_json))
+            except Exception as e:
+                results.append({"kb": kb_path, "status": "failed", "reason": str(e)})
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="把知识库的 JSON 向量存储迁移为二进制格式")
+    parser.add_argument("base_path", nargs="?", default="vector_db_storage")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--keep-json", action="store_true", help="保留原 JSON 文件")
+    args = parser.parse_args()
+
+    for item in migrate_all(args.base_path, dtype=args.dtype, keep_json=args.keep_json):
+        print(json.dumps(item, ensure_ascii=False))
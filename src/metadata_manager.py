@@ -1,27 +1,41 @@
 """
 元数据管理模块 - 增强文件属性追踪
+文件元数据存放在 SQLite（file_metadata.db，WAL），支持批量 upsert 和多进程并发写入；
+旧版 file_metadata.json 在首次写入时自动导入。
 """
 import os
-import hashlib
 import json
+import sqlite3
+from contextlib import closing
 from datetime import datetime
 from typing import Dict, List, Optional
 import jieba
 import jieba.analyse
 from collections import Counter
 
+from src.utils.file_fingerprint import hash_file
+from src.utils.sqlite_cache import connect_wal
+
 class MetadataManager:
     """文件元数据管理器"""
     
     def __init__(self, persist_dir: str):
         self.persist_dir = persist_dir
-        self.metadata_file = os.path.join(persist_dir, "file_metadata.json")
+        self.metadata_file = os.path.join(persist_dir, "file_metadata.json")  # 旧版格式，仅用于导入
+        self.db_file = os.path.join(persist_dir, "file_metadata.db")
         self.stats_file = os.path.join(persist_dir, "retrieval_stats.json")
         self.metadata = self._load_metadata()
         self.stats = self._load_stats()
     
     def _load_metadata(self) -> Dict:
         """加载元数据"""
+        if os.path.exists(self.db_file):
+            try:
+                with closing(sqlite3.connect(self.db_file, timeout=30)) as conn:
+                    rows = conn.execute("SELECT filename, data FROM file_metadata").fetchall()
+                return {name: json.loads(data) for name, data in rows}
+            except sqlite3.Error:
+                return {}
         if os.path.exists(self.metadata_file):
             try:
                 with open(self.metadata_file, 'r', encoding='utf-8') as f:
@@ -40,11 +54,33 @@ class MetadataManager:
                 return {}
         return {}
     
-    def _save_metadata(self):
-        """保存元数据"""
-        os.makedirs(self.persist_dir, exist_ok=True)
-        with open(self.metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(self.metadata, f, indent=2, ensure_ascii=False)
+    def _connect(self) -> sqlite3.Connection:
+        """打开元数据库（不存在则创建并导入旧版 JSON）"""
+        created = not os.path.exists(self.db_file)
+        conn = connect_wal(self.db_file, check_same_thread=True)
+        conn.execute("CREATE TABLE IF NOT EXISTS file_metadata (filename TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        if created and os.path.exists(self.metadata_file):
+            try:
+                with open(self.metadata_file, 'r', encoding='utf-8') as f:
+                    legacy = json.load(f)
+                with conn:
+                    conn.executemany("INSERT OR IGNORE INTO file_metadata VALUES (?, ?)",
+                                     [(k, json.dumps(v, ensure_ascii=False)) for k, v in legacy.items()])
+            except (OSError, ValueError):
+                pass
+        return conn
+    
+    def upsert_many(self, records: Dict[str, Dict]):
+        """在一个事务中写入多个文件的元数据"""
+        if not records:
+            return
+        rows = [(name, json.dumps(meta, ensure_ascii=False)) for name, meta in records.items()]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO file_metadata VALUES (?, ?) "
+                "ON CONFLICT(filename) DO UPDATE SET data = excluded.data", rows
+            )
+        self.metadata.update(records)
     
     def _save_stats(self):
         """保存统计数据"""
@@ -54,15 +90,8 @@ class MetadataManager:
     
     @staticmethod
     def compute_file_hash(file_path: str) -> str:
-        """计算文件哈希值"""
-        try:
-            hasher = hashlib.md5()
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(8192), b''):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
-        except:
-            return ""
+        """计算文件哈希值（xxhash 优先，大块读取）"""
+        return hash_file(file_path)
     
     @staticmethod
     def extract_keywords(text: str, top_k: int = 5) -> List[str]:
@@ -115,20 +144,28 @@ class MetadataManager:
         return "其他文档"
     
     def add_file_metadata(self, file_path: str, doc_ids: List[str], text_sample: str = "") -> Dict:
-        """添加文件元数据"""
-        filename = os.path.basename(file_path)
-        
-        # 计算哈希
-        file_hash = self.compute_file_hash(file_path)
-        
+        """添加单个文件元数据（批量构建请用 build_file_metadata + upsert_many）"""
+        metadata = self.build_file_metadata(file_path, doc_ids, text_sample)
+        self.upsert_many({os.path.basename(file_path): metadata})
+        return metadata
+    
+    @classmethod
+    def build_file_metadata(cls, file_path: str, doc_ids: List[str], text_sample: str = "") -> Dict:
+        """计算文件元数据（不写盘，可在工作进程中执行）"""
+        return cls.build_text_metadata(os.path.basename(file_path), cls.compute_file_hash(file_path),
+                                       doc_ids, text_sample)
+    
+    @classmethod
+    def build_text_metadata(cls, filename: str, file_hash: str, doc_ids: List[str], text_sample: str = "") -> Dict:
+        """按名称和内容哈希计算元数据（没有落盘文件的来源，如直接入库的网页）"""
         # 提取关键词
-        keywords = self.extract_keywords(text_sample) if text_sample else []
+        keywords = cls.extract_keywords(text_sample) if text_sample else []
         
         # 检测语言
-        language = self.detect_language(text_sample) if text_sample else "unknown"
+        language = cls.detect_language(text_sample) if text_sample else "unknown"
         
         # 自动分类
-        category = self.auto_categorize(filename, text_sample)
+        category = cls.auto_categorize(filename, text_sample)
         
         # 生成简短摘要（前100字）
         summary = text_sample[:100].strip() if text_sample else ""
@@ -144,9 +181,6 @@ class MetadataManager:
             "updated_at": datetime.now().isoformat(),
         }
         
-        self.metadata[filename] = metadata
-        self._save_metadata()
-        
         return metadata
     
     def find_duplicates(self) -> Dict[str, List[str]]:
@@ -215,6 +249,14 @@ class MetadataManager:
         
         return cold_files
     
+    def remove_files(self, filenames: List[str]) -> int:
+        """删除文件元数据（文件被删除或修改后重新提取），返回删除数量"""
+        removed = [f for f in filenames if self.metadata.pop(f, None) is not None]
+        if removed:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("DELETE FROM file_metadata WHERE filename = ?", [(f,) for f in removed])
+        return len(removed)
+    
     def get_metadata(self, filename: str) -> Optional[Dict]:
         """获取文件元数据"""
         return self.metadata.get(filename)
@@ -224,7 +266,7 @@ class MetadataManager:
         if filename in self.metadata:
             self.metadata[filename].update(updates)
             self.metadata[filename]["updated_at"] = datetime.now().isoformat()
-            self._save_metadata()
+            self.upsert_many({filename: self.metadata[filename]})
     
     def get_all_categories(self) -> Dict[str, int]:
         """获取所有分类统计"""
@@ -4,6 +4,7 @@
 
 import streamlit as st
 import psutil
+from src.utils.metrics_sampler import get_metrics_sampler
 import time
 
 
@@ -35,7 +36,7 @@ class SystemMonitorUI:
     def render_system_stats(self):
         """渲染系统统计信息"""
         # CPU 监控
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        cpu_percent = get_metrics_sampler().cpu_percent()
         col1, col2 = st.columns([4, 1])
         with col1:
             st.metric("CPU 使用率", f"{cpu_percent:.1f}%")
@@ -131,7 +132,7 @@ class SystemMonitorUI:
             }
         
         # 获取当前数据
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        cpu_percent = get_metrics_sampler().cpu_percent()
         mem_percent = psutil.virtual_memory().percent
         current_time = time.time()
         
@@ -164,7 +165,7 @@ class SystemMonitorUI:
         st.markdown("##### 🚨 系统告警")
         
         # 检查告警条件
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        cpu_percent = get_metrics_sampler().cpu_percent()
         mem_percent = psutil.virtual_memory().percent
         
         alerts = []
@@ -209,7 +210,7 @@ class SystemMonitorUI:
         
         # CPU使用率
         try:
-            cpu_percent = current_proc.cpu_percent(interval=0.1)
+            cpu_percent = get_metrics_sampler().latest().process_cpu_percent
             st.metric("进程CPU", f"{cpu_percent:.1f}%")
         except:
             st.metric("进程CPU", "N/A")
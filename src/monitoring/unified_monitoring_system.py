@@ -6,6 +6,7 @@
 
 import streamlit as st
 import psutil
+from src.utils.metrics_sampler import get_metrics_sampler
 import time
 import json
 from typing import Dict, Any, List, Optional
@@ -50,7 +51,7 @@ class UnifiedMonitoringSystem:
     def _render_realtime_metrics(self):
         """渲染实时指标"""
         # 获取系统指标
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        cpu_percent = get_metrics_sampler().cpu_percent()
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
         
@@ -223,7 +224,7 @@ class UnifiedMonitoringSystem:
             st.write("**📊 系统状态**")
             
             # 简化的系统指标
-            cpu = psutil.cpu_percent(interval=0.1)
+            cpu = get_metrics_sampler().cpu_percent()
             memory = psutil.virtual_memory()
             
             # 使用进度条显示
@@ -11,34 +11,73 @@ import time
 import hashlib
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
-from typing import List, Dict, Set, Optional, Callable
+from typing import List, Dict, Set, Optional, Callable, Tuple, Union
 import urllib.robotparser
 from pathlib import Path
 import logging
 
 # 🔥 新增：导入智能优化器
 from .crawl_optimizer import CrawlOptimizer
+from .crawl_frontier import CrawlFrontier, FrontierItem
+from .crawl_state import CrawlStateStore, DEFAULT_STATE_PATH
 from src.utils.file_system_utils import set_where_from_metadata
+from src.utils.near_duplicate import NearDuplicateIndex
+from src.utils.http_fetch_cache import (FetchRecord, HTTPFetchCache, RecrawlStats, body_digest,
+                                       get_http_fetch_cache, pending_record)
+
+# 近似重复指纹的条目上限（每条约数百字节），长期增量爬取时内存和持久化文件不再无限增长
+NEAR_DUP_MAX_ENTRIES = 200_000
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
 
 class AsyncWebCrawler:
-    def __init__(self, max_concurrent=10, delay_range=(0.5, 2.0), ignore_robots=False):
+    def __init__(self, max_concurrent=10, delay_range=(0.5, 2.0), ignore_robots=False,
+                 dedup_path: Optional[str] = None, incremental: bool = False,
+                 fetch_cache: Optional[HTTPFetchCache] = None,
+                 state_path: str = DEFAULT_STATE_PATH, use_bloom: bool = True,
+                 near_duplicates: Optional[NearDuplicateIndex] = None):
         self.max_concurrent = max_concurrent
         self.delay_range = delay_range
         self.ignore_robots = ignore_robots  # 是否忽略robots.txt
         self.session = None
         self.visited_urls: Set[str] = set()
         self.failed_urls: Set[str] = set()
-        self.content_hashes: Set[str] = set()  # 内容去重
+        self.content_hashes: Set[str] = set()  # 内容去重（完全相同）
+        # 近似重复去重（SimHash），指定 dedup_path 时跨会话持久化；条目数有上限，超出时淘汰最早登记的
+        # 传入 near_duplicates（如知识库的 NearDuplicateIndex.for_kb）时与质量分析、索引构建共用同一索引
+        if near_duplicates is None:
+            near_duplicates = NearDuplicateIndex(dedup_path, max_entries=NEAR_DUP_MAX_ENTRIES)
+        self.near_duplicates = near_duplicates
         self.robots_cache: Dict[str, bool] = {}
         
+        # 增量爬取：条件请求（ETag/Last-Modified），未变化的页面不重新解析和保存
+        self.incremental = incremental
+        self.fetch_cache = fetch_cache or (get_http_fetch_cache() if incremental else None)
+        self.recrawl_stats = RecrawlStats()
+        
         # 🔥 新增：智能优化器
         self.optimizer = CrawlOptimizer()
         
-        # 状态持久化 - 使用唯一文件名避免冲突
-        import time
-        import os
-        self.state_file = os.path.join("temp_uploads", f"crawler_state_{int(time.time())}.json")
+        # 状态持久化 - SQLite 按站点键增量写入，可断点续爬
+        self.state_path = state_path
+        self.use_bloom = use_bloom
+        self.state: Optional[CrawlStateStore] = None
         self.semaphore = None
+        self.frontier: Optional[CrawlFrontier] = None
         
     async def __aenter__(self):
         """异步上下文管理器"""
@@ -66,33 +105,45 @@ class AsyncWebCrawler:
         """清理资源"""
         if self.session:
             await self.session.close()
+        if self.state:
+            await self.save_state()
+            self.state.close()
+            self.state = None
     
     async def save_state(self):
-        """保存爬取状态"""
-        state = {
-            'visited_urls': list(self.visited_urls),
-            'failed_urls': list(self.failed_urls),
-            'content_hashes': list(self.content_hashes),
-            'timestamp': time.time()
-        }
-        
-        async with aiofiles.open(self.state_file, 'w') as f:
-            await f.write(json.dumps(state, indent=2))
+        """保存爬取状态（只追加写入新增记录）"""
+        if self.state:
+            if self.frontier:
+                self.state.set_meta('admitted_per_depth', self.frontier.admitted_per_depth)
+            self.state.flush()
+        self.near_duplicates.save()
     
-    async def load_state(self):
-        """加载爬取状态"""
-        try:
-            async with aiofiles.open(self.state_file, 'r') as f:
-                content = await f.read()
-                state = json.loads(content)
-                
-            self.visited_urls = set(state.get('visited_urls', []))
-            self.failed_urls = set(state.get('failed_urls', []))
-            self.content_hashes = set(state.get('content_hashes', []))
-            
-            return True
-        except FileNotFoundError:
-            return False
+    async def load_state(self, site_key: str = "default", resume: bool = False) -> bool:
+        """
+        打开站点的爬取状态
+        
+        Args:
+            site_key: 站点键
+            resume: 续爬上次未完成的爬取；为 False 时清空该站点的旧状态
+        
+        Returns:
+            是否找回了上次的状态
+        """
+        if self.state:
+            self.state.close()
+        self.state = CrawlStateStore(self.state_path, site_key, use_bloom=self.use_bloom)
+        if not resume:
+            self.state.reset()
+        
+        self.visited_urls = self.state.visited
+        self.failed_urls = self.state.failed
+        self.content_hashes = self.state.content_hashes
+        return len(self.visited_urls) > 0 or bool(self.state.pending_items())
+    
+    @staticmethod
+    def site_key_for(start_urls: List[str]) -> str:
+        """默认站点键：起始 URL 的主机名"""
+        return ",".join(sorted({urlparse(url).netloc for url in start_urls}))
     
     async def check_robots_txt(self, url: str) -> bool:
         """检查robots.txt合规性 - 宽松模式"""
@@ -127,16 +178,25 @@ class AsyncWebCrawler:
         cleaned = ''.join(text.split()).lower()
         return hashlib.md5(cleaned.encode()).hexdigest()
     
-    def is_duplicate_content(self, text: str) -> bool:
-        """检查内容是否重复"""
+    def is_duplicate_content(self, text: str, key: Optional[str] = None) -> bool:
+        """检查内容是否重复（完全相同或近似重复）"""
         fingerprint = self.content_fingerprint(text)
         if fingerprint in self.content_hashes:
             return True
+        # 同一 URL 的新版本（索引跨会话持久化时）不与自身比较，只更新指纹
+        if self.near_duplicates.check_and_add(key or fingerprint, text) is not None:
+            return True
         self.content_hashes.add(fingerprint)
         return False
     
     async def fetch_with_retry(self, url: str, max_retries=3) -> Optional[str]:
         """带重试的异步请求"""
+        _, content, _ = await self._fetch_with_retry(url, max_retries)
+        return content
+    
+    async def _fetch_with_retry(self, url: str, max_retries=3,
+                                headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[int], Optional[str], Dict]:
+        """带重试的异步请求，返回 (状态码, 页面内容, 响应头)"""
         async with self.semaphore:  # 限制并发数
             for attempt in range(max_retries):
                 try:
@@ -149,15 +209,15 @@ class AsyncWebCrawler:
                             __import__('random').uniform(*self.delay_range)
                         )
                     
-                    async with self.session.get(url) as response:
+                    async with self.session.get(url, headers=headers) as response:
                         if response.status == 200:
                             content = await response.text()
-                            return content
+                            return 200, content, response.headers
                         elif response.status == 429:  # 限流
                             await asyncio.sleep(5)
                             continue
                         else:
-                            break
+                            return response.status, None, response.headers
                             
                 except asyncio.TimeoutError:
                     continue
@@ -166,7 +226,22 @@ class AsyncWebCrawler:
                         self.failed_urls.add(url)
                     continue
             
-            return None
+            return None, None, {}
+    
+    async def fetch_once(self, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[int], Optional[str], Dict]:
+        """
+        单次请求（不重试、不额外等待，限速由调度器负责）
+        
+        Returns:
+            (状态码, 页面内容, 响应头)；超时或连接错误时状态码为 None
+        """
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 200:
+                    return 200, await response.text(), response.headers
+                return response.status, None, response.headers
+        except Exception:
+            return None, None, {}
     
     def extract_links(self, html_content: str, base_url: str, max_links: int = 8) -> List[str]:
         """提取链接"""
@@ -218,35 +293,53 @@ class AsyncWebCrawler:
         except:
             return ""
     
-    async def crawl_url(self, url: str, status_callback: Optional[Callable] = None, ignore_robots: bool = False) -> Optional[Dict]:
-        """爬取单个URL"""
-        if status_callback:
-            status_callback(f"🔍 开始处理URL: {url}")
-            
+    async def _should_crawl(self, url: str, status_callback: Optional[Callable] = None,
+                            ignore_robots: bool = False) -> bool:
+        """已访问、之前失败或 robots.txt 禁止的 URL 不再请求"""
         if url in self.visited_urls:
             if status_callback:
                 status_callback(f"⏭️ URL已访问，跳过: {url}")
-            return None
+            return False
             
         if url in self.failed_urls:
             if status_callback:
                 status_callback(f"⏭️ URL之前失败，跳过: {url}")
-            return None
+            return False
         
         # 检查robots.txt（可选）
         if not ignore_robots and not await self.check_robots_txt(url):
             if status_callback:
                 status_callback(f"🚫 robots.txt禁止访问: {url}")
-            return None
-        
+            return False
+        return True
+    
+    def _extract_title(self, html_content: str) -> str:
+        try:
+            soup = BeautifulSoup(html_content, 'html.parser')
+            title = soup.title.string if soup.title else "No Title"
+            return title.strip()
+        except:
+            return "No Title"
+    
+    def _unchanged_result(self, url: str, record: FetchRecord, headers, status: Optional[int],
+                          status_callback: Optional[Callable] = None) -> Dict:
+        """页面未变化：不解析、不保存，带上缓存的链接供递归使用"""
+        if status == 304:
+            self.recrawl_stats.not_modified += 1
+        else:
+            self.recrawl_stats.unchanged += 1
+        self.fetch_cache.touch(url, headers)
+        self.visited_urls.add(url)
         if status_callback:
-            status_callback(f"🔄 异步爬取: {url}")
-        
-        html_content = await self.fetch_with_retry(url)
-        if not html_content:
-            if status_callback:
-                status_callback(f"❌ 获取HTML失败: {url}")
-            return None
+            status_callback(f"⏭️ 页面未变化: {record.title or url}")
+        return {'url': url, 'title': record.title, 'unchanged': True, 'links': record.links}
+    
+    def _process_html(self, url: str, html_content: str, status_callback: Optional[Callable] = None,
+                      record: Optional[FetchRecord] = None, headers=None) -> Optional[Dict]:
+        """从页面 HTML 提取正文和标题，过短或重复的内容返回 None"""
+        body_hash = body_digest(html_content) if self.fetch_cache else None
+        if record and body_hash == record.body_hash:
+            return self._unchanged_result(url, record, headers, 200, status_callback)
         
         # 提取内容
         content = self.extract_content(html_content)
@@ -255,6 +348,22 @@ class AsyncWebCrawler:
         if status_callback:
             status_callback(f"📊 HTML长度: {len(html_content)}, 提取内容长度: {len(content)}")
         
+        links, title, fetch_record = None, None, None
+        if self.fetch_cache:
+            content_hash = body_digest(content)
+            links = self.extract_links(html_content, url)
+            title = self._extract_title(html_content)
+            changed = record is None or content_hash != record.content_hash
+            fetch_record = pending_record(url, headers, body_hash, content_hash, title, links, changed)
+            if not changed:
+                # 响应体变了（时间戳、随机数等）但正文相同，旧正文已经入库
+                self.fetch_cache.put(**fetch_record)
+                return self._unchanged_result(url, record, None, 200, status_callback)
+            if record is None:
+                self.recrawl_stats.new += 1
+            else:
+                self.recrawl_stats.changed += 1
+        
         # 检查内容是否为空或太短
         if len(content.strip()) < 100:
             if status_callback:
@@ -262,31 +371,94 @@ class AsyncWebCrawler:
             return None
         
         # 内容去重检查
-        if self.is_duplicate_content(content):
+        if self.is_duplicate_content(content, key=url):
             if status_callback:
                 status_callback(f"🔄 跳过重复内容: {url}")
             return None
         
         # 提取标题
-        try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            title = soup.title.string if soup.title else "No Title"
-            title = title.strip()
-        except:
-            title = "No Title"
+        title = title or self._extract_title(html_content)
         
         self.visited_urls.add(url)
         
         if status_callback:
             status_callback(f"✅ 已爬取: {title} ({len(content)} 字符)")
         
-        return {
+        result = {
             'url': url,
             'title': title,
             'content': content,
             'html': html_content,
             'timestamp': time.time()
         }
+        if links is not None:
+            result['links'] = links
+        if fetch_record is not None:
+            # 保存或入库后才写入缓存（HTTPFetchCache.commit），失败的页面下次重新处理
+            result['fetch_record'] = fetch_record
+        return result
+    
+    def _cached_record(self, url: str) -> Optional[FetchRecord]:
+        return self.fetch_cache.get(url) if self.incremental and self.fetch_cache else None
+    
+    async def crawl_url(self, url: str, status_callback: Optional[Callable] = None, ignore_robots: bool = False) -> Optional[Dict]:
+        """
+        爬取单个URL
+        
+        增量模式下未变化的页面返回 {'url', 'title', 'unchanged': True, 'links'}，不含正文；
+        新页面带 'fetch_record'，处理完成后由调用方 fetch_cache.commit(result) 写入。
+        """
+        if status_callback:
+            status_callback(f"🔍 开始处理URL: {url}")
+            
+        if not await self._should_crawl(url, status_callback, ignore_robots):
+            return None
+        
+        if status_callback:
+            status_callback(f"🔄 异步爬取: {url}")
+        
+        record = self._cached_record(url)
+        status, html_content, headers = await self._fetch_with_retry(
+            url, headers=record.conditional_headers() if record else None)
+        if record and status == 304:
+            return self._unchanged_result(url, record, headers, status, status_callback)
+        if not html_content:
+            if status_callback:
+                status_callback(f"❌ 获取HTML失败: {url}")
+            return None
+        
+        return self._process_html(url, html_content, status_callback, record, headers)
+    
+    async def _crawl_frontier_item(self, item: FrontierItem, status_callback: Optional[Callable] = None) -> Optional[Dict]:
+        """爬取调度器派发的 URL，并把状态码和延迟反馈给调度器"""
+        if not await self._should_crawl(item.url, status_callback, self.ignore_robots):
+            self.frontier.cancel(item)
+            return None
+        
+        if status_callback:
+            status_callback(f"🔄 异步爬取: {item.url}")
+        
+        record = self._cached_record(item.url)
+        start = time.monotonic()
+        status, html_content, headers = await self.fetch_once(
+            item.url, headers=record.conditional_headers() if record else None)
+        retry_after = _parse_retry_after(headers.get('Retry-After'))
+        if self.frontier.complete(item, status, time.monotonic() - start, retry_after):
+            if status_callback:
+                status_callback(f"⏳ {status or '超时'}，稍后重试: {item.url} (第{item.attempt}次)")
+            return None
+        
+        if record and status == 304:
+            return self._unchanged_result(item.url, record, headers, status, status_callback)
+        
+        if not html_content:
+            if status is None or status in CrawlFrontier.RETRY_STATUSES:
+                self.failed_urls.add(item.url)
+            if status_callback:
+                status_callback(f"❌ 获取HTML失败: {item.url} ({status or '超时'})")
+            return None
+        
+        return self._process_html(item.url, html_content, status_callback, record, headers)
     
     def get_smart_recommendations(self, url: str) -> Dict:
         """🔥 新增：获取智能爬取推荐参数"""
@@ -337,112 +509,170 @@ class AsyncWebCrawler:
             status_callback=status_callback
         )
     
+    async def _save_result(self, result: Dict, output_path: Path, index: int) -> str:
+        """把爬取结果写成文本文件，返回文件路径"""
+        title = result.get('title', '').strip()
+        if title:
+            # 清理标题，移除不合法的文件名字符
+            safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).strip()
+            safe_title = safe_title.replace(' ', '_')[:50]  # 限制长度
+            filename = f"{safe_title}_{index:03d}.txt"
+        else:
+            filename = f"page_{index}_{int(time.time())}.txt"
+        
+        filepath = output_path / filename
+        
+        async with aiofiles.open(filepath, 'w', encoding='utf-8') as f:
+            await f.write(f"URL: {result['url']}\n")
+            await f.write(f"Title: {result['title']}\n")
+            await f.write(f"Timestamp: {result['timestamp']}\n")
+            await f.write(f"Content Length: {len(result['content'])}\n")
+            await f.write(f"\n{result['content']}")
+        
+        # 为文件设置 macOS 下载来源元数据
+        set_where_from_metadata(str(filepath), result['url'])
+        return str(filepath)
+    
     async def crawl_recursive(
         self, 
-        start_url: str, 
+        start_url: Union[str, List[str]], 
         max_depth: int = 3, 
         max_pages_per_level: int = 8,
         output_dir: str = "crawled_data",
-        status_callback: Optional[Callable] = None
+        status_callback: Optional[Callable] = None,
+        resume: bool = False,
+        site_key: Optional[str] = None,
+        page_callback: Optional[Callable[[Dict], None]] = None,
+        save_files: bool = True
     ) -> List[str]:
-        """异步递归爬取 - 修复递归逻辑"""
+        """
+        异步递归爬取 - 按主机礼貌限速的连续调度
+        
+        不再逐层 gather：页面一返回就提取链接入队，任一主机有空闲额度就立即派发下一个请求，
+        慢页面和慢主机不会拖住整层。每层最多 max_pages_per_level ** depth 个 URL（与原逻辑一致）。
+        
+        Args:
+            start_url: 起始 URL，或多个站点的起始 URL 列表
+            resume: 从上次中断处继续（已访问的 URL 跳过，恢复未完成的待爬队列）
+            site_key: 状态的站点键，默认取起始 URL 的主机名
+            page_callback: 每爬到一个新页面调用一次，参数为 crawl_url 返回的结果字典（边爬边入库），
+                           入库成功后由调用方 fetch_cache.commit(result) 写入抓取记录
+            save_files: 是否把页面写成 .txt 文件
+        """
+        start_urls = [start_url] if isinstance(start_url, str) else list(start_url)
         
         # 加载之前的状态
-        await self.load_state()
+        resumed = await self.load_state(site_key or self.site_key_for(start_urls), resume)
         
         # 创建输出目录
         output_path = Path(output_dir)
-        output_path.mkdir(exist_ok=True)
+        if save_files:
+            output_path.mkdir(exist_ok=True)
+        
+        self.frontier = frontier = CrawlFrontier(
+            max_depth=max_depth,
+            max_pages_per_level=max_pages_per_level,
+            min_delay=self.delay_range[0],
+            max_host_concurrency=max(2, self.max_concurrent // 2),
+            seen=self.state.queued
+        )
+        pending = self.state.pending_items() if resumed else []
+        if resumed:
+            frontier.admitted_per_depth = {int(d): n for d, n in self.state.get_meta('admitted_per_depth', {}).items()}
+            for url, depth in pending:
+                frontier.restore(url, depth)
+            if status_callback:
+                status_callback(f"♻️ 续爬: 已访问 {len(self.visited_urls)} 个URL，恢复待爬 {len(pending)} 个")
+        if not pending:
+            for url in start_urls:
+                if frontier.add(url, 1):
+                    self.state.add_pending(url, 1)
         
-        current_level = [start_url]
         saved_files = []
+        self.recrawl_stats = RecrawlStats()
+        level_success: Dict[int, int] = {}
+        in_flight: Dict[asyncio.Task, Tuple[FrontierItem, int]] = {}
+        started = time.time()
+        processed = 0
         
         if status_callback:
-            status_callback(f"🚀 开始异步递归爬取: {start_url}")
+            status_callback(f"🚀 开始异步递归爬取: {', '.join(start_urls)}")
             status_callback(f"📊 递归参数: 最大深度={max_depth}, 基础页数={max_pages_per_level}, 并发={self.max_concurrent}")
             for d in range(1, max_depth + 1):
                 expected_pages = max_pages_per_level ** d
                 status_callback(f"   第{d}层预计: {expected_pages} 页")
         
-        for depth in range(1, max_depth + 1):
-            if not current_level:
-                break
-            
-            # 🔥 关键修复：每层的页面数量应该是 max_pages_per_level^depth
-            current_layer_limit = max_pages_per_level ** depth
-            
-            # 限制当前层处理的URL数量
-            current_level = current_level[:current_layer_limit]
-            
-            if status_callback:
-                status_callback(f"📂 第{depth}层: 并发处理 {len(current_level)} 个URL (限制: {current_layer_limit})")
-            
-            # 并发爬取当前层级的所有URL
-            tasks = [self.crawl_url(url, status_callback, ignore_robots=self.ignore_robots) for url in current_level]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        while frontier.pending or in_flight:
+            # 派发所有现在就能请求的 URL
+            while len(in_flight) < self.max_concurrent:
+                item = frontier.pop_ready()
+                if item is None:
+                    break
+                task = asyncio.ensure_future(self._crawl_frontier_item(item, status_callback))
+                in_flight[task] = (item, item.attempt)
             
-            next_level = []
-            level_success = 0
+            wait_for = frontier.next_ready_in() if len(in_flight) < self.max_concurrent else None
+            if not in_flight:
+                if wait_for is None:
+                    break
+                await asyncio.sleep(wait_for)
+                continue
             
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
+            done, _ = await asyncio.wait(in_flight, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item, attempt = in_flight.pop(task)
+                if item.attempt == attempt:
+                    # 未被重新入队（重试的 URL 仍留在待爬队列中）
+                    self.state.done_pending(item.url)
+                try:
+                    result = task.result()
+                except Exception as e:
                     if status_callback:
-                        status_callback(f"❌ 爬取失败: {current_level[i]} - {result}")
+                        status_callback(f"❌ 爬取失败: {item.url} - {e}")
                     continue
-                
                 if result is None:
-                    if status_callback:
-                        status_callback(f"⚠️ 爬取返回None: {current_level[i]}")
                     continue
+                processed += 1
                 
-                level_success += 1
-                
-                # 保存文件
-                title = result.get('title', '').strip()
-                if title:
-                    # 清理标题，移除不合法的文件名字符
-                    safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).strip()
-                    safe_title = safe_title.replace(' ', '_')[:50]  # 限制长度
-                    filename = f"{safe_title}_{len(saved_files)+1:03d}.txt"
-                else:
-                    filename = f"page_{len(saved_files)+1}_{int(time.time())}.txt"
-                
-                filepath = output_path / filename
-                
-                async with aiofiles.open(filepath, 'w', encoding='utf-8') as f:
-                    await f.write(f"URL: {result['url']}\n")
-                    await f.write(f"Title: {result['title']}\n")
-                    await f.write(f"Timestamp: {result['timestamp']}\n")
-                    await f.write(f"Content Length: {len(result['content'])}\n")
-                    await f.write(f"\n{result['content']}")
-                
-                # 为文件设置 macOS 下载来源元数据
-                set_where_from_metadata(str(filepath), result['url'])
+                if not result.get('unchanged'):
+                    level_success[item.depth] = level_success.get(item.depth, 0) + 1
+                    if save_files:
+                        result['file_path'] = await self._save_result(result, output_path, len(saved_files) + 1)
+                        saved_files.append(result['file_path'])
+                    if page_callback:
+                        page_callback(result)
+                    elif save_files and self.fetch_cache:
+                        self.fetch_cache.commit(result)
                 
-                saved_files.append(str(filepath))
+                # 如果还没到最大深度，提取下一级链接直接入队（未变化的页面使用缓存的链接）
+                if item.depth < max_depth:
+                    links = result.get('links')
+                    if links is None:
+                        links = self.extract_links(result['html'], result['url'])
+                    for link in links:
+                        if link not in self.visited_urls and frontier.add(link, item.depth + 1):
+                            self.state.add_pending(link, item.depth + 1)
                 
-                # 如果还没到最大深度，提取下一级链接
-                # 🔥 关键修复：提取所有有效链接，不限制数量
-                if depth < max_depth:
-                    links = self.extract_links(result['html'], result['url'])  # 移除max_pages_per_level参数
-                    next_level.extend(links)
-            
-            # 去重并准备下一层
-            current_level = list(set(next_level))
-            
-            if status_callback:
-                status_callback(f"🎯 第{depth}层完成: 成功 {level_success} 页，发现 {len(current_level)} 个下级链接")
-                if depth < max_depth and current_level:
-                    next_layer_limit = max_pages_per_level ** (depth + 1)
-                    actual_next = min(len(current_level), next_layer_limit)
-                    status_callback(f"📊 递归统计: 第{depth+1}层将处理前 {actual_next} 个链接")
-            
-            # 定期保存状态
-            await self.save_state()
+                # 定期保存状态
+                if processed % 20 == 0:
+                    await self.save_state()
+                    if status_callback:
+                        rate = processed / max(time.time() - started, 1e-6)
+                        status_callback(f"📊 已处理 {processed} 页 ({rate:.1f} 页/秒)，待爬 {frontier.pending}，进行中 {len(in_flight)}")
+        
+        await self.save_state()
         
         if status_callback:
-            status_callback(f"🎉 异步爬取完成！获取 {len(saved_files)} 个页面")
+            elapsed = time.time() - started
+            for d in sorted(level_success):
+                status_callback(f"🎯 第{d}层: 成功 {level_success[d]} 页 (接纳 {frontier.admitted_per_depth.get(d, 0)} 个URL)")
+            crawled = sum(level_success.values())
+            status_callback(f"🎉 异步爬取完成！获取 {crawled} 个页面，用时 {elapsed:.1f} 秒 ({crawled / max(elapsed, 1e-6):.1f} 页/秒)")
             status_callback(f"📈 统计: 访问 {len(self.visited_urls)} 个URL，失败 {len(self.failed_urls)} 个")
+            if self.incremental:
+                status_callback(self.recrawl_stats.summary())
+            for host, stats in frontier.get_stats().items():
+                status_callback(f"🌐 {host}: 请求 {stats['requests']}，限流 {stats['throttled']}，并发 {stats['concurrency']}，间隔 {stats['delay']}s")
         
         return saved_files
 
@@ -5,16 +5,24 @@
 
 import re
 import hashlib
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Optional, Set, Tuple
 from collections import Counter
 import jieba
 from difflib import SequenceMatcher
 
+from src.utils.near_duplicate import NearDuplicateIndex
+
 class ContentQualityAnalyzer:
     """内容质量分析器"""
     
-    def __init__(self):
+    def __init__(self, near_duplicates: Optional[NearDuplicateIndex] = None):
+        """
+        Args:
+            near_duplicates: 与爬虫、索引构建共用的近似去重索引（如 NearDuplicateIndex.for_kb），
+                为空时每次去重使用新的内存索引
+        """
         self.content_hashes = set()  # 用于去重
+        self.near_duplicates = near_duplicates
         self.stop_words = self._load_stop_words()
         
     def _load_stop_words(self) -> Set[str]:
@@ -206,12 +214,22 @@ class ContentQualityAnalyzer:
         relevance_score = matches / total_weight
         return min(relevance_score, 1.0)
     
-    def deduplicate_content(self, contents: List[Dict], similarity_threshold: float = 0.8) -> List[Dict]:
-        """内容去重"""
+    def deduplicate_content(self, contents: List[Dict], similarity_threshold: float = 0.8,
+                            index: Optional[NearDuplicateIndex] = None) -> List[Dict]:
+        """
+        内容去重
+        
+        完全相同的内容按哈希去重；近似重复用 SimHash 索引查找（只比较同桶候选，近似线性），
+        similarity_threshold 换算为汉明距离上限。传入持久化的 index 时可跨会话去重。
+        """
         if not contents:
             return []
         
-        unique_contents = []
+        if index is None:
+            max_distance = max(0, min(15, round((1 - similarity_threshold) * 16)))
+            index = NearDuplicateIndex(max_distance=max_distance)
+        
+        unique_contents: Dict[str, Dict] = {}  # 键 -> 内容（保持插入顺序）
         seen_hashes = set()
         
         for content_item in contents:
@@ -225,31 +243,40 @@ class ContentQualityAnalyzer:
             # 检查是否已存在相同内容
             if content_hash in seen_hashes:
                 continue
+            seen_hashes.add(content_hash)
             
-            # 检查与已有内容的相似度
-            is_duplicate = False
-            for existing_item in unique_contents:
-                existing_content = existing_item.get('content', '')
-                similarity = self._calculate_similarity(content, existing_content)
-                
-                if similarity >= similarity_threshold:
-                    is_duplicate = True
-                    # 保留质量更高的内容
-                    existing_score = existing_item.get('quality_score', {}).get('total_score', 0)
-                    current_score = content_item.get('quality_score', {}).get('total_score', 0)
-                    
-                    if current_score > existing_score:
-                        # 替换为质量更高的内容
-                        unique_contents.remove(existing_item)
-                        unique_contents.append(content_item)
-                        seen_hashes.add(content_hash)
-                    break
+            # 检查是否与已保留内容近似重复（网页以 URL 为键，与爬虫、索引构建登记的条目一致）
+            key = content_item.get('url') or content_hash
+            fingerprint = index.fingerprint(content)
+            existing_key = index.find(fingerprint=fingerprint, exclude=key)
+            if existing_key is None:
+                index.add(key, fingerprint=fingerprint)
+                unique_contents[key] = content_item
+                continue
             
-            if not is_duplicate:
-                unique_contents.append(content_item)
-                seen_hashes.add(content_hash)
-        
-        return unique_contents
+            existing_item = unique_contents.get(existing_key)
+            if existing_item is None:
+                # 与之前会话的内容重复
+                continue
+            
+            # 保留质量更高的内容
+            existing_score = existing_item.get('quality_score', {}).get('total_score', 0)
+            current_score = content_item.get('quality_score', {}).get('total_score', 0)
+            if current_score > existing_score:
+                del unique_contents[existing_key]
+                index.remove(existing_key)
+                index.add(key, fingerprint=fingerprint)
+                unique_contents[key] = content_item
+        
+        return list(unique_contents.values())
+    
+    def is_near_duplicate(self, content_item: Dict) -> Optional[str]:
+        """逐条去重（边爬边入库时使用）：与共用索引中已有内容近似重复时返回其键，否则登记并返回 None"""
+        content = content_item.get('content', '')
+        if self.near_duplicates is None or not content.strip():
+            return None
+        key = content_item.get('url') or self._calculate_content_hash(content)
+        return self.near_duplicates.check_and_add(key, content)
     
     def analyze_and_filter_contents(self, contents: List[Dict], 
                                   search_keywords: List[str] = None,
@@ -294,7 +321,7 @@ class ContentQualityAnalyzer:
         ]
         
         # 3. 去重
-        unique_contents = self.deduplicate_content(filtered_contents)
+        unique_contents = self.deduplicate_content(filtered_contents, index=self.near_duplicates)
         
         # 4. 按综合评分排序
         sorted_contents = sorted(
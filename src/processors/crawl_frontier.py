@@ -0,0 +1,245 @@
+"""
+爬取边界（Frontier）调度器 - 按主机礼貌限速的连续调度
+  - 优先队列：深度越浅越先爬，同深度按发现顺序
+  - 每个主机一个令牌桶（速率 = 1 / 爬取间隔）和独立并发上限
+  - 自适应：请求成功且延迟稳定时逐步放宽并发和间隔；
+    429/5xx/超时时并发减半、间隔加倍（遵守 Retry-After），即 AIMD
+  - 没有按层的屏障：任何主机有空闲额度就立即派发，慢主机不会拖住快主机
+"""
+
+import time
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+
+@dataclass(order=True)
+class FrontierItem:
+    """待爬取的 URL"""
+    priority: int
+    seq: int
+    url: str = field(compare=False)
+    depth: int = field(compare=False)
+    attempt: int = field(default=0, compare=False)
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.url).netloc
+
+
+class HostState:
+    """单个主机的限速与并发状态"""
+
+    def __init__(self, min_delay: float, max_delay: float, initial_concurrency: int, max_concurrency: int):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = min_delay
+        self.concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.queue: List[FrontierItem] = []
+
+        # 令牌桶：容量等于当前并发上限，按 1/delay 的速率补充
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0  # Retry-After / 退避期间不派发
+
+        self.latency_ewma: Optional[float] = None
+        self.latency_floor: Optional[float] = None
+        self.successes_since_change = 0
+        self.requests = 0
+        self.throttled = 0
+
+    def refill(self, now: float):
+        if self.delay <= 0:
+            self.tokens = float(self.concurrency)
+        elif now > self.last_refill:
+            self.tokens = min(float(self.concurrency), self.tokens + (now - self.last_refill) / self.delay)
+        self.last_refill = max(self.last_refill, now)
+
+    def ready_in(self, now: float) -> float:
+        """距离可以派发下一个请求的秒数（并发已满时为 inf）"""
+        if not self.queue or self.active >= self.concurrency:
+            return float("inf")
+        self.refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1.0:
+            wait = max(wait, (1.0 - self.tokens) * self.delay)
+        return wait
+
+    def on_success(self, latency: float):
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        self.latency_floor = latency if self.latency_floor is None else min(self.latency_floor, latency)
+        self.successes_since_change += 1
+
+        if self.latency_ewma > 2 * self.latency_floor + 0.5 and self.concurrency > 1:
+            # 延迟明显上升，说明主机开始吃力：减少一个并发
+            self.concurrency -= 1
+            self.successes_since_change = 0
+        elif self.successes_since_change >= self.concurrency:
+            # 一整轮请求都顺利：加性增加并发，间隔逐步回落
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.delay = max(self.min_delay, self.delay * 0.9)
+            self.successes_since_change = 0
+
+    def on_throttle(self, now: float, retry_after: Optional[float]):
+        """被限流或服务端出错：乘性减少"""
+        self.throttled += 1
+        self.concurrency = max(1, self.concurrency // 2)
+        self.delay = min(self.max_delay, max(self.delay * 2, self.min_delay or 0.5))
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + (retry_after if retry_after is not None else self.delay))
+        self.successes_since_change = 0
+
+
+class CrawlFrontier:
+    """按主机礼貌限速的 URL 调度器"""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, max_depth: int, max_pages_per_level: int,
+                 min_delay: float = 0.5, max_delay: float = 30.0,
+                 initial_host_concurrency: int = 2, max_host_concurrency: int = 8,
+                 max_retries: int = 3, seen=None):
+        """
+        Args:
+            max_depth: 最大深度（起始 URL 为第1层）
+            max_pages_per_level: 第 d 层最多接纳 max_pages_per_level ** d 个 URL
+            min_delay / max_delay: 同一主机两次请求的最小/最大间隔（秒）
+            initial_host_concurrency / max_host_concurrency: 单主机初始/最大并发
+            max_retries: 429/5xx/超时后的最多重试次数
+            seen: 已接纳 URL 的集合（支持 in / add），默认内存集合；
+                  大规模爬取传入 CrawlStateStore.queued，内存只占布隆过滤器
+        """
+        self.max_depth = max_depth
+        self.max_pages_per_level = max_pages_per_level
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_host_concurrency = initial_host_concurrency
+        self.max_host_concurrency = max(initial_host_concurrency, max_host_concurrency)
+        self.max_retries = max_retries
+
+        self.hosts: Dict[str, HostState] = {}
+        self.seen = seen if seen is not None else set()
+        self.admitted_per_depth: Dict[int, int] = {}
+        self._seq = itertools.count()
+        self._pending = 0
+
+    # ---------- 入队 ----------
+
+    def _host(self, host: str) -> HostState:
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(self.min_delay, self.max_delay,
+                                                 self.initial_host_concurrency, self.max_host_concurrency)
+        return state
+
+    def depth_limit(self, depth: int) -> int:
+        return self.max_pages_per_level ** depth
+
+    def add(self, url: str, depth: int) -> bool:
+        """接纳新 URL（已见过、超过深度或该层已满时返回 False）"""
+        if depth > self.max_depth or url in self.seen:
+            return False
+        if self.admitted_per_depth.get(depth, 0) >= self.depth_limit(depth):
+            return False
+        self.seen.add(url)
+        self.admitted_per_depth[depth] = self.admitted_per_depth.get(depth, 0) + 1
+        item = FrontierItem(priority=depth, seq=next(self._seq), url=url, depth=depth)
+        heapq.heappush(self._host(item.host).queue, item)
+        self._pending += 1
+        return True
+
+    def restore(self, url: str, depth: int) -> bool:
+        """续爬：恢复上次未完成的 URL（已计入各层配额，不再检查上限；持久化的 seen 中已有记录）"""
+        self.seen.add(url)
+        item = FrontierItem(priority=depth, seq=next(self._seq), url=url, depth=depth)
+        heapq.heappush(self._host(item.host).queue, item)
+        self._pending += 1
+        return True
+
+    # ---------- 派发 ----------
+
+    def pop_ready(self, now: Optional[float] = None) -> Optional[FrontierItem]:
+        """取出一个现在就可以请求的 URL（优先级最高者），没有则返回 None"""
+        now = time.monotonic() if now is None else now
+        best = None
+        for state in self.hosts.values():
+            if state.ready_in(now) == 0.0 and (best is None or state.queue[0] < best.queue[0]):
+                best = state
+        if best is None:
+            return None
+        item = heapq.heappop(best.queue)
+        best.tokens -= 1.0
+        best.active += 1
+        best.requests += 1
+        self._pending -= 1
+        return item
+
+    def next_ready_in(self, now: Optional[float] = None) -> Optional[float]:
+        """距离下一个可派发 URL 的秒数；所有主机都在等待请求返回时为 None"""
+        now = time.monotonic() if now is None else now
+        wait = min((state.ready_in(now) for state in self.hosts.values()), default=float("inf"))
+        return None if wait == float("inf") else wait
+
+    # ---------- 结果反馈 ----------
+
+    def cancel(self, item: FrontierItem):
+        """派发后未发出请求（已访问、robots 禁止等），归还并发额度和令牌"""
+        state = self._host(item.host)
+        state.active = max(0, state.active - 1)
+        state.tokens = min(float(state.concurrency), state.tokens + 1.0)
+        state.requests -= 1
+
+    def complete(self, item: FrontierItem, status: Optional[int], latency: float,
+                 retry_after: Optional[float] = None) -> bool:
+        """
+        记录请求结果，调整主机的并发与间隔
+
+        Args:
+            status: HTTP 状态码，超时/连接错误为 None
+
+        Returns:
+            是否已重新入队重试
+        """
+        now = time.monotonic()
+        state = self._host(item.host)
+        state.active = max(0, state.active - 1)
+
+        if status is not None and status not in self.RETRY_STATUSES:
+            state.on_success(latency)
+            return False
+
+        state.on_throttle(now, retry_after)
+        if item.attempt >= self.max_retries:
+            return False
+        item.attempt += 1
+        heapq.heappush(state.queue, item)
+        self._pending += 1
+        return True
+
+    # ---------- 状态 ----------
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def active(self) -> int:
+        return sum(state.active for state in self.hosts.values())
+
+    def get_stats(self) -> Dict[str, Dict]:
+        return {
+            host: {
+                "queued": len(state.queue),
+                "active": state.active,
+                "concurrency": state.concurrency,
+                "delay": round(state.delay, 3),
+                "requests": state.requests,
+                "throttled": state.throttled,
+                "latency_ms": round(state.latency_ewma * 1000, 1) if state.latency_ewma is not None else None,
+            }
+            for host, state in self.hosts.items()
+        }
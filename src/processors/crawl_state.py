@@ -0,0 +1,207 @@
+"""
+爬虫状态存储 - SQLite 持久化，按站点键断点续爬
+  - 已访问/失败/已入队 URL 和内容哈希只存 16 字节摘要，成员判断先查布隆过滤器再查索引，O(1)
+  - 新增记录先进内存缓冲，攒够一批在一个事务里追加写入，不再每层整体重写 JSON
+  - 待爬队列（URL + 深度）同样增量持久化，续爬时恢复到调度器
+内存占用只有布隆过滤器（固定大小）和写缓冲，不随爬取规模增长。
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.utils.bloom_filter import BloomFilter, digest
+from src.utils.sqlite_cache import connect_wal
+
+DEFAULT_STATE_PATH = "./temp_uploads/crawler_state.db"
+
+
+class PersistentSet:
+    """集合视图：支持 in / add / len，数据落在 CrawlStateStore 中"""
+
+    def __init__(self, store: "CrawlStateStore", kind: int, bloom: Optional[BloomFilter]):
+        self._store = store
+        self._kind = kind
+        self._bloom = bloom
+        self._buffer: Set[bytes] = set()
+        self._count = 0
+
+    def _load(self):
+        """打开已有状态：统计数量并重建布隆过滤器"""
+        self._count = 0
+        for (key,) in self._store._conn.execute(
+                "SELECT key FROM members WHERE site = ? AND kind = ?", (self._store.site_key, self._kind)):
+            self._count += 1
+            if self._bloom is not None:
+                self._bloom.add_digest(key)
+
+    def _contains_key(self, key: bytes) -> bool:
+        if key in self._buffer:
+            return True
+        if self._bloom is not None and not self._bloom.contains_digest(key):
+            return False
+        with self._store._lock:
+            row = self._store._conn.execute(
+                "SELECT 1 FROM members WHERE site = ? AND kind = ? AND key = ?",
+                (self._store.site_key, self._kind, key)
+            ).fetchone()
+        return row is not None
+
+    def __contains__(self, value: str) -> bool:
+        return self._contains_key(digest(value))
+
+    def add(self, value: str):
+        key = digest(value)
+        if self._contains_key(key):
+            return
+        self._buffer.add(key)
+        if self._bloom is not None:
+            self._bloom.add_digest(key)
+        self._count += 1
+        if len(self._buffer) >= self._store.flush_every:
+            self._store.flush()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _drain(self) -> List[bytes]:
+        keys, self._buffer = list(self._buffer), set()
+        return keys
+
+
+class CrawlStateStore:
+    """单个站点键的爬取状态"""
+
+    VISITED, FAILED, CONTENT, QUEUED = 1, 2, 3, 4
+
+    def __init__(self, db_path: str = DEFAULT_STATE_PATH, site_key: str = "default",
+                 use_bloom: bool = True, bloom_capacity: int = 1_000_000, flush_every: int = 500):
+        """
+        Args:
+            db_path: SQLite 文件路径（多个站点共用）
+            site_key: 站点键，续爬时按它找回状态
+            use_bloom: 是否在精确查询前使用布隆过滤器
+            bloom_capacity: 布隆过滤器预计容量（每个集合）
+            flush_every: 写缓冲达到多少条时落盘
+        """
+        self.db_path = db_path
+        self.site_key = site_key
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._pending_ops: List[Tuple[str, str, int]] = []
+
+        self._conn = connect_wal(db_path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS members (
+                site TEXT NOT NULL, kind INTEGER NOT NULL, key BLOB NOT NULL,
+                PRIMARY KEY (site, kind, key)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending (
+                site TEXT NOT NULL, url TEXT NOT NULL, depth INTEGER NOT NULL,
+                PRIMARY KEY (site, url)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                site TEXT NOT NULL, name TEXT NOT NULL, value TEXT,
+                PRIMARY KEY (site, name)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+        def make_bloom():
+            return BloomFilter(bloom_capacity) if use_bloom else None
+
+        self.visited = PersistentSet(self, self.VISITED, make_bloom())
+        self.failed = PersistentSet(self, self.FAILED, make_bloom())
+        self.content_hashes = PersistentSet(self, self.CONTENT, make_bloom())
+        self.queued = PersistentSet(self, self.QUEUED, make_bloom())  # 调度器接纳过的 URL
+        self._sets = (self.visited, self.failed, self.content_hashes, self.queued)
+        for s in self._sets:
+            s._load()
+
+    # ---------- 待爬队列 ----------
+
+    def add_pending(self, url: str, depth: int):
+        self._pending_ops.append(("add", url, depth))
+        if len(self._pending_ops) >= self.flush_every:
+            self.flush()
+
+    def done_pending(self, url: str):
+        self._pending_ops.append(("done", url, 0))
+        if len(self._pending_ops) >= self.flush_every:
+            self.flush()
+
+    def pending_items(self) -> List[Tuple[str, int]]:
+        self.flush()
+        with self._lock:
+            return self._conn.execute(
+                "SELECT url, depth FROM pending WHERE site = ? ORDER BY depth", (self.site_key,)
+            ).fetchall()
+
+    # ---------- 元数据 ----------
+
+    def set_meta(self, name: str, value: Any):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?, ?)",
+                               (self.site_key, name, json.dumps(value)))
+            self._conn.commit()
+
+    def get_meta(self, name: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE site = ? AND name = ?",
+                                     (self.site_key, name)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    # ---------- 持久化 ----------
+
+    def flush(self):
+        """把写缓冲在一个事务里追加到数据库"""
+        with self._lock:
+            for s in self._sets:
+                keys = s._drain()
+                if keys:
+                    self._conn.executemany("INSERT OR IGNORE INTO members VALUES (?, ?, ?)",
+                                           [(self.site_key, s._kind, k) for k in keys])
+            ops, self._pending_ops = self._pending_ops, []
+            for op, url, depth in ops:
+                if op == "add":
+                    self._conn.execute("INSERT OR REPLACE INTO pending VALUES (?, ?, ?)", (self.site_key, url, depth))
+                else:
+                    self._conn.execute("DELETE FROM pending WHERE site = ? AND url = ?", (self.site_key, url))
+            self._conn.commit()
+
+    def reset(self):
+        """清空该站点的全部状态（重新开始而不是续爬）"""
+        with self._lock:
+            for table in ("members", "pending", "meta"):
+                self._conn.execute(f"DELETE FROM {table} WHERE site = ?", (self.site_key,))
+            self._conn.commit()
+            self._pending_ops.clear()
+            for s in self._sets:
+                s._drain()
+                s._count = 0
+                if s._bloom is not None:
+                    s._bloom = BloomFilter(s._bloom.capacity, s._bloom.error_rate)
+
+    def get_stats(self) -> Dict[str, Any]:
+        self.flush()
+        with self._lock:
+            pending = self._conn.execute("SELECT COUNT(*) FROM pending WHERE site = ?",
+                                         (self.site_key,)).fetchone()[0]
+        return {
+            "site_key": self.site_key,
+            "visited": len(self.visited),
+            "failed": len(self.failed),
+            "content_hashes": len(self.content_hashes),
+            "queued": len(self.queued),
+            "pending": pending,
+            "bloom_bytes": sum(s._bloom.size_bytes for s in self._sets if s._bloom is not None),
+        }
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,140 @@
+"""
+爬取结果直接入库 - 网页不再先写 .txt 再由索引构建重新扫描读取
+爬虫在后台线程运行，每爬完一页通过 page_callback 放入有界队列；
+索引构建在调用线程逐页消费，切分和向量化与爬取重叠进行。
+队列满时爬虫线程阻塞等待（背压），内存中只保留队列长度个页面。
+爬虫线程的状态消息同样排队，由消费线程转交 status_callback（Streamlit
+只接受脚本线程上的界面更新）。
+"""
+
+import re
+import uuid
+import queue
+import hashlib
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from llama_index.core import Document
+
+
+def page_file_name(url: str, title: str) -> str:
+    """页面在知识库清单中的名称（与落盘文件名一致）"""
+    url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
+    safe_title = re.sub(r'[^\w\u4e00-\u9fff]+', '_', title or "")[:50]
+    return f"{safe_title}_{url_hash}.txt"
+
+
+def page_to_document(page: Dict) -> Document:
+    """爬取结果（url/title/content）转换为带来源元数据的文档"""
+    title = page.get('title') or "No Title"
+    timestamp = page.get('timestamp')
+    crawl_time = datetime.fromtimestamp(timestamp) if timestamp else datetime.now()
+    metadata = {
+        "file_name": page_file_name(page['url'], title),
+        "file_path": page.get('file_path') or page['url'],
+        "url": page['url'],
+        "title": title,
+        "source": "web_crawl",
+        "crawl_time": crawl_time.strftime('%Y-%m-%d %H:%M:%S'),
+        "file_extension": ".txt",
+    }
+    return Document(text=f"{title}\n\n{page['content']}", metadata=metadata, id_=str(uuid.uuid4()))
+
+
+def page_manifest_entry(doc: Document, size_bytes: int) -> Dict:
+    """知识库清单条目（字段与 get_file_info 一致）"""
+    metadata = doc.metadata
+    day = metadata['crawl_time'][:10]
+    return {
+        "name": metadata['file_name'],
+        "file_path": metadata['file_path'],
+        "url": metadata['url'],
+        "size": f"{size_bytes / 1024:.1f} KB" if size_bytes >= 1024 else f"{size_bytes} B",
+        "size_bytes": size_bytes,
+        "added_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "creation_date": day,
+        "last_modified": day,
+        "parent_folder": "web",
+        "type": "网页",
+        "icon": "🌐",
+        "doc_ids": [],
+    }
+
+
+class CrawlPageStream:
+    """后台线程爬取，按页产出爬取结果"""
+
+    _DONE = object()
+
+    def __init__(self, crawl_fn: Callable[[Callable[[Dict], None]], Any], queue_size: int = 64,
+                 status_callback: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            crawl_fn: 执行爬取的函数，参数为 page_callback，返回值保存在 self.result
+            queue_size: 已爬取、待入库的页面队列长度
+            status_callback: 状态回调，只在消费（迭代）线程上调用
+        """
+        self.crawl_fn = crawl_fn
+        self.queue_size = queue_size
+        self.status_callback = status_callback
+        self.result = None
+        self.pages = 0
+        self._status_queue = queue.SimpleQueue()
+
+    def status(self, message: str):
+        """爬虫线程中报告状态：消息入队，由消费线程转交 status_callback"""
+        if self.status_callback:
+            self._status_queue.put(message)
+
+    def _drain_status(self):
+        while True:
+            try:
+                message = self._status_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.status_callback(message)
+
+    def __iter__(self) -> Iterator[Dict]:
+        page_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        def put(item):
+            # 消费端已停止时丢弃，让爬虫自然结束
+            while not stop.is_set():
+                try:
+                    page_queue.put(item, timeout=0.2)
+                    return
+                except queue.Full:
+                    continue
+
+        def page_callback(page: Dict):
+            put(("page", page))
+
+        def run():
+            try:
+                self.result = self.crawl_fn(page_callback)
+            except Exception as e:
+                put(("error", e))
+            finally:
+                put(("done", self._DONE))
+
+        thread = threading.Thread(target=run, name="crawl-stream", daemon=True)
+        thread.start()
+        try:
+            while True:
+                self._drain_status()
+                try:
+                    kind, payload = page_queue.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if kind == "done":
+                    self._drain_status()
+                    break
+                if kind == "error":
+                    raise payload
+                self.pages += 1
+                yield payload
+            thread.join()
+        finally:
+            stop.set()
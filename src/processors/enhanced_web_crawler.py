@@ -7,6 +7,7 @@ from .async_web_crawler import AsyncWebCrawler
 from .web_crawler import WebCrawler
 import time
 from pathlib import Path
+from src.utils.near_duplicate import NearDuplicateIndex
 
 class EnhancedWebCrawler:
     def __init__(self):
@@ -24,9 +25,14 @@ class EnhancedWebCrawler:
         use_async: bool = True,
         max_concurrent: int = 10,
         ignore_robots: bool = False,
-        output_dir: str = None
+        output_dir: str = None,
+        persist_dir: str = None
     ):
-        """异步爬取入口"""
+        """异步爬取入口
+        
+        persist_dir 为目标知识库目录时，近似去重使用该库持久化的索引（与索引构建共用），
+        已入库的内容不会被再次抓取保存。
+        """
         
         if not use_async:
             # 使用原有同步爬虫
@@ -35,7 +41,9 @@ class EnhancedWebCrawler:
             )
         
         # 使用新的异步爬虫
-        async with AsyncWebCrawler(max_concurrent=max_concurrent, ignore_robots=ignore_robots) as crawler:
+        near_duplicates = NearDuplicateIndex.for_kb(persist_dir) if persist_dir else None
+        async with AsyncWebCrawler(max_concurrent=max_concurrent, ignore_robots=ignore_robots,
+                                   near_duplicates=near_duplicates) as crawler:
             
             # 使用指定的输出目录或创建临时目录
             if output_dir:
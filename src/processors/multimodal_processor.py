@@ -1,6 +1,7 @@
 """多模态处理器 - 支持图片、表格等多模态内容处理"""
 
 import os
+import json
 import base64
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
@@ -21,6 +22,8 @@ except ImportError:
     HAS_TABLE_EXTRACTION = False
 
 from ..app_logging import LogManager
+from ..utils.file_fingerprint import hash_file
+from ..utils.ocr_cache import get_ocr_cache
 
 logger = LogManager()
 
@@ -53,19 +56,28 @@ class MultimodalProcessor:
             return {'text': '', 'confidence': 0, 'error': 'OCR不可用'}
         
         try:
-            # 打开图片
+            # 打开图片（只读取文件头，像素在识别时才解码）
             image = Image.open(image_path)
             
-            # OCR识别
-            text = pytesseract.image_to_string(image, lang=self.ocr_languages)
-            
-            # 获取置信度信息
-            data = pytesseract.image_to_data(image, lang=self.ocr_languages, output_type=pytesseract.Output.DICT)
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+            # 同一图片（按文件内容哈希）识别过则直接取缓存
+            cache = get_ocr_cache()
+            digest = f"file:{hash_file(image_path)}"
+            cache_config = f"tesseract|lang={self.ocr_languages}|with_confidence"
+            cached = cache.get(digest, cache_config)
+            if cached is not None:
+                text, avg_confidence = json.loads(cached)
+            else:
+                # OCR识别
+                text = pytesseract.image_to_string(image, lang=self.ocr_languages).strip()
+                
+                # 获取置信度信息
+                data = pytesseract.image_to_data(image, lang=self.ocr_languages, output_type=pytesseract.Output.DICT)
+                confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
+                avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+                cache.put(digest, cache_config, json.dumps([text, avg_confidence], ensure_ascii=False))
             
             return {
-                'text': text.strip(),
+                'text': text,
                 'confidence': avg_confidence,
                 'word_count': len(text.split()),
                 'image_size': image.size,
@@ -11,9 +11,11 @@ from typing import List, Optional, Callable, Dict
 # 导入智能优化器
 from .crawl_optimizer import CrawlOptimizer
 from src.utils.file_system_utils import set_where_from_metadata
+from src.utils.http_fetch_cache import HTTPFetchCache, RecrawlStats, body_digest, get_http_fetch_cache, pending_record
+from .crawl_stream import page_file_name
 
 class WebCrawler:
-    def __init__(self, output_dir="temp_uploads/web_crawl"):
+    def __init__(self, output_dir="temp_uploads/web_crawl", fetch_cache: Optional[HTTPFetchCache] = None):
         self.output_dir = output_dir
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -21,6 +23,10 @@ class WebCrawler:
         self.failed_urls = set()
         self.retry_counts = {}
         
+        # 条件请求缓存（ETag/Last-Modified），增量爬取时使用
+        self.fetch_cache = fetch_cache
+        self.recrawl_stats = RecrawlStats()
+        
         # 🔥 新增：智能优化器
         self.optimizer = CrawlOptimizer()
         
@@ -122,7 +128,8 @@ class WebCrawler:
         return bool(parsed.netloc) and bool(parsed.scheme)
     
     
-    def _smart_request(self, url: str, status_callback=None) -> requests.Response:
+    def _smart_request(self, url: str, status_callback=None,
+                       extra_headers: Optional[Dict[str, str]] = None) -> requests.Response:
         """智能请求，处理反爬机制"""
         import random
         
@@ -160,6 +167,8 @@ class WebCrawler:
             parsed_url = urlparse(url)
             if parsed_url.netloc:
                 headers['Referer'] = f"{parsed_url.scheme}://{parsed_url.netloc}/"
+            if extra_headers:
+                headers.update(extra_headers)
             
             if retry_count > 0 and status_callback:
                 status_callback(f"🔄 重试第 {retry_count} 次: {url}")
@@ -296,9 +305,7 @@ class WebCrawler:
             return None
             
         # 生成文件名
-        url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
-        safe_title = re.sub(r'[^\w\u4e00-\u9fff]+', '_', title)[:50]
-        filename = f"{safe_title}_{url_hash}.txt"
+        filename = page_file_name(url, title)
         filepath = os.path.join(self.output_dir, filename)
         
         # 添加元数据头
@@ -318,7 +325,10 @@ class WebCrawler:
                       max_pages: int = 10,
                       exclude_patterns: List[str] = None,
                       parser_type: str = "default",
-                      status_callback: Optional[Callable] = None) -> List[str]:
+                      status_callback: Optional[Callable] = None,
+                      incremental: bool = False,
+                      page_callback: Optional[Callable[[Dict], None]] = None,
+                      save_files: bool = True) -> List[str]:
         """
         高级递归爬取网页 - 修复递归逻辑
         
@@ -329,6 +339,12 @@ class WebCrawler:
             exclude_patterns: 排除链接模式列表（支持通配符）
             parser_type: 页面解析器类型 ("default", "article", "documentation")
             status_callback: 状态回调函数 func(msg)
+            incremental: 增量爬取：发送条件请求，未变化的页面不重新解析、保存（不出现在返回列表中），
+                         只用缓存的链接继续递归；变化统计见 self.recrawl_stats
+            page_callback: 每保存一个页面调用一次，参数为 {'url', 'title', 'content', 'timestamp', 'file_path',
+                           'fetch_record'}，用于边爬边入库；入库成功后由调用方 fetch_cache.commit(page)
+                           写入抓取记录（不传 page_callback 时页面保存后即写入）
+            save_files: 是否把页面写成 .txt 文件（只通过 page_callback 入库时可关闭）
         
         Returns:
             list: 已保存的文件路径列表
@@ -348,6 +364,8 @@ class WebCrawler:
             raise ValueError(f"Invalid URL '{start_url}': No scheme supplied. Perhaps you meant https://{start_url.replace('https://', '').replace('http://', '')}?")
         
         self.visited_urls = set()
+        self.recrawl_stats = RecrawlStats()
+        fetch_cache = self.fetch_cache or (get_http_fetch_cache() if incremental else None)
         # 按层级组织队列: {depth: [urls]}
         current_level = [start_url]
         saved_files = []
@@ -397,39 +415,84 @@ class WebCrawler:
                     if status_callback:
                         status_callback(f"🔄 正在抓取 ({total_count+1}) 第{depth}层 ({i}/{len(current_level)}): {url}")
                     
-                    # 使用智能请求方法
-                    response = self._smart_request(url, status_callback)
-                    if status_callback:
-                        status_callback(f"📡 HTTP {response.status_code}: {url}")
-                    
-                    response.encoding = response.apparent_encoding
+                    record = fetch_cache.get(url) if incremental and fetch_cache else None
                     
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # 根据解析器类型提取内容
-                    content = self._extract_content_by_parser(soup, parser_type)
+                    # 使用智能请求方法（增量爬取时带上条件请求头）
+                    response = self._smart_request(url, status_callback,
+                                                   extra_headers=record.conditional_headers() if record else None)
                     if status_callback:
-                        status_callback(f"📝 内容提取: {len(content)} 字符 ({parser_type}模式)")
-                    
-                    title = soup.title.string if soup.title else "No Title"
-                    title = self._clean_text(title)
+                        status_callback(f"📡 HTTP {response.status_code}: {url}")
                     
-                    # 保存内容
-                    filepath = self._save_content(url, title, content)
-                    if filepath:
-                        saved_files.append(filepath)
-                        total_count += 1
-                        level_success += 1
+                    body_hash = None if response.status_code == 304 else body_digest(response.content)
+                    if record and (response.status_code == 304 or body_hash == record.body_hash):
+                        # 未变化：跳过解析和保存，用缓存的链接继续递归
+                        if response.status_code == 304:
+                            self.recrawl_stats.not_modified += 1
+                        else:
+                            self.recrawl_stats.unchanged += 1
+                        fetch_cache.touch(url, response.headers)
+                        links = [link for link in record.links
+                                 if not self._should_exclude_url(link, exclude_patterns or [])]
                         if status_callback:
-                            status_callback(f"✅ 已保存: {title} ({len(content)} 字符)")
+                            status_callback(f"⏭️ 页面未变化: {record.title or url}")
                     else:
-                        level_failed += 1
+                        response.encoding = response.apparent_encoding
+                        
+                        soup = BeautifulSoup(response.text, 'html.parser')
+                        
+                        # 根据解析器类型提取内容
+                        content = self._extract_content_by_parser(soup, parser_type)
                         if status_callback:
-                            status_callback(f"❌ 保存失败: {title}")
+                            status_callback(f"📝 内容提取: {len(content)} 字符 ({parser_type}模式)")
+                        
+                        title = soup.title.string if soup.title else "No Title"
+                        title = self._clean_text(title)
+                        
+                        content_hash = body_digest(content)
+                        links = self._extract_links(soup, url)
+                        changed = record is None or content_hash != record.content_hash
+                        fetch_record = pending_record(url, response.headers, body_hash, content_hash,
+                                                      title, links, changed)
+                        links = [link for link in links
+                                 if not self._should_exclude_url(link, exclude_patterns or [])]
+                        
+                        if not changed:
+                            # 响应体变了（时间戳、随机数等）但正文相同，不重新保存和索引
+                            fetch_cache.put(**fetch_record)
+                            self.recrawl_stats.unchanged += 1
+                            if status_callback:
+                                status_callback(f"⏭️ 正文未变化: {title}")
+                        else:
+                            if record is None:
+                                self.recrawl_stats.new += 1
+                            else:
+                                self.recrawl_stats.changed += 1
+                            
+                            # 保存内容（内容太少则跳过）
+                            kept = bool(content) and len(content.strip()) >= 50
+                            filepath = self._save_content(url, title, content) if kept and save_files else None
+                            if kept and (filepath or not save_files):
+                                if filepath:
+                                    saved_files.append(filepath)
+                                page = {'url': url, 'title': title, 'content': content,
+                                        'timestamp': time.time(), 'file_path': filepath,
+                                        'fetch_record': fetch_record}
+                                if page_callback:
+                                    # 抓取记录由入库方在入库成功后写入
+                                    page_callback(page)
+                                elif fetch_cache and filepath:
+                                    fetch_cache.commit(page)
+                                total_count += 1
+                                level_success += 1
+                                if status_callback:
+                                    status_callback(f"✅ 已保存: {title} ({len(content)} 字符)")
+                            else:
+                                level_failed += 1
+                                if status_callback:
+                                    status_callback(f"❌ 保存失败: {title}")
                     
-                    # 如果还没达到最大深度，提取下一级链接
+                    # 如果还没达到最大深度，加入下一级链接
                     if depth < max_depth:
-                        links = self._extract_links(soup, url, exclude_patterns)
                         # 🔥 关键修复：每个页面提取所有有效链接，不限制数量
                         # 让下一层的数量限制来控制递归规模
                         next_level.extend(links)
@@ -461,6 +524,8 @@ class WebCrawler:
         if status_callback:
             status_callback(f"🎉 递归爬取完成！总共获取 {len(saved_files)} 个页面 (共{max_depth}层)")
             status_callback(f"📈 最终统计: 尝试 {total_attempted} 个URL，成功访问 {len(self.visited_urls)} 个，保存 {len(saved_files)} 个文件")
+            if incremental:
+                status_callback(self.recrawl_stats.summary())
                 
         return saved_files
 
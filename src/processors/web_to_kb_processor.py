@@ -1,11 +1,16 @@
 """网页抓取到知识库构建的完整流程处理器"""
 
 import os
+import itertools
 from typing import List, Dict, Optional, Callable
 from datetime import datetime
 from .web_crawler import WebCrawler
+from .crawl_stream import CrawlPageStream
+from .content_analyzer import ContentQualityAnalyzer
 from ..kb.kb_manager import KBManager
 from ..processors.index_builder import IndexBuilder
+from ..utils.http_fetch_cache import fetch_cache_path, get_http_fetch_cache
+from ..utils.near_duplicate import NearDuplicateIndex
 import streamlit as st
 
 
@@ -15,7 +20,7 @@ class WebToKBProcessor:
     def __init__(self):
         # self.crawler 将在每次任务执行时独立初始化
         self.kb_manager = KBManager()
-        self.index_builder = IndexBuilder()
+        self.index_builder = None  # 每次任务按目标知识库创建
         
         # 预设知名网站 - 按类别分组
         self.preset_sites = {
@@ -149,7 +154,10 @@ class WebToKBProcessor:
                           max_pages: int = 10,
                           kb_name: str = None,
                           auto_switch: bool = True,
-                          status_callback: Optional[Callable] = None) -> Dict:
+                          status_callback: Optional[Callable] = None,
+                          stream_to_index: bool = True,
+                          save_files: bool = False,
+                          incremental: bool = False) -> Dict:
         """
         完整的网页抓取到知识库构建流程
         
@@ -162,10 +170,17 @@ class WebToKBProcessor:
             kb_name: 指定知识库名称（可选）
             auto_switch: 是否自动切换到新知识库
             status_callback: 状态回调函数
+            stream_to_index: 边爬边入库（爬取结果直接切分向量化，不经过 .txt 文件和目录扫描）
+            save_files: 流式入库时是否仍把页面写成 .txt 文件
+            incremental: kb_name 指定的知识库已存在时增量更新：条件请求重爬，只有变化的页面
+                         重新入库（替换旧片段），未变化的页面不下载、不解析（总是流式入库）
         
         Returns:
             dict: 处理结果
         """
+        if stream_to_index or incremental:
+            return self._crawl_and_stream_kb(url, keyword, sites, max_depth, max_pages, kb_name,
+                                             auto_switch, status_callback, save_files, incremental)
         try:
             # 每次执行使用独立的抓取器和输出目录，防止内容混淆
             timestamp_dir = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -305,6 +320,169 @@ class WebToKBProcessor:
         except Exception as e:
             return {"success": False, "message": f"处理失败: {e}"}
     
+    def _crawl_targets(self, url, keyword, sites, max_depth, max_pages) -> List[Dict]:
+        """需要抓取的起始地址及参数"""
+        if url:
+            return [{"url": url, "max_depth": max_depth, "max_pages": max_pages}]
+        if not sites:
+            sites = ["维基百科", "百度百科"]  # 默认搜索网站
+        search_results = self.search_preset_sites(keyword, sites)
+        return [{"url": r["url"], "site": r["site"], "max_depth": 2,  # 搜索结果需要抓取2层
+                 "max_pages": max_pages // len(search_results)}
+                for r in search_results[:2]]  # 限制搜索结果数量
+    
+    def _create_kb(self, kb_name: str):
+        """创建知识库（重名时追加时间后缀），返回 (名称, 路径, 错误信息)"""
+        success, message = self.kb_manager.create(kb_name)
+        if not success:
+            # 如果知识库已存在，生成新名称
+            kb_name = f"{kb_name}_{datetime.now().strftime('%H%M')}"
+            success, message = self.kb_manager.create(kb_name)
+            if not success:
+                return kb_name, None, f"创建知识库失败: {message}"
+        # 新建的知识库还没有 .kb_info.json（构建完成后写入），get_info 取不到路径
+        return kb_name, os.path.join(self.kb_manager.base_path, kb_name), None
+    
+    def _crawl_and_stream_kb(self, url, keyword, sites, max_depth, max_pages, kb_name,
+                             auto_switch, status_callback, save_files, incremental=False) -> Dict:
+        """
+        边爬边入库：爬虫在后台线程产出页面，索引构建按批切分、向量化
+        
+        页面的条件请求记录保存在知识库目录下，入库成功后才写入；增量更新已有知识库时
+        用这些记录跳过未变化的页面，变化的页面追加入库并替换旧片段。
+        近似去重索引按知识库持久化，质量分析和索引构建共用，与库内已有内容近似重复的页面不入库。
+        """
+        if not url and not keyword:
+            return {"success": False, "message": "必须提供URL或关键词"}
+        
+        try:
+            kb_path = None
+            if incremental and kb_name and self.kb_manager.exists(kb_name):
+                kb_path = os.path.join(self.kb_manager.base_path, kb_name)
+            fetch_cache = get_http_fetch_cache(fetch_cache_path(kb_path)) if kb_path else None
+            # 新建知识库时先在内存中去重，建库后再指向库目录下的持久化文件
+            near_duplicates = NearDuplicateIndex.for_kb(kb_path) if kb_path else NearDuplicateIndex()
+            analyzer = ContentQualityAnalyzer(near_duplicates=near_duplicates)
+            
+            timestamp_dir = datetime.now().strftime('%Y%m%d_%H%M%S')
+            unique_output_dir = os.path.join("temp_uploads", f"web_crawl_proc_{timestamp_dir}")
+            crawler = WebCrawler(output_dir=unique_output_dir, fetch_cache=fetch_cache)
+            targets = self._crawl_targets(url, keyword, sites, max_depth, max_pages)
+            if keyword and status_callback:
+                status_callback(f"🔍 搜索关键词: {keyword}")
+            
+            def crawl(page_callback):
+                # 运行在爬虫线程：状态经 stream.status 排队，由调用线程显示
+                saved = []
+                for target in targets:
+                    stream.status(f"🌐 开始抓取网页: {target['url']}")
+                    try:
+                        saved.extend(crawler.crawl_advanced(
+                            start_url=target['url'],
+                            max_depth=target['max_depth'],
+                            max_pages=target['max_pages'],
+                            status_callback=stream.status if status_callback else None,
+                            page_callback=page_callback,
+                            save_files=save_files,
+                            incremental=fetch_cache is not None
+                        ))
+                    except Exception as e:
+                        if not keyword:
+                            raise
+                        stream.status(f"❌ {target.get('site', target['url'])} 抓取失败: {e}")
+                return saved
+            
+            stream = CrawlPageStream(crawl, status_callback=status_callback)
+            crawled_pages = []
+            fetch_records = []
+            duplicates = []
+            
+            def track(page_iter):
+                for page in page_iter:
+                    if page.get('fetch_record'):
+                        # 近似重复的页面也记录，未变化时下次不再抓取
+                        fetch_records.append(page.pop('fetch_record'))
+                    duplicate = analyzer.is_near_duplicate(page)
+                    if duplicate is not None:
+                        duplicates.append(page['url'])
+                        if status_callback:
+                            status_callback(f"♻️ 与已有内容近似重复，跳过: {page['url']} ≈ {duplicate}")
+                        continue
+                    crawled_pages.append(f"{page.get('title') or 'No Title'} ({page['url']})")
+                    yield page
+            
+            pages = track(stream)
+            # 等到第一个页面再建库：知识库名称需要内容预览
+            first_page = next(pages, None)
+            if first_page is None:
+                if kb_path and (crawler.recrawl_stats.total or duplicates):
+                    if status_callback:
+                        status_callback(crawler.recrawl_stats.summary())
+                    return {"success": True, "kb_name": kb_name, "files_count": 0, "doc_count": 0, "files": [],
+                            "message": f"✅ 知识库 '{kb_name}' 已是最新，网页均未变化或与已有内容近似重复"}
+                return {"success": False, "message": "没有成功抓取到任何内容"}
+            
+            if not kb_name:
+                if url:
+                    kb_name = self.generate_kb_name_from_url(url, first_page['content'][:1000])
+                else:
+                    kb_name = f"搜索_{keyword}_{datetime.now().strftime('%m%d')}"
+            
+            if kb_path:
+                if status_callback:
+                    status_callback(f"🔁 增量更新知识库: {kb_name}")
+            else:
+                if status_callback:
+                    status_callback(f"📚 创建知识库: {kb_name}")
+                kb_name, kb_path, error = self._create_kb(kb_name)
+                if error:
+                    return {"success": False, "message": error}
+                near_duplicates.path = NearDuplicateIndex.kb_file(kb_path)
+            
+            from llama_index.core import Settings
+            self.index_builder = IndexBuilder(
+                kb_name=kb_name,
+                persist_dir=kb_path,
+                embed_model=Settings.embed_model,
+                near_duplicates=near_duplicates
+            )
+            build_callback = None
+            if status_callback:
+                status_callback("🔨 边抓取边构建索引...")
+                build_callback = lambda _, msg, *args: status_callback(f"🔨 {msg}" if isinstance(msg, str) else "处理中...")
+            build_result = self.index_builder.build_from_pages(
+                itertools.chain([first_page], pages),
+                action_mode="APPEND" if fetch_cache else "NEW",
+                status_callback=build_callback
+            )
+            
+            if not build_result.success:
+                return {"success": False, "message": f"索引构建失败: {build_result.error}"}
+            
+            # 入库成功后才记录页面，失败的页面下次增量更新时仍会重新处理
+            fetch_cache = fetch_cache or get_http_fetch_cache(fetch_cache_path(kb_path))
+            for record in fetch_records:
+                fetch_cache.put(**record)
+            if incremental and status_callback:
+                status_callback(crawler.recrawl_stats.summary())
+            
+            if auto_switch and 'st' in globals():
+                st.session_state.selected_kb = kb_name
+                if status_callback:
+                    status_callback(f"✅ 已自动切换到知识库: {kb_name}")
+            
+            return {
+                "success": True,
+                "kb_name": kb_name,
+                "files_count": build_result.file_count,
+                "doc_count": build_result.doc_count,
+                # 不落盘时列出页面标题和 URL
+                "files": (stream.result if save_files else None) or crawled_pages,
+                "message": f"✅ 成功创建知识库 '{kb_name}'，包含 {build_result.file_count} 个网页 ({build_result.doc_count} 个片段)"
+            }
+        except Exception as e:
+            return {"success": False, "message": f"处理失败: {e}"}
+    
     def get_preset_sites(self) -> Dict:
         """获取预设网站列表"""
         return self.preset_sites
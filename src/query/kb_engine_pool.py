@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+常驻知识库检索进程池
+多知识库查询不再每次新建进程并重新加载模型和索引：
+
+- 工作进程常驻，各自持有嵌入模型和 LRU 缓存的已加载索引
+- 同一知识库固定路由到已持有它的工作进程（亲和性调度）
+- 查询向量在主进程按嵌入模型只计算一次，随任务下发给各知识库共享
+"""
+
+import os
+import json
+import time
+import atexit
+import itertools
+import threading
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.kb.kb_version import get_kb_version
+
+
+def _read_kb_embed_model(persist_dir: str, default: str) -> str:
+    """读取知识库构建时使用的嵌入模型名"""
+    kb_info_file = os.path.join(persist_dir, ".kb_info.json")
+    try:
+        if os.path.exists(kb_info_file):
+            with open(kb_info_file, 'r') as f:
+                return json.load(f).get('embedding_model') or default
+    except Exception:
+        pass
+    return default
+
+
+def node_to_result(kb_name: str, node) -> Dict[str, Any]:
+    """把检索到的 NodeWithScore 转换为可序列化的结果字典"""
+    text = node.node.get_content()
+    metadata = dict(node.node.metadata or {})
+    return {
+        "node_id": node.node.node_id,
+        "kb_name": kb_name,
+        "content": text[:500] + "..." if len(text) > 500 else text,
+        "score": float(node.score or 0.0),
+        "metadata": metadata,
+        "source": metadata.get('file_name', 'Unknown'),
+    }
+
+
+def build_answer_prompt(query: str, results: List[Dict[str, Any]]) -> str:
+    """基于检索片段构造问答提示词"""
+    context = "\n\n".join(
+        f"[{i}] ({doc.get('kb_name', '')} / {doc.get('source', 'Unknown')})\n{doc['content']}"
+        for i, doc in enumerate(results, 1)
+    )
+    return (
+        "以下是从知识库检索到的信息：\n"
+        "---------------------\n"
+        f"{context}\n"
+        "---------------------\n"
+        "请完全根据上述上下文信息回答用户的问题，不要使用外部知识。"
+        "如果上下文中没有相关信息，请回答“知识库中未找到相关内容”。\n"
+        f"问题：{query}\n"
+        "回答："
+    )
+
+
+class _KBCache:
+    """单个进程内的嵌入模型与索引缓存（索引按 LRU 淘汰）"""
+
+    def __init__(self, embed_provider: str, embed_key: str, embed_url: str, max_kbs: int = 4):
+        self.embed_provider = embed_provider
+        self.embed_key = embed_key
+        self.embed_url = embed_url
+        self.max_kbs = max_kbs
+        self.embed_models: Dict[str, Any] = {}
+        self.indexes: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()  # 知识库 -> (索引, 内容版本)
+        self.loads = 0
+
+    def get_embed_model(self, model_name: str):
+        if model_name not in self.embed_models:
+            from src.utils.model_manager import load_embedding_model
+            embed = load_embedding_model(self.embed_provider, model_name, self.embed_key, self.embed_url)
+            if embed is None:
+                raise ValueError(f"无法加载嵌入模型: {model_name}")
+            self.embed_models[model_name] = embed
+        return self.embed_models[model_name]
+
+    def get_index(self, kb_name: str, persist_dir: str, model_name: str):
+        """已加载且知识库版本未变时直接返回，重建/追加后重新加载"""
+        version = get_kb_version(persist_dir)
+        cached = self.indexes.get(kb_name)
+        if cached is not None and cached[1] == version:
+            self.indexes.move_to_end(kb_name)
+            return cached[0]
+
+        from llama_index.core import load_index_from_storage
+        from src.kb.npy_vector_store import load_storage_context
+        storage_context = load_storage_context(persist_dir)
+        index = load_index_from_storage(storage_context, embed_model=self.get_embed_model(model_name))
+        self.loads += 1
+
+        self.indexes[kb_name] = (index, version)
+        self.indexes.move_to_end(kb_name)
+        while len(self.indexes) > self.max_kbs:
+            self.indexes.popitem(last=False)
+        return index
+
+    def retrieve(self, kb_name: str, persist_dir: str, model_name: str,
+                 query: str, embedding: Optional[List[float]], top_k: int) -> Dict[str, Any]:
+        """检索单个知识库，返回可跨进程传递的结果字典"""
+        from llama_index.core.schema import QueryBundle
+
+        start = time.time()
+        try:
+            index = self.get_index(kb_name, persist_dir, model_name)
+            retriever = index.as_retriever(similarity_top_k=top_k)
+            nodes = retriever.retrieve(QueryBundle(query_str=query, embedding=embedding))
+
+            return {
+                "kb_name": kb_name,
+                "success": True,
+                "results": [node_to_result(kb_name, node) for node in nodes[:top_k]],
+                "retrieve_time": time.time() - start,
+                "query_time": time.time()
+            }
+        except Exception as e:
+            return {
+                "kb_name": kb_name,
+                "success": False,
+                "error": str(e),
+                "results": []
+            }
+
+
+def _kb_worker_main(task_queue, result_queue, embed_provider, embed_key, embed_url, max_kbs):
+    """工作进程主循环（必须是顶级函数才能在 spawn 模式下启动）"""
+    import sys
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+    cache = _KBCache(embed_provider, embed_key, embed_url, max_kbs=max_kbs)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        req_id, kb_name, persist_dir, model_name, query, embedding, top_k = task
+        result = cache.retrieve(kb_name, persist_dir, model_name, query, embedding, top_k)
+        result["index_loads"] = cache.loads
+        result_queue.put((req_id, result))
+
+
+class KBEnginePool:
+    """常驻知识库检索进程池"""
+
+    def __init__(self, base_path: str = "vector_db_storage", num_workers: Optional[int] = None,
+                 max_kbs_per_worker: int = 4, embed_provider: Optional[str] = None,
+                 embed_key: str = "", embed_url: str = "", use_processes: bool = True,
+                 embed_model: Optional[str] = None):
+        from src.core.app_config import load_config
+
+        config = load_config()
+        self.base_path = base_path
+        self.num_workers = num_workers or min(mp.cpu_count(), 4)
+        self.max_kbs_per_worker = max_kbs_per_worker
+        self.embed_provider = embed_provider or config.get('embed_provider') or "HuggingFace (本地/极速)"
+        self.embed_key = embed_key or config.get('embed_key', '')
+        self.embed_url = embed_url or config.get('embed_url', '')
+        # 知识库未记录嵌入模型时使用
+        self.default_embed_model = embed_model or config.get('embed_model') or "sentence-transformers/all-MiniLM-L6-v2"
+        self.use_processes = use_processes
+        self.max_restarts = self.num_workers * 2
+
+        # 主进程缓存：查询向量计算 + 进程池不可用时的本地检索
+        self._local = _KBCache(self.embed_provider, self.embed_key, self.embed_url,
+                               max_kbs=max_kbs_per_worker)
+        self._local_lock = threading.Lock()
+
+        self._ctx = mp.get_context("spawn")
+        self._workers: List[Any] = []
+        self._task_queues: List[Any] = []
+        self._result_queue = None
+        self._dispatcher = None
+        self._futures: Dict[int, Future] = {}
+        self._futures_lock = threading.Lock()  # 查询线程登记/撤销与结果分发线程交付互斥
+        self._req_ids = itertools.count()
+        self._lock = threading.Lock()
+
+        # 知识库 -> 工作进程（亲和性）
+        self._assignments: Dict[str, int] = {}
+        self._stats = {"queries": 0, "kb_requests": 0, "embeddings": 0, "worker_restarts": 0}
+        self._started = False
+
+    # ---------- 生命周期 ----------
+
+    def start(self) -> bool:
+        """启动工作进程，失败时回退为进程内检索"""
+        with self._lock:
+            if self._started:
+                return self.use_processes
+            self._started = True
+            if not self.use_processes:
+                return False
+            try:
+                self._result_queue = self._ctx.Queue()
+                for worker_id in range(self.num_workers):
+                    self._task_queues.append(self._ctx.Queue())
+                    self._workers.append(self._spawn_worker(worker_id))
+                self._dispatcher = threading.Thread(target=self._dispatch_results, daemon=True)
+                self._dispatcher.start()
+                atexit.register(self.shutdown)
+            except Exception:
+                self.use_processes = False
+            return self.use_processes
+
+    def _spawn_worker(self, worker_id: int):
+        proc = self._ctx.Process(
+            target=_kb_worker_main,
+            args=(self._task_queues[worker_id], self._result_queue, self.embed_provider,
+                  self.embed_key, self.embed_url, self.max_kbs_per_worker),
+            daemon=True,
+            name=f"kb-worker-{worker_id}"
+        )
+        proc.start()
+        return proc
+
+    def _dispatch_results(self):
+        """后台线程：把工作进程的结果交付给对应 Future"""
+        while True:
+            try:
+                item = self._result_queue.get()
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+            req_id, result = item
+            with self._futures_lock:
+                future = self._futures.pop(req_id, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    def shutdown(self):
+        """停止所有工作进程"""
+        with self._lock:
+            for q in self._task_queues:
+                try:
+                    q.put(None)
+                except Exception:
+                    pass
+            for proc in self._workers:
+                proc.join(timeout=5)
+                if proc.is_alive():
+                    proc.terminate()
+            if self._result_queue is not None:
+                try:
+                    self._result_queue.put(None)
+                except Exception:
+                    pass
+            self._workers = []
+            self._task_queues = []
+            self._assignments = {}
+            self._started = False
+
+    # ---------- 调度 ----------
+
+    def _worker_for(self, kb_name: str) -> int:
+        """亲和性路由：已分配的知识库固定到同一进程，新知识库分配给负载最少的进程"""
+        with self._lock:
+            worker_id = self._assignments.get(kb_name)
+            if worker_id is None:
+                load = [0] * len(self._workers)
+                for assigned in self._assignments.values():
+                    load[assigned] += 1
+                worker_id = load.index(min(load))
+                self._assignments[kb_name] = worker_id
+            if not self._workers[worker_id].is_alive():
+                self._stats["worker_restarts"] += 1
+                if self._stats["worker_restarts"] > self.max_restarts:
+                    # 工作进程反复退出（如运行环境不支持 spawn），回退为进程内检索
+                    self.use_processes = False
+                    return -1
+                self._workers[worker_id] = self._spawn_worker(worker_id)
+            return worker_id
+
+    def embed_query(self, query: str, model_name: str) -> Optional[List[float]]:
+        """在主进程计算查询向量（每个嵌入模型只计算一次）"""
+        try:
+            with self._local_lock:
+                embed_model = self._local.get_embed_model(model_name)
+            # 向量化不加锁：并发查询由查询向量化服务合批
+            embedding = embed_model.get_query_embedding(query)
+            self._stats["embeddings"] += 1
+            return embedding
+        except Exception:
+            # 交给工作进程用常驻模型计算
+            return None
+
+    def retrieve(self, kb_names: List[str], query: str, top_k_per_kb: int = 3,
+                 timeout: float = 30) -> Dict[str, Dict[str, Any]]:
+        """检索多个知识库，返回 {知识库名: 结果}"""
+        self.start()
+        self._stats["queries"] += 1
+
+        # 按嵌入模型分组，同模型的知识库共享一个查询向量
+        kb_models = {kb: _read_kb_embed_model(os.path.join(self.base_path, kb), self.default_embed_model)
+                     for kb in kb_names}
+        embeddings = {model: self.embed_query(query, model) for model in set(kb_models.values())}
+
+        futures: Dict[str, Tuple[int, Future]] = {}
+        results: Dict[str, Dict[str, Any]] = {}
+        for kb_name in kb_names:
+            persist_dir = os.path.join(self.base_path, kb_name)
+            model_name = kb_models[kb_name]
+            embedding = embeddings.get(model_name)
+            self._stats["kb_requests"] += 1
+
+            worker_id = self._worker_for(kb_name) if self.use_processes else -1
+            if worker_id >= 0:
+                req_id = next(self._req_ids)
+                future = Future()
+                with self._futures_lock:
+                    self._futures[req_id] = future
+                self._task_queues[worker_id].put(
+                    (req_id, kb_name, persist_dir, model_name, query, embedding, top_k_per_kb)
+                )
+                futures[kb_name] = (req_id, future)
+            else:
+                with self._local_lock:
+                    results[kb_name] = self._local.retrieve(
+                        kb_name, persist_dir, model_name, query, embedding, top_k_per_kb
+                    )
+
+        deadline = time.time() + timeout
+        for kb_name, (req_id, future) in futures.items():
+            try:
+                results[kb_name] = future.result(timeout=max(0.1, deadline - time.time()))
+            except FutureTimeoutError:
+                with self._futures_lock:
+                    self._futures.pop(req_id, None)
+                results[kb_name] = {
+                    "kb_name": kb_name,
+                    "success": False,
+                    "error": f"查询超时 ({timeout:.0f}s)",
+                    "results": []
+                }
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取进程池统计"""
+        return {
+            **self._stats,
+            "workers": len(self._workers),
+            "alive_workers": sum(1 for p in self._workers if p.is_alive()),
+            "multiprocess": self.use_processes,
+            "assignments": dict(self._assignments),
+        }
+
+
+_pool: Optional[KBEnginePool] = None
+_pool_kwargs: Dict[str, Any] = {}
+_pool_lock = threading.Lock()
+
+
+def get_kb_engine_pool(base_path: str = "vector_db_storage", **kwargs) -> KBEnginePool:
+    """获取进程级共享的常驻检索池（目录或配置与现有池不同时停止旧池并按新配置重建）"""
+    global _pool, _pool_kwargs
+    with _pool_lock:
+        if _pool is None or _pool.base_path != base_path or _pool_kwargs != kwargs:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = KBEnginePool(base_path=base_path, **kwargs)
+            _pool_kwargs = dict(kwargs)
+        return _pool
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+常驻知识库注册表（API 服务）
+并发的 API 客户端共享同一份嵌入模型、LLM 和已加载索引：
+
+- 索引按知识库名常驻内存（LRU 淘汰），同一知识库只加载一次
+- 检索与生成在有界线程池中执行，不阻塞事件循环
+- 每个知识库限制并发检索数，超时未获得名额时报告繁忙
+- 增量写入与检索通过读写锁隔离，写入后立即对新查询可见
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.kb.kb_version import bump_kb_version, get_kb_version
+from src.query.kb_engine_pool import _KBCache, _read_kb_embed_model, build_answer_prompt, node_to_result
+
+
+class KBBusyError(RuntimeError):
+    """知识库并发名额已满"""
+
+
+class _RWLock:
+    """读写锁：检索共享，写入独占（写优先，避免写入饿死）"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writing or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+
+    def release_write(self):
+        with self._cond:
+            self._writing = False
+            self._cond.notify_all()
+
+
+class KBRegistry:
+    """常驻知识库注册表"""
+
+    def __init__(self, base_path: str = "vector_db_storage", max_kbs: int = 8,
+                 max_workers: Optional[int] = None, max_concurrency_per_kb: int = 4,
+                 queue_timeout: float = 30, embed_provider: Optional[str] = None,
+                 embed_key: str = "", embed_url: str = ""):
+        from src.core.app_config import load_config
+
+        self.config = load_config()
+        self.base_path = base_path
+        self.max_kbs = max_kbs
+        self.max_concurrency_per_kb = max_concurrency_per_kb
+        self.queue_timeout = queue_timeout
+        self.default_embed_model = self.config.get('embed_model') or "sentence-transformers/all-MiniLM-L6-v2"
+
+        # 嵌入模型按名称共享
+        self._models = _KBCache(
+            embed_provider or self.config.get('embed_provider') or "HuggingFace (本地/极速)",
+            embed_key or self.config.get('embed_key', ''),
+            embed_url or self.config.get('embed_url', ''),
+        )
+        self._models_lock = threading.Lock()
+
+        self._indexes: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()  # 知识库 -> (索引, 内容版本)
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._rw_locks: Dict[str, _RWLock] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+        max_workers = max_workers or min(8, (os.cpu_count() or 1) + 4)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kb-query")
+        # LLM 生成耗时较长，单独的线程池避免占满检索线程
+        self.llm_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kb-llm")
+
+        self._llm = None
+        self._llm_loaded = False
+        self._stats = {"queries": 0, "index_loads": 0, "evictions": 0, "busy_rejections": 0, "updates": 0}
+
+    # ---------- 索引 ----------
+
+    def _kb_path(self, kb_name: str) -> str:
+        return os.path.join(self.base_path, kb_name)
+
+    def _rw_lock(self, kb_name: str) -> _RWLock:
+        with self._lock:
+            return self._rw_locks.setdefault(kb_name, _RWLock())
+
+    def get_index(self, kb_name: str):
+        """获取常驻索引，未加载或知识库版本已变化（被重建/追加）时加载（同一知识库并发请求只加载一次）"""
+        persist_dir = self._kb_path(kb_name)
+        version = get_kb_version(persist_dir)
+        with self._lock:
+            cached = self._indexes.get(kb_name)
+            if cached is not None and cached[1] == version:
+                self._indexes.move_to_end(kb_name)
+                return cached[0]
+            load_lock = self._load_locks.setdefault(kb_name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                cached = self._indexes.get(kb_name)
+                if cached is not None and cached[1] == version:
+                    return cached[0]
+
+            if not os.path.exists(os.path.join(persist_dir, "docstore.json")):
+                raise FileNotFoundError(f"知识库 '{kb_name}' 不存在或尚未构建索引")
+
+            from llama_index.core import load_index_from_storage
+            from src.kb.npy_vector_store import load_storage_context
+            model_name = _read_kb_embed_model(persist_dir, self.default_embed_model)
+            with self._models_lock:
+                embed_model = self._models.get_embed_model(model_name)
+            storage_context = load_storage_context(persist_dir)
+            index = load_index_from_storage(storage_context, embed_model=embed_model)
+
+            with self._lock:
+                self._indexes[kb_name] = (index, version)
+                self._indexes.move_to_end(kb_name)
+                self._stats["index_loads"] += 1
+                while len(self._indexes) > self.max_kbs:
+                    self._indexes.popitem(last=False)
+                    self._stats["evictions"] += 1
+            return index
+
+    def invalidate(self, kb_name: str):
+        """卸载常驻索引（知识库被删除后调用；重建/追加由版本号自动检测）"""
+        with self._lock:
+            self._indexes.pop(kb_name, None)
+
+    def loaded_kbs(self) -> List[str]:
+        with self._lock:
+            return list(self._indexes)
+
+    # ---------- 检索与生成（同步，在线程池中执行） ----------
+
+    def retrieve(self, kb_name: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """检索单个知识库"""
+        index = self.get_index(kb_name)
+        rw_lock = self._rw_lock(kb_name)
+        rw_lock.acquire_read()
+        try:
+            nodes = index.as_retriever(similarity_top_k=top_k).retrieve(query)
+        finally:
+            rw_lock.release_read()
+        self._stats["queries"] += 1
+        return [node_to_result(kb_name, node) for node in nodes[:top_k]]
+
+    def embed_query(self, kb_name: str, query: str) -> List[float]:
+        """用知识库自身的嵌入模型向量化查询（语义查询缓存使用）"""
+        index = self.get_index(kb_name)
+        return index._embed_model.get_query_embedding(query)
+
+    def get_llm(self):
+        """按配置加载共享 LLM，失败时返回 None"""
+        if not self._llm_loaded:
+            with self._models_lock:
+                if not self._llm_loaded:
+                    try:
+                        from src.utils.model_manager import load_llm_model
+                        self._llm = load_llm_model(
+                            self.config.get('llm_provider', 'Ollama'),
+                            self.config.get('llm_model', ''),
+                            self.config.get('llm_key', ''),
+                            self.config.get('llm_url', ''),
+                            temperature=self.config.get('temperature', 0.7),
+                        )
+                    except Exception:
+                        self._llm = None
+                    self._llm_loaded = True
+        return self._llm
+
+    @staticmethod
+    def fallback_answer(results: List[Dict[str, Any]]) -> str:
+        """LLM 不可用时直接返回最相关的片段"""
+        if not results:
+            return "知识库中未找到相关内容"
+        return "\n\n".join(f"[{i}] {r['content']}" for i, r in enumerate(results[:3], 1))
+
+    def answer(self, query: str, results: List[Dict[str, Any]]) -> str:
+        llm = self.get_llm()
+        if llm is None or not results:
+            return self.fallback_answer(results)
+        return llm.complete(build_answer_prompt(query, results)).text
+
+    def stream_answer(self, query: str, results: List[Dict[str, Any]]) -> Iterator[str]:
+        """逐段产出回答文本"""
+        llm = self.get_llm()
+        if llm is None or not results:
+            yield self.fallback_answer(results)
+            return
+        for chunk in llm.stream_complete(build_answer_prompt(query, results)):
+            if chunk.delta:
+                yield chunk.delta
+
+    # ---------- 增量写入 ----------
+
+    def update_files(self, kb_name: str, file_paths: List[str], use_ocr: bool = True) -> Tuple[List[str], List[str]]:
+        """把文件写入常驻索引并持久化，已存在的同名/同路径文件先删除旧片段
+
+        清单、文件元数据和增量哈希与 IndexBuilder 构建时一样登记，之后的 DELTA/APPEND
+        构建不会把这些文件当作新文件重复入库。
+
+        Returns:
+            (成功的文件, 失败的文件)
+        """
+        from llama_index.core import Settings
+        from llama_index.core.ingestion import run_transformations
+        from src.file_processor import FileProcessResult, _load_single_file, _record_file_result
+        from src.kb.bm25_index import BM25Index
+        from src.processors.index_builder import load_file_map, record_indexed_files
+
+        index = self.get_index(kb_name)
+        persist_dir = self._kb_path(kb_name)
+
+        docs, processed, failed = [], [], []
+        file_records = {}  # 文件路径 -> (doc_ids, 正文开头样本)
+        result = FileProcessResult()
+        for file_path in file_paths:
+            file_docs = _record_file_result(
+                _load_single_file((file_path, os.path.basename(file_path), os.path.splitext(file_path)[1].lower()),
+                                  use_ocr=use_ocr),
+                result
+            )
+            if file_docs:
+                docs.extend(file_docs)
+                processed.append(file_path)
+                sample = next((d.text[:1000] for d in file_docs if d.text.strip()), "")
+                file_records[file_path] = ([d.doc_id for d in file_docs], sample)
+            else:
+                failed.append(file_path)
+
+        # 切分和向量化不需要独占索引
+        nodes = run_transformations(docs, Settings.transformations) if docs else []
+
+        rw_lock = self._rw_lock(kb_name)
+        rw_lock.acquire_write()
+        try:
+            bm25 = BM25Index(persist_dir) if BM25Index.exists(persist_dir) else None
+            file_map = load_file_map(persist_dir)
+            # 清单按文件名登记 doc_ids（与增量构建相同）；另按路径兜底清理未登记的旧片段
+            stale = {ref_doc_id for p in processed
+                     for ref_doc_id in file_map.get(os.path.basename(p), {}).get('doc_ids', [])}
+            targets = {os.path.abspath(p) for p in processed}
+            for ref_doc_id, info in list(index.ref_doc_info.items()):
+                file_path = (info.metadata or {}).get('file_path')
+                if ref_doc_id in stale or (file_path and os.path.abspath(file_path) in targets):
+                    if bm25 is not None:
+                        bm25.delete(info.node_ids)
+                    index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+
+            if nodes:
+                index.insert_nodes(nodes)
+                if bm25 is not None:
+                    bm25.add_nodes(nodes)
+            index.storage_context.persist(persist_dir)
+            if bm25 is not None:
+                bm25.commit()
+            record_indexed_files(persist_dir, file_map, file_records)
+            version = bump_kb_version(persist_dir)
+            with self._lock:
+                # 常驻索引已是最新内容，记录新版本避免重新加载
+                if kb_name in self._indexes:
+                    self._indexes[kb_name] = (index, version)
+        finally:
+            rw_lock.release_write()
+
+        self._stats["updates"] += 1
+        return processed, failed
+
+    # ---------- 异步入口 ----------
+
+    def _slot(self, kb_name: str) -> asyncio.Semaphore:
+        with self._lock:
+            sem = self._slots.get(kb_name)
+            if sem is None:
+                sem = self._slots[kb_name] = asyncio.Semaphore(self.max_concurrency_per_kb)
+            return sem
+
+    async def run_limited(self, kb_name: str, func: Callable, *args):
+        """在知识库并发限额内，把检索放到线程池执行"""
+        sem = self._slot(kb_name)
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["busy_rejections"] += 1
+            raise KBBusyError(f"知识库 '{kb_name}' 并发请求过多，请稍后重试")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            sem.release()
+
+    async def astream_answer(self, query: str, results: List[Dict[str, Any]]):
+        """在线程池中生成回答，异步逐段产出（客户端断开时停止生成）"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for token in self.stream_answer(query, results):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, token)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        loop.run_in_executor(self.llm_executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "loaded_kbs": self.loaded_kbs(),
+            "max_kbs": self.max_kbs,
+            "max_concurrency_per_kb": self.max_concurrency_per_kb,
+            "llm_loaded": self._llm is not None,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+        self.llm_executor.shutdown(wait=False)
+
+
+_registry: Optional[KBRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_kb_registry(base_path: str = "vector_db_storage", **kwargs) -> KBRegistry:
+    """获取进程级共享的知识库注册表"""
+    global _registry
+    with _registry_lock:
+        if _registry is None or _registry.base_path != base_path:
+            if _registry is not None:
+                _registry.shutdown()
+            _registry = KBRegistry(base_path=base_path, **kwargs)
+        return _registry
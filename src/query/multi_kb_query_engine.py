@@ -1,84 +1,28 @@
 #!/usr/bin/env python3
 """
-多知识库联合问答系统 - 多进程优化版
-支持同时查询多个知识库并整合结果，使用多进程避免GIL限制
+多知识库联合问答系统 - 常驻进程池版
+支持同时查询多个知识库并整合结果：检索由常驻进程池完成（模型和索引常驻），
+各知识库的检索结果按分数合并后只调用一次 LLM 生成答案
 """
 
 import streamlit as st
-from typing import List, Dict, Any, Optional, Tuple
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
 import time
 import multiprocessing as mp
 from pathlib import Path
-import os
-
-def query_single_kb_worker(kb_name: str, query: str, top_k: int = 3) -> Dict[str, Any]:
-    """
-    单个知识库查询工作函数 - 用于多进程
-    必须是顶级函数才能被pickle序列化
-    """
-    try:
-        # 在子进程中导入，避免序列化问题
-        import sys
-        import os
-        
-        # 添加项目路径
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        if project_root not in sys.path:
-            sys.path.insert(0, project_root)
-        
-        from src.rag_engine import create_rag_engine
-        
-        # 创建查询引擎
-        rag_engine = create_rag_engine(kb_name)
-        if not rag_engine:
-            return {
-                "kb_name": kb_name,
-                "success": False,
-                "error": "无法创建查询引擎",
-                "results": []
-            }
-        
-        # 执行查询
-        query_engine = rag_engine.get_query_engine()
-        response = query_engine.query(query)
-        
-        # 提取源文档信息
-        source_nodes = getattr(response, 'source_nodes', [])
-        results = []
-        
-        for node in source_nodes[:top_k]:
-            results.append({
-                "content": node.text[:500] + "..." if len(node.text) > 500 else node.text,
-                "score": getattr(node, 'score', 0.0),
-                "metadata": getattr(node, 'metadata', {}),
-                "source": getattr(node.metadata, 'file_name', 'Unknown') if hasattr(node, 'metadata') else 'Unknown'
-            })
-        
-        return {
-            "kb_name": kb_name,
-            "success": True,
-            "answer": str(response),
-            "results": results,
-            "query_time": time.time()
-        }
-        
-    except Exception as e:
-        return {
-            "kb_name": kb_name,
-            "success": False,
-            "error": str(e),
-            "results": []
-        }
 
 class MultiKBQueryEngine:
-    """多知识库联合查询引擎 - 多进程优化版"""
+    """多知识库联合查询引擎 - 常驻进程池版"""
     
-    def __init__(self):
-        self.base_path = "vector_db_storage"
+    def __init__(self, base_path: str = "vector_db_storage"):
+        self.base_path = base_path
         # 获取CPU核心数，但限制最大进程数
         self.max_workers = min(mp.cpu_count(), 4)
     
+    def _get_pool(self, **kwargs):
+        from src.query.kb_engine_pool import get_kb_engine_pool
+        return get_kb_engine_pool(self.base_path, num_workers=self.max_workers, **kwargs)
+    
     def get_available_kbs(self) -> List[str]:
         """获取可用的知识库列表"""
         try:
@@ -98,62 +42,44 @@ class MultiKBQueryEngine:
             return []
     
     def query_multiple_kbs(self, kb_names: List[str], query: str, 
-                          top_k_per_kb: int = 3, max_workers: Optional[int] = None) -> Dict[str, Any]:
-        """并行查询多个知识库 - 使用多进程"""
+                          top_k_per_kb: int = 3, synthesize: bool = True,
+                          **pool_kwargs) -> Dict[str, Any]:
+        """
+        并行检索多个知识库并按分数合并
+        
+        Args:
+            kb_names: 知识库名称列表
+            query: 查询问题
+            top_k_per_kb: 每个知识库返回的片段数
+            synthesize: 是否基于合并结果调用一次 LLM 生成答案
+            pool_kwargs: 常驻检索池的嵌入模型配置（进程池在首次创建时确定）
+        """
         if not kb_names:
             return {"success": False, "error": "未选择知识库"}
         
         start_time = time.time()
-        results = {}
-        
-        # 确定进程数
-        if max_workers is None:
-            max_workers = min(self.max_workers, len(kb_names))
-        else:
-            max_workers = min(max_workers, len(kb_names), self.max_workers)
+        pool = self._get_pool(**pool_kwargs)
         
         try:
-            # 使用多进程池
-            with ProcessPoolExecutor(max_workers=max_workers) as executor:
-                # 提交查询任务
-                future_to_kb = {
-                    executor.submit(query_single_kb_worker, kb_name, query, top_k_per_kb): kb_name 
-                    for kb_name in kb_names
-                }
-                
-                # 收集结果
-                for future in as_completed(future_to_kb, timeout=60):  # 总超时60秒
-                    kb_name = future_to_kb[future]
-                    try:
-                        result = future.result(timeout=30)  # 单个任务30秒超时
-                        results[kb_name] = result
-                    except Exception as e:
-                        results[kb_name] = {
-                            "kb_name": kb_name,
-                            "success": False,
-                            "error": f"查询超时或失败: {str(e)}",
-                            "results": []
-                        }
-        
+            results = pool.retrieve(kb_names, query, top_k_per_kb=top_k_per_kb)
         except Exception as e:
-            # 如果多进程失败，回退到单线程模式
-            st.warning("⚠️ 多进程查询失败，回退到单线程模式")
-            for kb_name in kb_names:
-                try:
-                    result = self._query_single_kb_fallback(kb_name, query, top_k_per_kb)
-                    results[kb_name] = result
-                except Exception as kb_error:
-                    results[kb_name] = {
-                        "kb_name": kb_name,
-                        "success": False,
-                        "error": f"查询失败: {str(kb_error)}",
-                        "results": []
-                    }
+            results = {
+                kb_name: {
+                    "kb_name": kb_name,
+                    "success": False,
+                    "error": f"查询失败: {str(e)}",
+                    "results": []
+                } for kb_name in kb_names
+            }
         
-        # 整合结果
-        total_time = time.time() - start_time
         successful_queries = [r for r in results.values() if r["success"]]
+        merged = self.merge_results(results, top_k=max(top_k_per_kb, 5))
         
+        answer = None
+        if synthesize and merged:
+            answer = self.synthesize_answer(query, merged)
+        
+        total_time = time.time() - start_time
         return {
             "success": len(successful_queries) > 0,
             "query": query,
@@ -161,81 +87,75 @@ class MultiKBQueryEngine:
             "successful_count": len(successful_queries),
             "total_time": total_time,
             "results": results,
-            "used_multiprocessing": True
+            "merged_results": merged,
+            "answer": answer,
+            "used_multiprocessing": pool.use_processes
         }
     
-    def _query_single_kb_fallback(self, kb_name: str, query: str, top_k: int = 3) -> Dict[str, Any]:
-        """单线程回退查询方法"""
+    @staticmethod
+    def merge_results(results: Dict[str, Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
+        """把各知识库的检索片段按分数统一排序，取全局 top_k"""
+        all_docs = []
+        for result in results.values():
+            if result.get("success"):
+                all_docs.extend(result.get("results", []))
+        all_docs.sort(key=lambda d: d.get("score", 0.0), reverse=True)
+        return all_docs[:top_k]
+    
+    def synthesize_answer(self, query: str, merged_results: List[Dict[str, Any]]) -> Optional[str]:
+        """基于合并后的片段调用一次 LLM 生成答案"""
         try:
-            from src.rag_engine import create_rag_engine
-            
-            rag_engine = create_rag_engine(kb_name)
-            if not rag_engine:
-                return {
-                    "kb_name": kb_name,
-                    "success": False,
-                    "error": "无法创建查询引擎",
-                    "results": []
-                }
-            
-            query_engine = rag_engine.get_query_engine()
-            response = query_engine.query(query)
-            
-            source_nodes = getattr(response, 'source_nodes', [])
-            results = []
-            
-            for node in source_nodes[:top_k]:
-                results.append({
-                    "content": node.text[:500] + "..." if len(node.text) > 500 else node.text,
-                    "score": getattr(node, 'score', 0.0),
-                    "metadata": getattr(node, 'metadata', {}),
-                    "source": getattr(node.metadata, 'file_name', 'Unknown') if hasattr(node, 'metadata') else 'Unknown'
-                })
-            
-            return {
-                "kb_name": kb_name,
-                "success": True,
-                "answer": str(response),
-                "results": results,
-                "query_time": time.time()
-            }
+            from llama_index.core import Settings
+            llm = Settings.llm
+            if llm is None:
+                return None
             
-        except Exception as e:
-            return {
-                "kb_name": kb_name,
-                "success": False,
-                "error": str(e),
-                "results": []
-            }
+            from src.query.kb_engine_pool import build_answer_prompt
+            return llm.complete(build_answer_prompt(query, merged_results)).text
+        except Exception:
+            return None
+    
+    def query(self, query: str, kb_names: List[str], embed_provider: str = None,
+              embed_model: str = None, embed_key: str = "", embed_url: str = "") -> str:
+        """查询多个知识库并返回整合答案文本（embed_model 用于未记录嵌入模型的知识库）"""
+        results = self.query_multiple_kbs(
+            kb_names, query,
+            embed_provider=embed_provider, embed_model=embed_model, embed_key=embed_key, embed_url=embed_url
+        )
+        return self.generate_integrated_answer(results)
     
     def generate_integrated_answer(self, multi_kb_results: Dict[str, Any]) -> str:
         """生成整合答案"""
         if not multi_kb_results["success"]:
             return "查询失败，请检查知识库状态。"
         
-        successful_results = [r for r in multi_kb_results["results"].values() if r["success"]]
-        
-        if not successful_results:
+        merged = multi_kb_results.get("merged_results") or []
+        if not merged:
             return "未找到相关信息。"
         
-        # 构建整合答案
-        integrated_answer = f"**基于 {len(successful_results)} 个知识库的查询结果：**\n\n"
+        integrated_answer = f"**基于 {multi_kb_results['successful_count']} 个知识库的查询结果：**\n\n"
         
-        for i, result in enumerate(successful_results, 1):
-            kb_name = result["kb_name"]
-            answer = result.get("answer", "无答案")
-            
-            integrated_answer += f"### 📚 知识库 {i}: {kb_name}\n"
+        answer = multi_kb_results.get("answer")
+        if answer:
             integrated_answer += f"{answer}\n\n"
+        else:
+            # LLM 不可用时直接给出最相关片段
+            for i, doc in enumerate(merged, 1):
+                integrated_answer += f"**{i}.** {doc['content']}\n\n"
+        
+        # 引用来源（按合并后的分数排序）
+        integrated_answer += "**📚 参考来源：**\n"
+        for i, doc in enumerate(merged, 1):
+            integrated_answer += f"{i}. {doc.get('kb_name', '')} / {doc.get('source', 'Unknown')} (相关度: {doc.get('score', 0.0):.3f})\n"
         
         # 添加统计信息
-        integrated_answer += f"---\n"
+        integrated_answer += f"\n---\n"
         integrated_answer += f"**查询统计**: {multi_kb_results['successful_count']}/{multi_kb_results['kb_count']} 个知识库响应成功，"
         integrated_answer += f"耗时 {multi_kb_results['total_time']:.2f} 秒"
         
         # 添加性能信息
         if multi_kb_results.get("used_multiprocessing"):
-            integrated_answer += f"，使用多进程加速"
+            integrated_answer += f"，使用常驻进程池"
         
         return integrated_answer
 
@@ -284,30 +204,16 @@ class MultiKBInterface:
     def render_query_options(self) -> Dict[str, Any]:
         """渲染查询选项"""
         with st.expander("🔧 查询设置", expanded=False):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                top_k_per_kb = st.slider(
-                    "每个知识库返回结果数",
-                    min_value=1,
-                    max_value=10,
-                    value=3,
-                    key="top_k_per_kb"
-                )
-            
-            with col2:
-                max_workers = st.slider(
-                    "并发进程数",
-                    min_value=1,
-                    max_value=min(mp.cpu_count(), 4),
-                    value=min(mp.cpu_count(), 3),
-                    key="max_workers",
-                    help=f"当前系统有 {mp.cpu_count()} 个CPU核心"
-                )
+            top_k_per_kb = st.slider(
+                "每个知识库返回结果数",
+                min_value=1,
+                max_value=10,
+                value=3,
+                key="top_k_per_kb"
+            )
         
         return {
-            "top_k_per_kb": top_k_per_kb,
-            "max_workers": max_workers
+            "top_k_per_kb": top_k_per_kb
         }
     
     def render_results(self, multi_kb_results: Dict[str, Any]):
@@ -343,10 +249,10 @@ class MultiKBInterface:
     def render_interface(self):
         """渲染完整界面"""
         st.title("🔍 多知识库联合问答")
-        st.markdown("同时查询多个知识库，获得更全面的答案（多进程加速）")
+        st.markdown("同时查询多个知识库，获得更全面的答案（常驻进程池加速）")
         
         # 性能提示
-        st.info(f"💡 系统检测到 {mp.cpu_count()} 个CPU核心，将使用多进程并行查询以获得最佳性能")
+        st.info(f"💡 系统检测到 {mp.cpu_count()} 个CPU核心，知识库索引和模型常驻于进程池，重复查询无需重新加载")
         
         # 知识库选择
         selected_kbs = self.render_kb_selector()
@@ -369,13 +275,12 @@ class MultiKBInterface:
         # 查询按钮
         if st.button("🔍 开始查询", type="primary", disabled=not query.strip()):
             if query.strip():
-                with st.spinner(f"正在使用 {query_options['max_workers']} 个进程并行查询 {len(selected_kbs)} 个知识库..."):
+                with st.spinner(f"正在并行查询 {len(selected_kbs)} 个知识库..."):
                     # 执行查询
                     results = self.query_engine.query_multiple_kbs(
                         selected_kbs,
                         query.strip(),
-                        query_options["top_k_per_kb"],
-                        query_options["max_workers"]
+                        query_options["top_k_per_kb"]
                     )
                     
                     # 显示结果
@@ -9,6 +9,7 @@ import streamlit as st
 from llama_index.core import Settings, load_index_from_storage, StorageContext
 
 from src.app_logging import LogManager
+from src.kb.npy_vector_store import load_storage_context
 from src.utils.memory import cleanup_memory
 from src.utils.model_manager import load_embedding_model, load_llm_model
 from src.chat import HistoryManager
@@ -64,7 +65,7 @@ class QueryHandler:
                             Settings.embed_model = embed
             
             # 加载向量索引
-            storage_context = StorageContext.from_defaults(persist_dir=db_path)
+            storage_context = load_storage_context(db_path)
             index = load_index_from_storage(storage_context)
             
             # 创建查询引擎
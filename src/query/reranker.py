@@ -0,0 +1,268 @@
+"""
+常驻重排序服务 - 每个交叉编码器模型在进程内只加载一次，所有会话共享
+  - 并发请求的 (查询, 片段) 对在几毫秒内合并成一次批量打分
+  - 打分按 (查询哈希, 节点 ID) 缓存，追问中反复出现的片段不再重新计算
+  - CPU 部署可开启截断/提前退出：只重排检索靠前的候选，并按检索顺序分段打分，
+    某一段打完后前 top_n 没有变化即停止
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.callbacks import CBEventType, EventPayload
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from src.utils.embedding_cache import normalize_text
+
+PredictFn = Callable[[List[Tuple[str, str]]], Sequence[float]]
+
+DEFAULT_RERANK_MODEL = "BAAI/bge-reranker-base"
+MAX_LENGTH = 512
+
+
+def query_hash(query: str) -> bytes:
+    return hashlib.blake2b(normalize_text(query).encode("utf-8"), digest_size=12).digest()
+
+
+class CrossEncoderScorer:
+    """单个交叉编码器模型：跨请求合批打分 + 打分缓存"""
+
+    def __init__(self, model_name: str, device: Optional[str] = None, predict_fn: Optional[PredictFn] = None,
+                 max_batch_pairs: int = 64, max_wait_ms: float = 3.0, cache_size: int = 50_000):
+        """
+        Args:
+            model_name: 交叉编码器模型名
+            device: 运行设备，None 时自动选择
+            predict_fn: 批量打分函数，None 时加载 sentence-transformers CrossEncoder
+            max_batch_pairs: 单次前向的最大 (查询, 片段) 对数
+            max_wait_ms: 第一个请求到达后最多等待多久凑批
+            cache_size: 缓存的打分条数
+        """
+        self.model_name = model_name
+        self.device = device
+        self.max_batch_pairs = max(1, max_batch_pairs)
+        self.max_wait_ms = max_wait_ms
+        self.cache_size = cache_size
+        self._predict = predict_fn
+        self._load_lock = threading.Lock()
+
+        self._cond = threading.Condition()
+        self._scores: "OrderedDict[Tuple[bytes, str], float]" = OrderedDict()
+        self._queue: Deque[Tuple[List[Tuple[str, str]], Future, float]] = deque()
+        self._worker: Optional[threading.Thread] = None
+        self._stats = {"requests": 0, "pairs": 0, "cache_hits": 0, "scored": 0, "batches": 0}
+
+    def load(self):
+        """加载模型（已加载时立即返回）"""
+        if self._predict is not None:
+            return
+        with self._load_lock:
+            if self._predict is not None:
+                return
+            from sentence_transformers import CrossEncoder
+            from llama_index.core.utils import infer_torch_device
+            self.device = self.device or infer_torch_device()
+            model = CrossEncoder(self.model_name, max_length=MAX_LENGTH, device=self.device,
+                                 trust_remote_code=True)
+            self._predict = lambda pairs: model.predict(pairs, batch_size=self.max_batch_pairs,
+                                                        show_progress_bar=False)
+
+    @property
+    def on_cpu(self) -> bool:
+        self.load()
+        return (self.device or "cpu") == "cpu"
+
+    def score(self, query: str, items: Sequence[Tuple[str, str]]) -> List[float]:
+        """给 (节点 ID, 文本) 打分，返回与 items 对应的分数"""
+        qh = query_hash(query)
+        scores: List[Optional[float]] = [None] * len(items)
+        missing = []
+        with self._cond:
+            self._stats["requests"] += 1
+            self._stats["pairs"] += len(items)
+            for i, (node_id, _) in enumerate(items):
+                cached = self._scores.get((qh, node_id))
+                if cached is not None:
+                    self._scores.move_to_end((qh, node_id))
+                    scores[i] = cached
+                else:
+                    missing.append(i)
+            self._stats["cache_hits"] += len(items) - len(missing)
+        if not missing:
+            return scores
+
+        self.load()
+        future = Future()
+        with self._cond:
+            self._queue.append(([(query, items[i][1]) for i in missing], future, time.perf_counter()))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"rerank:{self.model_name}", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+        computed = future.result()
+
+        with self._cond:
+            for i, value in zip(missing, computed):
+                scores[i] = value
+                self._scores[(qh, items[i][0])] = value
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+        return scores
+
+    def _next_batch(self) -> List[Tuple[List[Tuple[str, str]], Future, float]]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0][2] + self.max_wait_ms / 1000
+            while sum(len(pairs) for pairs, _, _ in self._queue) < self.max_batch_pairs:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            # 至少取一个请求；其余请求不超过单批上限
+            batch, total = [], 0
+            while self._queue and (not batch or total + len(self._queue[0][0]) <= self.max_batch_pairs):
+                request = self._queue.popleft()
+                batch.append(request)
+                total += len(request[0])
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            pairs = [pair for request_pairs, _, _ in batch for pair in request_pairs]
+            try:
+                flat = [float(s) for s in self._predict(pairs)]
+                error = None
+            except Exception as e:
+                flat, error = None, e
+            with self._cond:
+                self._stats["batches"] += 1
+                if error is None:
+                    self._stats["scored"] += len(pairs)
+            offset = 0
+            for request_pairs, future, _ in batch:
+                if error is None:
+                    future.set_result(flat[offset:offset + len(request_pairs)])
+                else:
+                    future.set_exception(error)
+                offset += len(request_pairs)
+
+    def clear(self):
+        with self._cond:
+            self._scores.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["cached_scores"] = len(self._scores)
+        stats["cache_hit_rate"] = stats["cache_hits"] / stats["pairs"] if stats["pairs"] else 0.0
+        stats["avg_batch"] = stats["scored"] / stats["batches"] if stats["batches"] else 0.0
+        stats["device"] = self.device
+        return stats
+
+
+class SharedRerank(BaseNodePostprocessor):
+    """使用常驻交叉编码器的重排序后处理器（替代 SentenceTransformerRerank）"""
+
+    model: str = Field(description="交叉编码器模型名")
+    top_n: int = Field(description="返回的节点数")
+    keep_retrieval_score: bool = Field(default=False, description="是否在元数据中保留检索分数")
+    candidate_limit: Optional[int] = Field(default=None, description="只重排检索前 N 个候选")
+    early_exit: bool = Field(default=False, description="按检索顺序分段打分，前 top_n 稳定后停止")
+    _scorer: Any = PrivateAttr()
+
+    def __init__(self, top_n: int = 3, model: str = DEFAULT_RERANK_MODEL, keep_retrieval_score: bool = False,
+                 candidate_limit: Optional[int] = None, early_exit: bool = False,
+                 scorer: Optional[CrossEncoderScorer] = None):
+        super().__init__(top_n=top_n, model=model, keep_retrieval_score=keep_retrieval_score,
+                         candidate_limit=candidate_limit, early_exit=early_exit)
+        self._scorer = scorer or get_rerank_scorer(model)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SharedRerank"
+
+    @classmethod
+    def for_deployment(cls, top_n: int = 3, model: str = DEFAULT_RERANK_MODEL, **kwargs) -> "SharedRerank":
+        """加载（或复用）模型；运行在 CPU 上时自动开启截断和提前退出"""
+        scorer = get_rerank_scorer(model)
+        if scorer.on_cpu:
+            kwargs.setdefault("candidate_limit", top_n * 3)
+            kwargs.setdefault("early_exit", True)
+        return cls(top_n=top_n, model=model, scorer=scorer, **kwargs)
+
+    @property
+    def scorer(self) -> CrossEncoderScorer:
+        return self._scorer
+
+    def _score_nodes(self, query: str, nodes: List[NodeWithScore]) -> List[float]:
+        items = [(n.node.node_id, n.node.get_content(metadata_mode=MetadataMode.EMBED)) for n in nodes]
+        if not self.early_exit or len(nodes) <= self.top_n:
+            return self._scorer.score(query, items)
+
+        # 分段打分：首段 top_n 个，此后每段 top_n 个；某段未改变前 top_n 即停止
+        scores: List[float] = []
+        top_ids = None
+        for start in range(0, len(items), self.top_n):
+            scores.extend(self._scorer.score(query, items[start:start + self.top_n]))
+            ranked = sorted(range(len(scores)), key=lambda i: -scores[i])[:self.top_n]
+            current = set(ranked)
+            if top_ids is not None and current == top_ids:
+                break
+            top_ids = current
+        return scores
+
+    def _postprocess_nodes(self, nodes: List[NodeWithScore],
+                           query_bundle: Optional[QueryBundle] = None) -> List[NodeWithScore]:
+        if query_bundle is None:
+            raise ValueError("Missing query bundle in extra info.")
+        if not nodes:
+            return []
+
+        candidates = nodes[:self.candidate_limit] if self.candidate_limit else nodes
+        with self.callback_manager.event(
+            CBEventType.RERANKING,
+            payload={
+                EventPayload.NODES: nodes,
+                EventPayload.MODEL_NAME: self.model,
+                EventPayload.QUERY_STR: query_bundle.query_str,
+                EventPayload.TOP_K: self.top_n,
+            },
+        ) as event:
+            scores = self._score_nodes(query_bundle.query_str, candidates)
+            scored = candidates[:len(scores)]
+            for node, score in zip(scored, scores):
+                if self.keep_retrieval_score:
+                    node.node.metadata["retrieval_score"] = node.score
+                node.score = score
+            new_nodes = sorted(scored, key=lambda x: -x.score if x.score else 0)[:self.top_n]
+            event.on_end(payload={EventPayload.NODES: new_nodes})
+        return new_nodes
+
+
+_scorers: Dict[str, CrossEncoderScorer] = {}
+_lock = threading.Lock()
+
+
+def get_rerank_scorer(model_name: str = DEFAULT_RERANK_MODEL, **kwargs) -> CrossEncoderScorer:
+    """获取进程级共享的交叉编码器（每个模型一个，首次打分或调用 load() 时加载）"""
+    with _lock:
+        scorer = _scorers.get(model_name)
+        if scorer is None:
+            scorer = CrossEncoderScorer(model_name, **kwargs)
+            _scorers[model_name] = scorer
+        return scorer
+
+
+def get_rerank_stats() -> Dict[str, Dict[str, Any]]:
+    """监控使用：各重排序模型的统计"""
+    with _lock:
+        scorers = dict(_scorers)
+    return {name: scorer.get_stats() for name, scorer in scorers.items()}
@@ -15,6 +15,7 @@ from llama_index.core import (
     PromptTemplate
 )
 from llama_index.core.schema import Document
+from src.kb.npy_vector_store import load_storage_context, new_storage_context
 
 
 class RAGEngine:
@@ -65,7 +66,7 @@ class RAGEngine:
             if self.logger:
                 self.logger.info(f"📂 加载现有索引: {self.kb_name}")
             
-            storage_context = StorageContext.from_defaults(persist_dir=self.persist_dir)
+            storage_context = load_storage_context(self.persist_dir)
             self.index = load_index_from_storage(storage_context)
             
             if self.logger:
@@ -123,6 +124,7 @@ class RAGEngine:
                 self.logger.info("🆕 创建新索引")
             self.index = VectorStoreIndex.from_documents(
                 documents,
+                storage_context=new_storage_context(),
                 show_progress=show_progress
             )
         
@@ -122,6 +122,9 @@ def monitor():
     last_net_io = psutil.net_io_counters()
     last_disk_io = psutil.disk_io_counters()
     last_time = time.time()
+    # interval=None 返回距上次调用的平均值（不阻塞），先调用一次建立基准
+    psutil.cpu_percent(interval=None)
+    psutil.cpu_percent(interval=None, percpu=True)
     
     try:
         while True:
@@ -150,9 +153,9 @@ def monitor():
                 print(f"   {format_bar(battery.percent, bar_type='battery')} {battery.percent:.0f}%")
             
             # CPU 信息
-            cpu_percent = psutil.cpu_percent(interval=1)
+            cpu_percent = psutil.cpu_percent(interval=None)
             cpu_count = psutil.cpu_count()
-            cpu_per_core = psutil.cpu_percent(interval=0, percpu=True)
+            cpu_per_core = psutil.cpu_percent(interval=None, percpu=True)
             cores_used = cpu_percent / 100 * cpu_count
             
             print(f"\n💻 CPU 使用率: {cpu_percent:5.1f}% ({cores_used:.1f}/{cpu_count} 核)")
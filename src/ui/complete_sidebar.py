@@ -6,6 +6,7 @@
 import streamlit as st
 import time
 import psutil
+from src.utils.metrics_sampler import get_metrics_sampler
 import subprocess
 import os
 from src.config import ConfigLoader
@@ -150,7 +151,8 @@ class CompleteSidebar:
             target_path = st.text_input("文档路径", placeholder="拖拽文件夹或输入路径...")
             
             # 处理模式
-            action_mode = st.radio("处理模式", ["NEW", "APPEND"], horizontal=True)
+            action_mode = st.radio("处理模式", ["NEW", "APPEND", "DELTA"], horizontal=True,
+                                   help="DELTA: 只处理新增/修改的文件，并删除已移除文件的片段")
             
             # 创建按钮
             btn_start = st.button("🚀 立即创建", type="primary", use_container_width=True)
@@ -177,7 +179,7 @@ class CompleteSidebar:
             auto_refresh = st.checkbox("🔄 自动刷新 (2秒)", value=False, key="monitor_auto_refresh")
             
             # 获取系统信息
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            cpu_percent = get_metrics_sampler().cpu_percent()
             mem = psutil.virtual_memory()
             disk = psutil.disk_usage('/System/Volumes/Data')
             
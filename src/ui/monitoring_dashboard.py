@@ -10,6 +10,8 @@ import os
 import threading
 from typing import Dict, Any
 
+from src.utils.metrics_sampler import get_metrics_sampler
+
 class MonitoringDashboard:
     """系统监控仪表盘"""
     
@@ -26,26 +28,16 @@ class MonitoringDashboard:
         
     def _get_system_stats(self) -> Dict[str, Any]:
         """获取系统资源统计"""
-        # CPU
-        cpu_percent = psutil.cpu_percent(interval=None)
-        
-        # 内存
-        mem = psutil.virtual_memory()
-        mem_percent = mem.percent
-        mem_used_gb = mem.used / (1024 ** 3)
-        mem_total_gb = mem.total / (1024 ** 3)
-        
-        # 进程信息
-        process = psutil.Process(os.getpid())
-        app_mem_mb = process.memory_info().rss / (1024 ** 2)
+        # 读取共享采样器的最新样本，不在渲染时调用 psutil
+        sample = get_metrics_sampler().latest()
         
         return {
-            'cpu_percent': cpu_percent,
-            'memory_percent': mem_percent,  # 修复键名以匹配测试
-            'mem_used_gb': mem_used_gb,
-            'mem_total_gb': mem_total_gb,
-            'app_mem_mb': app_mem_mb,
-            'timestamp': time.time()
+            'cpu_percent': sample.cpu_percent,
+            'memory_percent': sample.memory_percent,  # 修复键名以匹配测试
+            'mem_used_gb': sample.mem_used_gb,
+            'mem_total_gb': sample.mem_total_gb,
+            'app_mem_mb': sample.process_rss_mb,
+            'timestamp': sample.timestamp
         }
     
     def get_system_metrics(self) -> Dict[str, Any]:
@@ -116,6 +108,115 @@ class MonitoringDashboard:
             # active_threads = threading.active_count()
             # st.text(f"活跃线程: {active_threads}")
 
+    def _render_embedding_cache(self):
+        """嵌入缓存命中情况"""
+        try:
+            from src.utils.embedding_cache import get_embedding_cache_stats
+            cache_stats = get_embedding_cache_stats()
+        except Exception:
+            cache_stats = None
+        if not cache_stats:
+            return
+
+        st.markdown("##### 🧠 嵌入缓存")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("命中率", f"{cache_stats['hit_rate']:.1%}")
+        with col2:
+            st.metric("命中 / 未命中", f"{cache_stats['hits']} / {cache_stats['misses']}")
+        with col3:
+            st.metric("缓存条目", f"{cache_stats['entries']}")
+        with col4:
+            st.metric("占用空间", f"{cache_stats['size_mb']:.1f}/{cache_stats['max_size_mb']:.0f} MB")
+
+    def _render_query_embedding(self):
+        """查询向量化记忆化与合批情况"""
+        try:
+            from src.utils.query_embedding import get_query_embedding_stats
+            all_stats = get_query_embedding_stats()
+        except Exception:
+            all_stats = None
+        if not all_stats:
+            return
+
+        st.markdown("##### ⚡ 查询向量化")
+        for model_key, stats in all_stats.items():
+            st.caption(model_key)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("记忆命中率", f"{stats['memo_hit_rate']:.1%}")
+            with col2:
+                st.metric("请求 / 前向批次", f"{stats['requests']} / {stats['batches']}")
+            with col3:
+                st.metric("平均批大小", f"{stats['avg_batch']:.1f}")
+            with col4:
+                st.metric("平均凑批等待", f"{stats['avg_wait_ms']:.1f} ms")
+
+    def _render_rerank(self):
+        """重排序打分缓存与合批情况"""
+        try:
+            from src.query.reranker import get_rerank_stats
+            all_stats = get_rerank_stats()
+        except Exception:
+            all_stats = None
+        if not all_stats:
+            return
+
+        st.markdown("##### 🎯 重排序")
+        for model_name, stats in all_stats.items():
+            st.caption(f"{model_name} ({stats['device'] or '未加载'})")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("打分缓存命中率", f"{stats['cache_hit_rate']:.1%}")
+            with col2:
+                st.metric("请求 / 前向批次", f"{stats['requests']} / {stats['batches']}")
+            with col3:
+                st.metric("平均批大小", f"{stats['avg_batch']:.1f}")
+            with col4:
+                st.metric("缓存打分", f"{stats['cached_scores']}")
+
+    def _render_hybrid_retrieval(self):
+        """混合检索各路平均耗时"""
+        try:
+            from src.kb.hybrid_retriever import get_hybrid_retrieval_stats
+            stats = get_hybrid_retrieval_stats()
+        except Exception:
+            stats = None
+        if not stats or not stats['queries']:
+            return
+
+        st.markdown("##### 🔀 混合检索")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("查询次数", f"{stats['queries']}")
+        with col2:
+            st.metric("向量 / BM25", f"{stats['avg_vector_ms']:.1f} / {stats['avg_bm25_ms']:.1f} ms")
+        with col3:
+            st.metric("融合", f"{stats['avg_fusion_ms']:.1f} ms")
+        with col4:
+            st.metric("平均总耗时", f"{stats['avg_total_ms']:.1f} ms")
+
+    def _render_ocr_cache(self):
+        """OCR缓存命中情况"""
+        try:
+            from src.utils.ocr_cache import get_ocr_cache_stats
+            cache_stats = get_ocr_cache_stats()
+        except Exception:
+            cache_stats = None
+        if not cache_stats:
+            return
+
+        st.markdown("##### 🔍 OCR缓存")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("命中率", f"{cache_stats['hit_rate']:.1%}")
+        with col2:
+            st.metric("命中 / 未命中", f"{cache_stats['hits']} / {cache_stats['misses']}")
+        with col3:
+            st.metric("缓存页数", f"{cache_stats['entries']}")
+        with col4:
+            st.metric("占用空间", f"{cache_stats['size_mb']:.1f}/{cache_stats['max_size_mb']:.0f} MB")
+
     def render_full_dashboard(self):
         """渲染完整监控页面（用于独立Tab）"""
         st.markdown("##### 🖥️ 系统资源监控")
@@ -144,7 +245,13 @@ class MonitoringDashboard:
             st.line_chart(chart_data)
         else:
              st.info("⌛ 正在收集历史数据...")
-        
+
+        self._render_embedding_cache()
+        self._render_query_embedding()
+        self._render_rerank()
+        self._render_hybrid_retrieval()
+        self._render_ocr_cache()
+
         st.info("💡 提示: 高 CPU 使用率通常发生在文件解析或向量化阶段，属于正常现象。")
 
 
@@ -4,6 +4,7 @@
 
 import time
 import psutil
+from src.utils.metrics_sampler import get_metrics_sampler
 import torch
 import streamlit as st
 from datetime import datetime, timedelta
@@ -19,7 +20,7 @@ class PerformanceDashboard:
     def collect_metrics(self) -> Dict[str, Any]:
         """收集性能指标"""
         # CPU指标
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        cpu_percent = get_metrics_sampler().cpu_percent()
         cpu_per_core = psutil.cpu_percent(percpu=True)
         
         # 内存指标
@@ -6,6 +6,7 @@
 import streamlit as st
 import time
 import psutil
+from src.utils.metrics_sampler import get_metrics_sampler
 import subprocess
 from src.config import ConfigLoader
 from src.ui.config_forms import render_basic_config
@@ -118,7 +119,7 @@ class SidebarConfig:
             monitor_placeholder = st.empty()
             
             # 获取系统信息
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            cpu_percent = get_metrics_sampler().cpu_percent()
             mem = psutil.virtual_memory()
             disk = psutil.disk_usage('/System/Volumes/Data')
             
@@ -5,6 +5,7 @@
 import streamlit as st
 import time
 import psutil
+from src.utils.metrics_sampler import get_metrics_sampler
 import subprocess
 import platform
 
@@ -30,7 +31,7 @@ class ToolsUI:
 
             monitor_placeholder = st.empty()
 
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            cpu_percent = get_metrics_sampler().cpu_percent()
             mem = psutil.virtual_memory()
             disk = psutil.disk_usage('/')
 
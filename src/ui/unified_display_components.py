@@ -9,6 +9,8 @@ import psutil
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
+from src.utils.metrics_sampler import get_metrics_sampler
+
 class UnifiedDisplayRenderer:
     """统一显示渲染器"""
     
@@ -17,7 +19,7 @@ class UnifiedDisplayRenderer:
         col1, col2, col3 = st.columns(3)
         
         # CPU使用率
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = get_metrics_sampler().cpu_percent()
         with col1:
             st.metric(
                 label="🖥️ CPU使用率",
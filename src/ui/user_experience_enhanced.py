@@ -141,7 +141,8 @@ class UserExperienceEnhancer:
             
             # 快速状态检查
             import psutil
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            from src.utils.metrics_sampler import get_metrics_sampler
+            cpu_percent = get_metrics_sampler().cpu_percent()
             memory = psutil.virtual_memory()
             
             # 状态指示器
@@ -62,6 +62,12 @@ class WebToKBInterface:
                 help="如不填写，系统会根据网页内容自动生成合适的名称"
             )
             
+            incremental = st.checkbox(
+                "🔁 增量更新已有知识库",
+                value=False,
+                help="知识库已存在时只重新入库变化的网页（ETag/Last-Modified 条件请求），未变化的网页不下载、不解析"
+            )
+            
             exclude_patterns = st.text_area(
                 "🚫 排除链接模式（可选）",
                 placeholder="每行一个模式，支持通配符\n例如：*/admin/*\n*/login*",
@@ -77,7 +83,8 @@ class WebToKBInterface:
         
         # 开始抓取按钮
         if st.button("🚀 开始抓取并创建知识库", type="primary", disabled=not url):
-            self._execute_direct_crawl(url, max_depth, max_pages, kb_name, exclude_patterns, parser_type)
+            self._execute_direct_crawl(url, max_depth, max_pages, kb_name, exclude_patterns, parser_type,
+                                       incremental)
     
     def _render_keyword_search(self):
         """渲染关键词搜索界面"""
@@ -179,7 +186,8 @@ class WebToKBInterface:
             self._execute_keyword_search(keyword, selected_sites, max_pages_search, kb_name_search)
     
     def _execute_direct_crawl(self, url: str, max_depth: int, max_pages: int, 
-                             kb_name: str, exclude_patterns: str, parser_type: str):
+                             kb_name: str, exclude_patterns: str, parser_type: str,
+                             incremental: bool = False):
         """执行直接URL抓取"""
         # 处理排除模式
         exclude_list = []
@@ -200,7 +208,8 @@ class WebToKBInterface:
                 max_depth=max_depth,
                 max_pages=max_pages,
                 kb_name=kb_name if kb_name else None,
-                status_callback=status_callback
+                status_callback=status_callback,
+                incremental=incremental
             )
             
             progress_bar.progress(100)
@@ -251,6 +251,12 @@ class ResourceGuard:
             'status': self.throttler.get_status(),
         }
     
+    def check_current(self, gpu: float = 0, queue_sizes: Dict[str, int] = None) -> Dict:
+        """用共享采样器的最新 CPU/内存读数检查资源（不阻塞）"""
+        from src.utils.metrics_sampler import get_metrics_sampler
+        sample = get_metrics_sampler().latest()
+        return self.check_resources(sample.cpu_percent, sample.memory_percent, gpu, queue_sizes)
+    
     def should_pause_new_tasks(self) -> bool:
         """是否应该暂停新任务"""
         return self.throttler.throttle_level >= 3
@@ -13,6 +13,8 @@ import platform
 from datetime import datetime, timedelta
 from typing import Dict, List, Callable, Optional
 import logging  # 允许使用 - 系统告警专用
+
+from src.utils.metrics_sampler import get_metrics_sampler
 from src.app_logging.log_manager import LogManager
 
 try:
@@ -88,7 +90,7 @@ class AlertSystem:
     
     def check_system_status(self) -> Dict:
         """检查系统状态"""
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = get_metrics_sampler().cpu_percent()
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
         
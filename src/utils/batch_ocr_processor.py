@@ -7,6 +7,14 @@ from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Tuple
 import time
 
+from src.utils.ocr_cache import get_ocr_cache, image_digest
+from src.utils.ocr_engine_pool import get_ocr_engine_pool
+
+# Tesseract 识别参数（同时作为OCR缓存键的一部分）
+TESSERACT_LANG = 'chi_sim+eng'
+TESSERACT_CONFIG = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz一二三四五六七八九十百千万亿零壹贰叁肆伍陆柒捌玖拾佰仟萬億'
+OCR_CACHE_CONFIG = f"tesseract|lang={TESSERACT_LANG}|{TESSERACT_CONFIG}"
+
 class BatchOCRProcessor:
     """批量OCR处理器"""
     
@@ -29,96 +37,70 @@ class BatchOCRProcessor:
         if not self.ocr_tasks:
             return {}
         
+        # 已识别过的页面直接取缓存，只把未命中的页面交给OCR引擎
+        cache = get_ocr_cache()
+        digests = [image_digest(task['image']) for task in self.ocr_tasks]
+        cached = cache.get_many(digests, OCR_CACHE_CONFIG)
+        pending = []
+        for task, digest, text in zip(self.ocr_tasks, digests, cached):
+            if text is None:
+                task['digest'] = digest
+                pending.append(task)
+            else:
+                self.results.setdefault(task['task_id'], {})[task['page_idx']] = text
+        if len(pending) < len(self.ocr_tasks):
+            print(f"♻️  OCR缓存命中 {len(self.ocr_tasks) - len(pending)}/{len(self.ocr_tasks)} 页")
+        self.ocr_tasks = pending
+        if not self.ocr_tasks:
+            return self.results
+        
         print(f"🚀 批量OCR处理: {len(self.ocr_tasks)} 个页面，来自 {len(set(t['task_id'] for t in self.ocr_tasks))} 个文件")
         
         # 动态调整进程数
         from src.utils.ocr_optimizer import ocr_optimizer
         max_workers, strategy = ocr_optimizer.get_optimal_workers(len(self.ocr_tasks))
         
-        print(f"📊 {strategy}，使用 {max_workers} 进程并行处理")
+        print(f"📊 {strategy}，使用常驻OCR引擎并行处理")
         print(f"🛡️  CPU保护已启用，确保系统稳定运行")
         
         # 启动CPU监控
         ocr_optimizer.start_cpu_monitoring(max_workers)
         
         start_time = time.time()
-        temp_file = None  # 初始化临时文件变量
+        pool = get_ocr_engine_pool(TESSERACT_LANG, TESSERACT_CONFIG)
         
         try:
-            # 使用独立OCR工作脚本
-            import subprocess
-            import json
-            import tempfile
-            import os
-            
-            # 创建临时文件保存任务数据
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-                task_data = []
-                for task in self.ocr_tasks:
-                    # 将PIL Image转换为可序列化的格式
-                    import io
-                    import base64
-                    img_buffer = io.BytesIO()
-                    task['image'].save(img_buffer, format='PNG')
-                    img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-                    
-                    task_data.append({
-                        'task_id': task['task_id'],
-                        'page_idx': task['page_idx'],
-                        'image_data': img_base64
-                    })
-                
-                json.dump(task_data, f)
-                temp_file = f.name
-            
-            # 启动独立OCR工作进程
-            cmd = ['python', 'ocr_worker.py', temp_file, str(max_workers)]
-            
-            # 执行独立进程
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600, cwd='/Users/zhaosj/Documents/rag-pro-max')  # 减少超时时间
-            
-            # 检查紧急停止
-            if ocr_optimizer.should_emergency_stop():
-                print(f"🛑 检测到紧急停止信号，终止OCR处理")
-                return self.results
-            
-            if result.returncode == 0:
-                # 解析结果
-                ocr_results = json.loads(result.stdout.strip())
-                
-                # 整理结果
-                for result_item in ocr_results:
-                    task_id = result_item['task_id']
-                    page_idx = result_item['page_idx']
-                    text = result_item['text']
-                    
-                    if task_id not in self.results:
-                        self.results[task_id] = {}
-                    
-                    self.results[task_id][page_idx] = text
+            # 常驻引擎池按批次识别，每轮之间检查紧急停止
+            step = pool.batch_size * pool.workers
+            for begin in range(0, len(self.ocr_tasks), step):
+                if ocr_optimizer.should_emergency_stop():
+                    print(f"🛑 检测到紧急停止信号，终止OCR处理")
+                    return self.results
                 
-                elapsed = time.time() - start_time
-                pages_per_sec = len(self.ocr_tasks) / elapsed if elapsed > 0 else 0
+                round_tasks = self.ocr_tasks[begin:begin + step]
+                texts = pool.recognize([task['image'] for task in round_tasks])
                 
-                print(f"✅ 批量OCR完成: {elapsed:.1f}秒, {pages_per_sec:.1f}页/秒")
-                print(f"🛡️  CPU保护运行正常，系统保持稳定")
+                fresh = []
+                for task, text in zip(round_tasks, texts):
+                    text = _clean_text(text)
+                    self.results.setdefault(task['task_id'], {})[task['page_idx']] = text
+                    if text:
+                        fresh.append((task['digest'], text))
                 
-            else:
-                print(f"❌ OCR进程失败: {result.stderr}")
+                # 识别结果写入缓存
+                cache.put_many([d for d, _ in fresh], OCR_CACHE_CONFIG, [t for _, t in fresh])
+            
+            elapsed = time.time() - start_time
+            pages_per_sec = len(self.ocr_tasks) / elapsed if elapsed > 0 else 0
+            
+            print(f"✅ 批量OCR完成: {elapsed:.1f}秒, {pages_per_sec:.1f}页/秒 ({pool.backend})")
+            print(f"🛡️  CPU保护运行正常，系统保持稳定")
                 
         except Exception as e:
             print(f"❌ OCR处理异常: {e}")
         finally:
             # 停止CPU监控
-            from src.utils.ocr_optimizer import ocr_optimizer
             ocr_optimizer.stop_cpu_monitoring()
-            
-            # 清理临时文件
-            if temp_file:
-                try:
-                    os.unlink(temp_file)
-                except:
-                    pass
         
         # 清空任务队列
         self.ocr_tasks = []
@@ -145,24 +127,9 @@ class BatchOCRProcessor:
 # 全局批量OCR处理器
 batch_ocr_processor = BatchOCRProcessor()
 
-def _batch_ocr_page(args):
-    """批量OCR单页处理（模块级函数）"""
-    import pytesseract
-    
-    page_idx, img = args
-    try:
-        # 优化OCR配置
-        config = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz一二三四五六七八九十百千万亿零壹贰叁肆伍陆柒捌玖拾佰仟萬億'
-        
-        # 多语言识别
-        text = pytesseract.image_to_string(img, lang='chi_sim+eng', config=config)
-        
-        # 清理文本
-        if text:
-            text = text.strip()
-            lines = [line.strip() for line in text.split('\n') if len(line.strip()) > 2]
-            text = '\n'.join(lines)
-        
-        return page_idx, text if text else ""
-    except Exception as e:
-        return page_idx, ""
+def _clean_text(text: str) -> str:
+    """清理识别文本：去掉过短的行（通常是噪声）"""
+    if not text:
+        return ""
+    lines = [line.strip() for line in text.strip().split('\n') if len(line.strip()) > 2]
+    return '\n'.join(lines)
@@ -0,0 +1,60 @@
+"""
+布隆过滤器 - 固定内存的集合成员预判
+判定"不存在"一定准确，判定"存在"有 error_rate 的误判率；
+用于在精确查询（如 SQLite）前快速排除绝大多数新元素。
+"""
+
+import math
+import hashlib
+from typing import Union
+
+import numpy as np
+
+
+def digest(value: Union[str, bytes]) -> bytes:
+    """16 字节摘要，布隆过滤器和持久化存储共用同一个键"""
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return hashlib.blake2b(value, digest_size=16).digest()
+
+
+class BloomFilter:
+    """基于 NumPy 位数组的布隆过滤器"""
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        """
+        Args:
+            capacity: 预计元素数量（超出后误判率上升，但判定"不存在"仍然准确）
+            error_rate: 目标误判率
+        """
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self._bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, key: bytes) -> np.ndarray:
+        # 双重哈希：h1 + i * h2
+        h1 = int.from_bytes(key[:8], "little")
+        h2 = int.from_bytes(key[8:16], "little") | 1
+        return np.array([(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)], dtype=np.int64)
+
+    def add_digest(self, key: bytes):
+        positions = self._positions(key)
+        np.bitwise_or.at(self._bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+        self.count += 1
+
+    def contains_digest(self, key: bytes) -> bool:
+        positions = self._positions(key)
+        return bool(np.all(self._bits[positions >> 3] & (1 << (positions & 7)).astype(np.uint8)))
+
+    def add(self, value: Union[str, bytes]):
+        self.add_digest(digest(value))
+
+    def __contains__(self, value: Union[str, bytes]) -> bool:
+        return self.contains_digest(digest(value))
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bits.nbytes
@@ -9,6 +9,7 @@ import threading
 from typing import Optional, Callable
 import logging  # 允许使用 - CPU监控专用
 from src.app_logging.log_manager import LogManager
+from src.utils.metrics_sampler import get_metrics_sampler
 
 class CPUMonitor:
     """CPU使用率监控器"""
@@ -61,8 +62,8 @@ class CPUMonitor:
                 time.sleep(1)
     
     def get_current_cpu(self) -> float:
-        """获取当前CPU使用率"""
-        return psutil.cpu_percent(interval=0.1)
+        """获取当前CPU使用率（采样器最新样本，不阻塞）"""
+        return get_metrics_sampler().cpu_percent()
     
     def is_cpu_high(self) -> bool:
         """检查CPU使用率是否过高"""
@@ -89,7 +90,7 @@ class ResourceLimiter:
         
     def check_resources(self) -> dict:
         """检查系统资源"""
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = get_metrics_sampler().cpu_percent()
         memory = psutil.virtual_memory()
         
         return {
@@ -102,8 +103,8 @@ class ResourceLimiter:
     
     def get_safe_worker_count(self, default_workers: int) -> int:
         """根据CPU使用率获取安全的工作线程数"""
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory_percent = psutil.virtual_memory().percent
+        sample = get_metrics_sampler().latest()
+        cpu_percent, memory_percent = sample.cpu_percent, sample.memory_percent
         
         # 综合考虑CPU和内存使用率
         max_usage = max(cpu_percent, memory_percent)
@@ -9,6 +9,8 @@ import threading
 from typing import Optional, Callable
 from concurrent.futures import ThreadPoolExecutor
 
+from .metrics_sampler import get_metrics_sampler
+
 
 class CPUThrottle:
     """CPU 使用率限制器"""
@@ -42,9 +44,10 @@ class CPUThrottle:
     
     def _monitor_cpu(self):
         """监控 CPU 使用率的后台线程"""
+        sampler = get_metrics_sampler()
         while not self._stop_event.is_set():
             try:
-                cpu_percent = psutil.cpu_percent(interval=0.1)
+                cpu_percent = sampler.cpu_percent()
                 
                 if cpu_percent > self.max_cpu_percent:
                     if not self.is_throttling:
@@ -58,7 +61,7 @@ class CPUThrottle:
                         print(f"✅ CPU 使用率恢复正常 ({cpu_percent:.1f}%)，解除限流")
                         self.is_throttling = False
                 
-                time.sleep(self.check_interval)
+                self._stop_event.wait(self.check_interval)
                 
             except Exception as e:
                 print(f"CPU 监控异常: {e}")
@@ -76,7 +79,7 @@ class CPUThrottle:
     def get_safe_worker_count(self, default_workers: int) -> int:
         """根据 CPU 使用率动态调整工作线程数"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            cpu_percent = get_metrics_sampler().cpu_percent()
             
             if cpu_percent > 92:
                 # CPU 使用率极高，显著减少线程数
@@ -0,0 +1,181 @@
+"""
+嵌入向量缓存 - 按内容哈希跨知识库、跨重建复用向量
+键为 (嵌入模型, 规范化文本的哈希)，SQLite 持久化（WAL，多进程共享），
+超过容量上限时按最近访问时间淘汰。
+查询向量不落盘，走 query_embedding 的内存记忆化与并发合批。
+"""
+
+import re
+import time
+import asyncio
+import hashlib
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from src.utils.sqlite_cache import SQLiteCache
+
+DEFAULT_CACHE_PATH = "./embedding_cache/embeddings.db"
+DEFAULT_MAX_SIZE_MB = 2048
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：Unicode NFC、折叠空白"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache(SQLiteCache):
+    """SQLite 嵌入缓存"""
+
+    TABLE = "embeddings"
+    SIZE_EXPR = "LENGTH(vec)"
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_size_mb: float = DEFAULT_MAX_SIZE_MB):
+        super().__init__(db_path, max_size_mb)
+
+    def _create_schema(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                model TEXT NOT NULL,
+                vec BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        return hashlib.blake2b(f"{model}\0{normalize_text(text)}".encode("utf-8"), digest_size=20).digest()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """批量查询，未命中的位置为 None"""
+        keys = [self.make_key(model, t) for t in texts]
+        found: Dict[bytes, List[float]] = {}
+        with self._lock:
+            # SQLite 单条语句参数上限 999
+            for i in range(0, len(keys), 900):
+                chunk = keys[i:i + 900]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, vec in rows:
+                    found[key] = np.frombuffer(vec, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                       [(now, k) for k in found])
+                self._conn.commit()
+            results = [found.get(k) for k in keys]
+            self._record_lookups(sum(1 for r in results if r is not None), len(results))
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        if not texts:
+            return
+        now = time.time()
+        rows = [(self.make_key(model, t), model, np.asarray(e, dtype=np.float32).tobytes(), now)
+                for t, e in zip(texts, embeddings)]
+        rows = list({r[0]: r for r in rows}.values())  # 同一批内重复的键只保留最后一条
+        with self._lock:
+            replaced = self._existing_size(r[0] for r in rows)
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._record_writes(len(rows), sum(len(r[2]) for r in rows) - replaced)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """为任意嵌入模型加上内容哈希缓存（文档片段走缓存，查询走记忆化与并发合批）"""
+
+    _inner: Any = PrivateAttr()
+    _cache: Any = PrivateAttr()
+    _model_key: str = PrivateAttr()
+    _model_name: str = PrivateAttr()
+    _query_service: Any = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, model_key: str, cache: Optional[EmbeddingCache] = None,
+                 query_service: Any = None):
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size,
+                         callback_manager=inner.callback_manager)
+        self._inner = inner
+        self._cache = cache or get_embedding_cache()
+        self._model_key = model_key
+        self._model_name = getattr(inner, "_model_name", inner.model_name)
+        self._query_service = query_service
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    def _queries(self):
+        """同一模型的所有实例共享一个查询向量化服务"""
+        if self._query_service is None:
+            from src.utils.query_embedding import get_query_embedding_service, query_batch_fn
+            self._query_service = get_query_embedding_service(self._model_key, query_batch_fn(self._inner))
+        return self._query_service
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._queries().embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await asyncio.to_thread(self._queries().embed, query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _split(self, texts: List[str]):
+        cached = self._cache.get_many(self._model_key, texts)
+        missing = [i for i, e in enumerate(cached) if e is None]
+        return cached, missing
+
+    def _merge(self, texts, cached, missing, computed):
+        for i, emb in zip(missing, computed):
+            cached[i] = emb
+        self._cache.put_many(self._model_key, [texts[i] for i in missing], computed)
+        return cached
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = self._split(texts)
+        if not missing:
+            return cached
+        computed = self._inner._get_text_embeddings([texts[i] for i in missing])
+        return self._merge(texts, cached, missing, computed)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = self._split(texts)
+        if not missing:
+            return cached
+        computed = await self._inner._aget_text_embeddings([texts[i] for i in missing])
+        return self._merge(texts, cached, missing, computed)
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache(db_path: str = DEFAULT_CACHE_PATH,
+                        max_size_mb: float = DEFAULT_MAX_SIZE_MB) -> EmbeddingCache:
+    """获取进程级共享的嵌入缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(db_path, max_size_mb)
+        return _cache
+
+
+def get_embedding_cache_stats() -> Optional[Dict[str, Any]]:
+    """监控面板使用：缓存尚未启用时返回 None"""
+    return _cache.get_stats() if _cache is not None else None
@@ -1,34 +1,136 @@
 """
 增强查询缓存系统 - 纯内存版本
 目标：实现秒级响应，无需外部数据库
+
+两级查找：
+  - 精确层：规范化查询 + 参数的哈希键
+  - 语义层：查询向量与同一知识库、同一参数下已缓存查询向量做矩阵点积，
+    相似度超过阈值即命中（"如何配置OCR" 与 "OCR怎么配置"）
+每条缓存标记知识库内容版本（IndexBuilder 构建/追加时递增），版本变化后该知识库缓存整体失效。
+LRU 用 OrderedDict 维护，命中 move_to_end、淘汰 popitem，均为 O(1)。
+可选接入二级磁盘缓存（QueryResultStore）：内存未命中时查磁盘并提升到内存，
+启动时按命中次数预热，进程重启后不再冷启动。
 """
 
+import os
 import hashlib
 import json
 import time
 import threading
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List, Sequence, Set, Tuple
 from collections import OrderedDict
+
+import numpy as np
+
 from src.app_logging import LogManager
+from src.kb.kb_version import get_kb_version
+from src.utils.query_result_store import QueryResultStore
 
 logger = LogManager()
 
+
+class _SemanticBucket:
+    """同一知识库、同一查询参数下的查询向量矩阵（行 = 缓存条目）"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.matrix = np.zeros((16, dim), dtype=np.float32)
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def add(self, key: str, vector: np.ndarray):
+        if key in self.rows:
+            self.matrix[self.rows[key]] = vector
+            return
+        if len(self.keys) == len(self.matrix):
+            self.matrix = np.vstack([self.matrix, np.zeros_like(self.matrix)])
+        self.rows[key] = len(self.keys)
+        self.matrix[len(self.keys)] = vector
+        self.keys.append(key)
+
+    def remove(self, key: str):
+        """末行换到被删行，O(dim)"""
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        last = len(self.keys) - 1
+        if row != last:
+            moved = self.keys[last]
+            self.matrix[row] = self.matrix[last]
+            self.keys[row] = moved
+            self.rows[moved] = row
+        self.keys.pop()
+
+    def nearest(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        if not self.keys:
+            return None, 0.0
+        scores = self.matrix[:len(self.keys)] @ vector
+        best = int(np.argmax(scores))
+        return self.keys[best], float(scores[best])
+
+
 class EnhancedQueryCache:
     """增强查询缓存系统"""
     
-    def __init__(self, max_size: int = 1000, ttl: int = 3600):
+    def __init__(self, max_size: int = 1000, ttl: int = 3600,
+                 kb_base_path: str = "vector_db_storage",
+                 embed_fn: Optional[Callable[[str, str], Sequence[float]]] = None,
+                 semantic_threshold: float = 0.92,
+                 store: Optional[QueryResultStore] = None):
+        """
+        Args:
+            max_size: 内存中的最大条目数
+            ttl: 过期时间（秒）
+            kb_base_path: 知识库根目录，用于读取内容版本
+            embed_fn: (kb_name, query) -> 查询向量；为 None 时只用精确层
+            semantic_threshold: 语义命中的最低余弦相似度
+            store: 二级磁盘缓存，为 None 时只用内存
+        """
         self.max_size = max_size
         self.ttl = ttl
+        self.kb_base_path = kb_base_path
+        self.embed_fn = embed_fn
+        self.semantic_threshold = semantic_threshold
+        self.store = store
         self.cache = OrderedDict()
-        self.access_times = {}
         self.hit_count = 0
+        self.semantic_hit_count = 0
+        self.l2_hit_count = 0
         self.miss_count = 0
+        self.invalidation_count = 0
         self.lock = threading.RLock()
         
+        self._kb_keys: Dict[str, Set[str]] = {}
+        self._kb_versions: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[str, str], _SemanticBucket] = {}
+        # get 未命中时算出的查询向量，随后的 set 直接复用
+        self._pending_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        
         # 启动清理线程
         self.cleanup_thread = threading.Thread(target=self._cleanup_expired, daemon=True)
         self.cleanup_thread.start()
     
+    def configure(self, kb_base_path: Optional[str] = None,
+                  embed_fn: Optional[Callable[[str, str], Sequence[float]]] = None,
+                  semantic_threshold: Optional[float] = None,
+                  store: Optional[QueryResultStore] = None):
+        """接入知识库目录、查询向量化函数和二级缓存（服务启动时调用）"""
+        with self.lock:
+            if kb_base_path is not None:
+                self.kb_base_path = kb_base_path
+            if embed_fn is not None:
+                self.embed_fn = embed_fn
+                self._buckets.clear()
+                self._pending_vectors.clear()
+            if semantic_threshold is not None:
+                self.semantic_threshold = semantic_threshold
+            if store is not None:
+                self.store = store
+    
+    @staticmethod
+    def _params_key(kwargs: Dict[str, Any]) -> str:
+        return json.dumps(kwargs, sort_keys=True, default=str)
+    
     def _generate_key(self, query: str, kb_name: str, **kwargs) -> str:
         """生成缓存键"""
         # 标准化查询
@@ -41,31 +143,107 @@ class EnhancedQueryCache:
             **kwargs
         }
         
-        key_str = json.dumps(key_data, sort_keys=True)
+        key_str = json.dumps(key_data, sort_keys=True, default=str)
         return hashlib.md5(key_str.encode()).hexdigest()
     
+    def _kb_version(self, kb_name: str) -> int:
+        """读取知识库当前版本；与已缓存的版本不同时清掉该知识库的全部条目"""
+        version = get_kb_version(os.path.join(self.kb_base_path, kb_name))
+        if self._kb_versions.get(kb_name, version) != version:
+            dropped = self._drop_kb(kb_name)
+            if self.store is not None:
+                dropped += self.store.delete_kb(kb_name, keep_version=version)
+            self.invalidation_count += dropped
+            if dropped:
+                logger.info(f"♻️ 知识库 {kb_name} 内容已更新，失效缓存 {dropped} 条")
+        self._kb_versions[kb_name] = version
+        return version
+    
+    def _embed(self, query: str, kb_name: str) -> Optional[np.ndarray]:
+        if self.embed_fn is None:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn(kb_name, query), dtype=np.float32).ravel()
+        except Exception as e:
+            logger.warning(f"查询向量化失败，跳过语义缓存: {e}")
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+    
+    def _remove(self, key: str):
+        entry = self.cache.pop(key, None)
+        self._pending_vectors.pop(key, None)
+        if entry is None:
+            return
+        keys = self._kb_keys.get(entry["kb_name"])
+        if keys is not None:
+            keys.discard(key)
+        bucket = self._buckets.get(entry["bucket"])
+        if bucket is not None:
+            bucket.remove(key)
+    
+    def _drop_kb(self, kb_name: str) -> int:
+        keys = list(self._kb_keys.pop(kb_name, ()))
+        for key in keys:
+            self._remove(key)
+        for bucket_id in [b for b in self._buckets if b[0] == kb_name]:
+            del self._buckets[bucket_id]
+        return len(keys)
+    
+    def _lookup(self, key: str, version: int) -> Optional[Dict[str, Any]]:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        if entry["version"] != version or time.time() - entry["timestamp"] >= self.ttl:
+            self._remove(key)
+            return None
+        # 移到末尾（LRU）
+        self.cache.move_to_end(key)
+        return entry
+    
     def get(self, query: str, kb_name: str, **kwargs) -> Optional[Dict[str, Any]]:
-        """获取缓存结果"""
+        """获取缓存结果（先精确匹配，再语义匹配）"""
         key = self._generate_key(query, kb_name, **kwargs)
         
         with self.lock:
-            if key in self.cache:
-                entry = self.cache[key]
-                
-                # 检查是否过期
-                if time.time() - entry["timestamp"] < self.ttl:
-                    # 更新访问时间
-                    self.access_times[key] = time.time()
-                    # 移到末尾（LRU）
-                    self.cache.move_to_end(key)
-                    
-                    self.hit_count += 1
-                    logger.info(f"🎯 缓存命中: {query[:50]}...")
-                    return entry["data"]
-                else:
-                    # 过期删除
-                    del self.cache[key]
-                    del self.access_times[key]
+            version = self._kb_version(kb_name)
+            entry = self._lookup(key, version)
+            if entry is not None:
+                self.hit_count += 1
+                logger.info(f"🎯 缓存命中: {query[:50]}...")
+                return entry["data"]
+        
+        # 磁盘缓存与向量化在锁外执行
+        if self.store is not None:
+            stored = self.store.get(key)
+            if stored is not None:
+                if stored.version == version:
+                    with self.lock:
+                        self._insert(key, stored.query, kb_name, stored.data, version,
+                                     (kb_name, stored.params), stored.vector, time.time())
+                        self.hit_count += 1
+                        self.l2_hit_count += 1
+                    logger.info(f"🎯 磁盘缓存命中: {query[:50]}...")
+                    return stored.data
+                self.store.delete(key)
+        
+        vector = self._embed(query, kb_name)
+        
+        with self.lock:
+            if vector is not None:
+                bucket = self._buckets.get((kb_name, self._params_key(kwargs)))
+                if bucket is not None and bucket.dim == len(vector):
+                    match_key, score = bucket.nearest(vector)
+                    if match_key is not None and score >= self.semantic_threshold:
+                        entry = self._lookup(match_key, version)
+                        if entry is not None:
+                            self.hit_count += 1
+                            self.semantic_hit_count += 1
+                            logger.info(f"🎯 语义缓存命中({score:.3f}): {query[:50]} ≈ {entry['query'][:50]}")
+                            return entry["data"]
+                self._pending_vectors[key] = vector
+                while len(self._pending_vectors) > 256:
+                    self._pending_vectors.popitem(last=False)
             
             self.miss_count += 1
             return None
@@ -73,48 +251,94 @@ class EnhancedQueryCache:
     def set(self, query: str, kb_name: str, data: Dict[str, Any], **kwargs):
         """设置缓存"""
         key = self._generate_key(query, kb_name, **kwargs)
+        bucket_id = (kb_name, self._params_key(kwargs))
         
         with self.lock:
-            # 检查容量
-            if len(self.cache) >= self.max_size:
-                self._evict_lru()
-            
-            # 存储缓存
-            self.cache[key] = {
-                "data": data,
-                "timestamp": time.time(),
-                "query": query[:100],  # 存储查询片段用于调试
-                "kb_name": kb_name
-            }
-            self.access_times[key] = time.time()
-            
-            logger.info(f"💾 缓存存储: {query[:50]}...")
+            vector = self._pending_vectors.pop(key, None)
+        if vector is None:
+            vector = self._embed(query, kb_name)
+        
+        with self.lock:
+            version = self._kb_version(kb_name)
+            self._insert(key, query, kb_name, data, version, bucket_id, vector, time.time())
+        
+        if self.store is not None:
+            try:
+                self.store.put(key, kb_name, version, bucket_id[1], query[:100], data, vector)
+            except Exception as e:
+                logger.warning(f"写入磁盘缓存失败: {e}")
+        
+        logger.info(f"💾 缓存存储: {query[:50]}...")
     
+    def _insert(self, key: str, query: str, kb_name: str, data: Dict[str, Any], version: int,
+                bucket_id: Tuple[str, str], vector: Optional[np.ndarray], timestamp: float):
+        """写入内存缓存（调用方持有锁）"""
+        self._remove(key)
+        
+        # 检查容量
+        while len(self.cache) >= self.max_size:
+            self._evict_lru()
+        
+        self.cache[key] = {
+            "data": data,
+            "timestamp": timestamp,
+            "query": query[:100],  # 存储查询片段用于调试
+            "kb_name": kb_name,
+            "version": version,
+            "bucket": bucket_id
+        }
+        self._kb_keys.setdefault(kb_name, set()).add(key)
+        if vector is not None:
+            bucket = self._buckets.get(bucket_id)
+            if bucket is None or bucket.dim != len(vector):
+                bucket = self._buckets[bucket_id] = _SemanticBucket(len(vector))
+            bucket.add(key, vector)
+    
+    def warm_up(self, limit: Optional[int] = None) -> int:
+        """从磁盘缓存批量加载命中最多的条目（跳过知识库版本已变化的条目），返回加载数量"""
+        if self.store is None:
+            return 0
+        limit = min(limit or self.max_size, self.max_size)
+        loaded = 0
+        # 命中最多的最后插入，处于 LRU 尾部
+        for stored in reversed(self.store.hottest(limit)):
+            with self.lock:
+                if stored.key in self.cache or self._kb_version(stored.kb_name) != stored.version:
+                    continue
+                self._insert(stored.key, stored.query, stored.kb_name, stored.data, stored.version,
+                             (stored.kb_name, stored.params), stored.vector, time.time())
+                loaded += 1
+        if loaded:
+            logger.info(f"🔥 查询缓存预热: {loaded} 条")
+        return loaded
+    
+    def invalidate_kb(self, kb_name: str) -> int:
+        """删除某个知识库的全部缓存（知识库内容更新后调用）"""
+        with self.lock:
+            dropped = self._drop_kb(kb_name)
+            self._kb_versions.pop(kb_name, None)
+            if self.store is not None:
+                dropped += self.store.delete_kb(kb_name)
+            self.invalidation_count += dropped
+        return dropped
+
     def _evict_lru(self):
-        """淘汰最少使用的缓存"""
+        """淘汰最少使用的缓存（OrderedDict 头部），O(1)"""
         if self.cache:
-            # 找到最少访问的键
-            lru_key = min(self.access_times.keys(), 
-                         key=lambda k: self.access_times[k])
-            
-            del self.cache[lru_key]
-            del self.access_times[lru_key]
+            lru_key = next(iter(self.cache))
+            self._remove(lru_key)
     
     def _cleanup_expired(self):
         """清理过期缓存"""
         while True:
             try:
                 current_time = time.time()
-                expired_keys = []
                 
                 with self.lock:
-                    for key, entry in self.cache.items():
-                        if current_time - entry["timestamp"] >= self.ttl:
-                            expired_keys.append(key)
-                    
+                    expired_keys = [key for key, entry in self.cache.items()
+                                    if current_time - entry["timestamp"] >= self.ttl]
                     for key in expired_keys:
-                        del self.cache[key]
-                        del self.access_times[key]
+                        self._remove(key)
                 
                 if expired_keys:
                     logger.info(f"🧹 清理过期缓存: {len(expired_keys)}个")
@@ -130,22 +354,38 @@ class EnhancedQueryCache:
         total_requests = self.hit_count + self.miss_count
         hit_rate = (self.hit_count / total_requests * 100) if total_requests > 0 else 0
         
-        return {
+        stats = {
             "size": len(self.cache),
             "max_size": self.max_size,
             "hit_count": self.hit_count,
+            "semantic_hit_count": self.semantic_hit_count,
+            "l2_hit_count": self.l2_hit_count,
             "miss_count": self.miss_count,
             "hit_rate": f"{hit_rate:.1f}%",
+            "invalidated": self.invalidation_count,
+            "semantic_enabled": self.embed_fn is not None,
+            "semantic_threshold": self.semantic_threshold,
             "ttl": self.ttl
         }
+        if self.store is not None:
+            stats["l2"] = self.store.get_stats()
+        return stats
     
-    def clear(self):
-        """清空缓存"""
+    def clear(self, persistent: bool = True):
+        """清空缓存（persistent=False 时保留磁盘缓存，供下次启动预热）"""
         with self.lock:
+            if persistent and self.store is not None:
+                self.store.clear()
             self.cache.clear()
-            self.access_times.clear()
+            self._kb_keys.clear()
+            self._kb_versions.clear()
+            self._buckets.clear()
+            self._pending_vectors.clear()
             self.hit_count = 0
+            self.semantic_hit_count = 0
+            self.l2_hit_count = 0
             self.miss_count = 0
+            self.invalidation_count = 0
         
         logger.info("🧹 缓存已清空")
     
@@ -1,13 +1,3 @@
-def _process_single_image_global(args):
-    """处理单张图片 - 全局函数用于多进程"""
-    import pytesseract
-    image, page_num = args
-    try:
-        text = pytesseract.image_to_string(image, lang='chi_sim+eng')
-        return page_num, text.strip()
-    except Exception as e:
-        return page_num, f"OCR错误: {str(e)}"
-
 """
 增强OCR优化器
 集成自适应调度、GPU加速和实时进度监控
@@ -15,7 +5,7 @@ def _process_single_image_global(args):
 
 import time
 import uuid
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 from PIL import Image
 
 from .adaptive_scheduler import adaptive_scheduler
@@ -43,7 +33,7 @@ class EnhancedOCROptimizer:
     
     def process_pdf_pages(self, pdf_path: str, images: List[Image.Image]) -> List[str]:
         """
-        处理PDF页面，使用优化OCR处理器
+        处理已光栅化的PDF页面（图像直接在内存中识别，不再写临时JPEG）
         
         Args:
             pdf_path: PDF文件路径
@@ -52,14 +42,77 @@ class EnhancedOCROptimizer:
         Returns:
             OCR识别结果列表
         """
-        import tempfile
-        import os
-        from .optimized_ocr_processor import process_images_optimized
+        from .ocr_cache import image_digest
+        from .optimized_ocr_processor import OptimizedOCRProcessor
         
-        task_id = str(uuid.uuid4())
-        pages_count = len(images)
+        # 已光栅化的页面按像素哈希查缓存
+        digests = [image_digest(image) for image in images]
+        def make_pages(page_numbers):
+            return ((p, images[p - 1]) for p in page_numbers)
+        
+        return [text for _, text in self._run_cached(pdf_path, digests, OptimizedOCRProcessor.CACHE_CONFIG, make_pages)]
+    
+    def process_pdf_streaming(self, pdf_path: str, dpi: int = 200) -> Iterator[Tuple[int, str]]:
+        """
+        流式处理扫描版PDF：按页光栅化、经有界队列交给OCR工作线程，按页序逐页产出
+        
+        已识别过的页（PDF 文件哈希 + 页码 + DPI + 引擎配置相同）直接取缓存，不再光栅化。
+        
+        Args:
+            pdf_path: PDF文件路径
+            dpi: 光栅化分辨率
+            
+        Yields:
+            (页码(从1开始), 识别文本)
+        """
+        from .streaming_ocr import count_pdf_pages, iter_pdf_pages
+        from .file_fingerprint import hash_file
+        from .ocr_cache import pdf_page_digest
+        from .optimized_ocr_processor import OptimizedOCRProcessor
+        
+        pdf_hash = hash_file(pdf_path)
+        digests = [pdf_page_digest(pdf_hash, p) for p in range(1, count_pdf_pages(pdf_path) + 1)]
+        config = f"{OptimizedOCRProcessor.CACHE_CONFIG}|dpi={dpi}"
+        def make_pages(page_numbers):
+            return iter_pdf_pages(pdf_path, dpi=dpi, page_numbers=page_numbers)
+        
+        yield from self._run_cached(pdf_path, digests, config, make_pages)
+    
+    def _run_cached(self, pdf_path: str, digests: List[str], config: str, make_pages) -> Iterator[Tuple[int, str]]:
+        """先查OCR缓存，只对未命中的页光栅化和识别；按页序产出"""
+        from .ocr_cache import get_ocr_cache
+        
+        cache = get_ocr_cache()
+        cached = cache.get_many(digests, config)
+        missing = [page_no for page_no, text in enumerate(cached, 1) if text is None]
+        if len(missing) < len(digests):
+            print(f"♻️  OCR缓存命中 {len(digests) - len(missing)}/{len(digests)} 页")
+        
+        def store(page_no: int, text: str):
+            cache.put(digests[page_no - 1], config, text)
+        
+        fresh = self._run_streaming(pdf_path, make_pages(missing), len(missing), on_success=store) if missing else iter(())
+        try:
+            for page_no, text in enumerate(cached, 1):
+                if text is None:
+                    # 未命中的页由流水线按页序产出
+                    _, text = next(fresh)
+                yield page_no, text
+        finally:
+            if missing:
+                fresh.close()
+    
+    def _run_streaming(self, pdf_path: str, pages, pages_count: int, on_success=None) -> Iterator[Tuple[int, str]]:
+        """流水线执行 + 进度监控（on_success 只对识别成功的页调用）"""
+        from .streaming_ocr import StreamingOCRPipeline
+        from .optimized_ocr_processor import get_ocr_processor
         
-        print(f"📊 使用优化OCR处理器处理 {pages_count} 页")
+        processor = get_ocr_processor()
+        workers = processor.resource_limiter.get_safe_worker_count(processor.max_workers)
+        pipeline = StreamingOCRPipeline(processor.recognize, workers=workers)
+        
+        task_id = str(uuid.uuid4())
+        print(f"📊 流式OCR处理 {pages_count} 页 (工作线程: {workers})")
         
         # 实时进度监控 - 开始任务
         progress_monitor.start_task(
@@ -69,50 +122,25 @@ class EnhancedOCROptimizer:
         )
         
         start_time = time.time()
-        results = []
-        temp_files = []
-        
+        completed = 0
         try:
-            # 将PIL图像保存为临时文件
-            for i, image in enumerate(images):
-                temp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-                image.save(temp_file.name, 'JPEG')
-                temp_files.append(temp_file.name)
-            
-            # 进度回调函数
-            def progress_callback(completed, total):
+            for page_no, text in pipeline.run(pages):
+                completed += 1
                 progress_monitor.update_progress(
                     task_id,
                     completed=completed,
-                    current_item=f"处理页面 {completed}/{total}"
+                    current_item=f"处理页面 {completed}/{pages_count}"
                 )
-            
-            # 使用优化OCR处理器
-            ocr_results = process_images_optimized(temp_files, progress_callback)
-            
-            # 提取文本结果
-            results = [result.get('text', '') for result in ocr_results]
+                if on_success and page_no not in pipeline.failed_pages:
+                    on_success(page_no, text)
+                yield page_no, text
             
             processing_time = time.time() - start_time
-            speed = pages_count / processing_time if processing_time > 0 else 0
-            
+            speed = completed / processing_time if processing_time > 0 else 0
             print(f"✅ OCR处理完成: {processing_time:.1f}秒, {speed:.1f}页/秒")
-            
-        except Exception as e:
-            print(f"❌ OCR处理失败: {e}")
-            results = [''] * pages_count
         finally:
-            # 清理临时文件
-            for temp_file in temp_files:
-                try:
-                    os.unlink(temp_file)
-                except:
-                    pass
-            
             # 完成任务
             progress_monitor.complete_task(task_id)
-        
-        return results
     
     def _gpu_batch_process(self, task_id: str, images: List[Image.Image]) -> List[str]:
         """真正的并行OCR处理"""
@@ -164,66 +192,39 @@ class EnhancedOCROptimizer:
             return self._multi_process(task_id, images, workers)
     
     def _single_process(self, task_id: str, images: List[Image.Image]) -> List[str]:
-        """单进程处理"""
-        import pytesseract
+        """单线程处理：逐批交给常驻引擎（命令行后端每批只启动一次 tesseract）"""
+        from .ocr_engine_pool import get_ocr_engine_pool
         
+        pool = get_ocr_engine_pool('chi_sim+eng')
         results = []
-        for i, image in enumerate(images):
+        for start in range(0, len(images), pool.batch_size):
             # 更新进度
             progress_monitor.update_progress(
                 task_id,
-                completed=i,
-                current_item=f"处理第 {i+1} 页"
+                completed=start,
+                current_item=f"处理第 {start+1} 页"
             )
-            
-            try:
-                text = pytesseract.image_to_string(image, lang='chi_sim+eng')
-                results.append(text.strip())
-            except Exception as e:
-                print(f"⚠️  第{i+1}页OCR失败: {e}")
-                results.append("")
+            results.extend(text.strip() for text in pool.recognize(images[start:start + pool.batch_size]))
         
         return results
     
     def _multi_process(self, task_id: str, images: List[Image.Image], workers: int) -> List[str]:
-        """多进程处理"""
-        from concurrent.futures import ProcessPoolExecutor
-        import pytesseract
-        
-        def process_single_image(args):
-            """处理单张图片"""
-            image, page_num = args
-            try:
-                text = pytesseract.image_to_string(image, lang='chi_sim+eng')
-                return page_num, text.strip()
-            except Exception as e:
-                return page_num, ""
-        
-        results = [""] * len(images)
-        
-        with ProcessPoolExecutor(max_workers=workers) as executor:
-            # 提交任务
-            future_to_page = {
-                executor.submit(_process_single_image_global, (img, i)): i 
-                for i, img in enumerate(images)
-            }
+        """多线程处理：页面按批次交给常驻引擎池"""
+        from .ocr_engine_pool import get_ocr_engine_pool
+        
+        pool = get_ocr_engine_pool('chi_sim+eng')
+        # 每轮让所有工作线程各处理一个批次，轮次之间更新进度
+        step = pool.batch_size * max(1, min(workers, pool.workers))
+        results = []
+        for start in range(0, len(images), step):
+            results.extend(text.strip() for text in pool.recognize(images[start:start + step]))
             
-            completed = 0
-            for future in future_to_page:
-                try:
-                    page_num, text = future.result()
-                    results[page_num] = text
-                    completed += 1
-                    
-                    # 更新进度
-                    progress_monitor.update_progress(
-                        task_id,
-                        completed=completed,
-                        current_item=f"完成第 {page_num+1} 页"
-                    )
-                    
-                except Exception as e:
-                    print(f"⚠️  多进程OCR异常: {e}")
+            # 更新进度
+            progress_monitor.update_progress(
+                task_id,
+                completed=len(results),
+                current_item=f"完成第 {len(results)} 页"
+            )
         
         return results
     
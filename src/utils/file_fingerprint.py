@@ -0,0 +1,112 @@
+"""
+文件指纹 - 低成本变化检测
+先比较 (size, mtime_ns, inode) 快照，只有可疑文件才读内容计算哈希；
+哈希优先使用 xxhash（非加密、远快于 MD5），大块读取，线程池并行。
+"""
+
+import os
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
+READ_BUFFER = 4 * 1024 * 1024  # 4MB 大块读取，减少 NAS 上的往返次数
+HASH_ALGO = "xxh3" if HAS_XXHASH else "blake2b"
+
+
+def _new_hasher(algo: str):
+    if algo == "xxh3":
+        return xxhash.xxh3_128()
+    if algo == "blake2b":
+        return hashlib.blake2b(digest_size=16)
+    if algo == "md5":
+        return hashlib.md5()
+    raise ValueError(f"不支持的哈希算法: {algo}")
+
+
+def hash_file(file_path: str, algo: str = HASH_ALGO) -> str:
+    """计算文件内容哈希，返回带算法前缀的字符串（如 xxh3:...），失败返回空串
+
+    md5 不带前缀，与旧版清单/元数据中的值保持一致。
+    """
+    try:
+        hasher = _new_hasher(algo)
+        buf = bytearray(READ_BUFFER)
+        view = memoryview(buf)
+        with open(file_path, 'rb', buffering=0) as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                hasher.update(view[:n])
+        digest = hasher.hexdigest()
+        return digest if algo == "md5" else f"{algo}:{digest}"
+    except OSError:
+        return ""
+
+
+def hash_algo_of(file_hash: str) -> str:
+    """从哈希字符串识别算法（无前缀的为旧版 MD5）"""
+    return file_hash.split(":", 1)[0] if ":" in file_hash else "md5"
+
+
+def stat_fingerprint(file_path: str) -> Optional[Dict[str, int]]:
+    """(size, mtime_ns, inode) 快照，文件不存在返回 None"""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+
+
+def stat_matches(record: Dict, fingerprint: Dict) -> bool:
+    return all(record.get(k) == fingerprint[k] for k in ("size", "mtime_ns", "inode"))
+
+
+def hash_files(jobs: Iterable[Tuple[str, str]], max_workers: int = 8) -> Dict[str, str]:
+    """并行计算 [(路径, 算法)] 的哈希（读文件释放 GIL，线程池即可并行 IO）"""
+    jobs = list(jobs)
+    if len(jobs) <= 1:
+        return {path: hash_file(path, algo) for path, algo in jobs}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+        hashes = pool.map(lambda job: hash_file(*job), jobs)
+        return {path: h for (path, _), h in zip(jobs, hashes)}
+
+
+class ChangeReport:
+    """一次变化检测的统计"""
+
+    def __init__(self):
+        self.files = 0
+        self.stat_hits = 0       # 快照一致、未读内容的文件数
+        self.hashed = 0          # 实际计算哈希的文件数
+        self.bytes_hashed = 0
+        self.bytes_avoided = 0
+        self.seconds = 0.0
+        self._start = time.time()
+
+    def finish(self):
+        self.seconds = time.time() - self._start
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            "files": self.files,
+            "stat_hits": self.stat_hits,
+            "hashed": self.hashed,
+            "bytes_hashed": self.bytes_hashed,
+            "bytes_avoided": self.bytes_avoided,
+            "seconds": round(self.seconds, 3),
+        }
+
+    def __str__(self) -> str:
+        return (f"{self.files} 个文件: {self.stat_hits} 个快照命中, {self.hashed} 个重新哈希 "
+                f"({self.bytes_hashed / 1024 / 1024:.1f} MB), 免读 {self.bytes_avoided / 1024 / 1024:.1f} MB, "
+                f"耗时 {self.seconds:.2f}s")
+
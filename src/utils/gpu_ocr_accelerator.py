@@ -202,25 +202,11 @@ class GPUOCRAccelerator:
     
     def _fallback_ocr(self, images: List[Image.Image]) -> List[str]:
         """回退到CPU OCR"""
-        try:
-            import pytesseract
-            
-            print(f"🔄 回退到CPU OCR处理 {len(images)} 张图片")
-            results = []
-            
-            for image in images:
-                try:
-                    text = pytesseract.image_to_string(image, lang='chi_sim+eng')
-                    results.append(text.strip())
-                except Exception as e:
-                    print(f"⚠️  CPU OCR失败: {e}")
-                    results.append("")
-            
-            return results
-            
-        except ImportError:
-            print("❌ 未安装pytesseract，无法进行OCR")
-            return [""] * len(images)
+        from .ocr_engine_pool import get_ocr_engine_pool
+        
+        print(f"🔄 回退到CPU OCR处理 {len(images)} 张图片")
+        # 常驻引擎池按批次识别，失败的批次返回空文本
+        return [text.strip() for text in get_ocr_engine_pool('chi_sim+eng').recognize(images)]
     
     def _cleanup_gpu_memory(self):
         """清理GPU内存"""
@@ -0,0 +1,196 @@
+"""
+HTTP 条件请求缓存 - 周期性重爬同一站点时只处理真正变化的页面
+每个 URL 记录 ETag、Last-Modified、响应体哈希、正文哈希和页面链接：
+  - 再次爬取时带上 If-None-Match / If-Modified-Since，304 直接跳过下载和解析
+  - 服务端不支持条件请求时，响应体哈希未变同样跳过解析；正文哈希未变则不重新保存和索引
+  - 跳过解析的页面用缓存的链接继续递归，爬取范围不变
+SQLite 持久化（WAL，多进程共享），同步爬虫和异步爬虫共用。
+网页知识库的缓存放在知识库目录下（fetch_cache_path），各知识库互不影响；
+新页面的记录由爬虫附在结果的 fetch_record 中，保存或入库成功后才写入，
+失败的页面下次仍会重新处理。
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+from src.utils.sqlite_cache import connect_wal
+
+DEFAULT_CACHE_PATH = "./crawl_cache/fetch.db"  # 不属于任何知识库的独立爬取
+FETCH_CACHE_FILE = "fetch_cache.db"
+
+
+def fetch_cache_path(persist_dir: str) -> str:
+    """知识库自己的条件请求缓存路径"""
+    return os.path.join(persist_dir, FETCH_CACHE_FILE)
+
+
+def body_digest(body: Union[str, bytes]) -> str:
+    """响应体或正文的哈希"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def pending_record(url: str, headers: Optional[Mapping[str, str]], body_hash: str, content_hash: Optional[str],
+                   title: str, links: List[str], changed: bool = True) -> Dict[str, Any]:
+    """待写入的抓取记录（HTTPFetchCache.put 的参数），页面保存或入库后再 commit"""
+    headers = headers or {}
+    return {"url": url, "headers": {k: headers.get(k) for k in ("ETag", "Last-Modified") if headers.get(k)},
+            "body_hash": body_hash, "content_hash": content_hash, "title": title,
+            "links": list(links), "changed": changed}
+
+
+@dataclass
+class FetchRecord:
+    """单个 URL 上次成功爬取的结果"""
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    body_hash: Optional[str] = None
+    content_hash: Optional[str] = None
+    title: str = ""
+    links: List[str] = field(default_factory=list)
+    last_checked: float = 0.0
+    last_changed: float = 0.0
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """条件请求头（没有校验器时为空）"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class RecrawlStats:
+    """一次爬取中页面变化情况的计数"""
+
+    def __init__(self):
+        self.new = 0            # 首次爬取
+        self.changed = 0        # 正文有变化
+        self.not_modified = 0   # 服务端返回 304
+        self.unchanged = 0      # 重新下载但哈希未变
+
+    @property
+    def skipped(self) -> int:
+        return self.not_modified + self.unchanged
+
+    @property
+    def total(self) -> int:
+        return self.new + self.changed + self.skipped
+
+    def summary(self) -> str:
+        return (f"🔁 增量爬取: 检查 {self.total} 页，新增 {self.new}，变化 {self.changed}，"
+                f"未变化 {self.skipped} (304: {self.not_modified})")
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"new": self.new, "changed": self.changed,
+                "not_modified": self.not_modified, "unchanged": self.unchanged}
+
+
+class HTTPFetchCache:
+    """SQLite 条件请求缓存"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        self._conn = connect_wal(db_path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fetch_records (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT,
+                content_hash TEXT,
+                title TEXT,
+                links TEXT,
+                last_checked REAL NOT NULL,
+                last_changed REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[FetchRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, body_hash, content_hash, title, links, last_checked, last_changed "
+                "FROM fetch_records WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return FetchRecord(url=row[0], etag=row[1], last_modified=row[2], body_hash=row[3],
+                           content_hash=row[4], title=row[5] or "", links=json.loads(row[6] or "[]"),
+                           last_checked=row[7], last_changed=row[8])
+
+    def put(self, url: str, headers: Optional[Mapping[str, str]], body_hash: str, content_hash: Optional[str],
+            title: str, links: List[str], changed: bool = True):
+        """记录一次成功下载（changed=False 时保留上次的变化时间）"""
+        headers = headers or {}
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT last_changed FROM fetch_records WHERE url = ?", (url,)
+            ).fetchone()
+            last_changed = now if changed or previous is None else previous[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fetch_records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, headers.get("ETag"), headers.get("Last-Modified"), body_hash, content_hash,
+                 title, json.dumps(links, ensure_ascii=False), now, last_changed)
+            )
+            self._conn.commit()
+
+    def commit(self, page: Mapping[str, Any]) -> bool:
+        """页面已保存或入库：写入爬虫附带的抓取记录，没有记录时返回 False"""
+        record = page.get("fetch_record")
+        if not record:
+            return False
+        self.put(**record)
+        return True
+
+    def touch(self, url: str, headers: Optional[Mapping[str, str]] = None):
+        """304 或内容未变：更新检查时间，服务端给出新校验器时一并更新"""
+        headers = headers or {}
+        with self._lock:
+            self._conn.execute(
+                "UPDATE fetch_records SET last_checked = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), headers.get("ETag"), headers.get("Last-Modified"), url)
+            )
+            self._conn.commit()
+
+    def remove(self, url: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM fetch_records WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, validated = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(etag IS NOT NULL OR last_modified IS NOT NULL), 0) FROM fetch_records"
+            ).fetchone()
+        return {"entries": entries, "with_validators": validated}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM fetch_records")
+            self._conn.commit()
+
+
+_caches: Dict[str, HTTPFetchCache] = {}
+_cache_lock = threading.Lock()
+
+
+def get_http_fetch_cache(db_path: str = DEFAULT_CACHE_PATH) -> HTTPFetchCache:
+    """获取进程内共享的条件请求缓存（每个数据库文件一个实例）"""
+    key = os.path.abspath(db_path)
+    with _cache_lock:
+        if key not in _caches:
+            _caches[key] = HTTPFetchCache(db_path)
+        return _caches[key]
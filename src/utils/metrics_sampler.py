@@ -0,0 +1,136 @@
+"""
+系统指标采样器 - 进程内共享
+后台线程按固定间隔采样 CPU/内存/磁盘，写入环形缓冲区；
+调度器、限流器和监控面板读取最新样本（O(1)，不阻塞），
+替代各处 psutil.cpu_percent(interval=0.1) 的 100ms 阻塞调用。
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+import psutil
+
+
+@dataclass(frozen=True)
+class MetricsSample:
+    """一次采样结果"""
+    timestamp: float
+    cpu_percent: float
+    memory_percent: float
+    mem_used_gb: float
+    mem_total_gb: float
+    disk_percent: float
+    process_cpu_percent: float
+    process_rss_mb: float
+
+    def to_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+class MetricsSampler:
+    """系统指标采样器"""
+
+    def __init__(self, interval: float = 1.0, history_size: int = 300, disk_path: str = "/"):
+        self.interval = interval
+        self.disk_path = disk_path
+        self._history = deque(maxlen=history_size)
+        self._latest: Optional[MetricsSample] = None
+        self._process = psutil.Process(os.getpid())
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动后台采样（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # cpu_percent(interval=None) 返回距上次调用的平均值，首次调用只用来建立基准；
+            # 第一个样本用一次 0.1s 的测量，避免极短间隔下读数失真（每个进程只发生一次）
+            self._process.cpu_percent(interval=None)
+            self._sample(cpu_percent=psutil.cpu_percent(interval=0.1))
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:
+                pass
+
+    def _sample(self, cpu_percent: Optional[float] = None):
+        mem = psutil.virtual_memory()
+        try:
+            disk_percent = psutil.disk_usage(self.disk_path).percent
+        except Exception:
+            disk_percent = 0.0
+        try:
+            process_cpu = self._process.cpu_percent(interval=None)
+            process_rss_mb = self._process.memory_info().rss / (1024 ** 2)
+        except Exception:
+            process_cpu, process_rss_mb = 0.0, 0.0
+
+        sample = MetricsSample(
+            timestamp=time.time(),
+            cpu_percent=psutil.cpu_percent(interval=None) if cpu_percent is None else cpu_percent,
+            memory_percent=mem.percent,
+            mem_used_gb=mem.used / (1024 ** 3),
+            mem_total_gb=mem.total / (1024 ** 3),
+            disk_percent=disk_percent,
+            process_cpu_percent=process_cpu,
+            process_rss_mb=process_rss_mb,
+        )
+        self._history.append(sample)
+        self._latest = sample
+
+    # ---------- 读取接口（不阻塞） ----------
+
+    def latest(self) -> MetricsSample:
+        """最新样本"""
+        if self._latest is None:
+            self.start()
+        return self._latest
+
+    def cpu_percent(self) -> float:
+        return self.latest().cpu_percent
+
+    def memory_percent(self) -> float:
+        return self.latest().memory_percent
+
+    def history(self, seconds: Optional[float] = None) -> List[MetricsSample]:
+        """最近的样本（seconds 为空时返回整个缓冲区）"""
+        samples = list(self._history)
+        if seconds is None:
+            return samples
+        cutoff = time.time() - seconds
+        return [s for s in samples if s.timestamp >= cutoff]
+
+    def average_cpu(self, seconds: float = 5.0) -> float:
+        """最近一段时间的平均 CPU 使用率，平滑瞬时尖峰"""
+        samples = self.history(seconds) or [self.latest()]
+        return sum(s.cpu_percent for s in samples) / len(samples)
+
+
+_sampler: Optional[MetricsSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_metrics_sampler() -> MetricsSampler:
+    """获取进程级共享的采样器（首次调用时启动）"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = MetricsSampler()
+            _sampler.start()
+        return _sampler
@@ -19,7 +19,8 @@ def clean_proxy():
             del os.environ[key]
 
 
-def load_embedding_model(provider: str, model_name: str, api_key: str = "", api_url: str = ""):
+def load_embedding_model(provider: str, model_name: str, api_key: str = "", api_url: str = "",
+                         use_cache: bool = True):
     """
     加载嵌入模型
     
@@ -28,10 +29,25 @@ def load_embedding_model(provider: str, model_name: str, api_key: str = "", api_
         model_name: 模型名称
         api_key: API密钥（OpenAI需要）
         api_url: API地址（OpenAI/Ollama需要）
+        use_cache: 是否启用按内容哈希的嵌入缓存
     
     Returns:
         嵌入模型实例，失败返回 None
     """
+    embed = _load_embedding_model(provider, model_name, api_key, api_url)
+    if embed is None or not use_cache:
+        return embed
+    try:
+        from src.utils.embedding_cache import CachedEmbedding
+        # 不同供应商的同名模型向量不通用，缓存键带上供应商
+        return CachedEmbedding(embed, model_key=f"{provider.split()[0]}:{model_name}")
+    except Exception as e:
+        logger.warning(f"⚠️ 嵌入缓存不可用，直接使用模型: {e}")
+        return embed
+
+
+def _load_embedding_model(provider: str, model_name: str, api_key: str = "", api_url: str = ""):
+    """按供应商加载原始嵌入模型"""
     try:
         if provider.startswith("HuggingFace"):
             # HuggingFace 本地模型
@@ -203,7 +203,17 @@ def get_kb_embedding_dim(db_path):
         except Exception as e:
             print(f"⚠️ ChromaDB 检测失败: {e}")
         
-        # 方法2: 检查 vector_store.json
+        # 方法2: 二进制向量存储的 meta.json 直接记录维度
+        npy_meta_path = os.path.join(db_path, "default__vector_store", "meta.json")
+        if os.path.exists(npy_meta_path):
+            with open(npy_meta_path, 'r') as f:
+                dim = json.load(f).get('dim')
+            if dim:
+                print(f"✅ 二进制向量存储检测到维度: {dim}D")
+                st.session_state.kb_dimensions[kb_cache_key] = dim
+                return dim
+
+        # 方法3: 检查 vector_store.json
         vector_store_path = os.path.join(db_path, "vector_store.json")
         if os.path.exists(vector_store_path):
             print(f"📄 检查 vector_store.json...")
@@ -0,0 +1,225 @@
+"""
+近似重复检测 - 64 位 SimHash + 汉明距离分桶
+文本按字符 n-gram 切成特征，按特征是否出现（不按次数）合成 64 位指纹；两段文本的指纹汉明距离不超过 max_distance
+即视为近似重复。指纹切成 max_distance + 1 段作为桶键（鸽巢原理：距离 ≤ k 的两个指纹
+至少有一段完全相同），查询只比较同桶的候选，整体去重近似线性。
+爬虫、内容质量分析器和索引构建共用；按知识库持久化后可跨会话去重。
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+# 同一字符连续 3 次及以上（===、---、表格线等）折叠为 1 个
+_CHAR_RUN = re.compile(r"(.)\1{2,}")
+_BITS = 64
+# 特征定义版本，变化后旧的持久化指纹不可比
+FEATURE_VERSION = 2
+
+
+def _features(text: str, ngram: int) -> Set[str]:
+    """规范化文本并切成字符 n-gram 集合（中文无需分词）
+
+    只看特征是否出现：按次数加权时，长分隔线、表格竖线、重复标题等一个 n-gram
+    就能决定全部 64 位，毫不相干的文档会得到相同指纹。
+    """
+    cleaned = _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().lower()
+    cleaned = _CHAR_RUN.sub(r"\1", cleaned)
+    if len(cleaned) <= ngram:
+        return {cleaned} if cleaned else set()
+    return {cleaned[i:i + ngram] for i in range(len(cleaned) - ngram + 1)}
+
+
+def simhash(text: str, ngram: int = 3) -> int:
+    """64 位 SimHash 指纹"""
+    features = _features(text, ngram)
+    if not features:
+        return 0
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little") for f in features),
+        dtype=np.uint64, count=len(features)
+    )
+    # (特征数, 64) 位矩阵：位为 1 记 +1，为 0 记 -1
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    totals = (bits.astype(np.int64) * 2 - 1).sum(axis=0)
+    fingerprint = 0
+    for i in np.nonzero(totals > 0)[0]:
+        fingerprint |= 1 << int(i)
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    """SimHash 近似重复索引"""
+
+    def __init__(self, path: Optional[str] = None, max_distance: int = 3, ngram: int = 3,
+                 max_entries: Optional[int] = None):
+        """
+        Args:
+            path: 持久化文件路径（为空时只在内存中）
+            max_distance: 判定为近似重复的最大汉明距离
+            ngram: 字符 n-gram 长度
+            max_entries: 条目上限，超出时淘汰最早登记的条目（为空时不限）
+        """
+        self.path = path
+        self.max_distance = max_distance
+        self.ngram = ngram
+        self.max_entries = max_entries
+        self._fingerprints: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[int, int], List[str]] = {}
+        self._lock = threading.Lock()
+        self._bands = self._make_bands(max_distance)
+        self._dirty = False
+
+        if path and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def _make_bands(max_distance: int) -> List[Tuple[int, int]]:
+        """把 64 位切成 max_distance + 1 段，返回 (起始位, 掩码)"""
+        count = max_distance + 1
+        bands, start = [], 0
+        for i in range(count):
+            width = _BITS // count + (1 if i < _BITS % count else 0)
+            bands.append((start, (1 << width) - 1))
+            start += width
+        return bands
+
+    def _bucket_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        return [(i, (fingerprint >> start) & mask) for i, (start, mask) in enumerate(self._bands)]
+
+    def fingerprint(self, text: str) -> int:
+        return simhash(text, self.ngram)
+
+    def find(self, text: Optional[str] = None, fingerprint: Optional[int] = None,
+             exclude: Optional[str] = None) -> Optional[str]:
+        """返回一个近似重复条目的键（不含 exclude），没有则返回 None"""
+        if fingerprint is None:
+            fingerprint = self.fingerprint(text)
+        with self._lock:
+            seen = set()
+            for bucket in self._bucket_keys(fingerprint):
+                for key in self._buckets.get(bucket, ()):
+                    if key in seen or key == exclude:
+                        continue
+                    seen.add(key)
+                    if hamming_distance(fingerprint, self._fingerprints[key]) <= self.max_distance:
+                        return key
+        return None
+
+    def add(self, key: str, text: Optional[str] = None, fingerprint: Optional[int] = None) -> int:
+        """登记条目，返回指纹"""
+        if fingerprint is None:
+            fingerprint = self.fingerprint(text)
+        with self._lock:
+            if key in self._fingerprints:
+                self._remove_locked(key)
+            self._fingerprints[key] = fingerprint
+            for bucket in self._bucket_keys(fingerprint):
+                self._buckets.setdefault(bucket, []).append(key)
+            if self.max_entries is not None:
+                # 字典保持登记顺序，最前面的就是最早登记的
+                while len(self._fingerprints) > self.max_entries:
+                    self._remove_locked(next(iter(self._fingerprints)))
+            self._dirty = True
+        return fingerprint
+
+    def check_and_add(self, key: str, text: str) -> Optional[str]:
+        """已有近似重复时返回其键（不登记），否则登记并返回 None
+
+        同一个键重复登记（如同一 URL 在爬取、质量分析、入库各阶段依次登记）时
+        不与自身比较，只更新指纹。
+        """
+        fingerprint = self.fingerprint(text)
+        duplicate = self.find(fingerprint=fingerprint, exclude=key)
+        if duplicate is None:
+            self.add(key, fingerprint=fingerprint)
+        return duplicate
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            return self._remove_locked(key)
+
+    def remove_many(self, keys: Iterable[str]) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._remove_locked(key))
+
+    def _remove_locked(self, key: str) -> bool:
+        fingerprint = self._fingerprints.pop(key, None)
+        if fingerprint is None:
+            return False
+        for bucket in self._bucket_keys(fingerprint):
+            members = self._buckets.get(bucket)
+            if members:
+                try:
+                    members.remove(key)
+                except ValueError:
+                    pass
+                if not members:
+                    del self._buckets[bucket]
+        self._dirty = True
+        return True
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._fingerprints
+
+    def clear(self):
+        with self._lock:
+            self._fingerprints.clear()
+            self._buckets.clear()
+            self._dirty = True
+
+    # ---------- 持久化 ----------
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("ngram", self.ngram) != self.ngram or data.get("version", 1) != FEATURE_VERSION:
+            # 特征定义变化后旧指纹不可比，丢弃
+            return
+        for key, hex_fp in data.get("fingerprints", {}).items():
+            self.add(key, fingerprint=int(hex_fp, 16))
+        self._dirty = False
+
+    def save(self):
+        """写入持久化文件（无变化时跳过）"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = {
+                "version": FEATURE_VERSION,
+                "ngram": self.ngram,
+                "fingerprints": {key: f"{fp:016x}" for key, fp in self._fingerprints.items()},
+            }
+            self._dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def kb_file(persist_dir: str) -> str:
+        """知识库目录下的持久化文件路径"""
+        return os.path.join(persist_dir, "near_duplicates.json")
+
+    @classmethod
+    def for_kb(cls, persist_dir: str, **kwargs) -> "NearDuplicateIndex":
+        """知识库目录下的持久化索引"""
+        return cls(cls.kb_file(persist_dir), **kwargs)
@@ -0,0 +1,179 @@
+"""
+OCR结果缓存 - 重建知识库或重复上传同一批扫描件时不再重复识别
+键为 (内容摘要, 识别配置)：
+  - 内容摘要：渲染后页面像素的哈希，或 PDF 文件哈希 + 页码（无需光栅化即可命中）
+  - 识别配置：引擎、语言、DPI 及引擎参数，任一变化都视为不同结果
+SQLite 持久化（WAL，多进程共享），超过容量上限时按最近访问时间淘汰。
+命中/写入/淘汰计数也存在数据库中：OCR 在进程池的工作进程中进行，监控面板从界面进程读取。
+"""
+
+import os
+import time
+import hashlib
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.utils.sqlite_cache import SQLiteCache
+
+DEFAULT_CACHE_PATH = "./ocr_cache/ocr.db"
+DEFAULT_MAX_SIZE_MB = 512
+
+
+def image_digest(image) -> str:
+    """渲染页面（PIL 图像或数组）的像素哈希"""
+    array = np.ascontiguousarray(np.asarray(image))
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{array.shape}|{array.dtype}".encode("ascii"))
+    h.update(array.data)
+    return "img:" + h.hexdigest()
+
+
+def pdf_page_digest(pdf_hash: str, page_no: int) -> str:
+    """PDF 文件哈希 + 页码"""
+    return f"pdf:{pdf_hash}#{page_no}"
+
+
+class OCRCache(SQLiteCache):
+    """SQLite OCR结果缓存"""
+
+    TABLE = "ocr_results"
+    SIZE_EXPR = "LENGTH(text)"
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_size_mb: float = DEFAULT_MAX_SIZE_MB):
+        super().__init__(db_path, max_size_mb)
+
+    def _create_schema(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_results (
+                key BLOB PRIMARY KEY,
+                config TEXT NOT NULL,
+                text BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_last_access ON ocr_results(last_access)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+
+    def _add_counters(self, **deltas: int):
+        """累加持久化计数（调用方持有锁）"""
+        rows = [(name, value) for name, value in deltas.items() if value]
+        if rows:
+            self._conn.executemany(
+                "INSERT INTO ocr_stats VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                rows
+            )
+            self._conn.commit()
+
+    def _record_lookups(self, hits: int, total: int):
+        super()._record_lookups(hits, total)
+        self._add_counters(hits=hits, misses=total - hits)
+
+    def _record_writes(self, count: int, size: int):
+        evictions = self.evictions
+        super()._record_writes(count, size)
+        self._add_counters(writes=count, evictions=self.evictions - evictions)
+
+    @staticmethod
+    def make_key(digest: str, config: str) -> bytes:
+        return hashlib.blake2b(f"{config}\0{digest}".encode("utf-8"), digest_size=20).digest()
+
+    def get_many(self, digests: Sequence[str], config: str) -> List[Optional[str]]:
+        """批量查询，未命中的位置为 None"""
+        keys = [self.make_key(d, config) for d in digests]
+        found: Dict[bytes, str] = {}
+        with self._lock:
+            # SQLite 单条语句参数上限 999
+            for i in range(0, len(keys), 900):
+                chunk = keys[i:i + 900]
+                rows = self._conn.execute(
+                    f"SELECT key, text FROM ocr_results WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, text in rows:
+                    found[key] = text.decode("utf-8")
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE ocr_results SET last_access = ? WHERE key = ?",
+                                       [(now, k) for k in found])
+                self._conn.commit()
+            results = [found.get(k) for k in keys]
+            self._record_lookups(sum(1 for r in results if r is not None), len(results))
+        return results
+
+    def get(self, digest: str, config: str) -> Optional[str]:
+        return self.get_many([digest], config)[0]
+
+    def put_many(self, digests: Sequence[str], config: str, texts: Sequence[str]):
+        if not digests:
+            return
+        now = time.time()
+        rows = [(self.make_key(d, config), config, t.encode("utf-8"), now) for d, t in zip(digests, texts)]
+        rows = list({r[0]: r for r in rows}.values())  # 同一批内重复的键只保留最后一条
+        with self._lock:
+            replaced = self._existing_size(r[0] for r in rows)
+            self._conn.executemany("INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._record_writes(len(rows), sum(len(r[2]) for r in rows) - replaced)
+
+    def put(self, digest: str, config: str, text: str):
+        self.put_many([digest], config, [text])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """所有进程的累计计数，条目数和占用空间按数据库当前内容计算"""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM ocr_stats").fetchall())
+            entries, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM({self.SIZE_EXPR}), 0) FROM ocr_results"
+            ).fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "writes": counters.get("writes", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "size_mb": size / 1024 / 1024,
+            "max_size_mb": self.max_bytes / 1024 / 1024,
+        }
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self._conn.execute("DELETE FROM ocr_stats")
+            self._conn.commit()
+
+    def cached(self, digest: str, config: str, compute: Callable[[], str]) -> str:
+        """命中直接返回，否则计算并写入（compute 抛出异常时不缓存）"""
+        text = self.get(digest, config)
+        if text is None:
+            text = compute()
+            self.put(digest, config, text)
+        return text
+
+
+_cache: Optional[OCRCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache(db_path: str = DEFAULT_CACHE_PATH,
+                  max_size_mb: float = DEFAULT_MAX_SIZE_MB) -> OCRCache:
+    """获取进程级共享的OCR缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache(db_path, max_size_mb)
+        return _cache
+
+
+def get_ocr_cache_stats(db_path: str = DEFAULT_CACHE_PATH) -> Optional[Dict[str, Any]]:
+    """监控面板使用：统计从数据库读取，包含进程池工作进程中的OCR；缓存尚未建立时返回 None"""
+    if _cache is None and not os.path.exists(db_path):
+        return None
+    return get_ocr_cache(db_path).get_stats()
@@ -0,0 +1,211 @@
+"""
+常驻OCR引擎池 - 每个工作线程持有一个已初始化的 Tesseract 引擎
+pytesseract.image_to_string 每页都会启动一个 tesseract 进程并重新加载 chi_sim+eng 语言数据；
+这里按页批次把图像交给常驻引擎：
+  - 安装了 tesserocr 时，每个工作线程持有一个 PyTessBaseAPI（C API，识别时释放 GIL）
+  - 否则回退为每批页面启动一次 tesseract（文件列表输入），语言数据每批只加载一次
+"""
+
+import os
+import time
+import shlex
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import tesserocr
+    HAS_TESSEROCR = True
+except ImportError:
+    HAS_TESSEROCR = False
+
+DEFAULT_LANG = 'chi_sim+eng'
+
+
+def _to_pil(image) -> Image.Image:
+    return image if isinstance(image, Image.Image) else Image.fromarray(np.asarray(image))
+
+
+def parse_tesseract_config(config: str) -> Tuple[Optional[int], Optional[int], Dict[str, str]]:
+    """解析 tesseract 命令行参数为 (oem, psm, 变量)"""
+    oem, psm, variables = None, None, {}
+    tokens = shlex.split(config or "")
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token == '--oem' and i + 1 < len(tokens):
+            oem = int(tokens[i + 1])
+            i += 1
+        elif token == '--psm' and i + 1 < len(tokens):
+            psm = int(tokens[i + 1])
+            i += 1
+        elif token == '-c' and i + 1 < len(tokens) and '=' in tokens[i + 1]:
+            key, value = tokens[i + 1].split('=', 1)
+            variables[key] = value
+            i += 1
+        i += 1
+    return oem, psm, variables
+
+
+class TesserocrEngine:
+    """tesserocr 常驻引擎（语言数据只在创建时加载一次）"""
+
+    def __init__(self, lang: str = DEFAULT_LANG, config: str = ""):
+        oem, psm, variables = parse_tesseract_config(config)
+        kwargs = {"lang": lang}
+        if oem is not None:
+            kwargs["oem"] = oem
+        if psm is not None:
+            kwargs["psm"] = psm
+        self._api = tesserocr.PyTessBaseAPI(**kwargs)
+        for key, value in variables.items():
+            self._api.SetVariable(key, value)
+
+    def recognize(self, images: Sequence) -> List[str]:
+        texts = []
+        for image in images:
+            self._api.SetImage(_to_pil(image))
+            texts.append(self._api.GetUTF8Text())
+        return texts
+
+    def close(self):
+        self._api.End()
+
+
+class TesseractBatchEngine:
+    """tesseract 命令行批量识别：一批页面只启动一次进程"""
+
+    PAGE_SEPARATOR = '\f'
+
+    def __init__(self, lang: str = DEFAULT_LANG, config: str = "", timeout: float = 600):
+        self.lang = lang
+        self.args = shlex.split(config or "")
+        self.timeout = timeout
+        self.cmd = self._find_tesseract()
+
+    @staticmethod
+    def _find_tesseract() -> str:
+        try:
+            import pytesseract
+            cmd = pytesseract.pytesseract.tesseract_cmd
+        except ImportError:
+            cmd = 'tesseract'
+        return shutil.which(cmd) or cmd
+
+    def recognize(self, images: Sequence) -> List[str]:
+        if not images:
+            return []
+        with tempfile.TemporaryDirectory(prefix="ocr_batch_") as tmp_dir:
+            paths = []
+            for i, image in enumerate(images):
+                path = os.path.join(tmp_dir, f"{i:05d}.png")
+                _to_pil(image).save(path)
+                paths.append(path)
+            list_path = os.path.join(tmp_dir, "pages.txt")
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(paths) + '\n')
+
+            result = subprocess.run(
+                [self.cmd, list_path, 'stdout', '-l', self.lang, *self.args],
+                capture_output=True, timeout=self.timeout, check=True
+            )
+        # 每页输出以换页符结尾
+        texts = result.stdout.decode('utf-8', errors='ignore').split(self.PAGE_SEPARATOR)
+        return (texts + [''] * len(images))[:len(images)]
+
+    def close(self):
+        pass
+
+
+def create_engine(lang: str = DEFAULT_LANG, config: str = ""):
+    """创建常驻引擎：优先 tesserocr，否则批量命令行"""
+    if HAS_TESSEROCR:
+        return TesserocrEngine(lang, config)
+    return TesseractBatchEngine(lang, config)
+
+
+class OCREnginePool:
+    """OCR工作线程池，每个线程复用自己的引擎"""
+
+    def __init__(self, workers: Optional[int] = None, lang: str = DEFAULT_LANG, config: str = "",
+                 batch_size: int = 8):
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 1)))
+        self.lang = lang
+        self.config = config
+        self.batch_size = batch_size
+        self.backend = "tesserocr" if HAS_TESSEROCR else "tesseract-batch"
+
+        self.pages = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self._engines = []
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr-engine")
+
+    def _engine(self):
+        engine = getattr(self._local, "engine", None)
+        if engine is None:
+            engine = self._local.engine = create_engine(self.lang, self.config)
+            self._engines.append(engine)
+        return engine
+
+    def _run_batch(self, images: Sequence) -> List[str]:
+        try:
+            return self._engine().recognize(images)
+        except Exception as e:
+            print(f"⚠️  OCR批次失败 ({len(images)} 页): {e}")
+            with self._stats_lock:
+                self.failed += len(images)
+            return [''] * len(images)
+
+    def recognize(self, images: Sequence) -> List[str]:
+        """按批次分发到工作线程，结果与输入顺序一致"""
+        if not images:
+            return []
+        start = time.time()
+        batches = [images[i:i + self.batch_size] for i in range(0, len(images), self.batch_size)]
+        results = []
+        for texts in self._executor.map(self._run_batch, batches):
+            results.extend(texts)
+        with self._stats_lock:
+            self.pages += len(images)
+            self.busy_seconds += time.time() - start
+        return results
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "pages": self.pages,
+            "failed": self.failed,
+            "pages_per_sec": self.pages / self.busy_seconds if self.busy_seconds else 0.0,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for engine in self._engines:
+            try:
+                engine.close()
+            except Exception:
+                pass
+        self._engines.clear()
+
+
+_pools: Dict[Tuple[str, str], OCREnginePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_ocr_engine_pool(lang: str = DEFAULT_LANG, config: str = "") -> OCREnginePool:
+    """获取进程级共享的引擎池（按语言和参数区分）"""
+    with _pools_lock:
+        pool = _pools.get((lang, config))
+        if pool is None:
+            pool = _pools[(lang, config)] = OCREnginePool(lang=lang, config=config)
+        return pool
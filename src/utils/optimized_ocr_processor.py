@@ -27,6 +27,9 @@ class OptimizedOCRProcessor:
     _instance = None
     _lock = threading.Lock()
     
+    # 识别配置标识（OCR缓存键的一部分），修改引擎参数时同步修改
+    CACHE_CONFIG = "paddleocr|lang=ch|angle_cls|det_db_thresh=0.3|det_db_box_thresh=0.6"
+    
     def __new__(cls):
         if cls._instance is None:
             with cls._lock:
@@ -217,20 +220,37 @@ class OptimizedOCRProcessor:
         
         return results
     
+    def recognize(self, image) -> str:
+        """
+        识别内存中的单张图像（RGB 数组或 PIL 图像），不经过临时文件
+        
+        供流式OCR流水线的工作线程调用；引擎在首次调用时初始化。
+        """
+        if not self.initialized:
+            # 多个工作线程可能同时首次调用，只初始化一次
+            with self._lock:
+                if not self.initialized and not self.initialize():
+                    raise RuntimeError("OCR引擎初始化失败")
+        import numpy as np
+        # PaddleOCR 的数组输入按 OpenCV 约定为 BGR
+        array = np.ascontiguousarray(np.asarray(image)[:, :, ::-1])
+        return self._extract_text(self.ocr_engine.ocr(array, cls=True))
+    
+    def _extract_text(self, result) -> str:
+        """从 PaddleOCR 结果中提取文本行"""
+        text_lines = []
+        if result and result[0]:
+            for line in result[0]:
+                if len(line) >= 2:
+                    text_lines.append(line[1][0])
+        return '\n'.join(text_lines)
+    
     def _process_single_image(self, image_path: str) -> Dict:
         """处理单张图片"""
         try:
             # 使用已初始化的OCR引擎
             result = self.ocr_engine.ocr(image_path, cls=True)
-            
-            # 提取文本
-            text_lines = []
-            if result and result[0]:
-                for line in result[0]:
-                    if len(line) >= 2:
-                        text_lines.append(line[1][0])
-            
-            text = '\n'.join(text_lines)
+            text = self._extract_text(result)
             
             return {
                 'path': image_path,
@@ -13,6 +13,8 @@ import functools
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Callable, List, Any, Optional
 
+from .metrics_sampler import get_metrics_sampler
+
 
 class ParallelExecutor:
     """统一的并行执行管理器 - 带CPU使用率限制"""
@@ -55,7 +57,7 @@ class ParallelExecutor:
         
         # 检查CPU使用率，如果过高则禁用并行
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            cpu_percent = get_metrics_sampler().cpu_percent()
             if cpu_percent > 85:  # 降低阈值，更保守
                 print(f"⚠️  CPU使用率过高 ({cpu_percent:.1f}%)，禁用并行处理")
                 return False
@@ -9,10 +9,15 @@ from typing import List, Tuple
 from PIL import Image
 import numpy as np
 
+from .ocr_cache import get_ocr_cache, image_digest
+
 # 全局OCR实例，避免重复加载
 _global_ocr = None
 _ocr_initialized = False
 
+# 识别配置标识（OCR缓存键的一部分）
+OCR_CACHE_CONFIG = "paddleocr|lang=ch|angle_cls"
+
 def _get_ocr_instance():
     """获取全局OCR实例，只初始化一次"""
     global _global_ocr, _ocr_initialized
@@ -94,14 +99,20 @@ class ParallelOCRProcessor:
         
         print(f"🔥 启动OCR处理 {len(images)} 张图片")
         
-        # 准备数据
-        image_data = []
-        for i, image in enumerate(images):
-            img_array = np.array(image)
-            image_data.append((i, img_array))
+        # 准备数据：已识别过的页面直接取缓存，只把未命中的页面交给OCR
+        cache = get_ocr_cache()
+        arrays = [np.array(image) for image in images]
+        digests = [image_digest(arr) for arr in arrays]
+        cached = cache.get_many(digests, OCR_CACHE_CONFIG)
+        image_data = [(i, arr) for i, arr in enumerate(arrays) if cached[i] is None]
         
         start_time = time.time()
-        results = {}
+        results = {i: text for i, text in enumerate(cached) if text is not None}
+        if results:
+            print(f"♻️  OCR缓存命中 {len(results)}/{len(images)} 张")
+        if not image_data:
+            return [results[i] for i in range(len(images))]
+        recognized = set(results)
         
         # 检查是否在daemon进程中，直接使用串行处理
         try:
@@ -140,6 +151,10 @@ class ParallelOCRProcessor:
                     except Exception as ocr_e:
                         results[page_num] = f"OCR错误: {str(ocr_e)}"
         
+        # 识别成功的页面写入缓存
+        fresh = [i for i, text in results.items() if i not in recognized and not text.startswith("OCR错误")]
+        cache.put_many([digests[i] for i in fresh], OCR_CACHE_CONFIG, [results[i] for i in fresh])
+        
         # 按顺序组装结果
         ordered_results = []
         for i in range(len(images)):
@@ -10,6 +10,8 @@ def extract_metadata_task(task):
     """
     单个文件的元数据提取任务（多进程安全）
     
+    只计算不写盘，由调用方用 MetadataManager.upsert_many 一次性提交。
+    
     Args:
         task: (file_path, file_name, doc_ids, text_sample, persist_dir)
         
@@ -17,8 +19,7 @@ def extract_metadata_task(task):
         (file_name, metadata_dict)
     """
     fp, fname, doc_ids, text_sample, persist_dir = task
-    temp_mgr = MetadataManager(persist_dir)
-    return fname, temp_mgr.add_file_metadata(fp, doc_ids, text_sample)
+    return fname, MetadataManager.build_file_metadata(fp, doc_ids, text_sample)
 
 
 def process_node_worker(args):
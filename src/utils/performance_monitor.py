@@ -9,6 +9,8 @@ from collections import deque
 from datetime import datetime
 from typing import Dict, List
 
+from src.utils.metrics_sampler import get_metrics_sampler
+
 class PerformanceMonitor:
     def __init__(self, history_size=100):
         self.history_size = history_size
@@ -53,20 +55,19 @@ class PerformanceMonitor:
         while self.monitoring:
             try:
                 # 收集系统指标
-                cpu_percent = psutil.cpu_percent(interval=1)
-                memory = psutil.virtual_memory()
-                disk = psutil.disk_usage('/')
+                sample = get_metrics_sampler().latest()
+                cpu_percent = sample.cpu_percent
                 
                 # 记录数据
                 timestamp = datetime.now()
                 self.metrics['cpu'].append(cpu_percent)
-                self.metrics['memory'].append(memory.percent)
-                self.metrics['disk'].append(disk.percent)
+                self.metrics['memory'].append(sample.memory_percent)
+                self.metrics['disk'].append(sample.disk_percent)
                 self.metrics['timestamps'].append(timestamp)
                 
                 # 更新峰值
                 self.system_stats['peak_cpu'] = max(self.system_stats['peak_cpu'], cpu_percent)
-                self.system_stats['peak_memory'] = max(self.system_stats['peak_memory'], memory.percent)
+                self.system_stats['peak_memory'] = max(self.system_stats['peak_memory'], sample.memory_percent)
                 
                 time.sleep(interval)
             except Exception as e:
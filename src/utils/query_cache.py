@@ -1,7 +1,7 @@
 """查询缓存模块 - LRU Cache"""
 
-from functools import lru_cache
-from typing import Optional, List, Tuple
+from collections import OrderedDict
+from typing import Optional, Tuple
 import hashlib
 
 
@@ -10,8 +10,8 @@ class QueryCache:
     
     def __init__(self, max_size: int = 100):
         self.max_size = max_size
-        self.cache = {}
-        self.access_order = []
+        # 插入/访问顺序即 LRU 顺序，命中与淘汰都是 O(1)
+        self.cache: "OrderedDict[str, Tuple]" = OrderedDict()
     
     def _make_key(self, query: str, kb_name: str, top_k: int) -> str:
         """生成缓存键"""
@@ -24,8 +24,7 @@ class QueryCache:
         
         if key in self.cache:
             # 更新访问顺序
-            self.access_order.remove(key)
-            self.access_order.append(key)
+            self.cache.move_to_end(key)
             return self.cache[key]
         
         return None
@@ -36,18 +35,14 @@ class QueryCache:
         
         # 如果缓存已满，删除最旧的
         if len(self.cache) >= self.max_size and key not in self.cache:
-            oldest_key = self.access_order.pop(0)
-            del self.cache[oldest_key]
+            self.cache.popitem(last=False)
         
         self.cache[key] = result
-        
-        if key not in self.access_order:
-            self.access_order.append(key)
+        self.cache.move_to_end(key)
     
     def clear(self):
         """清空缓存"""
         self.cache.clear()
-        self.access_order.clear()
     
     def get_stats(self) -> dict:
         """获取缓存统计"""
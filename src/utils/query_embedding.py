@@ -0,0 +1,187 @@
+"""
+查询向量化服务 - 并发用户的查询记忆化 + 微批合并
+  - 最近的查询向量按规范化文本记忆（LRU），重复提问不再前向计算
+  - 同一查询正在计算时，后来的请求等待同一个结果
+  - 几毫秒内到达的不同查询合并成一次批量前向（max_wait_ms 可配置），
+    计算期间到达的请求自动进入下一批
+每个嵌入模型一个服务实例，后台线程负责合批。
+"""
+
+import sys
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.embedding_cache import normalize_text
+
+BatchFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+DEFAULT_MAX_BATCH = 32
+DEFAULT_MAX_WAIT_MS = 3.0
+DEFAULT_MEMO_SIZE = 4096
+
+
+def query_batch_fn(embed: Any) -> BatchFn:
+    """取得嵌入模型的批量查询向量化函数（保留各模型的查询指令/前缀）"""
+    if hasattr(embed, "_get_query_embeddings"):
+        return embed._get_query_embeddings
+    # 只有已加载该模块时模型才可能是 HuggingFaceEmbedding，避免为判断类型导入 torch
+    hf_module = sys.modules.get("llama_index.embeddings.huggingface")
+    if hf_module is not None and isinstance(embed, hf_module.HuggingFaceEmbedding):
+        return lambda queries: embed._embed(queries, prompt_name="query")
+    # 不支持批量查询的模型逐条计算，仍享有记忆化和同查询合并
+    return lambda queries: [embed._get_query_embedding(q) for q in queries]
+
+
+class QueryEmbeddingService:
+    """单个嵌入模型的查询向量化服务"""
+
+    def __init__(self, batch_fn: BatchFn, max_batch: int = DEFAULT_MAX_BATCH,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS, memo_size: int = DEFAULT_MEMO_SIZE,
+                 name: str = "query-embed"):
+        """
+        Args:
+            batch_fn: 批量查询向量化函数
+            max_batch: 单次前向的最大查询数
+            max_wait_ms: 第一个请求到达后最多等待多久凑批（0 表示不等待）
+            memo_size: 记忆的查询向量数
+            name: 后台线程名
+        """
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait_ms = max_wait_ms
+        self.memo_size = memo_size
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._memo: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._queue: Deque[Tuple[str, str, Future, float]] = deque()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        self._stats = {"requests": 0, "memo_hits": 0, "coalesced": 0, "batches": 0,
+                       "embedded": 0, "max_batch_seen": 0, "wait_ms_total": 0.0, "errors": 0}
+
+    def embed(self, query: str, timeout: Optional[float] = None) -> List[float]:
+        """查询向量（可并发调用）"""
+        key = normalize_text(query)
+        with self._cond:
+            self._stats["requests"] += 1
+            vector = self._memo.get(key)
+            if vector is not None:
+                self._memo.move_to_end(key)
+                self._stats["memo_hits"] += 1
+                return list(vector)
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self._queue.append((key, query, future, time.perf_counter()))
+                self._ensure_worker()
+                self._cond.notify()
+        return list(future.result(timeout))
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._closed = False
+            self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> List[Tuple[str, str, Future, float]]:
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if self._closed and not self._queue:
+                return []
+            deadline = self._queue[0][3] + self.max_wait_ms / 1000
+            while len(self._queue) < self.max_batch and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.max_batch, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            started = time.perf_counter()
+            try:
+                vectors = [list(v) for v in self.batch_fn([query for _, query, _, _ in batch])]
+                if len(vectors) != len(batch):
+                    raise RuntimeError(f"批量向量化返回 {len(vectors)} 条，期望 {len(batch)} 条")
+                error = None
+            except Exception as e:
+                vectors, error = None, e
+
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+                self._stats["wait_ms_total"] += sum(started - queued for _, _, _, queued in batch) * 1000
+                for i, (key, _, _, _) in enumerate(batch):
+                    self._inflight.pop(key, None)
+                    if error is None:
+                        self._memo[key] = vectors[i]
+                        self._memo.move_to_end(key)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+                if error is None:
+                    self._stats["embedded"] += len(batch)
+                else:
+                    self._stats["errors"] += len(batch)
+
+            for i, (_, _, future, _) in enumerate(batch):
+                if error is None:
+                    future.set_result(vectors[i])
+                else:
+                    future.set_exception(error)
+
+    def clear(self):
+        with self._cond:
+            self._memo.clear()
+
+    def close(self):
+        """停止后台线程（队列中的请求仍会完成）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["memo_entries"] = len(self._memo)
+        requests = stats["requests"]
+        stats["memo_hit_rate"] = stats["memo_hits"] / requests if requests else 0.0
+        stats["avg_batch"] = stats["embedded"] / stats["batches"] if stats["batches"] else 0.0
+        queued = stats["embedded"] + stats["errors"]
+        stats["avg_wait_ms"] = stats.pop("wait_ms_total") / queued if queued else 0.0
+        return stats
+
+
+_services: Dict[str, QueryEmbeddingService] = {}
+_lock = threading.Lock()
+
+
+def get_query_embedding_service(model_key: str, batch_fn: BatchFn, **kwargs) -> QueryEmbeddingService:
+    """获取进程级共享的查询向量化服务（每个嵌入模型一个）"""
+    with _lock:
+        service = _services.get(model_key)
+        if service is None:
+            service = QueryEmbeddingService(batch_fn, name=f"query-embed:{model_key}", **kwargs)
+            _services[model_key] = service
+        return service
+
+
+def get_query_embedding_stats() -> Dict[str, Dict[str, Any]]:
+    """监控面板使用：各模型的查询向量化统计"""
+    with _lock:
+        services = dict(_services)
+    return {key: service.get_stats() for key, service in services.items()}
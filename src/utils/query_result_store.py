@@ -0,0 +1,162 @@
+"""
+查询结果持久化缓存（二级缓存）- 进程重启、部署、工作进程回收后不再冷启动
+SQLite 持久化（WAL，同一节点的多个进程共享），结果 JSON 经 zlib 压缩后存储；
+条目带知识库内容版本和查询向量，一级内存缓存启动时按命中次数批量预热。
+过期（TTL）或超过容量上限时按最近访问时间淘汰。
+"""
+
+import json
+import time
+import zlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.utils.sqlite_cache import SQLiteCache
+
+DEFAULT_STORE_PATH = "./query_cache/results.db"
+DEFAULT_MAX_SIZE_MB = 256
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+@dataclass
+class StoredResult:
+    """持久化的一条查询结果"""
+    key: str
+    kb_name: str
+    version: int
+    params: str
+    query: str
+    data: Dict[str, Any]
+    vector: Optional[np.ndarray]
+    created: float
+    hits: int = 0
+
+
+class QueryResultStore(SQLiteCache):
+    """SQLite 查询结果缓存"""
+
+    TABLE = "results"
+    SIZE_EXPR = "LENGTH(value) + COALESCE(LENGTH(vec), 0)"
+    EVICT_BATCH = 500
+    _COLUMNS = "key, kb_name, version, params, query, value, vec, created, hits"
+
+    def __init__(self, db_path: str = DEFAULT_STORE_PATH, max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+                 ttl: float = DEFAULT_TTL):
+        """
+        Args:
+            db_path: SQLite 文件路径
+            max_size_mb: 结果与向量的总大小上限
+            ttl: 条目有效期（秒）
+        """
+        self.ttl = ttl
+        super().__init__(db_path, max_size_mb)
+
+    def _create_schema(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                kb_name TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                params TEXT NOT NULL,
+                query TEXT NOT NULL,
+                value BLOB NOT NULL,
+                vec BLOB,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_access ON results(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_kb ON results(kb_name)")
+
+    @staticmethod
+    def _encode(data: Dict[str, Any]) -> bytes:
+        return zlib.compress(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"), 6)
+
+    @staticmethod
+    def _decode(value: bytes) -> Dict[str, Any]:
+        return json.loads(zlib.decompress(value).decode("utf-8"))
+
+    def _row_to_result(self, row) -> StoredResult:
+        key, kb_name, version, params, query, value, vec, created, hits = row
+        vector = np.frombuffer(vec, dtype=np.float32) if vec else None
+        return StoredResult(key, kb_name, version, params, query, self._decode(value), vector, created, hits)
+
+    def get(self, key: str) -> Optional[StoredResult]:
+        """按键读取未过期的条目并记一次命中"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self._COLUMNS} FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row[7] >= self.ttl:
+                self._record_lookups(0, 1)
+                return None
+            self._conn.execute("UPDATE results SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                               (time.time(), key))
+            self._conn.commit()
+            self._record_lookups(1, 1)
+        return self._row_to_result(row)
+
+    def put(self, key: str, kb_name: str, version: int, params: str, query: str,
+            data: Dict[str, Any], vector: Optional[np.ndarray] = None):
+        value = self._encode(data)
+        vec = np.asarray(vector, dtype=np.float32).tobytes() if vector is not None else None
+        now = time.time()
+        with self._lock:
+            replaced = self._existing_size([key])
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, "
+                               "COALESCE((SELECT hits FROM results WHERE key = ?), 0))",
+                               (key, kb_name, version, params, query, value, vec, now, now, key))
+            self._conn.commit()
+            self._record_writes(1, len(value) + (len(vec) if vec else 0) - replaced)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def delete_kb(self, kb_name: str, keep_version: Optional[int] = None) -> int:
+        """删除某个知识库的条目；给出 keep_version 时只删除其他版本的条目"""
+        with self._lock:
+            if keep_version is None:
+                cursor = self._conn.execute("DELETE FROM results WHERE kb_name = ?", (kb_name,))
+            else:
+                cursor = self._conn.execute("DELETE FROM results WHERE kb_name = ? AND version != ?",
+                                            (kb_name, keep_version))
+            self._conn.commit()
+            if cursor.rowcount:
+                self._size = self._total_size()
+            return cursor.rowcount
+
+    def hottest(self, limit: int) -> List[StoredResult]:
+        """命中次数最多的未过期条目（启动预热用）"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM results WHERE created > ? "
+                "ORDER BY hits DESC, last_access DESC LIMIT ?",
+                (time.time() - self.ttl, limit)
+            ).fetchall()
+        return [self._row_to_result(row) for row in rows]
+
+    def _expire(self):
+        self._conn.execute("DELETE FROM results WHERE created <= ?", (time.time() - self.ttl,))
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["ttl"] = self.ttl
+        return stats
+
+
+_store: Optional[QueryResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_query_result_store(db_path: str = DEFAULT_STORE_PATH,
+                           max_size_mb: float = DEFAULT_MAX_SIZE_MB) -> QueryResultStore:
+    """获取进程级共享的查询结果缓存"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = QueryResultStore(db_path, max_size_mb)
+        return _store
@@ -9,6 +9,7 @@ import json
 import time
 from datetime import datetime
 import psutil
+from src.utils.metrics_sampler import get_metrics_sampler
 from pathlib import Path
 
 class RealtimeMonitor:
@@ -286,7 +287,7 @@ class RealtimeMonitor:
         """获取系统监控指标"""
         try:
             # CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            cpu_percent = get_metrics_sampler().cpu_percent()
             
             # 内存使用率
             memory = psutil.virtual_memory()
@@ -4,6 +4,7 @@
 """
 
 import psutil
+from src.utils.metrics_sampler import get_metrics_sampler
 
 
 def check_resource_usage(threshold=90.0):
@@ -16,7 +17,7 @@ def check_resource_usage(threshold=90.0):
     Returns:
         tuple: (cpu%, mem%, gpu%, should_throttle)
     """
-    cpu = psutil.cpu_percent(interval=0.1)
+    cpu = get_metrics_sampler().cpu_percent()
     mem = psutil.virtual_memory().percent
     gpu = 0.0
     
@@ -46,7 +47,7 @@ def get_system_stats():
     Returns:
         dict: 系统统计信息
     """
-    cpu_percent = psutil.cpu_percent(interval=0.1)
+    cpu_percent = get_metrics_sampler().cpu_percent()
     mem = psutil.virtual_memory()
     disk = psutil.disk_usage('/')
     
@@ -12,6 +12,7 @@ from typing import Dict, List, Optional
 from enum import Enum
 import logging  # 允许使用 - 智能调度专用
 from src.app_logging.log_manager import LogManager
+from src.utils.metrics_sampler import get_metrics_sampler
 
 class TaskType(Enum):
     """任务类型枚举"""
@@ -62,8 +63,9 @@ class SmartScheduler:
     
     def get_system_load(self) -> Dict:
         """获取系统负载"""
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        memory_percent = psutil.virtual_memory().percent
+        sample = get_metrics_sampler().latest()
+        cpu_percent = sample.cpu_percent
+        memory_percent = sample.memory_percent
         
         # 分类负载等级
         cpu_level = self._classify_load(cpu_percent, self.config['cpu_thresholds'])
@@ -0,0 +1,119 @@
+"""
+SQLite 缓存公共部分 - 嵌入、OCR、查询结果等缓存共用
+  - connect_wal：WAL 模式连接（多进程共享，写入不阻塞读取）
+  - SQLiteCache：容量上限 + 按最近访问时间淘汰（降到上限的 90%），命中/写入/淘汰计数
+子类只需建表（含 key、last_access 列）并给出条目大小的 SQL 表达式。
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Dict
+
+
+def connect_wal(db_path: str, check_same_thread: bool = False) -> sqlite3.Connection:
+    """打开 WAL 模式的 SQLite 连接（目录不存在时创建）"""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SQLiteCache:
+    """有容量上限、按最近访问时间淘汰的 SQLite 缓存"""
+
+    TABLE = ""       # 表名
+    SIZE_EXPR = ""   # 单个条目大小的 SQL 表达式，如 "LENGTH(vec)"
+    EVICT_BATCH = 1000
+
+    def __init__(self, db_path: str, max_size_mb: float):
+        self.db_path = db_path
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self._conn = connect_wal(db_path)
+        self._create_schema()
+        self._conn.commit()
+        self._size = self._total_size()
+
+    def _create_schema(self):
+        raise NotImplementedError
+
+    def _total_size(self) -> int:
+        return self._conn.execute(f"SELECT COALESCE(SUM({self.SIZE_EXPR}), 0) FROM {self.TABLE}").fetchone()[0]
+
+    def _existing_size(self, keys) -> int:
+        """已存在条目的总大小（INSERT OR REPLACE 覆盖前调用，调用方持有锁）"""
+        keys = list(keys)
+        total = 0
+        # SQLite 单条语句参数上限 999
+        for i in range(0, len(keys), 900):
+            chunk = keys[i:i + 900]
+            total += self._conn.execute(
+                f"SELECT COALESCE(SUM({self.SIZE_EXPR}), 0) FROM {self.TABLE} "
+                f"WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchone()[0]
+        return total
+
+    def _record_lookups(self, hits: int, total: int):
+        self.hits += hits
+        self.misses += total - hits
+
+    def _record_writes(self, count: int, size: int):
+        """写入已提交后更新计数，超过上限时淘汰（调用方持有锁；size 为净增大小，已扣除被覆盖的条目）"""
+        self.writes += count
+        self._size += size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _expire(self):
+        """淘汰前删除过期条目（有有效期的缓存覆盖）"""
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到降到上限的 90%"""
+        self._expire()
+        self._size = self._total_size()
+        target = int(self.max_bytes * 0.9)
+        while self._size > target:
+            rows = self._conn.execute(
+                f"SELECT key, {self.SIZE_EXPR} FROM {self.TABLE} ORDER BY last_access LIMIT ?",
+                (self.EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            # 只删除降到目标所需的条目
+            victims = []
+            for key, size in rows:
+                if self._size <= target:
+                    break
+                victims.append((key,))
+                self._size -= size
+            self._conn.executemany(f"DELETE FROM {self.TABLE} WHERE key = ?", victims)
+            self.evictions += len(victims)
+        self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_mb": self._size / 1024 / 1024,
+            "max_size_mb": self.max_bytes / 1024 / 1024,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.TABLE}")
+            self._conn.commit()
+            self._size = 0
@@ -0,0 +1,180 @@
+"""
+流式OCR流水线 - 扫描版PDF按页光栅化、按页识别
+光栅化线程逐页（或按小页段）生成内存图像，经有界队列交给OCR工作线程，
+识别结果按页码顺序逐页产出；任意时刻内存中只保留 队列长度 + 工作线程数 页图像，
+不再整本转换为图片，也不再落盘临时JPEG。
+"""
+
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fitz  # PyMuPDF
+    HAS_PYMUPDF = True
+except ImportError:
+    HAS_PYMUPDF = False
+
+try:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    HAS_PDF2IMAGE = True
+except ImportError:
+    HAS_PDF2IMAGE = False
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """PDF 页数（不光栅化）"""
+    if HAS_PYMUPDF:
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+    if HAS_PDF2IMAGE:
+        return int(pdfinfo_from_path(pdf_path)["Pages"])
+    raise ImportError("需要安装 PyMuPDF 或 pdf2image 来处理扫描版PDF")
+
+
+def iter_pdf_pages(pdf_path: str, dpi: int = 200, chunk_pages: int = 4,
+                   page_numbers: Optional[Sequence[int]] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    逐页光栅化PDF
+
+    Args:
+        pdf_path: PDF文件路径
+        dpi: 光栅化分辨率
+        chunk_pages: pdf2image 每次转换的页数（PyMuPDF 始终逐页）
+        page_numbers: 只光栅化这些页（从1开始，递增），默认全部
+
+    Yields:
+        (页码(从1开始), RGB 图像数组)
+    """
+    if HAS_PYMUPDF:
+        with fitz.open(pdf_path) as doc:
+            indexes = range(doc.page_count) if page_numbers is None else [p - 1 for p in page_numbers]
+            for index in indexes:
+                page = doc.load_page(index)
+                pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+                # pixmap 的缓冲区随对象释放，需要复制一份
+                image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, 3).copy()
+                del pix
+                yield index + 1, image
+        return
+
+    if not HAS_PDF2IMAGE:
+        raise ImportError("需要安装 PyMuPDF 或 pdf2image 来处理扫描版PDF")
+
+    if page_numbers is None:
+        page_numbers = range(1, count_pdf_pages(pdf_path) + 1)
+    wanted = list(page_numbers)
+    # 连续页合并为一次转换，每次最多 chunk_pages 页
+    i = 0
+    while i < len(wanted):
+        j = i
+        while j + 1 < len(wanted) and wanted[j + 1] == wanted[j] + 1 and j + 1 - i < chunk_pages:
+            j += 1
+        first, last = wanted[i], wanted[j]
+        images = convert_from_path(pdf_path, dpi=dpi, first_page=first, last_page=last)
+        for offset, image in enumerate(images):
+            yield first + offset, np.asarray(image.convert("RGB"))
+        i = j + 1
+
+
+class StreamingOCRPipeline:
+    """光栅化 → 有界队列 → OCR工作线程 → 按页序产出"""
+
+    _DONE = object()
+
+    def __init__(self, ocr_fn: Callable[[np.ndarray], str], workers: int = 2, queue_size: Optional[int] = None):
+        """
+        Args:
+            ocr_fn: 识别单页图像并返回文本的函数（需线程安全）
+            workers: OCR工作线程数
+            queue_size: 待识别页队列长度，默认 workers * 2
+        """
+        self.ocr_fn = ocr_fn
+        self.workers = max(1, workers)
+        self.queue_size = queue_size or self.workers * 2
+        self.pages_done = 0
+        self.pages_failed = 0
+        self.failed_pages = set()
+
+    def run(self, pages: Iterable[Tuple[int, np.ndarray]]) -> Iterator[Tuple[int, str]]:
+        """
+        处理页面流，按页码顺序逐页产出 (页码, 文本)
+
+        调用方提前停止迭代时，光栅化和识别线程会在当前页处理完后退出。
+        """
+        page_queue = queue.Queue(maxsize=self.queue_size)
+        result_queue = queue.Queue()
+        stop = threading.Event()
+
+        def put_page(item) -> bool:
+            while not stop.is_set():
+                try:
+                    page_queue.put(item, timeout=0.2)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            total = 0
+            try:
+                for page_no, image in pages:
+                    if not put_page((total, page_no, image)):
+                        return
+                    total += 1
+            except Exception as e:
+                result_queue.put(("error", e))
+            finally:
+                # 告知消费端总页数，再通知每个工作线程结束
+                result_queue.put(("total", total))
+                for _ in range(self.workers):
+                    put_page(self._DONE)
+
+        def work():
+            while not stop.is_set():
+                item = page_queue.get()
+                if item is self._DONE:
+                    break
+                seq, page_no, image = item
+                try:
+                    text = self.ocr_fn(image) or ""
+                    self.pages_done += 1
+                except Exception as e:
+                    print(f"⚠️  第{page_no}页OCR失败: {e}")
+                    text = ""
+                    self.pages_failed += 1
+                    self.failed_pages.add(page_no)
+                del image, item
+                result_queue.put(("page", (seq, page_no, text)))
+
+        threads = [threading.Thread(target=produce, name="ocr-rasterizer", daemon=True)]
+        threads += [threading.Thread(target=work, name=f"ocr-worker-{i}", daemon=True) for i in range(self.workers)]
+        for t in threads:
+            t.start()
+
+        finished = {}   # 已识别但前序页未完成的页: seq -> (页码, 文本)
+        total = None    # 光栅化结束后才知道总页数
+        emitted = 0
+        try:
+            while total is None or emitted < total:
+                kind, payload = result_queue.get()
+                if kind == "error":
+                    raise payload
+                if kind == "total":
+                    total = payload
+                    continue
+                seq, page_no, text = payload
+                finished[seq] = (page_no, text)
+                while emitted in finished:
+                    yield finished.pop(emitted)
+                    emitted += 1
+        finally:
+            stop.set()
+            # 唤醒可能阻塞在空队列上的工作线程
+            for _ in range(self.workers):
+                try:
+                    page_queue.put_nowait(self._DONE)
+                except queue.Full:
+                    break
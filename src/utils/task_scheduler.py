@@ -10,6 +10,8 @@ from typing import Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from dataclasses import dataclass
 
+from src.utils.metrics_sampler import get_metrics_sampler
+
 
 @dataclass
 class ResourceStatus:
@@ -35,8 +37,7 @@ class TaskScheduler:
             return self.resource_cache['status']
         
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            memory = psutil.virtual_memory()
+            sample = get_metrics_sampler().latest()
             available_cores = max(1, os.cpu_count() - 1)
             
             # GPU内存检测（简化版）
@@ -52,8 +53,8 @@ class TaskScheduler:
                 pass
             
             status = ResourceStatus(
-                cpu_percent=cpu_percent,
-                memory_percent=memory.percent,
+                cpu_percent=sample.cpu_percent,
+                memory_percent=sample.memory_percent,
                 gpu_memory_used=gpu_memory_used,
                 gpu_memory_total=gpu_memory_total,
                 available_cores=available_cores
@@ -18,13 +18,15 @@ class VectorizationWrapper:
         self.batch_optimizer = batch_optimizer or DynamicBatchOptimizer()
         self.node_parser = SentenceSplitter()
     
-    def vectorize_documents(self, documents: List[Document], show_progress: bool = True):
+    def vectorize_documents(self, documents: List[Document], show_progress: bool = True,
+                            storage_context=None):
         """
         向量化文档（带动态批量优化）
         
         Args:
             documents: 文档列表
             show_progress: 是否显示进度
+            storage_context: 存储上下文（指定向量存储）
             
         Returns:
             VectorStoreIndex
@@ -42,6 +44,7 @@ class VectorizationWrapper:
         # 批量优化主要通过内存管理实现
         index = VectorStoreIndex.from_documents(
             documents,
+            storage_context=storage_context,
             show_progress=show_progress
         )
         
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+ANN 索引测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from src.kb.ann_index import ANN_DIRNAME, build_ann_index
+from src.kb.npy_vector_store import JSON_STORE_FNAME, NpyVectorStore
+
+
+class TestANNIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.persist_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((20, 16))
+        self.vectors = centers[rng.integers(0, 20, 3000)] + 0.3 * rng.standard_normal((3000, 16))
+        store = NpyVectorStore()
+        store.add([TextNode(id_=f"n{i}", text="", embedding=v.tolist()) for i, v in enumerate(self.vectors)])
+        store.persist(os.path.join(self.persist_dir, JSON_STORE_FNAME))
+
+    def tearDown(self):
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+
+    def _query(self, store, vec, k=5):
+        return store.query(VectorStoreQuery(query_embedding=list(vec), similarity_top_k=k)).ids
+
+    def test_small_kb_uses_exact_search(self):
+        """向量数低于阈值时不建索引"""
+        report = build_ann_index(self.persist_dir, min_rows=10000)
+        self.assertEqual(report["status"], "skipped")
+        self.assertFalse(os.path.exists(os.path.join(self.persist_dir, ANN_DIRNAME)))
+
+    def test_build_reports_recall_and_serves_queries(self):
+        """构建报告 recall@k，检索走 ANN，之后追加的行仍可检索到"""
+        report = build_ann_index(self.persist_dir, min_rows=1000, target_recall=0.9)
+        self.assertEqual(report["status"], "built")
+        self.assertGreaterEqual(report["recall"], 0.9)
+
+        store = NpyVectorStore.from_persist_dir(self.persist_dir)
+        self.assertIsNotNone(store.get_ann_index())
+        self.assertEqual(self._query(store, self.vectors[42])[0], "n42")
+
+        store.add([TextNode(id_="new", text="", embedding=[100.0] + [0.0] * 15)])
+        self.assertEqual(self._query(store, [1.0] + [0.0] * 15, k=1), ["new"])
+
+    def test_rewrite_invalidates_index(self):
+        """压缩重写改变行号后旧 ANN 索引不再使用"""
+        build_ann_index(self.persist_dir, min_rows=1000)
+        store = NpyVectorStore.from_persist_dir(self.persist_dir)
+        store.delete_nodes([f"n{i}" for i in range(1000)])
+        store.persist(os.path.join(self.persist_dir, JSON_STORE_FNAME))
+
+        self.assertIsNone(store.get_ann_index())
+        self.assertEqual(self._query(store, self.vectors[2000])[0], "n2000")
+
+
+if __name__ == "__main__":
+    unittest.main()
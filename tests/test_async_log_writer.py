@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+异步日志写入器测试
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.app_logging.async_log_writer import AsyncLogWriter
+
+
+class TestAsyncLogWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "log.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _lines(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_concurrent_writers_are_batched(self):
+        """多线程写入的日志完整落盘，且合并为少量批次"""
+        writer = AsyncLogWriter(flush_interval=0.05, batch_size=500)
+
+        def worker(n):
+            for i in range(500):
+                writer.submit(self.path, json.dumps({"t": n, "i": i}) + "\n")
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        writer.close()
+
+        lines = self._lines()
+        self.assertEqual(len(lines), 2000)
+        for n in range(4):
+            self.assertEqual([x["i"] for x in lines if x["t"] == n], list(range(500)))
+        stats = writer.get_stats()
+        self.assertEqual((stats["written"], stats["dropped"], stats["pending"]), (2000, 0, 0))
+        self.assertLess(stats["batches"], 2000)
+
+    def test_overload_drops_and_counts(self):
+        """缓冲区满时丢弃新日志并计数，flush 后已缓冲的日志落盘"""
+        writer = AsyncLogWriter(capacity=10, flush_interval=60, batch_size=1000)
+        accepted = [writer.submit(self.path, f'{{"i": {i}}}\n') for i in range(25)]
+        self.assertEqual(accepted.count(True), 10)
+        writer.flush()
+
+        self.assertEqual([x["i"] for x in self._lines()], list(range(10)))
+        self.assertEqual(writer.get_stats()["dropped"], 15)
+        writer.close()
+
+    def test_alternating_files_keep_handles(self):
+        """交替写入多个文件时不反复重开句柄，超过上限只关闭最久未用的"""
+        writer = AsyncLogWriter(flush_interval=60, max_open_files=2)
+        paths = [os.path.join(self.tmp_dir, f"{name}.jsonl") for name in "abc"]
+        for _ in range(3):
+            for path in paths[:2]:
+                writer.submit(path, "{}\n")
+                writer.flush()
+        handles = dict(writer._files)
+        writer.submit(paths[0], "{}\n")
+        writer.submit(paths[2], "{}\n")
+        writer.flush()
+
+        self.assertIs(writer._files[paths[0]], handles[paths[0]])
+        self.assertEqual(list(writer._files), [paths[0], paths[2]])
+        self.assertTrue(handles[paths[1]].closed)
+        writer.close()
+        self.assertEqual([sum(1 for _ in open(p)) for p in paths], [4, 3, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+持久化 BM25 倒排索引测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.kb.bm25_index import BM25Index, tokenize
+
+
+class TestBM25Index(unittest.TestCase):
+
+    def setUp(self):
+        self.persist_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+
+    def _build(self, texts):
+        index = BM25Index(self.persist_dir)
+        for doc_id, text in texts.items():
+            index.add_text(doc_id, text)
+        index.commit()
+        return index
+
+    def test_tokenize_chinese(self):
+        """中文分词并去除停用词和标点"""
+        tokens = tokenize("如何配置OCR识别，的")
+        self.assertIn("配置", tokens)
+        self.assertIn("ocr", tokens)
+        self.assertNotIn("的", tokens)
+        self.assertNotIn("，", tokens)
+
+    def test_search_after_reload(self):
+        """持久化后重新加载仍可检索"""
+        self._build({
+            "py": "Python 非常适合数据分析",
+            "java": "Java 是面向对象的编程语言",
+            "js": "JavaScript 用于网页开发",
+        })
+        self.assertTrue(BM25Index.exists(self.persist_dir))
+
+        reloaded = BM25Index(self.persist_dir)
+        hits = reloaded.search("数据分析", top_k=2)
+        self.assertEqual(hits[0][0], "py")
+        self.assertEqual(reloaded.get_stats()['num_docs'], 3)
+
+    def test_append_and_delete(self):
+        """追加写入新段，删除后不再命中，合并后段数归一"""
+        self._build({"a": "向量检索 召回", "b": "关键词 检索"})
+
+        index = BM25Index(self.persist_dir)
+        index.add_text("c", "关键词 倒排索引")
+        index.commit()
+        self.assertEqual(len(index.segments), 2)
+
+        index.delete(["b"])
+        index.commit()
+        reloaded = BM25Index(self.persist_dir)
+        self.assertEqual([doc_id for doc_id, _ in reloaded.search("关键词")], ["c"])
+
+        reloaded.compact()
+        self.assertEqual(len(reloaded.segments), 1)
+        self.assertEqual(reloaded.get_stats()['num_docs'], 2)
+
+    def test_deletes_batched_until_commit(self):
+        """删除只登记，不写出内存段也不构建位置表；commit 时一并生效"""
+        self._build({"a": "向量检索 召回", "b": "关键词 检索"})
+
+        index = BM25Index(self.persist_dir)
+        index.add_text("c", "关键词 倒排索引")
+        index.add_text("d", "关键词 分词")
+        for doc_id in ["a", "d", "missing"]:
+            index.delete([doc_id])
+        self.assertEqual(len(index.segments), 1)
+        self.assertIsNone(index._locations)
+        self.assertFalse(index.contains("a"))
+        self.assertTrue(index.contains("c"))
+
+        index.commit()
+        self.assertEqual(index.deleted, {"a", "d"})
+        reloaded = BM25Index(self.persist_dir)
+        self.assertEqual(reloaded.get_stats()['num_docs'], 2)
+        self.assertEqual([doc_id for doc_id, _ in reloaded.search("倒排索引")], ["c"])
+        self.assertEqual(reloaded.search("召回"), [])
+        self.assertEqual(reloaded.search("分词"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+爬取调度器（按主机礼貌限速）测试
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.processors.crawl_frontier import CrawlFrontier
+
+
+class TestCrawlFrontier(unittest.TestCase):
+
+    def test_depth_limits_and_dedup(self):
+        frontier = CrawlFrontier(max_depth=2, max_pages_per_level=2)
+        self.assertTrue(frontier.add("https://a.com/", 1))
+        self.assertFalse(frontier.add("https://a.com/", 1))   # 已见过
+        self.assertTrue(frontier.add("https://a.com/x", 1))
+        self.assertFalse(frontier.add("https://a.com/y", 1))  # 第1层上限 2 ** 1
+        self.assertFalse(frontier.add("https://a.com/z", 3))  # 超过最大深度
+        self.assertEqual(frontier.pending, 2)
+
+    def test_per_level_limit(self):
+        frontier = CrawlFrontier(max_depth=2, max_pages_per_level=2)
+        added = [frontier.add(f"https://a.com/{i}", 2) for i in range(6)]
+        self.assertEqual(sum(added), 4)
+        self.assertFalse(frontier.add("https://a.com/deep", 3))
+
+    def test_shallow_first(self):
+        frontier = CrawlFrontier(max_depth=3, max_pages_per_level=10, min_delay=0, initial_host_concurrency=4)
+        frontier.add("https://a.com/deep", 3)
+        frontier.add("https://a.com/mid", 2)
+        frontier.add("https://a.com/", 1)
+        order = [frontier.pop_ready().url for _ in range(3)]
+        self.assertEqual(order, ["https://a.com/", "https://a.com/mid", "https://a.com/deep"])
+
+    def test_host_spacing(self):
+        frontier = CrawlFrontier(max_depth=1, max_pages_per_level=10, min_delay=1.0)
+        frontier.add("https://a.com/1", 1)
+        frontier.add("https://a.com/2", 1)
+        frontier.add("https://b.com/1", 1)
+
+        now = frontier.hosts["a.com"].last_refill
+        first = frontier.pop_ready(now)
+        second = frontier.pop_ready(now)
+        self.assertEqual({first.host, second.host}, {"a.com", "b.com"})
+        # a.com 的令牌已用完，需要等待一个间隔
+        self.assertIsNone(frontier.pop_ready(now))
+        self.assertAlmostEqual(frontier.next_ready_in(now), 1.0, places=2)
+        self.assertEqual(frontier.pop_ready(now + 1.0).url, "https://a.com/2")
+
+    def test_throttle_backoff_and_retry(self):
+        frontier = CrawlFrontier(max_depth=1, max_pages_per_level=10, min_delay=0.5,
+                                 initial_host_concurrency=4, max_retries=1)
+        frontier.add("https://a.com/1", 1)
+        item = frontier.pop_ready()
+
+        self.assertTrue(frontier.complete(item, 429, 0.1, retry_after=5))
+        state = frontier.hosts["a.com"]
+        self.assertEqual(state.concurrency, 2)
+        self.assertEqual(state.delay, 1.0)
+        self.assertEqual(frontier.pending, 1)
+        self.assertGreaterEqual(frontier.next_ready_in(), 4.9)
+
+        retry = frontier.pop_ready(state.blocked_until + 1)
+        self.assertEqual(retry.attempt, 1)
+        # 重试次数用尽后不再入队
+        self.assertFalse(frontier.complete(retry, 503, 0.1))
+        self.assertEqual(frontier.pending, 0)
+
+    def test_additive_increase(self):
+        frontier = CrawlFrontier(max_depth=1, max_pages_per_level=100, min_delay=0,
+                                 initial_host_concurrency=1, max_host_concurrency=3)
+        for i in range(10):
+            frontier.add(f"https://a.com/{i}", 1)
+        for _ in range(10):
+            item = frontier.pop_ready()
+            frontier.complete(item, 200, 0.05)
+        self.assertEqual(frontier.hosts["a.com"].concurrency, 3)
+
+    def test_cancel_returns_slot(self):
+        frontier = CrawlFrontier(max_depth=1, max_pages_per_level=10, min_delay=1.0,
+                                 initial_host_concurrency=1)
+        frontier.add("https://a.com/1", 1)
+        frontier.add("https://a.com/2", 1)
+        now = frontier.hosts["a.com"].last_refill
+        item = frontier.pop_ready(now)
+        self.assertIsNone(frontier.pop_ready(now))
+        frontier.cancel(item)
+        self.assertEqual(frontier.active, 0)
+        self.assertEqual(frontier.pop_ready(now).url, "https://a.com/2")
+
+
+if __name__ == "__main__":
+    unittest.main()
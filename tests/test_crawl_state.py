@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+爬虫状态存储与布隆过滤器测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.bloom_filter import BloomFilter
+from src.processors.crawl_state import CrawlStateStore
+from src.processors.crawl_frontier import CrawlFrontier
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives_and_low_error_rate(self):
+        bloom = BloomFilter(capacity=5000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f"https://a.com/{i}")
+        self.assertTrue(all(f"https://a.com/{i}" in bloom for i in range(5000)))
+        false_positives = sum(f"https://b.com/{i}" in bloom for i in range(5000))
+        self.assertLess(false_positives, 150)
+
+
+class TestCrawlStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "state.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_membership_and_resume(self):
+        store = CrawlStateStore(self.db_path, "a.com", flush_every=3)
+        for i in range(10):
+            store.visited.add(f"https://a.com/{i}")
+        store.visited.add("https://a.com/0")
+        store.failed.add("https://a.com/bad")
+        self.assertEqual(len(store.visited), 10)
+        self.assertIn("https://a.com/9", store.visited)
+        self.assertNotIn("https://a.com/10", store.visited)
+        store.close()
+
+        resumed = CrawlStateStore(self.db_path, "a.com")
+        self.assertEqual(len(resumed.visited), 10)
+        self.assertIn("https://a.com/5", resumed.visited)
+        self.assertIn("https://a.com/bad", resumed.failed)
+        self.assertNotIn("https://a.com/bad", resumed.visited)
+        # 其他站点键互不影响
+        other = CrawlStateStore(self.db_path, "b.com")
+        self.assertEqual(len(other.visited), 0)
+        resumed.close()
+        other.close()
+
+    def test_without_bloom(self):
+        store = CrawlStateStore(self.db_path, "a.com", use_bloom=False)
+        store.content_hashes.add("abc")
+        store.flush()
+        self.assertIn("abc", store.content_hashes)
+        self.assertNotIn("abd", store.content_hashes)
+        self.assertEqual(store.get_stats()["bloom_bytes"], 0)
+        store.close()
+
+    def test_pending_queue(self):
+        store = CrawlStateStore(self.db_path, "a.com")
+        store.add_pending("https://a.com/", 1)
+        store.add_pending("https://a.com/x", 2)
+        store.add_pending("https://a.com/y", 2)
+        store.done_pending("https://a.com/")
+        store.set_meta("admitted_per_depth", {1: 1, 2: 2})
+        store.close()
+
+        store = CrawlStateStore(self.db_path, "a.com")
+        self.assertEqual(sorted(store.pending_items()), [("https://a.com/x", 2), ("https://a.com/y", 2)])
+        self.assertEqual(store.get_meta("admitted_per_depth"), {"1": 1, "2": 2})
+
+        frontier = CrawlFrontier(max_depth=2, max_pages_per_level=1)
+        frontier.admitted_per_depth = {int(d): n for d, n in store.get_meta("admitted_per_depth").items()}
+        for url, depth in store.pending_items():
+            self.assertTrue(frontier.restore(url, depth))
+        # 恢复的条目不受上限约束，新链接仍受
+        self.assertEqual(frontier.pending, 2)
+        self.assertFalse(frontier.add("https://a.com/z", 2))
+
+        store.reset()
+        self.assertEqual(store.pending_items(), [])
+        self.assertEqual(len(store.visited), 0)
+        store.close()
+
+    def test_frontier_seen_backed_by_store(self):
+        """调度器的已接纳集合落在状态库中，续爬后已入队的 URL 不再接纳"""
+        store = CrawlStateStore(self.db_path, "a.com", flush_every=2)
+        frontier = CrawlFrontier(max_depth=2, max_pages_per_level=10, seen=store.queued)
+        self.assertTrue(frontier.add("https://a.com/", 1))
+        self.assertFalse(frontier.add("https://a.com/", 1))
+        self.assertTrue(frontier.add("https://a.com/x", 2))
+        store.close()
+
+        store = CrawlStateStore(self.db_path, "a.com")
+        self.assertEqual(store.get_stats()["queued"], 2)
+        frontier = CrawlFrontier(max_depth=2, max_pages_per_level=10, seen=store.queued)
+        self.assertTrue(frontier.restore("https://a.com/x", 2))
+        self.assertFalse(frontier.add("https://a.com/", 1))
+        self.assertEqual(frontier.pending, 1)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+爬取结果直接入库测试
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core import Settings, load_index_from_storage
+from llama_index.core.embeddings import MockEmbedding
+
+from src.config import ManifestManager
+from src.kb.npy_vector_store import load_storage_context
+from src.processors.crawl_stream import CrawlPageStream, page_to_document, page_file_name
+from src.processors.index_builder import IndexBuilder
+
+
+def make_page(i):
+    return {'url': f"https://docs.example.com/p{i}", 'title': f"页面{i}",
+            'content': f"第{i}页的正文内容，编号{i * 7919}。" * 30, 'timestamp': time.time()}
+
+
+class TestCrawlPageStream(unittest.TestCase):
+
+    def test_pages_flow_while_crawling(self):
+        consumed_before_finish = []
+        finished = []
+
+        def crawl(page_callback):
+            for i in range(5):
+                page_callback(make_page(i))
+                time.sleep(0.02)
+            finished.append(True)
+            return ["a.txt"]
+
+        stream = CrawlPageStream(crawl, queue_size=2)
+        for page in stream:
+            consumed_before_finish.append(not finished)
+        self.assertEqual(len(consumed_before_finish), 5)
+        self.assertTrue(consumed_before_finish[0])
+        self.assertEqual(stream.result, ["a.txt"])
+
+    def test_status_delivered_on_consumer_thread(self):
+        """爬虫线程的状态消息在迭代线程上回调（Streamlit 只接受脚本线程的界面更新）"""
+        import threading
+        seen = []
+
+        def crawl(page_callback):
+            for i in range(3):
+                stream.status(f"抓取 {i}")
+                page_callback(make_page(i))
+            stream.status("完成")
+
+        stream = CrawlPageStream(crawl, status_callback=lambda m: seen.append((m, threading.current_thread())))
+        self.assertEqual(len(list(stream)), 3)
+        self.assertEqual([m for m, _ in seen], ["抓取 0", "抓取 1", "抓取 2", "完成"])
+        self.assertTrue(all(t is threading.current_thread() for _, t in seen))
+
+    def test_crawl_error_propagates(self):
+        def crawl(page_callback):
+            page_callback(make_page(0))
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            list(CrawlPageStream(crawl))
+
+    def test_page_document_metadata(self):
+        page = make_page(3)
+        doc = page_to_document(page)
+        self.assertEqual(doc.metadata['url'], page['url'])
+        self.assertEqual(doc.metadata['file_name'], page_file_name(page['url'], page['title']))
+        self.assertTrue(doc.text.startswith("页面3"))
+
+
+class TestBuildFromPages(unittest.TestCase):
+
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+        self.embed = MockEmbedding(embed_dim=8)
+        Settings.embed_model = self.embed
+
+    def tearDown(self):
+        shutil.rmtree(self.out, ignore_errors=True)
+
+    def _builder(self):
+        return IndexBuilder("kb", self.out, self.embed, "mock", ann_method=None, generate_summary=False)
+
+    def test_build_and_append(self):
+        pages = [make_page(i) for i in range(5)]
+        pages.append(dict(make_page(9), content="   "))  # 空页面跳过
+        result = self._builder().build_from_pages(iter(pages), batch_docs=2)
+        self.assertTrue(result.success, result.error)
+        self.assertEqual((result.file_count, result.doc_count), (5, 5))
+
+        manifest = {f['name']: f for f in ManifestManager.load(self.out)['files']}
+        entry = manifest[page_file_name(pages[0]['url'], pages[0]['title'])]
+        self.assertEqual(entry['url'], pages[0]['url'])
+        self.assertTrue(entry['file_hash'])
+        self.assertEqual(len(entry['doc_ids']), 1)
+
+        result = self._builder().build_from_pages([make_page(7)], action_mode="APPEND")
+        self.assertTrue(result.success, result.error)
+        self.assertEqual(result.file_count, 6)
+        index = load_index_from_storage(load_storage_context(self.out), embed_model=self.embed)
+        urls = {n.metadata.get('url') for n in index.docstore.docs.values()}
+        self.assertIn("https://docs.example.com/p7", urls)
+        self.assertIn("https://docs.example.com/p0", urls)
+
+    def test_append_recrawl_replaces_old_chunks(self):
+        """追加时重新爬取的页面替换旧片段，不重复入库"""
+        self.assertTrue(self._builder().build_from_pages([make_page(i) for i in range(3)]).success)
+        updated = dict(make_page(1), content="更新后的页面正文。" * 30)
+        result = self._builder().build_from_pages([updated, make_page(3), updated], action_mode="APPEND")
+        self.assertTrue(result.success, result.error)
+        self.assertEqual(result.file_count, 4)
+
+        index = load_index_from_storage(load_storage_context(self.out), embed_model=self.embed)
+        texts = [info for info in index.ref_doc_info.values()
+                 if info.metadata.get('url') == updated['url']]
+        self.assertEqual(len(texts), 1)
+        name = page_file_name(updated['url'], updated['title'])
+        entry = {f['name']: f for f in ManifestManager.load(self.out)['files']}[name]
+        self.assertEqual(entry['doc_ids'], list(index.ref_doc_info.keys() & set(entry['doc_ids'])))
+        self.assertEqual(len(index.ref_doc_info), 4)
+
+    def test_no_pages(self):
+        result = self._builder().build_from_pages([])
+        self.assertFalse(result.success)
+
+
+if __name__ == "__main__":
+    unittest.main()
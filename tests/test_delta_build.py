@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+增量构建（DELTA）测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core import Settings, load_index_from_storage
+from llama_index.core.embeddings import MockEmbedding
+
+from src.config import ManifestManager
+from src.kb.bm25_index import BM25Index
+from src.kb.npy_vector_store import load_storage_context
+from src.processors.index_builder import IndexBuilder, guess_source_dir
+
+
+class TestDeltaBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+        self.out = tempfile.mkdtemp()
+        self.embed = MockEmbedding(embed_dim=8)
+        Settings.embed_model = self.embed
+        for i in range(6):
+            self._write(f"d{i}.txt", f"原始文档 {i} " * 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.src, ignore_errors=True)
+        shutil.rmtree(self.out, ignore_errors=True)
+
+    def _write(self, name, text):
+        with open(os.path.join(self.src, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _build(self, action_mode):
+        builder = IndexBuilder("kb", self.out, self.embed, "mock", extract_metadata=False, ann_method=None)
+        result = builder.build(self.src, action_mode=action_mode)
+        self.assertTrue(result.success, result.error)
+        return result
+
+    def _texts(self):
+        index = load_index_from_storage(load_storage_context(self.out), embed_model=self.embed)
+        return [n.get_content() for n in index.docstore.docs.values()]
+
+    def test_delta_only_processes_changes(self):
+        """只处理新增/修改文件，修改和删除文件的旧片段从向量存储与 BM25 中移除"""
+        self._build("NEW")
+
+        self._write("d1.txt", "修改后的文档 " * 20)
+        self._write("d9.txt", "新增文档 " * 20)
+        os.remove(os.path.join(self.src, "d2.txt"))
+
+        result = self._build("DELTA")
+        detection = result.delta.pop('detection')
+        self.assertEqual(result.delta, {'new': 1, 'modified': 1, 'removed': 1, 'unchanged': 4,
+                                        'deleted_docs': 2})
+        self.assertEqual((detection['stat_hits'], detection['hashed']), (4, 2))
+        self.assertEqual(result.doc_count, 2)
+
+        texts = self._texts()
+        self.assertFalse(any("原始文档 1 " in t or "原始文档 2 " in t for t in texts))
+        self.assertTrue(any("修改后的文档" in t for t in texts))
+        self.assertEqual(len(texts), 6)
+
+        manifest = {f['name']: f for f in ManifestManager.load(self.out)['files']}
+        self.assertEqual(sorted(manifest), ["d0.txt", "d1.txt", "d3.txt", "d4.txt", "d5.txt", "d9.txt"])
+        bm25 = BM25Index(self.out)
+        self.assertEqual(bm25.get_stats()['num_docs'], 6)
+        index = load_index_from_storage(load_storage_context(self.out), embed_model=self.embed)
+        hits = {node_id for node_id, _ in bm25.search("原始文档", top_k=10)}
+        self.assertTrue(hits <= set(index.docstore.docs))
+
+    def test_delta_without_changes_is_noop(self):
+        """没有变化时不读取任何文件"""
+        self._build("NEW")
+        result = self._build("DELTA")
+        self.assertEqual(result.doc_count, 0)
+        self.assertEqual(result.delta['unchanged'], 6)
+        self.assertEqual(len(self._texts()), 6)
+
+    def test_guess_source_dir(self):
+        """界面发起增量同步时从清单找回源目录"""
+        self.assertIsNone(guess_source_dir(self.out))
+        self._build("NEW")
+        self.assertEqual(guess_source_dir(self.out), os.path.abspath(self.src))
+
+
+if __name__ == "__main__":
+    unittest.main()
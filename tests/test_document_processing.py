@@ -62,7 +62,47 @@ class TestDocumentProcessing(unittest.TestCase):
         self.assertGreater(len(docs), 0)
         summary = result.get_summary()
         self.assertGreater(summary['success'], 0)
-    
+
+    def test_iter_document_batches(self):
+        """测试流式分批读取（有界在途批次）"""
+        from src.file_processor import iter_document_batches, FileProcessResult
+
+        # 创建测试文件（含子目录）
+        os.makedirs(os.path.join(self.test_dir, "sub"))
+        for i in range(25):
+            with open(os.path.join(self.test_dir, f"doc{i}.txt"), 'w', encoding='utf-8') as f:
+                f.write(f"内容 {i}")
+        with open(os.path.join(self.test_dir, "sub", "nested.md"), 'w', encoding='utf-8') as f:
+            f.write("子目录内容")
+
+        result = FileProcessResult()
+        batches = list(iter_document_batches(self.test_dir, result=result,
+                                             batch_size=4, max_pending=2, max_workers=2))
+
+        # 每批不超过 batch_size 个文件，且每个文件只读取一次
+        self.assertTrue(all(len(b) <= 4 for b in batches))
+        names = [d.metadata['file_name'] for b in batches for d in b]
+        self.assertEqual(len(names), 26)
+        self.assertEqual(len(set(names)), 26)
+        self.assertEqual(result.get_summary()['success'], 26)
+
+    def test_failed_batch_reported(self):
+        """整批读取失败时批内文件登记为失败，而不是静默丢弃"""
+        from unittest import mock
+        from src import file_processor
+        from src.file_processor import iter_document_batches, FileProcessResult
+
+        for i in range(3):
+            with open(os.path.join(self.test_dir, f"doc{i}.txt"), 'w', encoding='utf-8') as f:
+                f.write(f"内容 {i}")
+
+        result = FileProcessResult()
+        with mock.patch.object(file_processor, "_process_batch", side_effect=RuntimeError("进程崩溃")):
+            batches = list(iter_document_batches(self.test_dir, result=result, max_workers=1))
+        self.assertEqual(batches, [])
+        self.assertEqual(sorted(f['file'] for f in result.failed), ["doc0.txt", "doc1.txt", "doc2.txt"])
+        self.assertIn("进程崩溃", result.failed[0]['reason'])
+
     def test_pdf_page_reader(self):
         """测试PDF页码读取器"""
         from src.utils.pdf_page_reader import PDFPageReader
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+嵌入缓存测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core.embeddings import MockEmbedding
+
+from src.utils.embedding_cache import CachedEmbedding, EmbeddingCache
+
+
+class _CountingEmbedding(MockEmbedding):
+    """记录实际计算的文本数"""
+
+    computed: int = 0
+
+    def _get_text_embeddings(self, texts):
+        self.computed += len(texts)
+        return [[float(len(t))] * self.embed_dim for t in texts]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "embeddings.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_rebuild_only_embeds_new_chunks(self):
+        """重建时已有片段（空白差异也视为相同）直接命中，缓存跨实例持久"""
+        inner = _CountingEmbedding(embed_dim=4)
+        embed = CachedEmbedding(inner, "hf:test", EmbeddingCache(self.db_path))
+        first = embed.get_text_embedding_batch(["第一段", "第二段"])
+        self.assertEqual(inner.computed, 2)
+
+        embed = CachedEmbedding(inner, "hf:test", EmbeddingCache(self.db_path))
+        second = embed.get_text_embedding_batch([" 第一段\n", "第二段", "第三段"])
+        self.assertEqual(inner.computed, 3)
+        self.assertEqual(second[:2], first)
+
+        stats = embed._cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 3))
+
+    def test_model_isolation_and_eviction(self):
+        """不同模型互不命中；超过容量后淘汰最久未访问的条目"""
+        cache = EmbeddingCache(self.db_path, max_size_mb=0.001)
+        cache.put_many("a", ["x"], [[1.0] * 4])
+        self.assertEqual(cache.get_many("b", ["x"]), [None])
+
+        cache.put_many("a", [f"t{i}" for i in range(100)], [[0.0] * 4] * 100)
+        stats = cache.get_stats()
+        self.assertGreater(stats["evictions"], 0)
+        self.assertLessEqual(stats["size_mb"], stats["max_size_mb"])
+        self.assertEqual(cache.get_many("a", ["x"]), [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
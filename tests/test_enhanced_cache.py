@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+语义查询缓存与知识库版本失效测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.kb.kb_version import bump_kb_version, get_kb_version
+from src.utils.enhanced_cache import EnhancedQueryCache
+from src.utils.query_cache import QueryCache
+from src.utils.query_result_store import QueryResultStore
+
+# 同义查询映射到相近的向量
+VECTORS = {
+    "如何配置OCR": [1.0, 0.0, 0.0],
+    "OCR怎么配置": [0.98, 0.1, 0.0],
+    "如何删除知识库": [0.0, 1.0, 0.0],
+}
+
+
+class TestEnhancedQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.embed_calls = []
+
+        def embed(kb_name, query):
+            self.embed_calls.append(query)
+            return VECTORS[query]
+
+        self.cache = EnhancedQueryCache(max_size=3, kb_base_path=self.base, embed_fn=embed)
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def test_semantic_hit(self):
+        self.assertIsNone(self.cache.get("如何配置OCR", "kb", top_k=5))
+        self.cache.set("如何配置OCR", "kb", {"answer": "a"}, top_k=5)
+        self.assertEqual(self.embed_calls, ["如何配置OCR"])  # set 复用 get 算出的向量
+
+        self.assertEqual(self.cache.get("OCR怎么配置", "kb", top_k=5), {"answer": "a"})
+        self.assertIsNone(self.cache.get("如何删除知识库", "kb", top_k=5))
+        # 参数不同、知识库不同都不共享
+        self.assertIsNone(self.cache.get("OCR怎么配置", "kb", top_k=3))
+        self.assertIsNone(self.cache.get("OCR怎么配置", "other", top_k=5))
+        self.assertEqual(self.cache.get_stats()["semantic_hit_count"], 1)
+
+    def test_version_bump_invalidates(self):
+        kb_dir = os.path.join(self.base, "kb")
+        self.cache.set("如何配置OCR", "kb", {"answer": "old"})
+        self.cache.set("如何删除知识库", "other", {"answer": "x"})
+        self.assertEqual(self.cache.get("如何配置OCR", "kb"), {"answer": "old"})
+
+        version = bump_kb_version(kb_dir)
+        self.assertEqual(get_kb_version(kb_dir), version)
+        self.assertGreater(bump_kb_version(kb_dir), version)
+        self.assertIsNone(self.cache.get("如何配置OCR", "kb"))
+        self.assertIsNone(self.cache.get("OCR怎么配置", "kb"))
+        self.assertEqual(self.cache.get("如何删除知识库", "other"), {"answer": "x"})
+
+        # 知识库被删除后版本回到 0，同样失效
+        self.cache.set("如何配置OCR", "kb", {"answer": "new"})
+        shutil.rmtree(kb_dir)
+        self.assertIsNone(self.cache.get("如何配置OCR", "kb"))
+
+    def test_lru_eviction(self):
+        cache = EnhancedQueryCache(max_size=2, kb_base_path=self.base)
+        cache.set("q1", "kb", {"n": 1})
+        cache.set("q2", "kb", {"n": 2})
+        cache.get("q1", "kb")
+        cache.set("q3", "kb", {"n": 3})
+        self.assertIsNone(cache.get("q2", "kb"))
+        self.assertEqual(cache.get("q1", "kb"), {"n": 1})
+        self.assertEqual(cache.get_stats()["size"], 2)
+        self.assertEqual(cache.invalidate_kb("kb"), 2)
+
+    def test_evicted_entry_leaves_semantic_tier(self):
+        for query in ("如何配置OCR", "如何删除知识库"):
+            self.cache.set(query, "kb", {"q": query})
+        self.cache.max_size = 1
+        self.cache.set("如何删除知识库", "kb", {"q": "again"})
+        self.assertIsNone(self.cache.get("OCR怎么配置", "kb"))
+        self.assertEqual(self.cache.get("如何删除知识库", "kb"), {"q": "again"})
+
+
+class TestTwoTierCache(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.base, "results.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def _cache(self, **kwargs):
+        return EnhancedQueryCache(kb_base_path=self.base, embed_fn=lambda kb, q: VECTORS[q],
+                                  store=QueryResultStore(self.db_path), **kwargs)
+
+    def test_survives_restart(self):
+        cache = self._cache()
+        cache.get("如何配置OCR", "kb", top_k=5)
+        cache.set("如何配置OCR", "kb", {"answer": "a", "sources": [{"text": "正文" * 100}]}, top_k=5)
+
+        # 新进程：内存为空，从磁盘读取后提升到内存
+        restarted = self._cache()
+        self.assertEqual(restarted.get("如何配置OCR", "kb", top_k=5)["answer"], "a")
+        stats = restarted.get_stats()
+        self.assertEqual((stats["l2_hit_count"], stats["size"]), (1, 1))
+
+        # 预热同时恢复语义层
+        warmed = self._cache()
+        self.assertEqual(warmed.warm_up(), 1)
+        self.assertEqual(warmed.get("OCR怎么配置", "kb", top_k=5)["answer"], "a")
+        self.assertEqual(warmed.get_stats()["l2"]["entries"], 1)
+
+    def test_version_change_purges_disk(self):
+        cache = self._cache()
+        cache.set("如何配置OCR", "kb", {"answer": "old"})
+        bump_kb_version(os.path.join(self.base, "kb"))
+
+        restarted = self._cache()
+        self.assertEqual(restarted.warm_up(), 0)
+        self.assertIsNone(restarted.get("如何配置OCR", "kb"))
+        self.assertEqual(restarted.store.get_stats()["entries"], 0)
+
+    def test_store_ttl_and_size(self):
+        store = QueryResultStore(self.db_path, max_size_mb=0.01, ttl=3600)
+        for i in range(50):
+            store.put(f"k{i}", "kb", 0, "{}", f"q{i}", {"answer": os.urandom(200).hex()})
+        self.assertLess(store.get_stats()["size_mb"], 0.01)
+        self.assertGreater(store.evictions, 0)
+        self.assertIsNotNone(store.get("k49"))
+
+        store.ttl = 0
+        self.assertIsNone(store.get("k49"))
+        self.assertEqual(store.hottest(10), [])
+
+    def test_query_cache_lru(self):
+        cache = QueryCache(max_size=2)
+        cache.set("a", "kb", 5, ("A",))
+        cache.set("b", "kb", 5, ("B",))
+        cache.get("a", "kb", 5)
+        cache.set("c", "kb", 5, ("C",))
+        self.assertIsNone(cache.get("b", "kb", 5))
+        self.assertEqual(cache.get("a", "kb", 5), ("A",))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+文件指纹变化检测测试
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.kb.incremental_updater import IncrementalUpdater
+
+
+class TestFingerprintChangeDetection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.kb_dir = os.path.join(self.tmp_dir, "kb")
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(self.tmp_dir, f"f{i}.txt")
+            with open(path, "w") as f:
+                f.write(f"内容 {i}" * 100)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_stat_snapshot_skips_reads(self):
+        """快照一致的文件不读内容；只 touch 的文件重新哈希后判定未变"""
+        updater = IncrementalUpdater(self.kb_dir)
+        self.assertEqual(len(updater.get_changed_files(self.paths)['new']), 3)
+        updater.mark_files_processed(self.paths)
+
+        updater = IncrementalUpdater(self.kb_dir)
+        result = updater.get_changed_files(self.paths)
+        self.assertEqual(len(result['unchanged']), 3)
+        report = updater.last_report.to_dict()
+        self.assertEqual((report['stat_hits'], report['hashed']), (3, 0))
+        self.assertEqual(report['bytes_avoided'], sum(os.path.getsize(p) for p in self.paths))
+
+        st = os.stat(self.paths[0])
+        os.utime(self.paths[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        with open(self.paths[1], "a") as f:
+            f.write("追加")
+        result = updater.get_changed_files(self.paths)
+        self.assertEqual(result['modified'], [self.paths[1]])
+        self.assertIn(self.paths[0], result['unchanged'])
+        self.assertEqual(updater.last_report.hashed, 2)
+
+        # touch 后的快照已刷新，下次直接命中
+        updater = IncrementalUpdater(self.kb_dir)
+        updater.get_changed_files([self.paths[0]])
+        self.assertEqual(updater.last_report.stat_hits, 1)
+
+    def test_known_hashes_reused(self):
+        """构建中已算出的哈希直接复用；读取失败的文件不登记"""
+        from unittest import mock
+        from src.kb import incremental_updater
+        from src.utils.file_fingerprint import hash_file
+
+        known = {p: hash_file(p) for p in self.paths[:2]}
+        missing = os.path.join(self.tmp_dir, "missing.txt")
+        updater = IncrementalUpdater(self.kb_dir)
+        with mock.patch.object(incremental_updater, "hash_files", wraps=incremental_updater.hash_files) as spy:
+            updater.mark_files_processed(self.paths + [missing], known_hashes=known)
+        self.assertEqual([p for p, _ in spy.call_args[0][0]], [self.paths[2], missing])
+        self.assertEqual(sorted(updater.file_hashes), self.paths)
+        self.assertEqual(updater.file_hashes[self.paths[0]]["hash"], known[self.paths[0]])
+
+        updater = IncrementalUpdater(self.kb_dir)
+        self.assertEqual(len(updater.get_changed_files(self.paths)['unchanged']), 3)
+
+    def test_legacy_md5_records(self):
+        """旧版只记录 MD5 字符串的元数据仍能正确比对"""
+        os.makedirs(self.kb_dir)
+        legacy = {p: hashlib.md5(open(p, 'rb').read()).hexdigest() for p in self.paths}
+        legacy[self.paths[2]] = "0" * 32
+        with open(os.path.join(self.kb_dir, "incremental_metadata.json"), "w") as f:
+            json.dump(legacy, f)
+
+        result = IncrementalUpdater(self.kb_dir).get_changed_files(self.paths)
+        self.assertEqual(sorted(result['unchanged']), self.paths[:2])
+        self.assertEqual(result['modified'], [self.paths[2]])
+
+
+if __name__ == "__main__":
+    unittest.main()
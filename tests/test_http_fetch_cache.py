@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+HTTP 条件请求缓存与增量爬取测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.http_fetch_cache import HTTPFetchCache, body_digest, fetch_cache_path
+
+PAGES = {
+    "/": ("首页", ["/a", "/b"]),
+    "/a": ("页面A", []),
+    "/b": ("页面B", []),
+}
+
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    versions = {}      # 路径 -> 版本号（改变即内容变化）
+    requests = []      # (路径, 是否带 If-None-Match)
+
+    def do_GET(self):
+        title, links = PAGES[self.path]
+        version = self.versions.get(self.path, 1)
+        etag = f'"{self.path}-{version}"'
+        self.requests.append((self.path, self.headers.get("If-None-Match") is not None))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+        body = (f"<html><head><title>{title}</title></head><body>"
+                f"<p>{title} 第{version}版 " + "正文内容 " * 30 + f"</p>{anchors}</body></html>").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPFetchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = HTTPFetchCache(os.path.join(self.tmp_dir, "fetch.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_record_roundtrip(self):
+        self.assertIsNone(self.cache.get("https://a.com/"))
+        self.cache.put("https://a.com/", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+                       body_digest("<html>"), body_digest("正文"), "标题", ["https://a.com/x"])
+        record = self.cache.get("https://a.com/")
+        self.assertEqual(record.title, "标题")
+        self.assertEqual(record.links, ["https://a.com/x"])
+        self.assertEqual(record.conditional_headers(), {
+            "If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"})
+
+    def test_touch_keeps_last_changed(self):
+        self.cache.put("https://a.com/", {"ETag": '"v1"'}, "b", "c", "t", [])
+        changed_at = self.cache.get("https://a.com/").last_changed
+        self.cache.touch("https://a.com/", {"ETag": '"v2"'})
+        self.cache.put("https://a.com/", {"ETag": '"v3"'}, "b2", "c", "t", [], changed=False)
+        record = self.cache.get("https://a.com/")
+        self.assertEqual(record.etag, '"v3"')
+        self.assertEqual(record.last_changed, changed_at)
+
+    def test_no_validators(self):
+        self.cache.put("https://a.com/", {}, "b", "c", "t", [])
+        self.assertEqual(self.cache.get("https://a.com/").conditional_headers(), {})
+        self.assertEqual(self.cache.get_stats(), {"entries": 1, "with_validators": 0})
+
+
+class TestIncrementalCrawl(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _SiteHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        _SiteHandler.versions = {}
+        _SiteHandler.requests = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _crawl(self, cache, run):
+        from src.processors.web_crawler import WebCrawler
+        crawler = WebCrawler(output_dir=os.path.join(self.tmp_dir, f"run{run}"), fetch_cache=cache)
+        crawler.anti_bot_config.update(min_delay=0, max_delay=0)
+        files = crawler.crawl_advanced(self.base + "/", max_depth=2, max_pages=5, incremental=True)
+        return crawler, files
+
+    def test_only_changed_pages_saved(self):
+        cache = HTTPFetchCache(os.path.join(self.tmp_dir, "fetch.db"))
+
+        crawler, files = self._crawl(cache, 1)
+        self.assertEqual(len(files), 3)
+        self.assertEqual(crawler.recrawl_stats.new, 3)
+
+        _SiteHandler.versions["/b"] = 2
+        _SiteHandler.requests = []
+        crawler, files = self._crawl(cache, 2)
+
+        # 所有页面都带条件请求；首页 304 后仍用缓存链接递归到子页面
+        self.assertEqual(sorted(path for path, _ in _SiteHandler.requests), ["/", "/a", "/b"])
+        self.assertTrue(all(conditional for _, conditional in _SiteHandler.requests))
+        self.assertEqual(len(files), 1)
+        self.assertIn("第2版", open(files[0], encoding="utf-8").read())
+        self.assertEqual(crawler.recrawl_stats.not_modified, 2)
+        self.assertEqual(crawler.recrawl_stats.changed, 1)
+
+    def test_record_written_after_page_handled(self):
+        """边爬边入库时抓取记录随页面交给调用方，入库成功后才写入缓存"""
+        from src.processors.web_crawler import WebCrawler
+        cache = HTTPFetchCache(os.path.join(self.tmp_dir, "fetch.db"))
+        crawler = WebCrawler(output_dir=os.path.join(self.tmp_dir, "run"), fetch_cache=cache)
+        crawler.anti_bot_config.update(min_delay=0, max_delay=0)
+        pages = []
+        crawler.crawl_advanced(self.base + "/a", max_depth=1, max_pages=1, incremental=True,
+                               page_callback=pages.append, save_files=False)
+        self.assertEqual(len(pages), 1)
+        self.assertIsNone(cache.get(self.base + "/a"))
+
+        self.assertTrue(cache.commit(pages[0]))
+        self.assertEqual(cache.get(self.base + "/a").etag, '"/a-1"')
+
+    def test_web_kb_incremental_update(self):
+        """增量更新网页知识库：缓存在知识库目录下，只有变化的页面重新入库"""
+        from unittest import mock
+        from llama_index.core import Settings
+        from llama_index.core.embeddings import MockEmbedding
+        from src.kb.kb_manager import KBManager
+        from src.processors import web_to_kb_processor
+        from src.processors.web_crawler import WebCrawler
+
+        class FastCrawler(WebCrawler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.anti_bot_config.update(min_delay=0, max_delay=0)
+
+        Settings.embed_model = MockEmbedding(embed_dim=8)
+        processor = web_to_kb_processor.WebToKBProcessor()
+        processor.kb_manager = KBManager(base_path=self.tmp_dir)
+
+        def crawl():
+            with mock.patch.object(web_to_kb_processor, "WebCrawler", FastCrawler):
+                return processor.crawl_and_build_kb(url=self.base + "/", max_depth=2, max_pages=5,
+                                                    kb_name="site", auto_switch=False, incremental=True)
+
+        result = crawl()
+        self.assertTrue(result["success"], result["message"])
+        self.assertEqual((result["files_count"], result["doc_count"]), (3, 3))
+        cache_path = fetch_cache_path(os.path.join(self.tmp_dir, "site"))
+        self.assertEqual(HTTPFetchCache(cache_path).get_stats()["entries"], 3)
+
+        _SiteHandler.versions["/b"] = 2
+        result = crawl()
+        self.assertTrue(result["success"], result["message"])
+        self.assertEqual((result["files_count"], result["doc_count"]), (3, 1))
+
+        result = crawl()
+        self.assertTrue(result["success"], result["message"])
+        self.assertEqual(result["doc_count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+向量 + BM25 并行混合检索测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core import VectorStoreIndex, load_index_from_storage
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import MetadataFilter, MetadataFilters
+
+from src.kb.bm25_index import BM25Index
+from src.kb.hybrid_retriever import HybridRetriever, get_hybrid_retrieval_stats, reciprocal_rank_fusion
+from src.kb.npy_vector_store import load_storage_context, new_storage_context
+
+TEXTS = {
+    "ocr": ("OCR 识别 扫描件 OCR 识别", "manual.pdf"),
+    "ocr2": ("OCR 表格 导出", "faq.md"),
+    "bm25": ("关键词 倒排索引 检索", "manual.pdf"),
+    "vec": ("向量 检索 召回", "faq.md"),
+}
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+
+    def test_fusion_order(self):
+        """两路都靠前的文档排第一，同分按ID稳定排序"""
+        ids, scores = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+        self.assertEqual(list(ids), ["c", "a", "b", "d"])
+        self.assertAlmostEqual(scores[0], 1 / 63 + 1 / 61)
+
+        ids, _ = reciprocal_rank_fusion([["a", "b"], ["b", "a"]], top_k=1)
+        self.assertEqual(list(ids), ["a"])
+        self.assertEqual(len(reciprocal_rank_fusion([[], []])[0]), 0)
+
+
+class TestHybridRetriever(unittest.TestCase):
+
+    def setUp(self):
+        self.persist_dir = tempfile.mkdtemp()
+        nodes = [TextNode(id_=node_id, text=text, metadata={"file_name": name})
+                 for node_id, (text, name) in TEXTS.items()]
+        embed = MockEmbedding(embed_dim=8)
+        VectorStoreIndex(nodes, storage_context=new_storage_context(),
+                         embed_model=embed).storage_context.persist(self.persist_dir)
+        self.index = load_index_from_storage(load_storage_context(self.persist_dir), embed_model=embed)
+        self.bm25 = BM25Index(self.persist_dir)
+        self.bm25.add_nodes(nodes)
+        self.bm25.commit()
+
+    def tearDown(self):
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+
+    def test_keyword_hit_and_timings(self):
+        before = get_hybrid_retrieval_stats()["queries"]
+        retriever = HybridRetriever(self.index, self.bm25, similarity_top_k=2)
+        results = retriever.retrieve("倒排索引")
+        self.assertEqual(len(results), 2)
+        # 向量路分数相同（MockEmbedding），BM25 路决定第一名
+        self.assertEqual(results[0].node.node_id, "bm25")
+        for name in ("vector_ms", "bm25_ms", "fusion_ms", "total_ms"):
+            self.assertGreaterEqual(retriever.last_timings[name], 0.0)
+        self.assertEqual(retriever.get_stats()["queries"], 1)
+        # 进程内累计统计（监控面板读取）包含所有检索器
+        HybridRetriever(self.index, self.bm25, similarity_top_k=2).retrieve("倒排索引")
+        self.assertEqual(get_hybrid_retrieval_stats()["queries"], before + 2)
+
+    def test_filters_apply_before_bm25_top_k(self):
+        """过滤在 BM25 取 top_k 前生效：不匹配的高分文档不会挤掉候选"""
+        filters = MetadataFilters(filters=[MetadataFilter(key="file_name", value="faq.md")])
+        self.assertEqual(self.bm25.search("OCR 识别", top_k=1)[0][0], "ocr")
+        self.assertEqual(self.bm25.search("OCR 识别", top_k=1, allowed=["ocr2", "vec"])[0][0], "ocr2")
+
+        retriever = HybridRetriever(self.index, self.bm25, similarity_top_k=2, candidate_top_k=1,
+                                    filters=filters)
+        results = retriever.retrieve("OCR 识别")
+        self.assertEqual(results[0].node.node_id, "ocr2")
+        self.assertTrue(all(n.node.metadata["file_name"] == "faq.md" for n in results))
+
+    def test_no_match_returns_empty(self):
+        filters = MetadataFilters(filters=[MetadataFilter(key="file_name", value="none.txt")])
+        retriever = HybridRetriever(self.index, self.bm25, filters=filters)
+        self.assertEqual(retriever.retrieve("OCR"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
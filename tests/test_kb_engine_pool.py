@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+常驻知识库检索池测试
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core import Document, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+
+from src.kb.kb_version import bump_kb_version
+from src.query.kb_engine_pool import KBEnginePool
+from src.query.multi_kb_query_engine import MultiKBQueryEngine
+
+
+class TestKBEnginePool(unittest.TestCase):
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.embed = MockEmbedding(embed_dim=8)
+        for kb in ["kb_a", "kb_b", "kb_c"]:
+            docs = [Document(text=f"{kb} 片段 {i}", metadata={"file_name": f"{kb}_{i}.txt"}) for i in range(3)]
+            index = VectorStoreIndex.from_documents(docs, embed_model=self.embed)
+            persist_dir = os.path.join(self.base_path, kb)
+            index.storage_context.persist(persist_dir)
+            with open(os.path.join(persist_dir, ".kb_info.json"), 'w') as f:
+                json.dump({"embedding_model": "mock"}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.base_path, ignore_errors=True)
+
+    def _pool(self, **kwargs):
+        pool = KBEnginePool(self.base_path, use_processes=False, **kwargs)
+        pool._local.embed_models["mock"] = self.embed
+        return pool
+
+    def test_indexes_stay_resident(self):
+        """重复查询不重新加载索引，查询向量每个模型只算一次"""
+        pool = self._pool()
+        for _ in range(3):
+            results = pool.retrieve(["kb_a", "kb_b"], "片段", top_k_per_kb=2)
+        self.assertTrue(all(r["success"] for r in results.values()))
+        self.assertEqual(pool._local.loads, 2)
+        self.assertEqual(pool.get_stats()["embeddings"], 3)
+
+    def test_lru_eviction(self):
+        """超过上限时淘汰最久未用的索引"""
+        pool = self._pool(max_kbs_per_worker=2)
+        pool.retrieve(["kb_a", "kb_b", "kb_c"], "片段")
+        self.assertEqual(list(pool._local.indexes), ["kb_b", "kb_c"])
+
+    def test_reload_after_version_bump(self):
+        """知识库重建/追加后（版本变化）重新加载常驻索引"""
+        pool = self._pool()
+        pool.retrieve(["kb_a"], "片段")
+        pool.retrieve(["kb_a"], "片段")
+        self.assertEqual(pool._local.loads, 1)
+
+        bump_kb_version(os.path.join(self.base_path, "kb_a"))
+        pool.retrieve(["kb_a"], "片段")
+        self.assertEqual(pool._local.loads, 2)
+
+    def test_embed_model_override(self):
+        """指定的嵌入模型用于未记录模型的知识库"""
+        os.remove(os.path.join(self.base_path, "kb_c", ".kb_info.json"))
+        pool = self._pool(embed_model="mock")
+        self.assertEqual(pool.default_embed_model, "mock")
+        self.assertTrue(pool.retrieve(["kb_c"], "片段")["kb_c"]["success"])
+
+    def test_shared_pool_applies_new_settings(self):
+        """共享池的配置变化时按新配置重建，配置相同时复用"""
+        from src.query import kb_engine_pool
+        from src.query.kb_engine_pool import get_kb_engine_pool
+
+        try:
+            pool = get_kb_engine_pool(self.base_path, use_processes=False, embed_model="a")
+            self.assertIs(get_kb_engine_pool(self.base_path, use_processes=False, embed_model="a"), pool)
+            rebuilt = get_kb_engine_pool(self.base_path, use_processes=False, embed_model="b")
+            self.assertIsNot(rebuilt, pool)
+            self.assertEqual(rebuilt.default_embed_model, "b")
+        finally:
+            kb_engine_pool._pool = None
+            kb_engine_pool._pool_kwargs = {}
+
+    def test_merge_by_score(self):
+        """合并结果按分数全局排序"""
+        results = {
+            "kb_a": {"success": True, "results": [{"score": 0.5, "content": "a"}]},
+            "kb_b": {"success": True, "results": [{"score": 0.9, "content": "b"}, {"score": 0.1, "content": "c"}]},
+            "kb_c": {"success": False, "results": []},
+        }
+        merged = MultiKBQueryEngine.merge_results(results, top_k=2)
+        self.assertEqual([d["content"] for d in merged], ["b", "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
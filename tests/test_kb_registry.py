@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+常驻知识库注册表测试
+"""
+
+import os
+import sys
+import json
+import asyncio
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core import Document, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+
+from src.kb.kb_version import bump_kb_version
+from src.query.kb_registry import KBBusyError, KBRegistry
+
+
+class TestKBRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.base_path = tempfile.mkdtemp()
+        self.embed = MockEmbedding(embed_dim=8)
+        self.persist_dir = os.path.join(self.base_path, "kb_a")
+        docs = [Document(text=f"片段 {i}", metadata={"file_name": f"doc{i}.txt"}) for i in range(3)]
+        index = VectorStoreIndex.from_documents(docs, embed_model=self.embed)
+        index.storage_context.persist(self.persist_dir)
+        with open(os.path.join(self.persist_dir, ".kb_info.json"), 'w') as f:
+            json.dump({"embedding_model": "mock"}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.base_path, ignore_errors=True)
+
+    def _registry(self, **kwargs):
+        registry = KBRegistry(self.base_path, **kwargs)
+        registry._models.embed_models["mock"] = self.embed
+        registry._llm_loaded = True  # 不加载 LLM，回答使用检索片段
+        return registry
+
+    def test_concurrent_queries_share_index(self):
+        """并发查询只加载一次索引"""
+        registry = self._registry(max_concurrency_per_kb=2)
+
+        async def run():
+            return await asyncio.gather(*[
+                registry.run_limited("kb_a", registry.retrieve, "kb_a", "片段", 2) for _ in range(8)
+            ])
+
+        results = asyncio.run(run())
+        self.assertTrue(all(len(r) == 2 for r in results))
+        self.assertEqual(registry.get_stats()["index_loads"], 1)
+        self.assertEqual(registry.get_stats()["loaded_kbs"], ["kb_a"])
+
+    def test_busy_rejection(self):
+        """并发名额占满且等待超时时报告繁忙"""
+        registry = self._registry(max_concurrency_per_kb=1, queue_timeout=0.05)
+
+        async def run():
+            sem = registry._slot("kb_a")
+            await sem.acquire()
+            try:
+                await registry.run_limited("kb_a", registry.retrieve, "kb_a", "片段", 1)
+            finally:
+                sem.release()
+
+        with self.assertRaises(KBBusyError):
+            asyncio.run(run())
+
+    def test_update_files_replaces_old_nodes(self):
+        """增量写入：同一文件重复写入时替换旧片段并持久化"""
+        registry = self._registry()
+        file_path = os.path.join(self.base_path, "new.txt")
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write("新增的文档内容")
+
+        for _ in range(2):
+            processed, failed = registry.update_files("kb_a", [file_path], use_ocr=False)
+            self.assertEqual((processed, failed), ([file_path], []))
+
+        index = registry.get_index("kb_a")
+        names = [info.metadata.get("file_name") for info in index.ref_doc_info.values()]
+        self.assertEqual(names.count("new.txt"), 1)
+
+        reloaded = self._registry()
+        self.assertEqual(len(reloaded.get_index("kb_a").ref_doc_info), 4)
+        # 写入后常驻索引已是最新内容，不重新加载
+        self.assertEqual(registry.get_stats()["index_loads"], 1)
+
+    def test_reload_after_rebuild(self):
+        """知识库被重建（版本变化）后重新加载常驻索引"""
+        registry = self._registry()
+        first = registry.get_index("kb_a")
+        self.assertIs(registry.get_index("kb_a"), first)
+
+        bump_kb_version(self.persist_dir)
+        self.assertIsNot(registry.get_index("kb_a"), first)
+        self.assertEqual(registry.get_stats()["index_loads"], 2)
+
+    def test_update_files_keeps_build_bookkeeping(self):
+        """增量写入登记清单与文件哈希，之后的 DELTA 构建不会重复入库"""
+        from llama_index.core import Settings
+        from src.processors.index_builder import IndexBuilder, load_file_map
+
+        src = os.path.join(self.base_path, "src")
+        os.makedirs(src)
+        for i in range(3):
+            with open(os.path.join(src, f"d{i}.txt"), 'w', encoding='utf-8') as f:
+                f.write(f"原始文档 {i} " * 20)
+        Settings.embed_model = self.embed
+        builder = IndexBuilder("kb_b", os.path.join(self.base_path, "kb_b"), self.embed, "mock",
+                               extract_metadata=False, ann_method=None)
+        self.assertTrue(builder.build(src, action_mode="NEW").success)
+
+        file_path = os.path.join(src, "d1.txt")
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write("修改后的文档 " * 20)
+        with open(os.path.join(src, "d3.txt"), 'w', encoding='utf-8') as f:
+            f.write("新增文档 " * 20)
+        registry = self._registry()
+        registry.update_files("kb_b", [file_path, os.path.join(src, "d3.txt")], use_ocr=False)
+
+        file_map = load_file_map(os.path.join(self.base_path, "kb_b"))
+        self.assertEqual(len(file_map), 4)
+        self.assertTrue(file_map["d3.txt"]["doc_ids"] and file_map["d3.txt"]["file_hash"])
+
+        result = builder.build(src, action_mode="DELTA")
+        self.assertEqual((result.delta["new"], result.delta["modified"], result.doc_count), (0, 0, 0))
+        names = [info.metadata.get("file_name")
+                 for info in registry.get_index("kb_b").ref_doc_info.values()]
+        self.assertEqual(sorted(names), ["d0.txt", "d1.txt", "d2.txt", "d3.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+元数据批量持久化测试
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.metadata_manager import MetadataManager
+
+
+def _write_batch(args):
+    persist_dir, worker = args
+    MetadataManager(persist_dir).upsert_many(
+        {f"w{worker}_{i}.txt": {"category": "其他文档", "keywords": [str(worker)]} for i in range(50)}
+    )
+    return worker
+
+
+class TestMetadataStore(unittest.TestCase):
+
+    def setUp(self):
+        self.persist_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+
+    def test_concurrent_batched_writers(self):
+        """多个进程各自批量写入，互不覆盖"""
+        with mp.Pool(4) as pool:
+            pool.map(_write_batch, [(self.persist_dir, w) for w in range(4)])
+
+        mgr = MetadataManager(self.persist_dir)
+        self.assertEqual(len(mgr.metadata), 200)
+        self.assertEqual(mgr.get_all_categories(), {"其他文档": 200})
+
+        mgr.remove_files(["w0_0.txt", "w1_1.txt"])
+        mgr.update_metadata("w2_2.txt", {"category": "设计文档"})
+        reloaded = MetadataManager(self.persist_dir)
+        self.assertEqual(len(reloaded.metadata), 198)
+        self.assertEqual(reloaded.get_metadata("w2_2.txt")["category"], "设计文档")
+
+    def test_legacy_json_is_imported(self):
+        """旧版 file_metadata.json 仍可读取，首次写入时导入数据库"""
+        with open(os.path.join(self.persist_dir, "file_metadata.json"), "w", encoding="utf-8") as f:
+            json.dump({"old.txt": {"file_hash": "abc", "keywords": []}}, f)
+
+        mgr = MetadataManager(self.persist_dir)
+        self.assertEqual(mgr.get_metadata("old.txt")["file_hash"], "abc")
+
+        sample = os.path.join(self.persist_dir, "new.txt")
+        with open(sample, "w", encoding="utf-8") as f:
+            f.write("需求评审")
+        mgr.add_file_metadata(sample, ["d1"], "需求评审会议")
+
+        reloaded = MetadataManager(self.persist_dir)
+        self.assertEqual(sorted(reloaded.metadata), ["new.txt", "old.txt"])
+        self.assertEqual(reloaded.get_metadata("new.txt")["category"], "需求文档")
+
+
+if __name__ == "__main__":
+    unittest.main()
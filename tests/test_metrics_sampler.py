@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+系统指标采样器测试
+"""
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.metrics_sampler import MetricsSampler
+
+
+class TestMetricsSampler(unittest.TestCase):
+
+    def test_background_sampling(self):
+        """后台线程持续写入环形缓冲区，读取不阻塞"""
+        sampler = MetricsSampler(interval=0.05, history_size=5)
+        sampler.start()
+        try:
+            time.sleep(0.4)
+            history = sampler.history()
+            self.assertEqual(len(history), 5)
+            self.assertEqual(sampler.latest(), history[-1])
+
+            start = time.perf_counter()
+            for _ in range(1000):
+                sampler.cpu_percent()
+            self.assertLess(time.perf_counter() - start, 0.1)
+        finally:
+            sampler.stop()
+
+    def test_sample_fields(self):
+        """样本字段在合理范围内"""
+        sampler = MetricsSampler(interval=60)
+        sample = sampler.latest()
+        try:
+            self.assertTrue(0 <= sample.cpu_percent <= 100)
+            self.assertTrue(0 < sample.memory_percent <= 100)
+            self.assertGreater(sample.process_rss_mb, 0)
+            self.assertIn("disk_percent", sample.to_dict())
+        finally:
+            sampler.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
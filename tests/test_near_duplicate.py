@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+近似重复检测测试
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.near_duplicate import NearDuplicateIndex, simhash, hamming_distance
+
+CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+
+
+def random_text(rng, n=3000):
+    return "".join(rng.choice(CHARS) for _ in range(n))
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_near_duplicates_found_distinct_kept(self):
+        base = random_text(self.rng)
+        edited = base[:300] + "（已更新）" + base[300:] + "\n版权所有"
+        self.assertLessEqual(hamming_distance(simhash(base), simhash(edited)), 3)
+
+        index = NearDuplicateIndex()
+        self.assertIsNone(index.check_and_add("a", base))
+        self.assertEqual(index.check_and_add("b", edited), "a")
+        self.assertIsNone(index.check_and_add("c", random_text(self.rng)))
+        self.assertEqual(len(index), 2)
+
+        index.remove("a")
+        self.assertIsNone(index.find(edited))
+
+    def test_same_key_updates_instead_of_matching_itself(self):
+        """同一键（同一 URL）再次登记时不与自身判重，只更新指纹"""
+        base = random_text(self.rng)
+        index = NearDuplicateIndex()
+        self.assertIsNone(index.check_and_add("https://a", base))
+        self.assertIsNone(index.check_and_add("https://a", base + "。"))
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.check_and_add("https://b", base), "https://a")
+
+    def test_shared_separator_or_table_not_duplicate(self):
+        """共用长分隔线或表格的不相干文档不应判为近似重复"""
+        separator = "\n" + "=" * 400 + "\n"
+        table = "\n".join("| --- | --- | --- |" for _ in range(60))
+        a, b = random_text(self.rng, 200), random_text(self.rng, 200)
+        self.assertGreater(hamming_distance(simhash(a + separator + a), simhash(b + separator + b)), 3)
+        self.assertGreater(hamming_distance(simhash(a + table), simhash(b + table)), 3)
+
+        index = NearDuplicateIndex()
+        self.assertIsNone(index.check_and_add("a", "项目架构说明" + separator + "系统包括检索、索引与问答三个模块。"))
+        self.assertIsNone(index.check_and_add("b", "免费公网访问指南" + separator + "使用内网穿透工具从外部访问服务。"))
+
+    def test_persisted_across_sessions(self):
+        path = os.path.join(self.tmp_dir, "kb", "near_duplicates.json")
+        texts = [random_text(self.rng) for _ in range(50)]
+        index = NearDuplicateIndex(path)
+        for i, text in enumerate(texts):
+            index.add(f"doc{i}", text)
+        index.save()
+
+        reloaded = NearDuplicateIndex(path)
+        self.assertEqual(len(reloaded), 50)
+        self.assertEqual(reloaded.find(texts[17] + "。"), "doc17")
+
+    def test_max_entries_evicts_oldest(self):
+        texts = [random_text(self.rng, 500) for _ in range(5)]
+        index = NearDuplicateIndex(max_entries=3)
+        for i, text in enumerate(texts):
+            index.add(f"doc{i}", text)
+        self.assertEqual(len(index), 3)
+        self.assertNotIn("doc0", index)
+        self.assertIsNone(index.find(texts[1]))
+        self.assertEqual(index.find(texts[4]), "doc4")
+        self.assertEqual(sum(len(m) for m in index._buckets.values()), 3 * len(index._bands))
+
+    def test_content_analyzer_dedup_keeps_better_item(self):
+        from src.processors.content_analyzer import ContentQualityAnalyzer
+
+        base = random_text(self.rng)
+        contents = [{"content": random_text(self.rng), "quality_score": {"total_score": 50}} for _ in range(300)]
+        contents.insert(10, {"content": base, "quality_score": {"total_score": 40}})
+        contents.append({"content": base + "。", "quality_score": {"total_score": 90}})
+        contents.append({"content": base, "quality_score": {"total_score": 99}})  # 完全相同，直接丢弃
+
+        unique = ContentQualityAnalyzer().deduplicate_content(contents)
+        self.assertEqual(len(unique), 301)
+        kept = [c for c in unique if c["content"].startswith(base)]
+        self.assertEqual([c["quality_score"]["total_score"] for c in kept], [90])
+
+    def test_index_builder_skips_near_duplicates(self):
+        """开启去重时跳过近似重复的文档并记录在构建结果中，去重索引随知识库持久化"""
+        from llama_index.core import Settings
+        from llama_index.core.embeddings import MockEmbedding
+        from src.processors.index_builder import IndexBuilder
+
+        src = os.path.join(self.tmp_dir, "src")
+        out = os.path.join(self.tmp_dir, "kb")
+        os.makedirs(src)
+        base = random_text(self.rng)
+        for name, text in [("a.txt", base), ("b.txt", base + "\n转载请注明出处"),
+                           ("c.txt", random_text(self.rng))]:
+            with open(os.path.join(src, name), "w", encoding="utf-8") as f:
+                f.write(text)
+
+        embed = MockEmbedding(embed_dim=8)
+        Settings.embed_model = embed
+        # 默认不去重
+        result = IndexBuilder("kb", out, embed, "mock", extract_metadata=False, ann_method=None).build(src)
+        self.assertEqual((result.doc_count, result.duplicates), (3, None))
+
+        builder = IndexBuilder("kb", out, embed, "mock", extract_metadata=False, ann_method=None,
+                               dedup_near_duplicates=True)
+        result = builder.build(src, action_mode="NEW")
+        self.assertTrue(result.success, result.error)
+        self.assertEqual((result.doc_count, builder.dedup_skipped), (2, 1))
+        # 读取进程并行，先入库的一方被保留
+        self.assertIn(result.duplicates, ({"b.txt": "a.txt"}, {"a.txt": "b.txt"}))
+        self.assertEqual(len(NearDuplicateIndex.for_kb(out)), 2)
+
+        # 被依赖的文件修改后，被跳过的文件在增量构建中重新读取入库
+        kept = next(iter(result.duplicates.values()))
+        with open(os.path.join(src, kept), "w", encoding="utf-8") as f:
+            f.write(random_text(self.rng))
+        result = builder.build(src, action_mode="DELTA")
+        self.assertTrue(result.success, result.error)
+        self.assertEqual((result.doc_count, result.delta["modified"], result.duplicates), (2, 2, None))
+
+    def test_kb_index_shared_across_crawl_stages(self):
+        """质量分析和边爬边入库共用知识库的去重索引，入库后持久化，后续爬取跨会话去重"""
+        from llama_index.core import Settings
+        from llama_index.core.embeddings import MockEmbedding
+        from src.processors.content_analyzer import ContentQualityAnalyzer
+        from src.processors.index_builder import IndexBuilder
+
+        out = os.path.join(self.tmp_dir, "kb")
+        base = random_text(self.rng)
+        pages = [{"url": f"https://docs.example.com/p{i}", "title": f"p{i}", "content": text}
+                 for i, text in enumerate([base, base + "\n转载请注明出处", random_text(self.rng)])]
+
+        shared = NearDuplicateIndex.for_kb(out)
+        analyzer = ContentQualityAnalyzer(near_duplicates=shared)
+        kept = [page for page in pages if analyzer.is_near_duplicate(page) is None]
+        self.assertEqual([p["url"] for p in kept], [pages[0]["url"], pages[2]["url"]])
+
+        embed = MockEmbedding(embed_dim=8)
+        Settings.embed_model = embed
+        builder = IndexBuilder("kb", out, embed, "mock", extract_metadata=False, ann_method=None,
+                               near_duplicates=shared)
+        result = builder.build_from_pages(kept)
+        self.assertTrue(result.success, result.error)
+        self.assertEqual((result.doc_count, builder.dedup_skipped), (2, 0))
+
+        # 下次会话：重新爬取的同一页面不判重，其他 URL 的近似重复内容被识别
+        persisted = NearDuplicateIndex.for_kb(out)
+        self.assertEqual(len(persisted), 2)
+        self.assertIsNone(persisted.check_and_add(pages[0]["url"], base + "。"))
+        self.assertEqual(persisted.check_and_add("https://mirror.example.com/p0", base), pages[0]["url"])
+        analyzer = ContentQualityAnalyzer(near_duplicates=NearDuplicateIndex.for_kb(out))
+        unique = analyzer.analyze_and_filter_contents([dict(pages[1]), dict(pages[2])], min_quality_score=0)
+        self.assertEqual([c["url"] for c in unique], [pages[2]["url"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
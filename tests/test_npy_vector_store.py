@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+二进制向量存储测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core import Document, VectorStoreIndex, load_index_from_storage
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.vector_stores import MetadataFilter, MetadataFilters
+
+from src.kb.npy_vector_store import (
+    NpyVectorStore, JSON_STORE_FNAME, load_storage_context, migrate_kb, new_storage_context
+)
+
+
+class _HashEmbedding(MockEmbedding):
+    """按文本生成确定性向量，使检索结果有区分度"""
+
+    def _vec(self, text):
+        return [float((hash(text) >> (i * 4)) % 17) - 8 for i in range(self.embed_dim)]
+
+    def _get_text_embedding(self, text):
+        return self._vec(text)
+
+    def _get_query_embedding(self, query):
+        return self._vec(query)
+
+
+class TestNpyVectorStore(unittest.TestCase):
+
+    def setUp(self):
+        self.persist_dir = tempfile.mkdtemp()
+        self.embed = _HashEmbedding(embed_dim=16)
+        self.docs = [Document(text=f"文档 {i}", metadata={"file_name": f"f{i}.txt"}) for i in range(12)]
+
+    def tearDown(self):
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+
+    def _retrieve(self, index, query, **kwargs):
+        return [n.node.node_id for n in index.as_retriever(similarity_top_k=3, **kwargs).retrieve(query)]
+
+    def test_migrate_matches_json_results(self):
+        """迁移后检索结果与 JSON 向量存储一致，且不再依赖 JSON 文件"""
+        index = VectorStoreIndex.from_documents(self.docs, embed_model=self.embed)
+        index.storage_context.persist(self.persist_dir)
+        expected = self._retrieve(index, "文档 3")
+
+        report = migrate_kb(self.persist_dir)
+        self.assertEqual(report["status"], "migrated")
+        self.assertFalse(os.path.exists(os.path.join(self.persist_dir, JSON_STORE_FNAME)))
+
+        migrated = load_index_from_storage(load_storage_context(self.persist_dir), embed_model=self.embed)
+        self.assertIsInstance(migrated.vector_store, NpyVectorStore)
+        self.assertEqual(self._retrieve(migrated, "文档 3"), expected)
+
+    def test_append_delete_and_filter(self):
+        """追加、删除（墓碑）和元数据过滤在重新加载后保持一致"""
+        index = VectorStoreIndex.from_documents(self.docs, storage_context=new_storage_context("float16"),
+                                                embed_model=self.embed)
+        index.storage_context.persist(self.persist_dir)
+
+        index = load_index_from_storage(load_storage_context(self.persist_dir), embed_model=self.embed)
+        index.insert(Document(text="新增", metadata={"file_name": "new.txt"}))
+        deleted_nodes = set(index.ref_doc_info[self.docs[0].doc_id].node_ids)
+        index.delete_ref_doc(self.docs[0].doc_id, delete_from_docstore=True)
+        index.storage_context.persist(self.persist_dir)
+
+        reloaded = load_index_from_storage(load_storage_context(self.persist_dir), embed_model=self.embed)
+        stats = reloaded.vector_store.get_stats()
+        self.assertEqual((stats["dtype"], stats["alive"]), ("float16", 12))
+
+        filters = MetadataFilters(filters=[MetadataFilter(key="file_name", value="new.txt")])
+        hits = reloaded.as_retriever(similarity_top_k=3, filters=filters).retrieve("文档")
+        self.assertEqual([h.node.metadata["file_name"] for h in hits], ["new.txt"])
+
+        all_ids = {n.node.node_id for n in reloaded.as_retriever(similarity_top_k=20).retrieve("文档")}
+        self.assertFalse(deleted_nodes & all_ids)
+        self.assertEqual(len(all_ids), 12)
+
+    def test_delete_after_insert(self):
+        """首次删除后构建的行索引随后续写入更新"""
+        index = VectorStoreIndex.from_documents(self.docs, storage_context=new_storage_context(),
+                                                embed_model=self.embed)
+        store = index.vector_store
+        index.delete_ref_doc(self.docs[0].doc_id)
+        extra = Document(text="新增", metadata={"file_name": "new.txt"})
+        index.insert(extra)
+        index.delete_ref_doc(extra.doc_id)
+        index.delete_ref_doc(self.docs[1].doc_id)
+        self.assertEqual(store.get_stats()["alive"], 10)
+        self.assertNotIn(extra.doc_id, store._ref_rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
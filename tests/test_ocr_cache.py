@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+OCR结果缓存测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import ocr_cache
+from src.utils.ocr_cache import OCRCache, image_digest, pdf_page_digest
+from src.utils.streaming_ocr import HAS_PYMUPDF
+
+
+class TestOCRCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = OCRCache(os.path.join(self.tmp_dir, "ocr.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_key_includes_config(self):
+        """同一页面在不同识别配置下互不命中"""
+        digest = image_digest(np.zeros((4, 4, 3), dtype=np.uint8))
+        self.cache.put(digest, "tesseract|dpi=200", "合同")
+        self.assertEqual(self.cache.get(digest, "tesseract|dpi=200"), "合同")
+        self.assertIsNone(self.cache.get(digest, "tesseract|dpi=300"))
+        self.assertNotEqual(digest, image_digest(np.zeros((4, 4, 3), dtype=np.float32)))
+
+        stats = self.cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_overwrite_keeps_size_exact(self):
+        """覆盖已有条目时扣除旧条目大小，重复写入不会把缓存撑到淘汰"""
+        digest = image_digest(np.zeros((4, 4, 3), dtype=np.uint8))
+        for i in range(20):
+            self.cache.put(digest, "cfg", "识别结果" * (i + 1))
+        self.cache.put_many([digest, digest], "cfg", ["旧", "新"])
+        self.assertEqual(self.cache._size, self.cache._total_size())
+        self.assertEqual(self.cache._size, len("新".encode("utf-8")))
+        self.assertEqual(self.cache.get(digest, "cfg"), "新")
+
+    def test_lru_eviction(self):
+        """超过容量上限时淘汰最久未访问的页面"""
+        cache = OCRCache(os.path.join(self.tmp_dir, "small.db"), max_size_mb=0.01)
+        page = "字" * 1000  # 3000 字节
+        cache.put("p0", "cfg", page)
+        cache.put("p1", "cfg", page)
+        cache.get("p0", "cfg")
+        cache.put("p2", "cfg", page)
+        cache.put("p3", "cfg", page)
+
+        self.assertGreater(cache.get_stats()["evictions"], 0)
+        self.assertIsNone(cache.get("p1", "cfg"))
+        self.assertEqual(cache.get("p3", "cfg"), page)
+
+    def test_stats_shared_across_processes(self):
+        """计数存在数据库中：另一个进程（另一个连接）的命中与未命中也能读到"""
+        db_path = os.path.join(self.tmp_dir, "ocr.db")
+        worker = OCRCache(db_path)
+        worker.put("p0", "cfg", "第一页")
+        worker.get_many(["p0", "p1"], "cfg")
+
+        stats = self.cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["writes"], stats["entries"]), (1, 1, 1, 1))
+        self.assertGreater(stats["size_mb"], 0)
+
+        with mock.patch.object(ocr_cache, "_cache", None):
+            self.assertIsNone(ocr_cache.get_ocr_cache_stats(os.path.join(self.tmp_dir, "missing.db")))
+            with mock.patch.object(ocr_cache, "get_ocr_cache", return_value=self.cache):
+                self.assertEqual(ocr_cache.get_ocr_cache_stats(db_path)["hits"], 1)
+
+        self.cache.clear()
+        self.assertEqual(worker.get_stats()["hits"], 0)
+
+
+@unittest.skipUnless(HAS_PYMUPDF, "需要 PyMuPDF")
+class TestCachedPdfOCR(unittest.TestCase):
+
+    def setUp(self):
+        import fitz
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pdf_path = os.path.join(self.tmp_dir, "scan.pdf")
+        doc = fitz.open()
+        for _ in range(3):
+            doc.new_page(width=60, height=40)
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_second_run_skips_ocr(self):
+        """同一PDF第二次处理全部命中缓存，不再光栅化和识别"""
+        from src.utils.enhanced_ocr_optimizer import EnhancedOCROptimizer
+        from src.utils.optimized_ocr_processor import get_ocr_processor
+
+        cache = OCRCache(os.path.join(self.tmp_dir, "ocr.db"))
+        optimizer = EnhancedOCROptimizer.__new__(EnhancedOCROptimizer)
+        calls = []
+
+        def fake_recognize(image):
+            calls.append(image.shape)
+            return f"第{len(calls)}页内容"
+
+        with mock.patch.object(ocr_cache, "_cache", cache), \
+                mock.patch.object(get_ocr_processor(), "recognize", fake_recognize):
+            first = list(optimizer.process_pdf_streaming(self.pdf_path, dpi=72))
+            with mock.patch("src.utils.streaming_ocr.iter_pdf_pages") as rasterize:
+                second = list(optimizer.process_pdf_streaming(self.pdf_path, dpi=72))
+                rasterize.assert_not_called()
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(first, second)
+        self.assertEqual([p for p, _ in second], [1, 2, 3])
+        self.assertIsNotNone(cache.get(pdf_page_digest(_pdf_hash(self.pdf_path), 2),
+                                       f"{get_ocr_processor().CACHE_CONFIG}|dpi=72"))
+
+
+def _pdf_hash(path):
+    from src.utils.file_fingerprint import hash_file
+    return hash_file(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
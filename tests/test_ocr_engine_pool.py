@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+常驻OCR引擎池测试
+"""
+
+import os
+import sys
+import stat
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import ocr_engine_pool
+from src.utils.ocr_engine_pool import OCREnginePool, TesseractBatchEngine, parse_tesseract_config
+
+
+class FakeEngine:
+    created = 0
+
+    def __init__(self, lang, config):
+        FakeEngine.created += 1
+
+    def recognize(self, images):
+        return [f"page {int(np.asarray(img)[0, 0, 0])}" for img in images]
+
+    def close(self):
+        pass
+
+
+class TestOCREnginePool(unittest.TestCase):
+
+    def test_parse_config(self):
+        oem, psm, variables = parse_tesseract_config('--oem 3 --psm 6 -c tessedit_char_whitelist=0123abc')
+        self.assertEqual((oem, psm), (3, 6))
+        self.assertEqual(variables, {"tessedit_char_whitelist": "0123abc"})
+
+    def test_engines_are_reused_across_batches(self):
+        """每个工作线程只创建一次引擎，结果顺序与输入一致"""
+        FakeEngine.created = 0
+        images = [np.full((2, 2, 3), i, dtype=np.uint8) for i in range(50)]
+        with mock.patch.object(ocr_engine_pool, "create_engine", FakeEngine):
+            pool = OCREnginePool(workers=3, batch_size=4)
+            first = pool.recognize(images)
+            second = pool.recognize(images)
+            pool.close()
+
+        self.assertEqual(first, [f"page {i}" for i in range(50)])
+        self.assertEqual(first, second)
+        self.assertLessEqual(FakeEngine.created, 3)
+        stats = pool.get_stats()
+        self.assertEqual(stats["pages"], 100)
+        self.assertGreater(stats["pages_per_sec"], 0)
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "需要 shell 脚本")
+class TestTesseractBatchEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.calls = os.path.join(self.tmp_dir, "calls")
+        # 模拟 tesseract：读取文件列表，每页输出文件名并以换页符结尾
+        self.fake = os.path.join(self.tmp_dir, "tesseract")
+        with open(self.fake, "w") as f:
+            f.write('#!/bin/sh\necho x >> "%s"\n'
+                    'while read p; do printf "%%s\\f" "$(basename "$p")"; done < "$1"\n' % self.calls)
+        os.chmod(self.fake, os.stat(self.fake).st_mode | stat.S_IEXEC)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_one_process_per_batch(self):
+        engine = TesseractBatchEngine(config="--psm 6")
+        engine.cmd = self.fake
+        texts = engine.recognize([np.zeros((4, 4, 3), dtype=np.uint8)] * 5)
+
+        self.assertEqual(texts, [f"{i:05d}.png" for i in range(5)])
+        with open(self.calls) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+查询向量化服务测试（记忆化、同查询合并、微批合并）
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core.embeddings import MockEmbedding
+
+from src.utils.embedding_cache import CachedEmbedding, EmbeddingCache
+from src.utils.query_embedding import QueryEmbeddingService, query_batch_fn
+
+
+class _SlowBatch:
+    """记录每次前向的批内容，模拟固定的前向耗时"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, queries):
+        self.batches.append(list(queries))
+        time.sleep(self.delay)
+        return [[float(len(q)), 1.0] for q in queries]
+
+
+def run_concurrently(fn, args):
+    results = [None] * len(args)
+    barrier = threading.Barrier(len(args))
+
+    def call(i):
+        barrier.wait()
+        results[i] = fn(args[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(args))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TestQueryEmbeddingService(unittest.TestCase):
+
+    def test_concurrent_queries_share_forward_passes(self):
+        batch = _SlowBatch()
+        service = QueryEmbeddingService(batch, max_batch=16, max_wait_ms=20)
+        queries = [f"问题{i}" for i in range(12)] + ["问题0"] * 4
+        results = run_concurrently(service.embed, queries)
+        service.close()
+
+        self.assertEqual(results[0], [3.0, 1.0])
+        self.assertEqual(results[-1], results[0])
+        # 12 个不同查询各只计算一次，且远少于 16 次前向
+        self.assertEqual(sum(len(b) for b in batch.batches), 12)
+        self.assertLessEqual(len(batch.batches), 3)
+
+    def test_memo_and_normalization(self):
+        batch = _SlowBatch(delay=0)
+        service = QueryEmbeddingService(batch, max_wait_ms=0, memo_size=2)
+        service.embed("如何配置OCR")
+        service.embed(" 如何配置OCR\n")
+        self.assertEqual(len(batch.batches), 1)
+
+        service.embed("b")
+        service.embed("c")
+        service.embed("如何配置OCR")  # 已被挤出记忆
+        stats = service.get_stats()
+        self.assertEqual((stats["memo_hits"], stats["embedded"], stats["memo_entries"]), (1, 4, 2))
+        service.close()
+
+    def test_error_propagates_to_all_waiters(self):
+        def failing(queries):
+            time.sleep(0.02)
+            raise ValueError("model down")
+
+        service = QueryEmbeddingService(failing, max_wait_ms=10)
+
+        def call(q):
+            try:
+                service.embed(q)
+            except ValueError as e:
+                return str(e)
+
+        self.assertEqual(run_concurrently(call, ["a", "b", "a"]), ["model down"] * 3)
+        self.assertEqual(service.get_stats()["memo_entries"], 0)
+        service.close()
+
+    def test_cached_embedding_routes_queries(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            inner = MockEmbedding(embed_dim=4)
+            batch = _SlowBatch(delay=0)
+            service = QueryEmbeddingService(batch, max_wait_ms=0)
+            embed = CachedEmbedding(inner, "mock", EmbeddingCache(os.path.join(tmp_dir, "e.db")),
+                                    query_service=service)
+            self.assertEqual(embed.get_query_embedding("你好"), [2.0, 1.0])
+            self.assertEqual(embed.get_query_embedding("你好"), [2.0, 1.0])
+            self.assertEqual(len(batch.batches), 1)
+            service.close()
+
+            # 默认批量函数：不支持批量查询的模型逐条计算
+            self.assertEqual(query_batch_fn(inner)(["a", "b"]), [[0.5] * 4, [0.5] * 4])
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+常驻重排序服务测试（跨请求合批、打分缓存、提前退出）
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from src.query.reranker import CrossEncoderScorer, SharedRerank
+
+
+class _FakeCrossEncoder:
+    """分数 = 片段中查询字符出现的次数；记录每次前向的对数"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, pairs):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return [float(sum(text.count(ch) for ch in set(query))) for query, text in pairs]
+
+
+def make_nodes(texts):
+    return [NodeWithScore(node=TextNode(text=t, id_=f"n{i}"), score=1.0 - i * 0.01) for i, t in enumerate(texts)]
+
+
+class TestCrossEncoderScorer(unittest.TestCase):
+
+    def test_concurrent_requests_share_batches(self):
+        model = _FakeCrossEncoder(delay=0.05)
+        scorer = CrossEncoderScorer("fake", predict_fn=model, max_batch_pairs=64, max_wait_ms=20)
+        results = [None] * 6
+        barrier = threading.Barrier(6)
+
+        def request(i):
+            barrier.wait()
+            results[i] = scorer.score(f"问题{i}", [(f"n{j}", f"问题{i}片段{j}") for j in range(5)])
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sum(model.batches), 30)
+        self.assertLessEqual(len(model.batches), 3)
+        self.assertTrue(all(len(r) == 5 for r in results))
+
+    def test_pair_scores_cached(self):
+        model = _FakeCrossEncoder()
+        scorer = CrossEncoderScorer("fake", predict_fn=model, max_wait_ms=0)
+        first = scorer.score("OCR 配置", [("a", "OCR"), ("b", "配置说明")])
+        # 追问：同一查询、部分片段重复
+        second = scorer.score(" OCR 配置", [("b", "配置说明"), ("c", "无关")])
+        self.assertEqual(second[0], first[1])
+        self.assertEqual(model.batches, [2, 1])
+        self.assertEqual(scorer.get_stats()["cache_hits"], 1)
+
+
+class TestSharedRerank(unittest.TestCase):
+
+    def test_rerank_orders_and_truncates(self):
+        model = _FakeCrossEncoder()
+        scorer = CrossEncoderScorer("fake", predict_fn=model, max_wait_ms=0)
+        rerank = SharedRerank(top_n=2, model="fake", keep_retrieval_score=True, scorer=scorer)
+        nodes = make_nodes(["无关内容", "OCR 配置步骤 OCR", "配置"])
+        result = rerank.postprocess_nodes(nodes, QueryBundle("OCR 配置"))
+        self.assertEqual([n.node.node_id for n in result], ["n1", "n2"])
+        self.assertIn("retrieval_score", result[0].node.metadata)
+
+    def test_early_exit_and_candidate_limit(self):
+        model = _FakeCrossEncoder()
+        scorer = CrossEncoderScorer("fake", predict_fn=model, max_wait_ms=0)
+        rerank = SharedRerank(top_n=2, model="fake", scorer=scorer, candidate_limit=8, early_exit=True)
+        # 检索顺序已基本正确：前两名之后的片段都不相关
+        texts = ["OCR 配置", "配置 OCR 方法"] + [f"无关{i}" for i in range(10)]
+        result = rerank.postprocess_nodes(make_nodes(texts), QueryBundle("OCR 配置"))
+        self.assertEqual({n.node.node_id for n in result}, {"n0", "n1"})
+        # 只打了两段（4 对），没有打满 8 个候选
+        self.assertEqual(sum(model.batches), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+流式OCR流水线测试
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.streaming_ocr import StreamingOCRPipeline, iter_pdf_pages, count_pdf_pages, HAS_PYMUPDF
+
+
+class TestStreamingOCRPipeline(unittest.TestCase):
+
+    def test_pages_emitted_in_order_with_bounded_memory(self):
+        """乱序完成的页按页序产出，同时存活的页图像数有上限"""
+        lock = threading.Lock()
+        state = {"alive": 0, "peak": 0}
+
+        def pages():
+            for page_no in range(1, 41):
+                with lock:
+                    state["alive"] += 1
+                    state["peak"] = max(state["peak"], state["alive"])
+                yield page_no, np.full((4, 4, 3), page_no, dtype=np.uint8)
+
+        def fake_ocr(image):
+            time.sleep(random.uniform(0, 0.005))
+            with lock:
+                state["alive"] -= 1
+            return f"page {int(image[0, 0, 0])}"
+
+        pipeline = StreamingOCRPipeline(fake_ocr, workers=3, queue_size=2)
+        results = list(pipeline.run(pages()))
+
+        self.assertEqual([p for p, _ in results], list(range(1, 41)))
+        self.assertEqual([t for _, t in results], [f"page {p}" for p in range(1, 41)])
+        # 队列长度 + 工作线程数 + 光栅化线程手中的一页
+        self.assertLessEqual(state["peak"], 2 + 3 + 1)
+
+    def test_failed_page_and_early_stop(self):
+        """单页识别失败返回空文本；调用方提前停止时不会挂起"""
+        def fake_ocr(image):
+            if image[0, 0, 0] == 2:
+                raise ValueError("bad page")
+            return "ok"
+
+        pages = ((p, np.full((2, 2, 3), p, dtype=np.uint8)) for p in range(1, 100))
+        pipeline = StreamingOCRPipeline(fake_ocr, workers=2)
+        run = pipeline.run(pages)
+        self.assertEqual([next(run) for _ in range(3)], [(1, "ok"), (2, ""), (3, "ok")])
+        run.close()
+        self.assertEqual(pipeline.pages_failed, 1)
+
+
+@unittest.skipUnless(HAS_PYMUPDF, "需要 PyMuPDF")
+class TestIterPdfPages(unittest.TestCase):
+
+    def test_rasterize_lazily(self):
+        import fitz
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "scan.pdf")
+            doc = fitz.open()
+            for _ in range(3):
+                doc.new_page(width=100, height=50)
+            doc.save(path)
+            doc.close()
+
+            self.assertEqual(count_pdf_pages(path), 3)
+            pages = list(iter_pdf_pages(path, dpi=72))
+            self.assertEqual([p for p, _ in pages], [1, 2, 3])
+            self.assertEqual(pages[0][1].shape, (50, 100, 3))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()